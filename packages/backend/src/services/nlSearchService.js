@@ -5,6 +5,7 @@ const geocodingService = require('./geocodingService');
 class NLSearchService {
     constructor() {
         this.llmServiceUrl = process.env.LLM_SERVICE_URL || 'http://localhost:8001';
+        this.llmTimeoutMs = parseInt(process.env.LLM_SERVICE_TIMEOUT_MS, 10) || 10000;
     }
 
     /**
@@ -191,8 +192,12 @@ class NLSearchService {
                 `${this.llmServiceUrl}/api/search`,
                 { query },
                 { 
-                    timeout: 10000,
-                    headers: { 'Content-Type': 'application/json' }
+                    timeout: this.llmTimeoutMs,
+                    headers: {
+                        'Content-Type': 'application/json',
+                        // Lets the LLM service stop generating once we have given up waiting
+                        'X-Request-Timeout-Ms': String(this.llmTimeoutMs)
+                    }
                 }
             );
             return response.data;
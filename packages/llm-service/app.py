@@ -6,29 +6,54 @@ Supports two scenarios:
 """
 
 import os
-import json
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException
+from typing import Dict, Any, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+from llm_providers.registry import ProviderRegistry, build_provider
+from llm_providers.cascade_provider import CascadeProvider
+from llm_providers.resilience import circuit_breaker_states
+from llm_providers.replay_provider import RecordingProvider
+from src.deadline import (
+    Deadline, deadline_from_headers, run_with_deadline, await_with_deadline, DeadlineExceeded, RequestCancelled
+)
+from src.metrics import metrics
+from src.usage import RequestUsage, usage_scope, usage_stats
+from src.logging_config import configure_logging
+from src.responses import DefaultResponse, json_response
+from src.cache.similarity_cache import SimilarityCache
+from src.cache.vibe_cache import VibeCache, vibe_key
+from src.vibe.tile_store import VibeTileStore
+from src.vibe.heuristic_scorer import HeuristicVibeScorer
+from src.vibe.prefetcher import shared_prefetcher
+from src.prompts import (
+    SEARCH_PROMPT, VIBE_PROMPT, SEARCH_SYSTEM_PROMPT, VIBE_SYSTEM_PROMPT, extract_json
+)
+from src.vibe.poi_summarizer import PoiSummarizer
+from src.ranking.spot_ranker import SpotRanker
+from src.geo.spatial_index import SpotIndex
+from src.availability.booking_index import BookingIndex
+from src.replay.recorder import TrafficRecorderMiddleware, shared_recorder
+
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging; records are written by a background thread so log I/O never blocks requests
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Parkwise Unified LLM Service",
     description="Supports API and vLLM (GPU) modes",
-    version="2.0.0"
+    version="2.0.0",
+    # orjson for the dict-returning routes; the search and vibe routes build their responses directly
+    default_response_class=DefaultResponse
 )
 
 # Configure CORS
@@ -40,6 +65,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in traffic recording (TRAFFIC_RECORD_DIR) for offline replay with src/scripts/replay_traffic.py
+traffic_recorder = shared_recorder()
+if traffic_recorder is not None:
+    app.add_middleware(TrafficRecorderMiddleware, recorder=traffic_recorder)
+
 # Request/Response models
 class SearchRequest(BaseModel):
     query: str
@@ -53,6 +83,7 @@ class SearchResponse(BaseModel):
     response: Optional[str] = None  # Natural language response for non-parking queries
     mode: str
     error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None  # Tokens and time the request spent in the LLM, with ?debug=true
 
 class VibeRequest(BaseModel):
     lat: float
@@ -67,100 +98,99 @@ class VibeResponse(BaseModel):
     transport: list
     mode: str
     error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None  # Tokens and time the request spent in the LLM, with ?debug=true
+
+class RankRequest(BaseModel):
+    filters: Dict[str, Any] = {}
+    spots: list = []  # Left untyped so tens of thousands of candidates are not validated one by one
+    top_k: int = 20
+    require_all_features: bool = True
+
+class RankResponse(BaseModel):
+    success: bool
+    spots: list
+    matched: int
+    considered: int
+
+class SpotQueryRequest(BaseModel):
+    filters: Dict[str, Any] = {}  # SearchFilters fields, as returned by the search workflow
+    top_k: int = 20
+    require_all_features: bool = True
+
+class SpotUpsertRequest(BaseModel):
+    spots: list  # Full spots, or {"id": ..., <changed fields>} to update some fields
+
+class BookingRequest(BaseModel):
+    bookings: list  # {"id", "spot_id", "start", "end"} with ISO 8601 or epoch-second times
+    replace: bool = False  # Swap in these bookings for all indexed ones
+
+# Near-duplicate query cache for /api/search
+search_cache = SimilarityCache.from_env("search")
 
-# Prompts
-SEARCH_PROMPT = """Analyze this query: "{query}"
-
-If the query contains words like "parking", "park", "spot", "garage", "cheap", "near", "find", "show", "covered", "EV", then it's about parking.
-If the query is "who are you", "what are you", "what can you do", it's asking about the assistant.
-If the query is "hello", "hi", "hey", "good morning", it's a greeting.
-Otherwise, it's off-topic.
-
-Return JSON:
-{{
-  "intent": {{
-    "type": "parking_search" or "system_inquiry" or "greeting" or "off_topic",
-    "confidence": 0.8
-  }},
-  "response": "I'm your parking assistant! I help you find the best parking spots in your area." (for system_inquiry) or "Hello! I'm here to help you find parking." (for greeting) or "I specialize in parking. How can I help you find parking?" (for off_topic) or "" (for parking_search),
-  "entities": {{
-    "location": null,
-    "price_range": null,
-    "features": []
-  }},
-  "filters": {{
-    "max_price": null,
-    "required_features": [],
-    "radius": 500
-  }}
-}}"""
-
-VIBE_PROMPT = """Analyze this location and provide parking insights.
-
-Location: ({lat}, {lng})
-Nearby POIs: {pois}
-
-Return a JSON object with:
-{{
-  "vibe": {{
-    "score": 1-10,
-    "summary": "brief description",
-    "hashtags": ["#tag1", "#tag2", "#tag3"]
-  }},
-  "parking": {{
-    "difficulty": 1-10,
-    "level": "Easy|Moderate|Hard",
-    "tips": ["tip1", "tip2"],
-    "hashtags": ["#parking-tags"]
-  }},
-  "transport": [
-    {{"method": "Car|Public|Walk", "reason": "why"}}
-  ]
-}}
-
-Return ONLY valid JSON."""
-
-# Global LLM provider instance
-llm_provider = None
-current_mode = None
+# Precomputed vibe analyses, answered without the LLM when the tile exists
+vibe_tiles = VibeTileStore.from_env()
+
+# How vibe requests without a precomputed tile are answered:
+#   llm       wait for the model
+#   heuristic instant NumPy scorer only
+#   hybrid    instant scorer now, the model refines the cached answer in the background
+#   auto      the model, unless it is saturated, unavailable or the deadline is too short
+VIBE_TIER = os.getenv("VIBE_TIER", "llm").lower()
+VIBE_AUTO_MAX_IN_FLIGHT = int(os.getenv("VIBE_AUTO_MAX_IN_FLIGHT", "4"))
+VIBE_AUTO_MIN_SECONDS = float(os.getenv("VIBE_AUTO_MIN_SECONDS", "3"))
+VIBE_REFINE_TIMEOUT = float(os.getenv("VIBE_REFINE_TIMEOUT", "60"))
+vibe_scorer = HeuristicVibeScorer.from_env()
+# Condenses poi_data into the prompt's POI section within a token budget
+poi_summarizer = PoiSummarizer.from_env()
+vibe_cache = VibeCache.from_env()
+# Background refinements by vibe cache key, so each location is refined once at a time
+_vibe_refinements: Dict[Tuple, asyncio.Task] = {}
+# Opt-in (VIBE_PREFETCH_ENABLED) vibe analyses of the locations searches resolve, ahead of the map asking
+vibe_prefetcher = shared_prefetcher() if vibe_cache is not None else None
+VIBE_PREFETCH_MAX_LOAD = int(os.getenv("VIBE_PREFETCH_MAX_LOAD", "2"))
+
+# Scores candidate spots against parsed filters for /api/rank
+spot_ranker = SpotRanker.from_env()
+
+# Bookings per spot, so filters with start_time/end_time only return spots free for the whole window
+booking_index = BookingIndex.from_env()
+
+# Parking spots held in process (SPOT_INDEX_PATH snapshot plus upserts), queried by filters
+spot_index = SpotIndex.from_env(bookings=booking_index)
+
+# Registry holding the active (and any warm) LLM provider
+registry = ProviderRegistry(
+    drain_timeout=float(os.getenv("PROVIDER_DRAIN_TIMEOUT", "30")),
+    lease_timeout=float(os.getenv("PROVIDER_LEASE_TIMEOUT", "60")),
+)
+# Completions are requested through llm, which also records them while traffic is recorded
+llm = RecordingProvider(registry) if traffic_recorder is not None else registry
 
 def detect_and_initialize_llm():
-    """Auto-detect and initialize the best available LLM provider"""
-    global llm_provider, current_mode
-    
-    # Check environment for explicit mode
-    mode = os.getenv("LLM_MODE", "auto").lower()
-    
-    if mode == "api" or (mode == "auto" and os.getenv("API_BASE_URL")):
-        # Scenario 1: OpenAI-compatible API (including Ollama)
-        try:
-            from llm_providers.api_provider import OpenAICompatibleProvider
-            llm_provider = OpenAICompatibleProvider()
-            current_mode = "api"
-            logger.info(f"✓ Initialized API mode with endpoint: {os.getenv('API_BASE_URL')}")
-            return
-        except Exception as e:
-            logger.error(f"Failed to initialize API provider: {e}")
-            if mode == "api":
-                raise
-    
-    if mode == "vllm" or mode == "auto":
-        # Scenario 2: vLLM with GPU
-        try:
-            import torch
-            if torch.cuda.is_available():
-                from llm_providers.vllm_provider import VLLMProvider
-                llm_provider = VLLMProvider()
-                current_mode = "vllm"
-                logger.info(f"✓ Initialized vLLM mode with model: {os.getenv('VLLM_MODEL', 'openai/gpt-oss-20b')}")
-                return
-        except Exception as e:
-            logger.error(f"Failed to initialize vLLM provider: {e}")
-            if mode == "vllm":
-                raise
-    
-    # If we get here, no provider could be initialized
-    raise RuntimeError("No LLM provider could be initialized. Please check your configuration.")
+    """Build a provider and install it as the active one"""
+    provider, mode = build_provider()
+    registry.install(provider, mode, builder=lambda: build_provider(mode))
+
+def _shares_gpu(mode: Optional[str]) -> bool:
+    """Whether a reload would start a second vLLM engine next to the active one"""
+    target = (mode or os.getenv("LLM_MODE", "auto")).lower()
+    if target == "auto" and os.getenv("API_BASE_URL"):
+        target = "api"
+    return registry.mode == "vllm" and target != "api"
+
+async def _prefetch_vibe(lat: float, lng: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Vibe of a searched location as the map will ask for it, without POIs"""
+    # Counted on its own route so speculative tokens show apart from the ones requests wait for
+    with usage_scope():
+        result = await _llm_vibe(VibeRequest(lat=lat, lng=lng), Deadline(VIBE_REFINE_TIMEOUT, route="vibe_prefetch"))
+    analysis = _complete_vibe(result)
+    return (registry.mode or "none", analysis) if analysis else None
+
+if vibe_prefetcher is not None:
+    vibe_prefetcher.bind(
+        _prefetch_vibe, vibe_cache,
+        busy=lambda: not registry.available or registry.in_flight >= VIBE_PREFETCH_MAX_LOAD
+    )
 
 # Initialize LLM on startup
 try:
@@ -169,28 +199,15 @@ except Exception as e:
     logger.error(f"Failed to initialize LLM service: {e}")
     logger.info("Service will start but LLM features will be unavailable")
 
-def extract_json(text: str) -> Dict:
-    """Extract JSON from LLM response"""
-    try:
-        # Try to find JSON in the response
-        import re
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group())
-        return json.loads(text)
-    except:
-        # Fallback response
-        return {}
-
 @app.get("/")
 async def root():
     """Service information endpoint"""
     return {
         "service": "Parkwise Unified LLM Service",
         "version": "2.0.0",
-        "mode": current_mode,
-        "status": "ready" if llm_provider else "no_provider",
-        "endpoints": ["/api/search", "/api/vibe/analyze", "/health", "/config"],
+        "mode": registry.mode,
+        "status": "ready" if registry.available else "no_provider",
+        "endpoints": ["/api/search", "/api/vibe/analyze", "/api/rank", "/api/spots/query", "/api/spots", "/api/bookings", "/health", "/config", "/metrics", "/stats", "/providers"],
         "modes": {
             "api": "OpenAI-compatible API (cloud or local including Ollama)",
             "vllm": "vLLM with GPU (OpenAI GPT-OSS 20B)"
@@ -201,27 +218,48 @@ async def root():
 async def get_config():
     """Get current configuration"""
     config = {
-        "mode": current_mode,
-        "available": llm_provider is not None
+        "mode": registry.mode,
+        "available": registry.available
     }
     
-    if current_mode == "api":
+    if registry.mode == "api":
         config["api"] = {
             "endpoint": os.getenv("API_BASE_URL"),
             "model": os.getenv("API_MODEL")
         }
-    elif current_mode == "vllm":
+    elif registry.mode == "vllm":
         config["vllm"] = {
             "model": os.getenv("VLLM_MODEL", "openai/gpt-oss-20b"),
             "gpu_memory": os.getenv("VLLM_GPU_MEMORY", "0.9")
         }
     
+    if isinstance(registry.provider, CascadeProvider):
+        config["cascade"] = {
+            "small_model": registry.provider.small.model,
+            "thresholds": registry.provider.thresholds
+        }
+    
     return config
 
 @app.post("/api/search", response_model=SearchResponse)
-async def search_parking(request: SearchRequest):
+async def search_parking(request: SearchRequest, http_request: Request, debug: bool = False):
     """Process natural language parking search queries"""
-    if not llm_provider:
+    with usage_scope() as usage:
+        response = await _search_parking(request, http_request)
+    return _with_usage(response, usage, debug)
+
+def _with_usage(response: BaseModel, usage: RequestUsage, debug: bool):
+    """JSON response, carrying the request's LLM usage when debugging"""
+    summary = usage.close()
+    if debug:
+        response.usage = summary
+        return json_response(response)
+    return json_response(response, exclude={"usage"})
+
+async def _search_parking(request: SearchRequest, http_request: Request) -> SearchResponse:
+    deadline = deadline_from_headers(http_request.headers, "search")
+    
+    if not registry.serving:
         return SearchResponse(
             success=False,
             query=request.query,
@@ -232,45 +270,189 @@ async def search_parking(request: SearchRequest):
             error="No LLM provider available"
         )
     
+    # Reuse the parse of a near-duplicate query when one is cached
+    context = registry.mode or ""
+    if search_cache is not None:
+        match = search_cache.lookup(request.query, context)
+        if match is not None:
+            response = SearchResponse(query=request.query, **match.value)
+            _prefetch_location(response)
+            return response
+    
     try:
         # Format prompt
         prompt = SEARCH_PROMPT.format(query=request.query)
         
-        # Generate response
-        response_text = llm_provider.generate_structured(
+        # Generate response off the event loop, cancelled if the caller stops waiting
+        response_text = await run_with_deadline(
+            deadline,
+            llm.generate_structured,
             prompt,
-            system_prompt="You are a parking assistant. Always return valid JSON."
+            system_prompt=SEARCH_SYSTEM_PROMPT,
+            route="search",
+            is_disconnected=http_request.is_disconnected
         )
         
         # Parse JSON response
         result = extract_json(response_text)
         
-        return SearchResponse(
+        response = SearchResponse(
             success=True,
             query=request.query,
             intent=result.get("intent", {"type": "parking_search", "confidence": 0.8}),
             entities=result.get("entities", {}),
             filters=result.get("filters", {"radius": 500}),
             response=result.get("response", None),
-            mode=current_mode
+            mode=registry.mode or "none"
         )
+        if search_cache is not None and result:
+            search_cache.put(request.query, response.model_dump(exclude={"query", "usage"}), context)
+        _prefetch_location(response)
+        return response
         
+    except (DeadlineExceeded, RequestCancelled) as e:
+        logger.warning("Search abandoned: %s", e)
+        return SearchResponse(
+            success=False,
+            query=request.query,
+            intent={"type": "find_parking", "confidence": 0.5},
+            entities={},
+            filters={"radius": 500},
+            mode=registry.mode or "none",
+            error=str(e)
+        )
     except Exception as e:
-        logger.error(f"Search error: {e}")
+        logger.error("Search error: %s", e)
         return SearchResponse(
             success=False,
             query=request.query,
             intent={"type": "find_parking", "confidence": 0.5},
             entities={},
             filters={"radius": 500},
-            mode=current_mode,
+            mode=registry.mode or "none",
             error=str(e)
         )
 
+def _prefetch_location(response: SearchResponse):
+    if vibe_prefetcher is not None and response.success:
+        vibe_prefetcher.prefetch(response.filters)
+
+def _vibe_tier(deadline: Deadline) -> str:
+    """Resolve VIBE_TIER into the path this request takes: llm, heuristic or hybrid"""
+    if VIBE_TIER == "heuristic":
+        return "heuristic"
+    if VIBE_TIER == "hybrid":
+        return "hybrid" if registry.available else "heuristic"
+    if VIBE_TIER == "auto":
+        remaining = deadline.remaining()
+        if (not registry.available or registry.in_flight >= VIBE_AUTO_MAX_IN_FLIGHT
+                or (remaining is not None and remaining < VIBE_AUTO_MIN_SECONDS)):
+            return "heuristic"
+    return "llm"
+
+def _heuristic_vibe(request: VibeRequest) -> Dict[str, Any]:
+    return vibe_scorer.score(request.lat, request.lng, request.poi_data)
+
+async def _llm_vibe(request: VibeRequest, deadline: Deadline, is_disconnected=None) -> Dict[str, Any]:
+    """Raw vibe analysis JSON from the active provider"""
+    prompt = VIBE_PROMPT.format(
+        lat=request.lat,
+        lng=request.lng,
+        pois=poi_summarizer.format(request.poi_data, request.lat, request.lng)
+    )
+    
+    # Generate response off the event loop, cancelled if the caller stops waiting
+    response_text = await run_with_deadline(
+        deadline,
+        llm.generate_structured,
+        prompt,
+        system_prompt=VIBE_SYSTEM_PROMPT,
+        route="vibe",
+        is_disconnected=is_disconnected
+    )
+    
+    return extract_json(response_text)
+
+def _complete_vibe(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The analysis in a model result, or None when parts are missing"""
+    if not result.get("vibe") or not result.get("parking"):
+        return None
+    return {"vibe": result["vibe"], "parking": result["parking"], "transport": result.get("transport", [])}
+
+async def _refine_vibe(key: Tuple, request: VibeRequest):
+    """Replace a heuristic answer in the vibe cache with the model's"""
+    try:
+        # Counted on its own rather than in the request that scheduled it, which has already been answered
+        with usage_scope():
+            analysis = _complete_vibe(await _llm_vibe(request, Deadline(VIBE_REFINE_TIMEOUT, route="vibe")))
+        if analysis:
+            vibe_cache.put(key, registry.mode or "none", analysis)
+        metrics.increment("vibe_refinements_total", outcome="refined" if analysis else "empty")
+    except Exception as e:
+        metrics.increment("vibe_refinements_total", outcome="failed")
+        logger.warning("Background vibe refinement failed: %s", e)
+
+def _schedule_refinement(key: Tuple, request: VibeRequest):
+    if key in _vibe_refinements:
+        return
+    # Refinement is best effort and must not crowd out requests that wait for the model
+    if registry.in_flight >= VIBE_AUTO_MAX_IN_FLIGHT:
+        metrics.increment("vibe_refinements_total", outcome="skipped")
+        return
+    task = asyncio.create_task(_refine_vibe(key, request))
+    _vibe_refinements[key] = task
+    task.add_done_callback(lambda _: _vibe_refinements.pop(key, None))
+
 @app.post("/api/vibe/analyze", response_model=VibeResponse)
-async def analyze_vibe(request: VibeRequest):
+async def analyze_vibe(request: VibeRequest, http_request: Request, debug: bool = False):
     """Analyze location vibe and parking difficulty"""
-    if not llm_provider:
+    with usage_scope() as usage:
+        response = await _analyze_vibe(request, http_request)
+    return _with_usage(response, usage, debug)
+
+async def _analyze_vibe(request: VibeRequest, http_request: Request) -> VibeResponse:
+    deadline = deadline_from_headers(http_request.headers, "vibe")
+    
+    if vibe_tiles is not None:
+        tile = vibe_tiles.get(request.lat, request.lng)
+        metrics.increment("vibe_tile_lookups_total", outcome="hit" if tile else "miss")
+        if tile is not None:
+            return VibeResponse(
+                success=True,
+                vibe=tile["vibe"],
+                parking=tile["parking"],
+                transport=tile["transport"],
+                mode="precomputed"
+            )
+    
+    key = vibe_key(request.lat, request.lng, request.poi_data)
+    cached = vibe_cache.get(key) if vibe_cache is not None else None
+    if cached is not None:
+        source, analysis = cached
+        return VibeResponse(success=True, mode=source, **analysis)
+    
+    # A search may have started this analysis already; waiting for it beats starting a second one
+    if vibe_prefetcher is not None and not request.poi_data:
+        try:
+            if await await_with_deadline(deadline, vibe_prefetcher.wait(key), route="vibe"):
+                cached = vibe_cache.get(key)
+                if cached is not None:
+                    metrics.increment("vibe_prefetch_total", outcome="joined")
+                    source, analysis = cached
+                    return VibeResponse(success=True, mode=source, **analysis)
+        except (DeadlineExceeded, RequestCancelled):
+            pass
+    
+    tier = _vibe_tier(deadline)
+    metrics.increment("vibe_tier_total", tier=tier)
+    if tier != "llm":
+        analysis = _heuristic_vibe(request)
+        if tier == "hybrid" and vibe_cache is not None:
+            vibe_cache.put(key, "heuristic", analysis)
+            _schedule_refinement(key, request)
+        return VibeResponse(success=True, mode="heuristic", **analysis)
+    
+    if not registry.serving:
         return VibeResponse(
             success=False,
             vibe={},
@@ -281,27 +463,15 @@ async def analyze_vibe(request: VibeRequest):
         )
     
     try:
-        # Format POI data
-        pois = ", ".join([
-            f"{poi.get('name', 'Unknown')} ({poi.get('type', 'place')})"
-            for poi in request.poi_data[:10]
-        ]) if request.poi_data else "No POI data"
-        
-        # Format prompt
-        prompt = VIBE_PROMPT.format(
-            lat=request.lat,
-            lng=request.lng,
-            pois=pois
-        )
-        
-        # Generate response
-        response_text = llm_provider.generate_structured(
-            prompt,
-            system_prompt="You are a location analyst. Always return valid JSON."
-        )
-        
-        # Parse JSON response
-        result = extract_json(response_text)
+        result = await _llm_vibe(request, deadline, http_request.is_disconnected)
+        analysis = _complete_vibe(result)
+        if analysis:
+            if vibe_cache is not None:
+                vibe_cache.put(key, registry.mode or "none", analysis)
+            return VibeResponse(success=True, mode=registry.mode or "none", **analysis)
+        if VIBE_TIER != "llm":
+            metrics.increment("vibe_heuristic_fallbacks_total", reason="unparseable")
+            return VibeResponse(success=True, mode="heuristic", **_heuristic_vibe(request))
         
         return VibeResponse(
             success=True,
@@ -319,53 +489,172 @@ async def analyze_vibe(request: VibeRequest):
             transport=result.get("transport", [
                 {"method": "Car", "reason": "Most convenient"}
             ]),
-            mode=current_mode
+            mode=registry.mode or "none"
         )
         
+    except (DeadlineExceeded, RequestCancelled) as e:
+        logger.warning("Vibe analysis abandoned: %s", e)
+        if VIBE_TIER != "llm" and not isinstance(e, RequestCancelled):
+            metrics.increment("vibe_heuristic_fallbacks_total", reason="deadline")
+            return VibeResponse(success=True, mode="heuristic", **_heuristic_vibe(request))
+        return VibeResponse(
+            success=False,
+            vibe={"score": 5, "summary": "Analysis timed out", "hashtags": []},
+            parking={"difficulty": 5, "level": "Unknown", "tips": [], "hashtags": []},
+            transport=[],
+            mode=registry.mode or "none",
+            error=str(e)
+        )
     except Exception as e:
-        logger.error(f"Vibe analysis error: {e}")
+        logger.error("Vibe analysis error: %s", e)
+        if VIBE_TIER != "llm":
+            metrics.increment("vibe_heuristic_fallbacks_total", reason="error")
+            return VibeResponse(success=True, mode="heuristic", **_heuristic_vibe(request))
         return VibeResponse(
             success=False,
             vibe={"score": 5, "summary": "Analysis failed", "hashtags": []},
             parking={"difficulty": 5, "level": "Unknown", "tips": [], "hashtags": []},
             transport=[],
-            mode=current_mode,
+            mode=registry.mode or "none",
             error=str(e)
         )
 
+@app.post("/api/rank", response_model=RankResponse)
+async def rank_spots(request: RankRequest):
+    """Filter and rank candidate parking spots by parsed search filters"""
+    started = time.perf_counter()
+    # Off the event loop: reading large candidate lists is pure CPU
+    ranking = await asyncio.to_thread(
+        spot_ranker.rank, request.spots, request.filters, request.top_k, request.require_all_features
+    )
+    metrics.observe("rank_seconds", time.perf_counter() - started)
+    metrics.observe("rank_candidates", ranking.considered)
+    return json_response(RankResponse(success=True, spots=ranking.spots, matched=ranking.matched,
+                                      considered=ranking.considered))
+
+@app.post("/api/spots/query", response_model=RankResponse)
+async def query_spots(request: SpotQueryRequest):
+    """Indexed parking spots matching search filters, best first"""
+    started = time.perf_counter()
+    ranking = spot_index.query(request.filters, request.top_k, request.require_all_features)
+    metrics.observe("spot_query_seconds", time.perf_counter() - started)
+    return json_response(RankResponse(success=True, spots=ranking.spots, matched=ranking.matched,
+                                      considered=ranking.considered))
+
+@app.put("/api/spots")
+async def upsert_spots(request: SpotUpsertRequest):
+    """Add spots to the index or update fields of indexed ones, such as availability"""
+    spots = [spot for spot in request.spots if isinstance(spot, dict) and spot.get("id") is not None]
+    if len(spots) != len(request.spots):
+        raise HTTPException(status_code=422, detail="Every spot needs an id")
+    inserted = sum(spot_index.upsert(spot) for spot in spots)
+    metrics.increment("spot_index_updates_total", inserted, kind="insert")
+    metrics.increment("spot_index_updates_total", len(spots) - inserted, kind="update")
+    return {"inserted": inserted, "updated": len(spots) - inserted, "spots": len(spot_index)}
+
+@app.delete("/api/spots/{spot_id}")
+async def delete_spot(spot_id: str):
+    """Remove a spot from the index"""
+    if not spot_index.delete(spot_id):
+        raise HTTPException(status_code=404, detail=f"Spot '{spot_id}' is not indexed")
+    metrics.increment("spot_index_updates_total", kind="delete")
+    return {"deleted": spot_id, "spots": len(spot_index)}
+
+@app.put("/api/bookings")
+async def put_bookings(request: BookingRequest):
+    """Add or replace bookings of indexed spots"""
+    try:
+        if request.replace:
+            booking_index.load(request.bookings)
+        else:
+            booking_index.add_many(request.bookings)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid booking: {e}")
+    metrics.increment("booking_index_updates_total", len(request.bookings), kind="load" if request.replace else "add")
+    return {"bookings": len(booking_index)}
+
+@app.delete("/api/bookings/{booking_id}")
+async def delete_booking(booking_id: str):
+    """Remove a booking, freeing its spot for that window"""
+    if not booking_index.remove(booking_id):
+        raise HTTPException(status_code=404, detail=f"Booking '{booking_id}' is not indexed")
+    metrics.increment("booking_index_updates_total", kind="remove")
+    return {"deleted": booking_id, "bookings": len(booking_index)}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     health = {
-        "status": "healthy" if llm_provider else "degraded",
-        "mode": current_mode,
-        "provider_available": llm_provider is not None
+        "status": "healthy" if registry.available else "degraded",
+        "mode": registry.mode,
+        "provider_available": registry.available
     }
     
-    if llm_provider and hasattr(llm_provider, 'health_check'):
-        health["provider_status"] = llm_provider.health_check()
+    if registry.available:
+        health["provider_status"] = await asyncio.to_thread(registry.health_check)
+    
+    health["circuits"] = circuit_breaker_states()
+    if search_cache is not None:
+        health["search_cache"] = search_cache.stats()
+    if vibe_tiles is not None:
+        health["vibe_tiles"] = vibe_tiles.stats()
+    if vibe_cache is not None:
+        health["vibe_cache"] = dict(vibe_cache.stats(), tier=VIBE_TIER, refining=len(_vibe_refinements))
+    if vibe_prefetcher is not None:
+        health["vibe_prefetch"] = vibe_prefetcher.stats()
+    health["spot_index"] = spot_index.stats()
+    health["booking_index"] = booking_index.stats()
+    health["providers"] = registry.stats()
     
     return health
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process service metrics (counters, gauges, latency summaries)"""
+    return metrics.snapshot()
+
+@app.get("/stats")
+async def get_stats():
+    """LLM token usage per route and model since startup, and rolling tokens per second"""
+    return usage_stats.stats()
+
 @app.post("/reload")
-async def reload_provider():
-    """Reload LLM provider (useful for switching modes)"""
-    try:
-        detect_and_initialize_llm()
-        return {
-            "success": True,
-            "mode": current_mode,
-            "message": f"Reloaded with {current_mode} mode"
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+async def reload_provider(mode: Optional[str] = None, name: Optional[str] = None,
+                          keep_warm: Optional[bool] = None, wait: bool = True):
+    """Build a new provider in the background and swap it in without dropping requests"""
+    if keep_warm is None:
+        keep_warm = os.getenv("PROVIDER_KEEP_WARM", "false").lower() == "true"
+    drain_first = _shares_gpu(mode)
+    
+    result = await registry.reload(
+        lambda: build_provider(mode),
+        name=name,
+        keep_warm=keep_warm and not drain_first,
+        drain_first=drain_first,
+        wait=wait
+    )
+    if result.get("status") == "completed":
+        result["message"] = f"Reloaded with {result['mode']} mode"
+    return result
+
+@app.get("/providers")
+async def list_providers():
+    """Active and warm providers, plus the state of the last reload"""
+    return registry.stats()
+
+@app.post("/providers/{name}/activate")
+async def activate_provider(name: str):
+    """Switch instantly to a provider kept warm by an earlier reload"""
+    return registry.activate(name)
+
+@app.delete("/providers/{name}")
+async def evict_provider(name: str):
+    """Drain and close a warm provider"""
+    return await registry.evict(name)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8001"))
     logger.info(f"Starting Unified LLM Service on port {port}")
-    logger.info(f"Mode: {current_mode}")
+    logger.info(f"Mode: {registry.mode}")
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -4,9 +4,17 @@ Supports: OpenAI, Azure OpenAI, local vLLM/Ollama endpoints, and any OpenAI-comp
 """
 
 import os
+import time
 import logging
-from typing import Dict, Any, List
-from openai import OpenAI
+from typing import Dict, Any, List, Optional
+from openai import OpenAI, BadRequestError, RateLimitError, NotFoundError, UnprocessableEntityError
+
+from .prefix_cache import PrefixCacheStats
+from .rate_limiter import RateLimiter
+from .resilience import Resilience
+from src.deadline import Deadline, get_deadline
+from src.tokens import token_counter
+from src.usage import Completion, usage_stats
 
 logger = logging.getLogger(__name__)
 
@@ -14,92 +22,220 @@ logger = logging.getLogger(__name__)
 class OpenAICompatibleProvider:
     """Provider for any OpenAI-compatible API endpoint"""
     
-    def __init__(self):
-        # Get configuration from environment
-        self.base_url = os.getenv("API_BASE_URL", "https://api.openai.com/v1")
-        self.api_key = os.getenv("API_KEY", "dummy")
-        self.model = os.getenv("API_MODEL", "gpt-4-turbo")
-        self.temperature = float(os.getenv("API_TEMPERATURE", "0.3"))
-        self.max_tokens = int(os.getenv("API_MAX_TOKENS", "500"))
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, env_prefix: str = "API"):
+        # Get configuration from arguments, then the environment
+        self.base_url = base_url or os.getenv("API_BASE_URL", "https://api.openai.com/v1")
+        self.api_key = api_key or os.getenv("API_KEY", "dummy")
+        self.model = model or os.getenv("API_MODEL", "gpt-4-turbo")
+        self.temperature = float(os.getenv(f"{env_prefix}_TEMPERATURE", os.getenv("API_TEMPERATURE", "0.3")))
+        self.max_tokens = int(os.getenv(f"{env_prefix}_MAX_TOKENS", os.getenv("API_MAX_TOKENS", "500")))
+        
+        # Retries and circuit breaking are handled by the shared resilience layer; a second
+        # model on the same endpoint gets its own circuit so its failures do not trip the first
+        endpoint = self.base_url if env_prefix == "API" else f"{self.base_url}#{self.model}"
+        self.resilience = Resilience.from_env(endpoint, env_prefix)
         
         # Initialize OpenAI client with custom endpoint
         self.client = OpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
+            timeout=self.resilience.timeout,
+            max_retries=0,
         )
         
+        # Pace calls against the endpoint's RPM/TPM budgets
+        self.rate_limiter = RateLimiter.from_env(env_prefix)
+        
+        # Cached prompt tokens, for endpoints that report them (OpenAI, vLLM with --enable-prefix-caching)
+        self.prefix_cache = PrefixCacheStats(f"api:{self.model}")
+        # Ask for usage on streamed responses too; switched off for good if the server rejects stream_options
+        self.stream_usage = os.getenv("API_STREAM_USAGE", "true").lower() == "true"
+        
         logger.info(f"Initialized OpenAI-compatible API provider")
         logger.info(f"Endpoint: {self.base_url}")
         logger.info(f"Model: {self.model}")
+        if self.rate_limiter.enabled:
+            logger.info(f"Rate limits: {self.rate_limiter.stats()}")
+    
+    def _completion(self, prompt: str, text: str, usage: Any, queued: float, started: float) -> Completion:
+        """Completion with the token counts the endpoint reported, or estimates when it did not"""
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        estimated = prompt_tokens is None or completion_tokens is None
+        if prompt_tokens is None:
+            prompt_tokens = token_counter.count(prompt)
+        else:
+            token_counter.observe(prompt, prompt_tokens)
+        if completion_tokens is None:
+            completion_tokens = token_counter.count(text)
+        return Completion(text or "", prompt_tokens, completion_tokens, queued,
+                          time.perf_counter() - started, self.model, estimated)
+    
+    def _create_chat_completion(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Completion:
+        """Run a chat completion within the rate limit budget and the request deadline"""
+        deadline = get_deadline()
+        if deadline is not None:
+            deadline.check()
+        
+        estimated_tokens = self.rate_limiter.estimate_tokens(messages, max_tokens)
+        queued = self.rate_limiter.acquire(
+            estimated_tokens,
+            max_wait=deadline.timeout_for(self.rate_limiter.max_wait) if deadline else None
+        )
+        
+        timeout = deadline.timeout_for(self.resilience.timeout) if deadline else self.resilience.timeout
+        # Streaming lets a cancelled request close the connection and stop upstream generation
+        stream = deadline is not None
+        started = time.perf_counter()
+        try:
+            try:
+                raw_response = self._create_raw(messages, temperature, max_tokens, timeout, stream)
+            except (BadRequestError, UnprocessableEntityError):
+                if not (stream and self.stream_usage):
+                    raise
+                logger.warning("%s rejected stream_options, streaming without token usage", self.base_url)
+                self.stream_usage = False
+                raw_response = self._create_raw(messages, temperature, max_tokens, timeout, stream)
+        except RateLimitError as e:
+            # Let the server's view of the budget hold back subsequent calls
+            self.rate_limiter.update_from_headers(getattr(e.response, "headers", None))
+            raise
+        
+        self.rate_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        
+        if stream:
+            text, usage = self._read_stream(response, deadline)
+        else:
+            text, usage = response.choices[0].message.content, getattr(response, "usage", None)
+        
+        if usage is not None:
+            self.rate_limiter.reconcile(estimated_tokens, getattr(usage, "total_tokens", None))
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.prefix_cache.record(getattr(usage, "prompt_tokens", None), getattr(details, "cached_tokens", None))
+        
+        return self._completion("\n".join(m["content"] for m in messages), text, usage, queued, started)
+    
+    def _create_raw(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                    timeout: Optional[float], stream: bool):
+        extra = {"stream_options": {"include_usage": True}} if stream and self.stream_usage else {}
+        return self.client.with_options(timeout=timeout).chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            **extra
+        )
+    
+    def _read_stream(self, stream, deadline: Deadline):
+        """Collect a streamed completion and its usage, abandoning it as soon as the deadline is cancelled"""
+        parts = []
+        usage = None
+        try:
+            for chunk in stream:
+                deadline.check()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+        finally:
+            stream.close()
+        return "".join(parts), usage
+    
+    def _create_legacy_completion(self, prompt: str, temperature: float, max_tokens: int):
+        """Run a legacy completion within the rate limit budget"""
+        deadline = get_deadline()
+        if deadline is not None:
+            deadline.check()
+        
+        queued = self.rate_limiter.acquire(
+            self.rate_limiter.estimate_tokens([{"content": prompt}], max_tokens),
+            max_wait=deadline.timeout_for(self.rate_limiter.max_wait) if deadline else None
+        )
+        timeout = deadline.timeout_for(self.resilience.timeout) if deadline else self.resilience.timeout
+        started = time.perf_counter()
+        response = self.client.with_options(timeout=timeout).completions.create(
+            model=self.model,
+            prompt=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return self._completion(prompt, response.choices[0].text, getattr(response, "usage", None), queued, started)
+    
+    def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Completion:
+        """Chat completion with retries and circuit breaking, counted in the usage stats"""
+        try:
+            completion = self.resilience.call(
+                lambda: self._create_chat_completion(messages, temperature, max_tokens)
+            )
+        except NotFoundError:
+            # Older endpoints only expose the completions API
+            logger.info("Chat completions not found at %s, using legacy completions", self.base_url)
+            prompt = "\n\n".join(message["content"] for message in messages)
+            completion = self.resilience.call(
+                lambda: self._create_legacy_completion(prompt, temperature, max_tokens)
+            )
+        usage_stats.record(completion)
+        return completion
     
     def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using OpenAI-compatible API"""
+        # Override with kwargs if provided
+        temperature = kwargs.get('temperature', self.temperature)
+        max_tokens = kwargs.get('max_tokens', self.max_tokens)
+        
         try:
-            # Override with kwargs if provided
-            temperature = kwargs.get('temperature', self.temperature)
-            max_tokens = kwargs.get('max_tokens', self.max_tokens)
-            
             # Use chat completions format (standard for OpenAI-compatible APIs)
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            return self._complete(
+                [
                     {"role": "system", "content": "You are a helpful parking assistant."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=temperature,
                 max_tokens=max_tokens
-            )
-            
-            return response.choices[0].message.content
-            
+            ).text
         except Exception as e:
-            logger.error(f"API generation error: {e}")
-            # Try completion format as fallback (for older APIs)
-            try:
-                response = self.client.completions.create(
-                    model=self.model,
-                    prompt=prompt,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                return response.choices[0].text
-            except:
-                raise e
+            logger.error("API generation error: %s", e)
+            raise
     
     def generate_structured(self, prompt: str, system_prompt: str = None) -> str:
         """Generate with explicit system prompt for structured output"""
+        return self.complete_structured(prompt, system_prompt).text
+    
+    def complete_structured(self, prompt: str, system_prompt: str = None) -> Completion:
+        """Structured generation with its token counts and timings"""
+        messages = []
+        
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        messages.append({"role": "user", "content": prompt})
+        
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
+            return self._complete(
+                messages,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
-            
-            return response.choices[0].message.content
-            
         except Exception as e:
-            logger.error(f"Structured generation error: {e}")
-            # Fallback to simple generation
-            return self.generate(f"{system_prompt}\n\n{prompt}" if system_prompt else prompt)
+            logger.error("Structured generation error: %s", e)
+            raise
     
     def health_check(self) -> Dict[str, Any]:
         """Check if the API is accessible"""
         try:
             # Try to list models (works with most OpenAI-compatible APIs)
-            models = self.client.models.list()
+            models = self.client.with_options(timeout=5.0).models.list()
             return {
                 "status": "healthy",
                 "endpoint": self.base_url,
                 "model": self.model,
-                "available": True
+                "available": True,
+                "rate_limit": self.rate_limiter.stats(),
+                "resilience": self.resilience.stats(),
+                "prefix_cache": self.prefix_cache.stats()
             }
         except Exception as e:
             logger.warning(f"Health check failed: {e}")
@@ -108,9 +244,15 @@ class OpenAICompatibleProvider:
                 "endpoint": self.base_url,
                 "model": self.model,
                 "available": False,
+                "rate_limit": self.rate_limiter.stats(),
+                "resilience": self.resilience.stats(),
                 "error": str(e)
             }
     
+    def close(self):
+        """Close the HTTP connection pool"""
+        self.client.close()
+    
     @staticmethod
     def get_example_configs() -> Dict[str, Dict[str, str]]:
         """Return example configurations for different services"""
@@ -0,0 +1,208 @@
+"""
+Cascade Provider
+Answers with a small, fast model and escalates to the large model only when
+the small model's JSON is invalid, incomplete or not confident enough
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from src.deadline import DeadlineExceeded, RequestCancelled, get_deadline
+from src.metrics import metrics
+from src.prompts import extract_json
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INTENTS = {"parking_search", "system_inquiry", "greeting", "off_topic"}
+PARKING_LEVELS = {"easy", "moderate", "hard"}
+
+# Minimum confidence to keep the small model's answer, for routes whose output carries one
+DEFAULT_THRESHOLDS = {"search": 0.7, "vibe": 0.0, "default": 0.0}
+
+# A validator returns why an answer must be escalated (None if it is usable) and its confidence
+Validator = Callable[[Dict[str, Any]], Tuple[Optional[str], Optional[float]]]
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_search(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[float]]:
+    intent = result.get("intent")
+    if not isinstance(intent, dict) or intent.get("type") not in SEARCH_INTENTS:
+        return "incomplete", None
+    confidence = _number(intent.get("confidence"))
+    if confidence is None:
+        return "incomplete", None
+    if intent["type"] == "parking_search" and not isinstance(result.get("filters"), dict):
+        return "incomplete", confidence
+    if intent["type"] != "parking_search" and not result.get("response"):
+        return "incomplete", confidence
+    return None, confidence
+
+
+def validate_vibe(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[float]]:
+    vibe, parking = result.get("vibe"), result.get("parking")
+    if not isinstance(vibe, dict) or not isinstance(parking, dict):
+        return "incomplete", None
+    score, difficulty = _number(vibe.get("score")), _number(parking.get("difficulty"))
+    if score is None or not 1 <= score <= 10 or difficulty is None or not 1 <= difficulty <= 10:
+        return "incomplete", None
+    if not vibe.get("summary") or str(parking.get("level", "")).lower() not in PARKING_LEVELS:
+        return "incomplete", None
+    return None, _number(result.get("confidence"))
+
+
+def validate_default(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[float]]:
+    """Validate by the shape of the answer when the route is unknown"""
+    if "intent" in result:
+        return validate_search(result)
+    if "vibe" in result:
+        return validate_vibe(result)
+    return None, _number(result.get("confidence"))
+
+
+ROUTE_VALIDATORS: Dict[str, Validator] = {
+    "search": validate_search,
+    "vibe": validate_vibe,
+}
+
+
+def parse_thresholds(value: Optional[str]) -> Dict[str, float]:
+    """Per-route thresholds from "search=0.8,vibe=0" over the defaults"""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for item in (value or "").split(","):
+        route, _, threshold = item.partition("=")
+        if route.strip() and threshold.strip():
+            thresholds[route.strip()] = float(threshold)
+    return thresholds
+
+
+class CascadeProvider:
+    """Two-tier provider: small model first, large model for answers that fail validation"""
+
+    def __init__(self, small: Any, large: Any, thresholds: Optional[Dict[str, float]] = None):
+        self.small = small
+        self.large = large
+        self.thresholds = thresholds or dict(DEFAULT_THRESHOLDS)
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._tiers = {
+            tier: {"calls": 0, "errors": 0, "latency_total": 0.0} for tier in ("small", "large")
+        }
+
+    @classmethod
+    def from_env(cls, large: Any) -> Optional["CascadeProvider"]:
+        """Wrap large in a cascade when CASCADE_SMALL_MODEL is set"""
+        model = os.getenv("CASCADE_SMALL_MODEL")
+        if not model:
+            return None
+        from .api_provider import OpenAICompatibleProvider
+        small = OpenAICompatibleProvider(
+            base_url=os.getenv("CASCADE_SMALL_BASE_URL") or None,
+            api_key=os.getenv("CASCADE_SMALL_API_KEY") or None,
+            model=model,
+            env_prefix="CASCADE_SMALL",
+        )
+        thresholds = parse_thresholds(os.getenv("CASCADE_THRESHOLDS"))
+        logger.info(f"Cascade enabled: {model} first, thresholds {thresholds}")
+        return cls(small, large, thresholds)
+
+    def _threshold(self, route: str) -> float:
+        return self.thresholds.get(route, self.thresholds.get("default", 0.0))
+
+    def _timed(self, tier: str, route: str, fn: Callable[[], str]) -> str:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return fn()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe("cascade_latency_seconds", elapsed, tier=tier, route=route)
+            with self._lock:
+                stats = self._tiers[tier]
+                stats["calls"] += 1
+                stats["errors"] += int(failed)
+                stats["latency_total"] += elapsed
+
+    def _record(self, route: str, reason: Optional[str]):
+        metrics.increment("cascade_requests_total", route=route, outcome=reason or "accepted")
+        with self._lock:
+            stats = self._routes.setdefault(route, {"requests": 0, "escalated": 0, "reasons": Counter()})
+            stats["requests"] += 1
+            if reason is not None:
+                stats["escalated"] += 1
+                stats["reasons"][reason] += 1
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """Free-form text cannot be validated, so it goes to the large model"""
+        return self.large.generate(prompt, **kwargs)
+
+    def generate_structured(self, prompt: str, system_prompt: str = None, route: Optional[str] = None) -> str:
+        """Small model's answer if it validates, otherwise the large model's"""
+        deadline = get_deadline()
+        route = route or (deadline.route if deadline is not None else None) or "default"
+        validator = ROUTE_VALIDATORS.get(route, validate_default)
+
+        try:
+            text = self._timed("small", route, lambda: self.small.generate_structured(prompt, system_prompt=system_prompt))
+            result = extract_json(text or "")
+            if not result:
+                reason = "invalid_json"
+            else:
+                reason, confidence = validator(result)
+                if reason is None and confidence is not None and confidence < self._threshold(route):
+                    reason = "low_confidence"
+        except (DeadlineExceeded, RequestCancelled):
+            raise
+        except Exception as e:
+            logger.warning("Small model failed on %s, escalating: %s", route, e)
+            reason = "error"
+
+        self._record(route, reason)
+        if reason is None:
+            return text
+        return self._timed("large", route, lambda: self.large.generate_structured(prompt, system_prompt=system_prompt))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": stats["requests"],
+                    "escalated": stats["escalated"],
+                    "escalation_rate": round(stats["escalated"] / stats["requests"], 4),
+                    "reasons": dict(stats["reasons"]),
+                }
+                for route, stats in self._routes.items()
+            }
+            tiers = {
+                tier: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "mean_latency_ms": round(stats["latency_total"] / stats["calls"] * 1000, 1) if stats["calls"] else None,
+                }
+                for tier, stats in self._tiers.items()
+            }
+        return {"thresholds": self.thresholds, "routes": routes, "tiers": tiers}
+
+    def health_check(self) -> Dict[str, Any]:
+        """Health of the large model, which must work for the cascade to answer everything"""
+        health = dict(self.large.health_check())
+        health["cascade"] = self.stats()
+        health["cascade"]["small"] = self.small.health_check()
+        return health
+
+    def close(self):
+        for provider in (self.small, self.large):
+            if hasattr(provider, "close"):
+                provider.close()
@@ -0,0 +1,48 @@
+"""
+Prefix Cache Accounting
+Tracks how many prompt tokens a backend served from its prefix (KV) cache
+"""
+
+import threading
+from typing import Dict, Any, Optional
+
+from src.metrics import metrics
+
+
+class PrefixCacheStats:
+    """Prompt and cached-prompt token totals for one provider, as reported by its backend"""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.requests = 0
+        self.prompt_tokens = 0
+        # Prompt tokens of the requests whose response said how many were cached
+        self.reported_prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: Optional[int], cached_tokens: Optional[int]):
+        """Count one request; cached_tokens is None when the backend does not report it"""
+        if not prompt_tokens:
+            return
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            if cached_tokens is not None:
+                self.reported_prompt_tokens += prompt_tokens
+                self.cached_tokens += cached_tokens
+        metrics.increment("prompt_tokens_total", prompt_tokens, provider=self.provider)
+        if cached_tokens is not None:
+            metrics.increment("prompt_cached_tokens_total", cached_tokens, provider=self.provider)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "hit_rate": (
+                    round(self.cached_tokens / self.reported_prompt_tokens, 4)
+                    if self.reported_prompt_tokens else None
+                ),
+            }
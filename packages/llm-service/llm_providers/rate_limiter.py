@@ -0,0 +1,276 @@
+"""
+Client-side rate limiting for upstream LLM endpoints
+Paces calls against requests-per-minute and tokens-per-minute budgets with
+token buckets, and keeps them in sync with x-ratelimit-* response headers
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Mapping, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than the configured maximum"""
+
+    def __init__(self, wait_seconds: float):
+        super().__init__(f"Upstream rate limit budget exhausted, next slot in {wait_seconds:.1f}s")
+        self.wait_seconds = wait_seconds
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse reset durations like '1s', '6m0s', '250ms' or plain seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(value):
+        matched = True
+        amount = float(amount)
+        if unit == "h":
+            total += amount * 3600
+        elif unit == "m":
+            total += amount * 60
+        elif unit == "s":
+            total += amount
+        else:
+            total += amount / 1000.0
+    return total if matched else None
+
+
+class TokenBucket:
+    """Token bucket that allows debt so callers are paced instead of rejected"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.burst_seconds = burst_seconds
+        self.per_minute = 0.0
+        self.rate = 0.0
+        self.capacity = 0.0
+        self.set_limit(per_minute)
+        self.tokens = self.capacity
+        self.updated_at = self.clock()
+
+    def set_limit(self, per_minute: float):
+        """Change the per-minute budget, keeping the current fill level"""
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = max(1.0, self.rate * self.burst_seconds)
+        if hasattr(self, "tokens"):
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount tokens and return how long the caller must wait for them"""
+        self._refill()
+        self.tokens -= amount
+        if self.tokens >= 0 or self.rate <= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens would be available, without reserving"""
+        self._refill()
+        deficit = amount - self.tokens
+        if deficit <= 0 or self.rate <= 0:
+            return 0.0
+        return deficit / self.rate
+
+    def refund(self, amount: float):
+        """Give back tokens (negative amount charges extra)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, remaining: float, reset_seconds: Optional[float] = None):
+        """Clamp the local fill level to what the server reports as remaining"""
+        self._refill()
+        if remaining <= 0 and reset_seconds:
+            # Server budget is empty: hold callers until the window resets
+            self.tokens = min(self.tokens, -reset_seconds * self.rate)
+        elif remaining < self.tokens:
+            self.tokens = float(remaining)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+class RateLimiter:
+    """Request and token budget limiter shared by all calls to one endpoint"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 burst_seconds: float = 10.0, max_wait: float = 30.0,
+                 learn_from_headers: bool = True,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self.learn_from_headers = learn_from_headers
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+        self.requests = TokenBucket(requests_per_minute, burst_seconds, clock) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds, clock) if tokens_per_minute > 0 else None
+
+        # Gauges and counters
+        self.throttled_calls = 0
+        self.rejected_calls = 0
+        self.total_wait_seconds = 0.0
+        self.last_header_sync = None
+        self.server_remaining: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls, prefix: str = "API") -> "RateLimiter":
+        """Build a limiter from <PREFIX>_RPM_LIMIT / <PREFIX>_TPM_LIMIT style settings"""
+        return cls(
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM_LIMIT", "0")),
+            tokens_per_minute=float(os.getenv(f"{prefix}_TPM_LIMIT", "0")),
+            burst_seconds=float(os.getenv(f"{prefix}_RATE_LIMIT_BURST_SECONDS", "10")),
+            max_wait=float(os.getenv(f"{prefix}_RATE_LIMIT_MAX_WAIT", "30")),
+            learn_from_headers=os.getenv(f"{prefix}_RATE_LIMIT_FROM_HEADERS", "true").lower() == "true",
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int = 0) -> int:
+        """Estimate the token cost of a chat call (prompt plus worst-case completion)"""
+        chars = sum(len(m.get("content") or "") for m in messages)
+        return chars // CHARS_PER_TOKEN + 4 * len(messages) + int(max_tokens or 0)
+
+    def acquire(self, estimated_tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """Block until one request and estimated_tokens fit the budget, return seconds waited"""
+        if not self.enabled:
+            return 0.0
+        if max_wait is None:
+            max_wait = self.max_wait
+
+        with self._lock:
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(estimated_tokens))
+
+            if wait > max_wait:
+                # Fail fast instead of queueing far beyond the caller's patience
+                self.rejected_calls += 1
+                raise RateLimitExceeded(wait)
+
+            if self.requests is not None:
+                self.requests.reserve(1)
+            if self.tokens is not None:
+                self.tokens.reserve(estimated_tokens)
+
+            if wait > 0:
+                self.throttled_calls += 1
+                self.total_wait_seconds += wait
+
+        if wait > 0:
+            logger.debug("Pacing upstream call for %.2fs", wait)
+            self.sleep(wait)
+        return wait
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage of a call is known"""
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]):
+        """Sync budgets with x-ratelimit-* (and retry-after) response headers"""
+        if not headers:
+            return
+
+        def header(name: str) -> Optional[str]:
+            value = headers.get(name)
+            return value if value not in (None, "") else None
+
+        with self._lock:
+            synced = False
+            for kind in ("requests", "tokens"):
+                limit = header(f"x-ratelimit-limit-{kind}")
+                remaining = header(f"x-ratelimit-remaining-{kind}")
+                reset = parse_reset_duration(header(f"x-ratelimit-reset-{kind}"))
+                bucket = getattr(self, kind)
+
+                if limit is not None:
+                    try:
+                        limit_value = float(limit)
+                    except ValueError:
+                        limit_value = 0
+                    if limit_value > 0:
+                        if bucket is None and self.learn_from_headers:
+                            bucket = TokenBucket(limit_value, self.burst_seconds, self.clock)
+                            setattr(self, kind, bucket)
+                            logger.info(f"Learned upstream {kind} limit from headers: {limit_value:.0f}/min")
+                        elif bucket is not None and bucket.per_minute != limit_value:
+                            bucket.set_limit(limit_value)
+
+                if remaining is not None and bucket is not None:
+                    try:
+                        remaining_value = float(remaining)
+                    except ValueError:
+                        continue
+                    self.server_remaining[kind] = remaining_value
+                    bucket.sync(remaining_value, reset)
+                    synced = True
+
+            retry_after = parse_reset_duration(header("retry-after"))
+            if retry_after and self.requests is not None:
+                self.requests.sync(0, retry_after)
+                synced = True
+
+            if synced:
+                self.last_header_sync = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """Remaining-budget gauges for health and config endpoints"""
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "throttled_calls": self.throttled_calls,
+                "rejected_calls": self.rejected_calls,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+                "last_header_sync": self.last_header_sync,
+            }
+            for kind in ("requests", "tokens"):
+                bucket = getattr(self, kind)
+                if bucket is None:
+                    continue
+                stats[kind] = {
+                    "per_minute": bucket.per_minute,
+                    "burst_capacity": round(bucket.capacity, 1),
+                    "available": round(bucket.available, 1),
+                    "server_remaining": self.server_remaining.get(kind),
+                }
+            return stats
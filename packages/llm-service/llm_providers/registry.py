@@ -0,0 +1,377 @@
+"""
+Provider Registry
+Holds the active LLM provider (and optionally other warm ones), swaps in new
+providers atomically after a background build and health check, and drains
+in-flight calls on the old instance before closing it
+"""
+
+import gc
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Tuple, Iterator
+
+from .cascade_provider import CascadeProvider
+from src.deadline import get_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class NoProviderAvailable(RuntimeError):
+    """Raised when a call arrives while no provider is installed"""
+
+
+class ProviderEntry:
+    """A provider instance plus the bookkeeping needed to drain it"""
+
+    def __init__(self, name: str, mode: str, provider: Any,
+                 builder: Optional[Callable[[], Tuple[Any, str]]] = None):
+        self.name = name
+        self.mode = mode
+        self.provider = provider
+        # How to build this provider again, to restore it if a drain-first reload fails
+        self.builder = builder
+        self.created_at = time.time()
+        self.in_flight = 0
+        self.total_calls = 0
+        self._idle = threading.Condition()
+
+    def enter(self):
+        with self._idle:
+            self.in_flight += 1
+            self.total_calls += 1
+
+    def exit(self):
+        with self._idle:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Block until no calls are running on this provider, return False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self.in_flight == 0, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "in_flight": self.in_flight,
+            "total_calls": self.total_calls,
+            "created_at": self.created_at,
+        }
+
+
+def build_provider(mode: Optional[str] = None) -> Tuple[Any, str]:
+    """Auto-detect and build the best available LLM provider, returning it with its mode"""
+    provider, mode = _build_base_provider(mode)
+    
+    # With CASCADE_SMALL_MODEL set, a small model answers first and this provider handles escalations
+    try:
+        cascade = CascadeProvider.from_env(provider)
+    except Exception as e:
+        logger.error(f"Failed to initialize the cascade's small model, using {mode} alone: {e}")
+        cascade = None
+    return (cascade, mode) if cascade is not None else (provider, mode)
+
+
+def _build_base_provider(mode: Optional[str] = None) -> Tuple[Any, str]:
+    # Check environment for explicit mode
+    mode = (mode or os.getenv("LLM_MODE", "auto")).lower()
+    
+    if mode == "api" or (mode == "auto" and os.getenv("API_BASE_URL")):
+        # Scenario 1: OpenAI-compatible API (including Ollama)
+        try:
+            from .api_provider import OpenAICompatibleProvider
+            provider = OpenAICompatibleProvider()
+            logger.info(f"✓ Initialized API mode with endpoint: {os.getenv('API_BASE_URL')}")
+            return provider, "api"
+        except Exception as e:
+            logger.error(f"Failed to initialize API provider: {e}")
+            if mode == "api":
+                raise
+    
+    if mode == "vllm" or mode == "auto":
+        # Scenario 2: vLLM with GPU
+        try:
+            import torch
+            if torch.cuda.is_available():
+                from .vllm_provider import VLLMProvider
+                provider = VLLMProvider()
+                logger.info(f"✓ Initialized vLLM mode with model: {os.getenv('VLLM_MODEL', 'openai/gpt-oss-20b')}")
+                return provider, "vllm"
+        except Exception as e:
+            logger.error(f"Failed to initialize vLLM provider: {e}")
+            if mode == "vllm":
+                raise
+    
+    # If we get here, no provider could be initialized
+    raise RuntimeError("No LLM provider could be initialized. Please check your configuration.")
+
+
+def close_provider(provider: Any):
+    """Release a provider's resources (HTTP pools, GPU memory)"""
+    try:
+        if hasattr(provider, "close"):
+            provider.close()
+    except Exception as e:
+        logger.warning(f"Error closing provider {type(provider).__name__}: {e}")
+    gc.collect()
+
+
+def _is_healthy(health: Any) -> bool:
+    if not isinstance(health, dict):
+        return True
+    return health.get("available", True) and health.get("status") not in ("unhealthy", "degraded")
+
+
+class ProviderRegistry:
+    """Routes calls to the active provider and performs zero-downtime swaps"""
+
+    def __init__(self, drain_timeout: float = 30.0, lease_timeout: float = 60.0):
+        self.drain_timeout = drain_timeout
+        # How long a call waits for the provider a drain-first reload is building
+        self.lease_timeout = lease_timeout
+        self._active: Optional[ProviderEntry] = None
+        self._warm: Dict[str, ProviderEntry] = {}
+        self._lock = threading.Lock()
+        self._installed = threading.Condition(self._lock)
+        # Set while a drain-first reload has no active provider
+        self._swapping = False
+        self._reload_task: Optional[asyncio.Task] = None
+        self._generation = 0
+        self.last_reload: Dict[str, Any] = {}
+
+    # Active provider -----------------------------------------------------
+
+    @property
+    def available(self) -> bool:
+        return self._active is not None
+
+    @property
+    def serving(self) -> bool:
+        """Whether calls will be served, now or once a drain-first reload installs its provider"""
+        return self._active is not None or self._swapping
+
+    @property
+    def provider(self) -> Any:
+        entry = self._active
+        return entry.provider if entry else None
+
+    @property
+    def mode(self) -> Optional[str]:
+        entry = self._active
+        return entry.mode if entry else None
+
+    @property
+    def in_flight(self) -> int:
+        entry = self._active
+        return entry.in_flight if entry else 0
+
+    def install(self, provider: Any, mode: str, name: Optional[str] = None,
+                builder: Optional[Callable[[], Tuple[Any, str]]] = None):
+        """Install a provider synchronously (used at startup)"""
+        with self._lock:
+            entry = self._active = ProviderEntry(self._unique_name(name or mode), mode, provider, builder)
+            self._installed.notify_all()
+        logger.info(f"Installed {mode} provider as '{entry.name}'")
+
+    def _unique_name(self, name: str) -> str:
+        """name, or name-<generation> when an active or warm provider already uses it (call with the lock held)"""
+        self._generation += 1
+        taken = set(self._warm)
+        if self._active is not None:
+            taken.add(self._active.name)
+        return name if name not in taken else f"{name}-{self._generation}"
+
+    @contextmanager
+    def lease(self) -> Iterator[ProviderEntry]:
+        """Pin the current provider for the duration of one call"""
+        with self._lock:
+            if self._active is None and self._swapping:
+                # The old provider is closed; wait for its replacement within the request deadline
+                deadline = get_deadline()
+                timeout = deadline.timeout_for(self.lease_timeout) if deadline else self.lease_timeout
+                self._installed.wait_for(lambda: self._active is not None or not self._swapping, timeout=timeout)
+            entry = self._active
+            if entry is None:
+                raise NoProviderAvailable("No LLM provider available")
+            entry.enter()
+        try:
+            yield entry
+        finally:
+            entry.exit()
+
+    # Provider interface, so the registry can stand in for a provider -----
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        with self.lease() as entry:
+            return entry.provider.generate(prompt, **kwargs)
+
+    def generate_structured(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
+        with self.lease() as entry:
+            return entry.provider.generate_structured(prompt, system_prompt=system_prompt, **kwargs)
+
+    def health_check(self) -> Dict[str, Any]:
+        with self.lease() as entry:
+            if hasattr(entry.provider, "health_check"):
+                return entry.provider.health_check()
+            return {"status": "healthy", "available": True}
+
+    # Swapping --------------------------------------------------------------
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_task is not None and not self._reload_task.done()
+
+    async def reload(self, builder: Callable[[], Tuple[Any, str]], name: Optional[str] = None,
+                     keep_warm: bool = False, drain_first: bool = False,
+                     wait: bool = True) -> Dict[str, Any]:
+        """Build a provider in the background, health-check it and swap it in"""
+        if self.reloading:
+            return {"success": False, "status": "in_progress", "error": "A reload is already in progress"}
+
+        self._reload_task = asyncio.ensure_future(
+            self._reload(builder, name=name, keep_warm=keep_warm, drain_first=drain_first)
+        )
+        if not wait:
+            return {"success": True, "status": "started"}
+        return await asyncio.shield(self._reload_task)
+
+    async def _reload(self, builder: Callable[[], Tuple[Any, str]], name: Optional[str],
+                      keep_warm: bool, drain_first: bool) -> Dict[str, Any]:
+        started = time.time()
+        self.last_reload = {"status": "building", "started_at": started}
+
+        drained = None
+        try:
+            if drain_first:
+                # Providers that cannot coexist (one GPU) must release the old instance first
+                drained = self._take_active()
+                await self._retire(drained, keep_warm=False)
+
+            provider, mode = await self._build_healthy(builder)
+
+            with self._lock:
+                entry = ProviderEntry(self._unique_name(name or mode), mode, provider, builder)
+                old = self._active
+                self._active = entry
+                self._installed.notify_all()
+            logger.info(f"Swapped in {mode} provider '{entry.name}' after {time.time() - started:.1f}s")
+
+            await self._retire(old, keep_warm=keep_warm)
+
+            self.last_reload = {
+                "status": "completed",
+                "started_at": started,
+                "duration_seconds": round(time.time() - started, 3),
+                "mode": mode,
+                "name": entry.name,
+            }
+            return {"success": True, "status": "completed", "mode": mode, "name": entry.name}
+
+        except Exception as e:
+            logger.error(f"Provider reload failed: {e}")
+            self.last_reload = {"status": "failed", "started_at": started, "error": str(e)}
+            result = {"success": False, "status": "failed", "error": str(e)}
+            if drained is not None:
+                result["restored"] = self.last_reload["restored"] = await self._restore(drained)
+            return result
+        finally:
+            with self._lock:
+                self._swapping = False
+                self._installed.notify_all()
+
+    async def _build_healthy(self, builder: Callable[[], Tuple[Any, str]]) -> Tuple[Any, str]:
+        """Build a provider and health-check it, closing it and raising if it is unhealthy"""
+        provider, mode = await asyncio.to_thread(builder)
+        health = await asyncio.to_thread(provider.health_check) if hasattr(provider, "health_check") else {}
+        if not _is_healthy(health):
+            await asyncio.to_thread(close_provider, provider)
+            reason = health.get("error") or health.get("status")
+            raise RuntimeError(f"New {mode} provider failed its health check: {reason}")
+        return provider, mode
+
+    async def _restore(self, entry: ProviderEntry) -> bool:
+        """Rebuild a provider closed by a failed drain-first reload and make it active again"""
+        if entry.builder is None:
+            logger.error(f"Cannot rebuild provider '{entry.name}', no provider is active")
+            return False
+        try:
+            provider, mode = await self._build_healthy(entry.builder)
+        except Exception as e:
+            logger.error(f"Failed to restore provider '{entry.name}', no provider is active: {e}")
+            return False
+        with self._lock:
+            if self._active is not None:
+                # Something else was installed meanwhile; keep it and drop the rebuilt one
+                restored = None
+            else:
+                restored = self._active = ProviderEntry(self._unique_name(entry.name), mode, provider, entry.builder)
+                self._installed.notify_all()
+        if restored is None:
+            await asyncio.to_thread(close_provider, provider)
+            return False
+        logger.info(f"Restored {mode} provider '{restored.name}' after the failed reload")
+        return True
+
+    def _take_active(self) -> Optional[ProviderEntry]:
+        with self._lock:
+            old, self._active = self._active, None
+            self._swapping = old is not None
+        return old
+
+    async def _retire(self, entry: Optional[ProviderEntry], keep_warm: bool):
+        """Keep a replaced provider warm, or drain and close it"""
+        if entry is None:
+            return
+        if keep_warm:
+            with self._lock:
+                displaced = self._warm.get(entry.name)
+                self._warm[entry.name] = entry
+            logger.info(f"Keeping provider '{entry.name}' warm")
+            if displaced is not None and displaced is not entry:
+                await self._retire(displaced, keep_warm=False)
+            return
+
+        drained = await asyncio.to_thread(entry.wait_idle, self.drain_timeout)
+        if not drained:
+            logger.warning(f"Provider '{entry.name}' still had {entry.in_flight} calls after {self.drain_timeout}s")
+        await asyncio.to_thread(close_provider, entry.provider)
+        logger.info(f"Closed provider '{entry.name}'")
+
+    def activate(self, name: str) -> Dict[str, Any]:
+        """Switch instantly to a warm provider, keeping the current one warm"""
+        with self._lock:
+            entry = self._warm.pop(name, None)
+            if entry is None:
+                return {"success": False, "error": f"No warm provider named '{name}'"}
+            if self._active is not None:
+                self._warm[self._active.name] = self._active
+            self._active = entry
+            self._installed.notify_all()
+        logger.info(f"Activated warm provider '{name}'")
+        return {"success": True, "mode": entry.mode, "name": entry.name}
+
+    async def evict(self, name: str) -> Dict[str, Any]:
+        """Drain and close a warm provider"""
+        with self._lock:
+            entry = self._warm.pop(name, None)
+        if entry is None:
+            return {"success": False, "error": f"No warm provider named '{name}'"}
+        await self._retire(entry, keep_warm=False)
+        return {"success": True, "name": name}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = self._active
+            warm = list(self._warm.values())
+        return {
+            "active": active.stats() if active else None,
+            "warm": [entry.stats() for entry in warm],
+            "reloading": self.reloading,
+            "last_reload": self.last_reload,
+        }
@@ -0,0 +1,148 @@
+"""
+Record and Replay Providers
+RecordingProvider adds each completion to the request being recorded;
+ReplayProvider answers prompts with the completions of a recording, at
+their recorded latency or instantly, so traffic can be replayed offline
+"""
+
+import time
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any, Deque, Iterable, Optional, Sequence
+
+from src.metrics import metrics
+from src.replay.recorder import record_call
+
+
+class ReplayMiss(LookupError):
+    """Raised when a replayed prompt was never recorded"""
+
+
+def call_key(prompt: str, system_prompt: Optional[str]) -> str:
+    return hashlib.sha1(f"{system_prompt or ''}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def _split_messages(messages: Sequence[Any]):
+    """(prompt, system prompt) of a chat model call: the last message and the first, if there are several"""
+    contents = [str(getattr(message, "content", message)) for message in messages]
+    return contents[-1] if contents else "", contents[0] if len(contents) > 1 else None
+
+
+class RecordingProvider:
+    """Provider wrapper recording each structured completion of the current request"""
+
+    def __init__(self, provider: Any):
+        self.provider = provider
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.provider, name)
+
+    def generate_structured(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            response = self.provider.generate_structured(prompt, system_prompt=system_prompt, **kwargs)
+        except Exception as e:
+            record_call(prompt, system_prompt, None, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            raise
+        record_call(prompt, system_prompt, response, time.perf_counter() - started)
+        return response
+
+
+class RecordingChatModel:
+    """LangChain chat model wrapper recording each ainvoke of the current request"""
+
+    def __init__(self, llm: Any):
+        self.llm = llm
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    async def ainvoke(self, messages: Sequence[Any], *args, **kwargs) -> Any:
+        prompt, system_prompt = _split_messages(messages)
+        started = time.perf_counter()
+        try:
+            response = await self.llm.ainvoke(messages, *args, **kwargs)
+        except Exception as e:
+            record_call(prompt, system_prompt, None, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            raise
+        record_call(prompt, system_prompt, response.content, time.perf_counter() - started)
+        return response
+
+
+class ReplayProvider:
+    """Answers each prompt with the completions recorded for it, in recorded order"""
+
+    def __init__(self, records: Iterable[Dict[str, Any]], latency: str = "recorded"):
+        if latency not in ("recorded", "instant"):
+            raise ValueError(f"latency must be 'recorded' or 'instant', not {latency!r}")
+        self.latency = latency
+        self._calls: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for record in records:
+            for call in record.get("calls", []):
+                self._calls[call_key(call["prompt"], call.get("system_prompt"))].append(call)
+        self.recorded = sum(len(calls) for calls in self._calls.values())
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _next(self, prompt: str, system_prompt: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._calls.get(call_key(prompt, system_prompt))
+            if not calls:
+                self.misses += 1
+                metrics.increment("replay_calls_total", outcome="miss")
+                raise ReplayMiss("No recorded completion for this prompt")
+            # Rotate, so replaying more requests than were recorded reuses the completions
+            call = calls[0]
+            calls.rotate(-1)
+            self.replayed += 1
+        metrics.increment("replay_calls_total", outcome="hit")
+        return call
+
+    def _answer(self, call: Dict[str, Any]) -> str:
+        if call.get("error"):
+            raise RuntimeError(f"Recorded failure: {call['error']}")
+        return call.get("response") or ""
+
+    def generate_structured(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
+        call = self._next(prompt, system_prompt)
+        if self.latency == "recorded":
+            time.sleep(call.get("latency_ms", 0) / 1000.0)
+        return self._answer(call)
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return self.generate_structured(prompt, system_prompt=kwargs.get("system_prompt"))
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        call = self._next(prompt, system_prompt)
+        if self.latency == "recorded":
+            await asyncio.sleep(call.get("latency_ms", 0) / 1000.0)
+        return self._answer(call)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+    def health_check(self) -> Dict[str, Any]:
+        return {"status": "healthy", "available": True, "replay": self.stats()}
+
+    def close(self):
+        pass
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class ReplayChatModel:
+    """LangChain chat model double for the search workflow nodes, backed by a ReplayProvider"""
+
+    def __init__(self, replay: ReplayProvider):
+        self.replay = replay
+
+    async def ainvoke(self, messages: Sequence[Any], *args, **kwargs) -> _Message:
+        prompt, system_prompt = _split_messages(messages)
+        return _Message(await self.replay.agenerate(prompt, system_prompt))
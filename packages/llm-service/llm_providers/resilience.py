@@ -0,0 +1,299 @@
+"""
+Shared resilience layer for LLM providers
+Bounded retries with jittered exponential backoff, a retry budget, and a
+per-endpoint circuit breaker so that an unhealthy upstream fails fast
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, TypeVar
+
+from src.deadline import get_deadline, DeadlineExceeded, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying, and the subset that says nothing about upstream health
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+NON_FAILURE_STATUS_CODES = {409, 429}
+
+# Exception class names (OpenAI SDK, httpx, builtins) that indicate a transient transport problem
+TRANSIENT_ERROR_NAMES = {
+    "APITimeoutError",
+    "APIConnectionError",
+    "TimeoutException",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "ConnectError",
+    "RemoteProtocolError",
+    "TimeoutError",
+    "ConnectionError",
+    "ConnectionResetError",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's circuit is open"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Circuit open for {endpoint}, retry in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether repeating the call could plausibly succeed"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Whether the error says the upstream itself is unhealthy"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES and status not in NON_FAILURE_STATUS_CODES
+    return is_retryable(error)
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent calls so retries cannot amplify an outage"""
+
+    def __init__(self, ratio: float = 0.2, min_balance: float = 3.0, max_balance: float = 10.0):
+        self.ratio = ratio
+        self.min_balance = min_balance
+        self.max_balance = max(max_balance, min_balance)
+        self.balance = min_balance
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 budget: Optional[RetryBudget] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt (1-based)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker tracking consecutive upstream failures"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected_calls = 0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Admit a call or raise CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                elapsed = self.clock() - self.opened_at
+                if elapsed < self.recovery_timeout:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                # Only a single probe call is let through while half-open
+                if self._probe_in_flight:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+            self._probe_in_flight = False
+
+    def release(self):
+        """End a call that neither proved nor disproved upstream health"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+            }
+
+
+# Breakers are shared by every provider instance talking to the same endpoint
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str, failure_threshold: int = 5,
+                        recovery_timeout: float = 30.0) -> CircuitBreaker:
+    """Return the shared circuit breaker for an endpoint"""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint, failure_threshold, recovery_timeout)
+            _breakers[endpoint] = breaker
+        return breaker
+
+
+def circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every known endpoint's breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+class Resilience:
+    """Retry policy and circuit breaker applied around calls to one endpoint"""
+
+    def __init__(self, endpoint: str, timeout: Optional[float] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 is_failure: Callable[[BaseException], bool] = counts_as_failure,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.endpoint = endpoint
+        self.is_failure = is_failure
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or get_circuit_breaker(endpoint)
+        self.sleep = sleep
+
+    @classmethod
+    def from_env(cls, endpoint: str, prefix: str, default_timeout: Optional[float] = 20.0,
+                 default_retries: int = 2,
+                 is_failure: Callable[[BaseException], bool] = counts_as_failure) -> "Resilience":
+        """Build from <PREFIX>_TIMEOUT / <PREFIX>_MAX_RETRIES and shared LLM_* settings"""
+        timeout = os.getenv(f"{prefix}_TIMEOUT")
+        return cls(
+            endpoint,
+            timeout=float(timeout) if timeout else default_timeout,
+            retry_policy=RetryPolicy(
+                max_attempts=int(os.getenv(f"{prefix}_MAX_RETRIES", str(default_retries))) + 1,
+                base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.2")),
+                max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "2.0")),
+                budget=RetryBudget(ratio=float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))),
+            ),
+            breaker=get_circuit_breaker(
+                endpoint,
+                failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+                recovery_timeout=float(os.getenv("LLM_CIRCUIT_RECOVERY_SECONDS", "30")),
+            ),
+            is_failure=is_failure,
+        )
+
+    def call(self, fn: Callable[[], T], fallback: Optional[Callable[[BaseException], T]] = None) -> T:
+        """Run fn with retries; route to fallback (or raise) when the endpoint is unhealthy"""
+        policy = self.retry_policy
+        policy.budget.deposit()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                self.breaker.allow()
+            except CircuitOpenError as e:
+                if fallback is not None:
+                    return fallback(e)
+                raise
+
+            try:
+                result = fn()
+            except (DeadlineExceeded, RequestCancelled):
+                # Abandoned by the caller: says nothing about upstream health
+                self.breaker.release()
+                raise
+            except Exception as e:
+                deadline = get_deadline()
+                if deadline is not None and (deadline.expired or deadline.cancelled):
+                    # A timeout shortened to fit the deadline is not the upstream's fault
+                    self.breaker.release()
+                    deadline.check()
+
+                if self.is_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+
+                if (attempt >= policy.max_attempts or not is_retryable(e)
+                        or not policy.budget.withdraw()):
+                    if fallback is not None and is_retryable(e):
+                        return fallback(e)
+                    raise
+
+                delay = policy.backoff(attempt)
+                if deadline is not None and (deadline.cancelled or deadline.timeout_for(delay) < delay):
+                    # No point retrying into a request nobody will wait for
+                    raise
+                logger.warning("Retrying %s in %.2fs after: %s", self.endpoint, delay, e)
+                self.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "timeout": self.timeout,
+            "max_attempts": self.retry_policy.max_attempts,
+            "retry_budget": round(self.retry_policy.budget.balance, 2),
+            "circuit": self.breaker.stats(),
+        }
@@ -3,11 +3,20 @@ vLLM Provider for Local GPU Inference
 Optimized for OpenAI GPT-OSS 20B with native support
 """
 
+import gc
 import os
+import time
+import uuid
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 from vllm import LLM, SamplingParams
 
+from .prefix_cache import PrefixCacheStats
+from .resilience import Resilience
+from src.deadline import Deadline, get_deadline
+from src.usage import Completion, usage_stats
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +31,20 @@ class VLLMProvider:
         self.max_model_len = int(os.getenv("VLLM_MAX_MODEL_LEN", "4096"))
         self.temperature = float(os.getenv("VLLM_TEMPERATURE", "0.3"))
         self.max_tokens = int(os.getenv("VLLM_MAX_TOKENS", "500"))
+        # Reuse the KV cache of shared prompt prefixes (system prompt and static instructions)
+        self.enable_prefix_caching = os.getenv("VLLM_PREFIX_CACHING", "true").lower() == "true"
+        
+        # The offline engine is not thread-safe, so generations take turns
+        self._engine_lock = threading.Lock()
+        
+        # In-process engine errors are rarely transient, so only the circuit breaker applies by default
+        self.resilience = Resilience.from_env(
+            f"vllm:{self.model_name}",
+            "VLLM",
+            default_timeout=None,
+            default_retries=0,
+            is_failure=lambda error: True
+        )
         
         # Initialize vLLM
         try:
@@ -38,7 +61,8 @@ class VLLMProvider:
                 gpu_memory_utilization=self.gpu_memory_utilization,
                 max_model_len=self.max_model_len,
                 dtype="auto",  # Let vLLM choose the best dtype
-                download_dir=os.getenv("VLLM_DOWNLOAD_DIR", None)
+                download_dir=os.getenv("VLLM_DOWNLOAD_DIR", None),
+                enable_prefix_caching=self.enable_prefix_caching
             )
             
             logger.info(f"✓ vLLM initialized successfully with {self.model_name}")
@@ -53,11 +77,78 @@ class VLLMProvider:
                 self.llm = LLM(
                     model=self.model_name,
                     gpu_memory_utilization=self.gpu_memory_utilization,
-                    max_model_len=self.max_model_len
+                    max_model_len=self.max_model_len,
+                    enable_prefix_caching=self.enable_prefix_caching
                 )
                 logger.info("✓ Fallback to Mistral-7B successful")
             else:
                 raise e
+        
+        self.prefix_cache = PrefixCacheStats(f"vllm:{self.model_name}")
+    
+    def _completions(self, outputs: list, queued: float, elapsed: float) -> List[Completion]:
+        """Count each output's tokens and, on vLLM versions that report it, prefix cache hits and scheduler wait"""
+        completions = []
+        for output in outputs:
+            prompt_tokens = len(getattr(output, "prompt_token_ids", None) or [])
+            self.prefix_cache.record(prompt_tokens, getattr(output, "num_cached_tokens", None))
+            scheduled = min(elapsed, getattr(getattr(output, "metrics", None), "time_in_queue", None) or 0.0)
+            completion = Completion(
+                output.outputs[0].text,
+                prompt_tokens,
+                len(getattr(output.outputs[0], "token_ids", None) or []),
+                queued + scheduled,
+                elapsed - scheduled,
+                self.model_name,
+            )
+            usage_stats.record(completion)
+            completions.append(completion)
+        return completions
+    
+    def _acquire_engine(self, deadline: Optional[Deadline]):
+        """Wait for the engine, giving up if the request is cancelled meanwhile"""
+        if deadline is None:
+            self._engine_lock.acquire()
+            return
+        while not self._engine_lock.acquire(timeout=0.05):
+            deadline.check()
+    
+    def _run_engine(self, prompts: List[str], sampling_params) -> Tuple[list, float, float]:
+        """Outputs of prompts run to completion, with seconds spent waiting for the engine and running it"""
+        # A cancelled request deadline aborts the prompts mid-generation
+        deadline = get_deadline()
+        if deadline is not None:
+            deadline.check()
+        
+        waiting = time.perf_counter()
+        self._acquire_engine(deadline)
+        started = time.perf_counter()
+        try:
+            if deadline is None:
+                outputs = self.llm.generate(prompts, sampling_params)
+                return outputs, started - waiting, time.perf_counter() - started
+            
+            # Step the engine ourselves so a cancelled request can be aborted mid-generation
+            engine = self.llm.llm_engine
+            request_ids = [f"parkwise-{uuid.uuid4().hex}" for _ in prompts]
+            for request_id, prompt in zip(request_ids, prompts):
+                engine.add_request(request_id, prompt, sampling_params)
+            
+            finished = {}
+            try:
+                while len(finished) < len(request_ids):
+                    deadline.check()
+                    for output in engine.step():
+                        if output.finished:
+                            finished[output.request_id] = output
+            except Exception:
+                engine.abort_request([rid for rid in request_ids if rid not in finished])
+                raise
+            
+            outputs = [finished[request_id] for request_id in request_ids]
+            return outputs, started - waiting, time.perf_counter() - started
+        finally:
+            self._engine_lock.release()
     
     def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using vLLM"""
@@ -76,30 +167,36 @@ class VLLMProvider:
             )
             
             # Generate
-            outputs = self.llm.generate([prompt], sampling_params)
-            
-            # Extract text from first output
-            generated_text = outputs[0].outputs[0].text
-            
-            return generated_text
+            return self._complete([prompt], sampling_params)[0].text
             
         except Exception as e:
-            logger.error(f"vLLM generation error: {e}")
+            logger.error("vLLM generation error: %s", e)
             raise e
     
-    def generate_structured(self, prompt: str, system_prompt: str = None) -> str:
-        """Generate with system prompt for structured output"""
-        # Combine system and user prompts
+    def _structured_prompt(self, prompt: str, system_prompt: str = None) -> str:
+        """Combine system and user prompts"""
         if system_prompt:
             # Format for instruction-following models
             if "instruct" in self.model_name.lower() or "gpt-oss" in self.model_name.lower():
-                full_prompt = f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
-            else:
-                full_prompt = f"{system_prompt}\n\n{prompt}"
-        else:
-            full_prompt = prompt
-        
-        return self.generate(full_prompt)
+                return f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
+            return f"{system_prompt}\n\n{prompt}"
+        return prompt
+    
+    def _complete(self, prompts: List[str], sampling_params) -> List[Completion]:
+        return self._completions(*self.resilience.call(lambda: self._run_engine(prompts, sampling_params)))
+    
+    def generate_structured(self, prompt: str, system_prompt: str = None) -> str:
+        """Generate with system prompt for structured output"""
+        return self.generate(self._structured_prompt(prompt, system_prompt))
+    
+    def complete_structured(self, prompt: str, system_prompt: str = None) -> Completion:
+        """Structured generation with its token counts and timings"""
+        sampling_params = SamplingParams(temperature=self.temperature, max_tokens=self.max_tokens, top_p=0.9)
+        return self._complete([self._structured_prompt(prompt, system_prompt)], sampling_params)[0]
+    
+    def batch_generate_structured(self, prompts: list, system_prompt: str = None, **kwargs) -> list:
+        """Generate structured output for many prompts in one engine batch"""
+        return self.batch_generate([self._structured_prompt(p, system_prompt) for p in prompts], **kwargs)
     
     def batch_generate(self, prompts: list, **kwargs) -> list:
         """Generate for multiple prompts efficiently"""
@@ -111,13 +208,10 @@ class VLLMProvider:
             )
             
             # vLLM handles batching efficiently
-            outputs = self.llm.generate(prompts, sampling_params)
-            
-            # Extract text from outputs
-            return [output.outputs[0].text for output in outputs]
+            return [completion.text for completion in self._complete(prompts, sampling_params)]
             
         except Exception as e:
-            logger.error(f"Batch generation error: {e}")
+            logger.error("Batch generation error: %s", e)
             raise e
     
     def health_check(self) -> Dict[str, Any]:
@@ -129,7 +223,7 @@ class VLLMProvider:
                 temperature=0.1,
                 max_tokens=5
             )
-            outputs = self.llm.generate([test_prompt], sampling_params)
+            self._run_engine([test_prompt], sampling_params)
             
             return {
                 "status": "healthy",
@@ -137,7 +231,10 @@ class VLLMProvider:
                 "backend": "vLLM",
                 "gpu_memory_utilization": self.gpu_memory_utilization,
                 "max_model_len": self.max_model_len,
-                "available": True
+                "prefix_caching": self.enable_prefix_caching,
+                "prefix_cache": self.prefix_cache.stats(),
+                "available": True,
+                "resilience": self.resilience.stats()
             }
         except Exception as e:
             return {
@@ -145,9 +242,27 @@ class VLLMProvider:
                 "model": self.model_name,
                 "backend": "vLLM",
                 "available": False,
+                "resilience": self.resilience.stats(),
                 "error": str(e)
             }
     
+    def close(self):
+        """Release the engine and its GPU memory once no calls are running"""
+        with self._engine_lock:
+            self.llm = None
+        try:
+            from vllm.distributed.parallel_state import destroy_model_parallel
+            destroy_model_parallel()
+        except Exception as e:
+            logger.debug(f"Model parallel teardown skipped: {e}")
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+    
     @staticmethod
     def check_gpu_available() -> bool:
         """Check if GPU is available for vLLM"""
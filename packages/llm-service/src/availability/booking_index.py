@@ -0,0 +1,196 @@
+"""Booking Index - Sorted-array interval index of spot bookings answering whole-window availability in batches"""
+
+import os
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Times are whole epoch seconds packed under the spot code as code << 32 | seconds
+_TIME_BITS = 32
+_MAX_SECONDS = (1 << _TIME_BITS) - 1
+
+Time = Union[datetime, str, int, float]
+
+
+def to_seconds(value: Time) -> int:
+    """Epoch seconds of a datetime, ISO 8601 string or number, reading naive times as UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.timestamp()
+    seconds = int(value)
+    if not 0 <= seconds <= _MAX_SECONDS:
+        raise ValueError(f"Time out of range: {value}")
+    return seconds
+
+
+def window(filters: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(start, end) seconds of the filters' start_time/end_time, the start instant alone without an end"""
+    if not filters.get("start_time"):
+        return None
+    try:
+        start = to_seconds(filters["start_time"])
+        end = to_seconds(filters["end_time"]) if filters.get("end_time") else start + 1
+    except (TypeError, ValueError):
+        logger.warning("Ignoring unreadable time window %s - %s", filters.get("start_time"), filters.get("end_time"))
+        return None
+    return start, max(end, start + 1)
+
+
+def _booking(booking: Dict[str, Any]) -> Tuple[str, str, int, int]:
+    start, end = to_seconds(booking["start"]), to_seconds(booking["end"])
+    if end <= start:
+        raise ValueError(f"Booking {booking.get('id')} ends before it starts")
+    return str(booking["id"]), str(booking["spot_id"]), start, end
+
+
+class BookingIndex:
+    """Bookings as half-open [start, end) intervals per spot, in arrays sorted by (spot, start)
+
+    Each sorted position also keeps the latest end of its spot's bookings up to
+    there, so a spot is busy in [s, e) exactly when the last of its bookings
+    starting before e reaches past s: one searchsorted per queried spot.
+    Inserts and removals go to per-spot dicts and mark the spot stale; stale
+    spots are answered from those dicts until the arrays are rebuilt.
+    """
+
+    def __init__(self, compact_after: int = 4096):
+        self.compact_after = compact_after
+        self.bookings: Dict[str, Tuple[int, int, int]] = {}
+        self._codes: Dict[str, int] = {}
+        self._by_spot: Dict[int, Dict[str, Tuple[int, int]]] = {}
+        self._keys = np.empty(0, dtype=np.int64)
+        self._reach = np.empty(0, dtype=np.int64)
+        self._stale: Set[int] = set()
+        self._compactions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BookingIndex":
+        return cls(compact_after=int(os.getenv("BOOKING_INDEX_COMPACT_AFTER", "4096")))
+
+    def __len__(self) -> int:
+        return len(self.bookings)
+
+    def _code(self, spot_id: str) -> int:
+        code = self._codes.get(spot_id)
+        if code is None:
+            code = self._codes[spot_id] = len(self._codes)
+        return code
+
+    def _compact(self):
+        """Rebuild the sorted arrays from every booking and clear the stale spots"""
+        count = len(self.bookings)
+        entries = self.bookings.values()
+        codes = np.fromiter((entry[0] for entry in entries), dtype=np.int64, count=count)
+        starts = np.fromiter((entry[1] for entry in entries), dtype=np.int64, count=count)
+        ends = np.fromiter((entry[2] for entry in entries), dtype=np.int64, count=count)
+        keys = (codes << _TIME_BITS) | starts
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        # Packed ends of later spots always exceed those of earlier ones, so a running
+        # maximum over the whole array never carries one spot's end into the next
+        self._reach = np.maximum.accumulate(((codes << _TIME_BITS) | ends)[order]) if count else ends
+        self._stale = set()
+        self._compactions += 1
+
+    def _touch(self, code: int):
+        self._stale.add(code)
+        if len(self._stale) > self.compact_after:
+            self._compact()
+
+    def load(self, bookings: Iterable[Dict[str, Any]]):
+        """Replace every booking, building the sorted arrays in one pass"""
+        parsed = [_booking(booking) for booking in bookings]
+        with self._lock:
+            self.bookings = {}
+            self._codes = {}
+            self._by_spot = {}
+            for booking_id, spot_id, start, end in parsed:
+                self._drop(booking_id)
+                code = self._code(spot_id)
+                self.bookings[booking_id] = (code, start, end)
+                self._by_spot.setdefault(code, {})[booking_id] = (start, end)
+            self._compact()
+
+    def _drop(self, booking_id: str) -> Optional[int]:
+        entry = self.bookings.pop(booking_id, None)
+        if entry is None:
+            return None
+        code = entry[0]
+        spot = self._by_spot[code]
+        del spot[booking_id]
+        if not spot:
+            del self._by_spot[code]
+        return code
+
+    def add(self, booking: Dict[str, Any]):
+        """Insert a booking {"id", "spot_id", "start", "end"}, replacing one with the same id"""
+        self.add_many([booking])
+
+    def add_many(self, bookings: Iterable[Dict[str, Any]]):
+        """Insert bookings, none of them unless all are valid"""
+        parsed = [_booking(booking) for booking in bookings]
+        with self._lock:
+            for booking_id, spot_id, start, end in parsed:
+                previous = self._drop(booking_id)
+                if previous is not None:
+                    self._stale.add(previous)
+                code = self._code(spot_id)
+                self.bookings[booking_id] = (code, start, end)
+                self._by_spot.setdefault(code, {})[booking_id] = (start, end)
+                self._touch(code)
+
+    def remove(self, booking_id: str) -> bool:
+        """Remove a booking, returning whether it was indexed"""
+        with self._lock:
+            code = self._drop(str(booking_id))
+            if code is None:
+                return False
+            self._touch(code)
+            return True
+
+    def free(self, spot_ids: Sequence[str], start: Union[Time, Sequence[Time]],
+             end: Union[Time, Sequence[Time]]) -> np.ndarray:
+        """Whether each spot has no booking overlapping its window, one window for all or one per spot"""
+        count = len(spot_ids)
+        starts = self._times(start, count)
+        ends = self._times(end, count)
+        with self._lock:
+            codes = np.fromiter((self._codes.get(str(spot_id), -1) for spot_id in spot_ids),
+                                dtype=np.int64, count=count)
+            busy = np.zeros(count, dtype=bool)
+            known = np.flatnonzero(codes >= 0)
+            if known.size and self._keys.size:
+                packed = codes[known] << _TIME_BITS
+                # Last booking starting before the window ends, in this spot's run or an earlier one
+                last = np.searchsorted(self._keys, packed | ends[known], side="left") - 1
+                found = last >= 0
+                # A match from an earlier spot's run has a smaller reach than any of this spot's times
+                busy[known[found]] = self._reach[last[found]] > (packed[found] | starts[known[found]])
+            if self._stale and known.size:
+                stale = known[np.isin(codes[known], np.fromiter(self._stale, dtype=np.int64))]
+                for i in stale.tolist():
+                    s, e = starts[i], ends[i]
+                    busy[i] = any(bs < e and be > s for bs, be in self._by_spot.get(codes[i], {}).values())
+        return ~busy
+
+    @staticmethod
+    def _times(value: Union[Time, Sequence[Time]], count: int) -> np.ndarray:
+        if isinstance(value, np.ndarray) and value.dtype.kind in "iu":
+            return np.broadcast_to(value.astype(np.int64), (count,))
+        if isinstance(value, (str, datetime)) or np.isscalar(value):
+            return np.full(count, to_seconds(value), dtype=np.int64)
+        return np.fromiter((to_seconds(v) for v in value), dtype=np.int64, count=count)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"bookings": len(self.bookings), "spots": len(self._by_spot), "stale_spots": len(self._stale),
+                    "compactions": self._compactions}
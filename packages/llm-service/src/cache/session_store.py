@@ -0,0 +1,65 @@
+"""Session Store - Bounded TTL store of the last search state per conversation, for follow-up refinements"""
+
+import os
+import copy
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+class SessionStore:
+    """LRU of session states with an idle time-to-live, safe to share between threads"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 900.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SessionStore"]:
+        """Build from SEARCH_SESSION_* settings, or None when sessions are disabled"""
+        if os.getenv("SEARCH_SESSIONS_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            max_entries=int(os.getenv("SEARCH_SESSION_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("SEARCH_SESSION_TTL_SECONDS", "900")),
+        )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """State last stored for the session, or None when unknown or idle for longer than the TTL"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or self.clock() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[session_id]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, session_id: str, state: Dict[str, Any]):
+        with self._lock:
+            self._entries[session_id] = (self.clock(), copy.deepcopy(state))
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
@@ -0,0 +1,278 @@
+"""Similarity Cache - Reuses results of near-duplicate queries found with MinHash signatures and LSH banding"""
+
+import os
+import re
+import copy
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, NamedTuple, Tuple, FrozenSet, Callable
+
+import numpy as np
+
+from src.nlp.keyword_entities import extract_keyword_entities, split_features
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Letters and numbers are split apart, so "taipei101" and "taipei 101" tokenize the same
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_COMPACT = re.compile(r"[^a-z0-9]+")
+
+# Words that carry no meaning for the resulting filters
+STOPWORDS = {
+    "a", "an", "the", "s", "near", "nearby", "by", "at", "around", "close", "to", "next", "in", "on",
+    "that", "thats", "which", "is", "are", "me", "my", "i", "find", "show", "get", "need", "want",
+    "looking", "look", "for", "some", "any", "please", "can", "you", "with", "of", "within", "and",
+    "where", "there", "something", "somewhere", "spot", "spots", "place", "places",
+}
+
+SYNONYMS = {
+    "cheapest": "cheap",
+    "affordable": "cheap",
+    "inexpensive": "cheap",
+    "budget": "cheap",
+    "parking": "park",
+    "parked": "park",
+    "carpark": "park",
+    "garages": "garage",
+    "hours": "hour",
+    "hrs": "hour",
+    "hr": "hour",
+    "minutes": "minute",
+    "mins": "minute",
+    "min": "minute",
+    "kilometers": "km",
+    "kilometres": "km",
+    "meters": "m",
+    "metres": "m",
+}
+
+# Relative time words change what a query means, so they must match exactly
+TIME_WORDS = {
+    "now", "today", "tonight", "tomorrow", "morning", "afternoon", "evening", "night", "weekend",
+    "am", "pm", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+# 32-bit universal hashing modulo a Mersenne prime, as in classic MinHash
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_tokens(query: str) -> FrozenSet[str]:
+    """Lower-cased, synonym-mapped tokens without stopwords"""
+    tokens = set()
+    for token in _TOKEN.findall(query.lower()):
+        token = SYNONYMS.get(token, token)
+        if token not in STOPWORDS:
+            tokens.add(token)
+    return frozenset(tokens)
+
+
+def query_fingerprint(query: str) -> Tuple:
+    """Parts of a query that must match exactly before a cached result is reused"""
+    text = query.lower()
+    entities = extract_keyword_entities(query)
+    location = entities.get("location")
+    return (
+        _COMPACT.sub("", location) if location else None,
+        tuple(sorted(float(n) for n in _NUMBER.findall(text))),
+        tuple(sorted(entities.get("features") or [])),
+        entities.get("max_price"),
+        entities.get("min_price"),
+        entities.get("radius"),
+        entities.get("duration"),
+        tuple(sorted(TIME_WORDS.intersection(_TOKEN.findall(text)))),
+        # "with ev charging" and "without ev charging" share every token but the negation
+        tuple(sorted(split_features(text)[1])),
+    )
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """Computes MinHash signatures of token sets"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: FrozenSet[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64, count=len(tokens)
+        )
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+class SimilarityMatch(NamedTuple):
+    value: Any
+    similarity: float
+    matched_query: str
+
+
+class _Entry:
+    __slots__ = ("query", "tokens", "fingerprint", "context", "value", "created_at", "band_keys")
+
+    def __init__(self, query, tokens, fingerprint, context, value, created_at, band_keys):
+        self.query = query
+        self.tokens = tokens
+        self.fingerprint = fingerprint
+        self.context = context
+        self.value = value
+        self.created_at = created_at
+        self.band_keys = band_keys
+
+
+class SimilarityCache:
+    """Bounded LRU cache keyed by query similarity rather than exact text"""
+
+    def __init__(self, name: str = "search", max_entries: int = 2048, threshold: float = 0.75,
+                 ttl_seconds: float = 600.0, num_perm: int = 64, bands: int = 16,
+                 clock: Callable[[], float] = time.monotonic):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.name = name
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.clock = clock
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, name: str = "search", prefix: str = "SEARCH_CACHE") -> Optional["SimilarityCache"]:
+        """Build from <PREFIX>_* settings, or None when the cache is disabled"""
+        if os.getenv(f"{prefix}_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            name=name,
+            max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "2048")),
+            threshold=float(os.getenv(f"{prefix}_THRESHOLD", "0.75")),
+            ttl_seconds=float(os.getenv(f"{prefix}_TTL_SECONDS", "600")),
+        )
+
+    def _band_keys(self, signature: np.ndarray, context: str) -> List[Tuple]:
+        return [
+            (context, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for key in entry.band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, query: str, context: str = "") -> Optional[SimilarityMatch]:
+        """Return a copy of the best verified near-duplicate result, if any"""
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return None
+        band_keys = self._band_keys(self.hasher.signature(tokens), context)
+        fingerprint = None
+        now = self.clock()
+
+        with self._lock:
+            candidates = set()
+            for key in band_keys:
+                candidates.update(self._buckets.get(key, ()))
+
+            best_id, best_similarity, rejected = None, 0.0, False
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                similarity = jaccard(tokens, entry.tokens)
+                if similarity < self.threshold or similarity <= best_similarity:
+                    continue
+                if fingerprint is None:
+                    fingerprint = query_fingerprint(query)
+                if entry.fingerprint != fingerprint:
+                    rejected = True
+                    continue
+                best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                if rejected:
+                    self.rejected += 1
+                metrics.increment("similarity_cache_total", cache=self.name,
+                                  outcome="rejected" if rejected else "miss")
+                return None
+
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            self.hits += 1
+            metrics.increment("similarity_cache_total", cache=self.name, outcome="hit")
+            return SimilarityMatch(copy.deepcopy(entry.value), best_similarity, entry.query)
+
+    def put(self, query: str, value: Any, context: str = ""):
+        """Remember a result for query and its near-duplicates"""
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return
+        fingerprint = query_fingerprint(query)
+        band_keys = self._band_keys(self.hasher.signature(tokens), context)
+
+        with self._lock:
+            # Replace an entry for the same normalized query instead of storing it twice
+            for entry_id in set().union(*(self._buckets.get(key, ()) for key in band_keys)):
+                entry = self._entries[entry_id]
+                if entry.tokens == tokens and entry.fingerprint == fingerprint:
+                    self._remove(entry_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(
+                query, tokens, fingerprint, context, copy.deepcopy(value), self.clock(), band_keys
+            )
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
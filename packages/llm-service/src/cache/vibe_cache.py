@@ -0,0 +1,69 @@
+"""Vibe Cache - Bounded TTL cache of vibe analyses keyed by rounded location and POI set"""
+
+import os
+import copy
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+
+def vibe_key(lat: float, lng: float, poi_data: List[Dict[str, Any]], precision: int = 4) -> Tuple:
+    """Key that is stable for the same place (about 11m at 4 decimals) and the same POIs"""
+    names = "|".join(sorted(f"{p.get('name', '')}:{p.get('type', '')}" for p in poi_data or []))
+    return round(lat, precision), round(lng, precision), zlib.crc32(names.encode("utf-8"))
+
+
+class VibeCache:
+    """LRU of analyses with a time-to-live, safe to share between threads"""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["VibeCache"]:
+        """Build from VIBE_CACHE_* settings, or None when the cache is disabled"""
+        if os.getenv("VIBE_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            max_entries=int(os.getenv("VIBE_CACHE_MAX_ENTRIES", "4096")),
+            ttl_seconds=float(os.getenv("VIBE_CACHE_TTL_SECONDS", "3600")),
+        )
+
+    def get(self, key: Tuple) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(source, analysis) for key, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], copy.deepcopy(entry[2])
+
+    def contains(self, key: Tuple) -> bool:
+        """Whether a fresh analysis is cached for key, without counting a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self.clock() - entry[0] <= self.ttl_seconds
+
+    def put(self, key: Tuple, source: str, analysis: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (self.clock(), source, copy.deepcopy(analysis))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
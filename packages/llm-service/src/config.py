@@ -39,6 +39,22 @@ class Config:
     TEMPERATURE = 0  # For consistent parsing
     MAX_RETRIES = 3
     
+    # Per-stage latency budgets for the search workflow (milliseconds, 0 = unbounded)
+    STAGE_BUDGET_PARSE_INTENT_MS = int(os.getenv("STAGE_BUDGET_PARSE_INTENT_MS", 1500))
+    STAGE_BUDGET_EXTRACT_ENTITIES_MS = int(os.getenv("STAGE_BUDGET_EXTRACT_ENTITIES_MS", 2500))
+    STAGE_BUDGET_MAP_FILTERS_MS = int(os.getenv("STAGE_BUDGET_MAP_FILTERS_MS", 1000))
+    
+    # Local intent classifier; the LLM is only asked when its confidence is below the threshold
+    INTENT_CLASSIFIER_PATH = os.getenv(
+        "INTENT_CLASSIFIER_PATH",
+        os.path.join(os.path.dirname(__file__), "data", "intent_classifier.npz")
+    )
+    INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.9))
+    
+    # Known places resolved locally, typos included, before falling back to network geocoding
+    PLACES_PATH = os.getenv("PLACES_PATH", os.path.join(os.path.dirname(__file__), "data", "places.json"))
+    PLACE_MATCH_MIN_CONFIDENCE = float(os.getenv("PLACE_MATCH_MIN_CONFIDENCE", 0.75))
+    
     @classmethod
     def validate(cls):
         """Validate required configuration"""
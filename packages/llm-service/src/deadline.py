@@ -0,0 +1,197 @@
+"""Request Deadlines - Carries a per-request time budget and cancellation signal through the service"""
+
+import os
+import time
+import asyncio
+import functools
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional, Callable, Awaitable, Mapping, Any, Iterator, Coroutine
+
+from src.metrics import metrics
+
+DEADLINE_EXCEEDED = "deadline_exceeded"
+CLIENT_DISCONNECTED = "client_disconnected"
+
+# Relative budget in milliseconds, or an absolute unix timestamp in milliseconds
+TIMEOUT_HEADER = "x-request-timeout-ms"
+DEADLINE_HEADER = "x-request-deadline"
+
+# Default budgets per route in seconds, overridable with <ROUTE>_DEADLINE_SECONDS
+DEFAULT_ROUTE_TIMEOUTS = {
+    "search": 10.0,
+    "vibe": 15.0,
+}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work continues past the request's deadline"""
+
+
+class RequestCancelled(Exception):
+    """Raised when the client is gone and the work is no longer wanted"""
+
+
+class Deadline:
+    """Point in time after which a request's result is useless"""
+
+    def __init__(self, timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic,
+                 parent: Optional["Deadline"] = None, route: Optional[str] = None):
+        self.clock = clock
+        self.parent = parent
+        # API route the work belongs to, for providers that behave differently per route
+        self.route = route or (parent.route if parent is not None else None)
+        self.expires_at = clock() + timeout if timeout is not None else None
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self._cancel_reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    def child(self, timeout: Optional[float]) -> "Deadline":
+        """Tighter deadline for a sub-step that is also cancelled with this one"""
+        return Deadline(timeout, clock=self.clock, parent=self)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when unbounded"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.clock() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def cancel_reason(self) -> Optional[str]:
+        if self._cancel_reason is None and self.parent is not None:
+            return self.parent.cancel_reason
+        return self._cancel_reason
+
+    def cancel(self, reason: str = CLIENT_DISCONNECTED):
+        """Signal in-flight work to stop"""
+        if not self._cancelled.is_set():
+            self._cancel_reason = reason
+            self._cancelled.set()
+
+    def timeout_for(self, default: Optional[float]) -> Optional[float]:
+        """Per-call timeout that never outlives the deadline"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if default is None:
+            return remaining
+        return min(default, remaining)
+
+    def check(self):
+        """Raise if the work should stop now"""
+        if self.parent is not None:
+            self.parent.check()
+        if self._cancelled.is_set():
+            if self.cancel_reason == DEADLINE_EXCEEDED:
+                raise DeadlineExceeded("Request deadline exceeded")
+            raise RequestCancelled(f"Request cancelled: {self.cancel_reason}")
+        if self.expired:
+            self.cancel(DEADLINE_EXCEEDED)
+            raise DeadlineExceeded("Request deadline exceeded")
+
+
+current_deadline: contextvars.ContextVar = contextvars.ContextVar("current_deadline", default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """Deadline of the request being served in this context, if any"""
+    return current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make deadline the current one for the duration of the block"""
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def deadline_from_headers(headers: Mapping[str, str], route: str) -> Deadline:
+    """Build a request deadline from headers, falling back to the route default"""
+    timeout = os.getenv(f"{route.upper()}_DEADLINE_SECONDS")
+    timeout = float(timeout) if timeout else DEFAULT_ROUTE_TIMEOUTS.get(route)
+
+    relative = headers.get(TIMEOUT_HEADER)
+    absolute = headers.get(DEADLINE_HEADER)
+    try:
+        if relative:
+            timeout = float(relative) / 1000.0
+        elif absolute:
+            timeout = float(absolute) / 1000.0 - time.time()
+    except ValueError:
+        pass
+
+    return Deadline(max(0.0, timeout) if timeout is not None else None, route=route)
+
+
+async def run_with_deadline(deadline: Deadline, fn: Callable[..., Any], *args,
+                            route: str = "unknown",
+                            is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                            poll_interval: float = 0.1, **kwargs) -> Any:
+    """Run a blocking call in a worker thread, cancelling it on deadline expiry or client disconnect"""
+    loop = asyncio.get_running_loop()
+    with deadline_scope(deadline):
+        context = contextvars.copy_context()
+
+    try:
+        deadline.check()
+        future = loop.run_in_executor(None, functools.partial(context.run, fn, *args, **kwargs))
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=poll_interval)
+            if done:
+                return future.result()
+            if deadline.expired:
+                deadline.cancel(DEADLINE_EXCEEDED)
+                break
+            if is_disconnected is not None and await is_disconnected():
+                deadline.cancel(CLIENT_DISCONNECTED)
+                break
+        # The worker notices the cancellation and closes its upstream call on its own
+        deadline.check()
+    except (DeadlineExceeded, RequestCancelled):
+        metrics.increment("requests_cancelled_total", route=route, reason=deadline.cancel_reason)
+        raise
+
+
+async def await_with_deadline(deadline: Deadline, coro: Coroutine, route: str = "unknown",
+                              stage: Optional[str] = None, poll_interval: float = 0.1) -> Any:
+    """Await a coroutine, cancelling its task (and any HTTP call in it) once the deadline is cancelled or passes"""
+    labels = {"route": route}
+    if stage:
+        labels["stage"] = stage
+
+    try:
+        deadline.check()
+    except (DeadlineExceeded, RequestCancelled):
+        coro.close()
+        metrics.increment("requests_cancelled_total", reason=deadline.cancel_reason, **labels)
+        raise
+
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            remaining = deadline.remaining()
+            timeout = poll_interval if remaining is None else min(poll_interval, remaining)
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            deadline.check()
+    except (DeadlineExceeded, RequestCancelled):
+        task.cancel()
+        metrics.increment("requests_cancelled_total", reason=deadline.cancel_reason, **labels)
+        raise
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,352 @@
+"""Prompt Evaluation - Scores prompt and model variants on a labelled query corpus for accuracy, latency and tokens"""
+
+import os
+import re
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import config
+from src.geo.place_index import load_place_index, normalize_place
+from src.nlp.feature_vocabulary import normalize_features
+from src.nlp.keyword_entities import extract_keyword_entities
+from src.prompts import (
+    SEARCH_PROMPT, SEARCH_SYSTEM_PROMPT, INTENT_SYSTEM_PROMPT, ENTITY_SYSTEM_PROMPT, KNOWN_FEATURES, extract_json
+)
+from src.tokens import token_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "eval_queries.jsonl")
+
+# User prompt of the workflow nodes, which put the instructions in the system prompt
+NODE_PROMPT = "Query: {query}"
+
+
+def _search_expected(row: Dict[str, Any]) -> Dict[str, Any]:
+    entities = row.get("entities", {})
+    expected = {"intent": row["search_intent"]} if "search_intent" in row else {}
+    expected.update({field: entities[field] for field in ("location", "features", "max_price", "radius") if field in entities})
+    return expected
+
+
+def _search_observed(result: Dict[str, Any]) -> Dict[str, Any]:
+    intent = result.get("intent")
+    entities = result.get("entities") or {}
+    filters = result.get("filters") or {}
+    return {
+        "intent": intent.get("type") if isinstance(intent, dict) else intent,
+        "location": entities.get("location"),
+        "features": filters.get("required_features") or entities.get("features") or [],
+        "max_price": filters.get("max_price"),
+        "radius": filters.get("radius"),
+    }
+
+
+def _intent_expected(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"intent": row["intent"]} if "intent" in row else {}
+
+
+def _intent_observed(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"intent": result.get("intent_type")}
+
+
+def _entities_expected(row: Dict[str, Any]) -> Dict[str, Any]:
+    entities = row.get("entities", {})
+    return {field: entities[field] for field in ("location", "features", "max_price", "min_price", "radius")
+            if field in entities}
+
+
+def _entities_observed(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: result.get(field) for field in ("location", "features", "max_price", "min_price", "radius")}
+
+
+class Target(NamedTuple):
+    """A prompt being evaluated: its shipped wording and how its answers are graded"""
+    prompt: str
+    system_prompt: Optional[str]
+    expected: Callable[[Dict[str, Any]], Dict[str, Any]]
+    observed: Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+TARGETS: Dict[str, Target] = {
+    # /api/search
+    "search": Target(SEARCH_PROMPT, SEARCH_SYSTEM_PROMPT, _search_expected, _search_observed),
+    # QueryParserNode and EntityExtractorNode of the search workflow
+    "intent": Target(NODE_PROMPT, INTENT_SYSTEM_PROMPT, _intent_expected, _intent_observed),
+    "entities": Target(NODE_PROMPT, ENTITY_SYSTEM_PROMPT.format(features=", ".join(KNOWN_FEATURES)),
+                       _entities_expected, _entities_observed),
+}
+
+
+class Variant(NamedTuple):
+    name: str
+    target: str
+    prompt: str
+    system_prompt: Optional[str]
+    model: Optional[str] = None
+
+
+def default_variants(targets: Sequence[str] = tuple(TARGETS)) -> List[Variant]:
+    """The shipped prompts of each target, on the default model"""
+    return [Variant(f"{name}:baseline", name, TARGETS[name].prompt, TARGETS[name].system_prompt) for name in targets]
+
+
+def _text(spec: Dict[str, Any], key: str, base_dir: str, default: Optional[str]) -> Optional[str]:
+    if f"{key}_file" in spec:
+        with open(os.path.join(base_dir, spec[f"{key}_file"]), encoding="utf-8") as f:
+            return f.read()
+    return spec.get(key, default)
+
+
+def load_variants(path: str) -> List[Variant]:
+    """Variants from a JSON list of {"name", "target", "prompt" | "prompt_file", "system_prompt" | "system_prompt_file", "model"}"""
+    # A missing prompt or system prompt keeps the target's shipped one; files are relative to the JSON file
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        specs = json.load(f)
+    variants = []
+    for spec in specs:
+        target = TARGETS.get(spec.get("target"))
+        if target is None:
+            raise ValueError(f"Variant {spec.get('name')!r} has unknown target {spec.get('target')!r}")
+        variants.append(Variant(
+            spec["name"],
+            spec["target"],
+            _text(spec, "prompt", base_dir, target.prompt),
+            _text(spec, "system_prompt", base_dir, target.system_prompt),
+            spec.get("model"),
+        ))
+    names = [variant.name for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique")
+    return variants
+
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> List[Dict[str, Any]]:
+    """Labelled queries, one JSON object per line"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace("$", "").strip())
+    except ValueError:
+        return None
+
+
+def field_matches(field: str, expected: Any, observed: Any) -> bool:
+    """Whether an answer's field means the same as its label"""
+    if field == "features":
+        return set(normalize_features(expected or [])[0]) == set(normalize_features(observed or [])[0])
+    if field == "location":
+        if not expected or not observed:
+            return not expected and not observed
+        if normalize_place(str(expected)) == normalize_place(str(observed)):
+            return True
+        # What the filter mapper does with the location is what counts: the same known place is a match
+        places = load_place_index(config.PLACES_PATH)
+        if places is None:
+            return False
+        wanted, found = places.resolve(str(expected)), places.resolve(str(observed))
+        return (wanted is not None and found is not None and wanted.name == found.name
+                and found.confidence >= config.PLACE_MATCH_MIN_CONFIDENCE)
+    if field == "intent":
+        return str(expected).lower() == str(observed or "").lower()
+    expected, observed = _number(expected), _number(observed)
+    if expected is None or observed is None:
+        return expected is None and observed is None
+    return abs(expected - observed) < 1e-6
+
+
+class _Call(NamedTuple):
+    query: str
+    expected: Dict[str, Any]
+    observed: Optional[Dict[str, Any]]
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    estimated: bool
+    error: Optional[str]
+
+
+def _call(provider: Any, variant: Variant, row: Dict[str, Any], expected: Dict[str, Any]) -> _Call:
+    prompt = variant.prompt.format(query=row["query"])
+    complete = getattr(provider, "complete_structured", None)
+    started = time.perf_counter()
+    try:
+        if complete is not None:
+            completion = complete(prompt, system_prompt=variant.system_prompt)
+            text, tokens, estimated = completion.text, (completion.prompt_tokens, completion.completion_tokens), completion.estimated
+        else:
+            text = provider.generate_structured(prompt, system_prompt=variant.system_prompt)
+            tokens, estimated = None, True
+        latency = time.perf_counter() - started
+    except Exception as e:
+        return _Call(row["query"], expected, None, time.perf_counter() - started, 0, 0, True, f"{type(e).__name__}: {e}")
+
+    if tokens is None:
+        tokens = (token_counter.count(prompt) + token_counter.count(variant.system_prompt or ""), token_counter.count(text))
+    result = extract_json(text or "")
+    observed = TARGETS[variant.target].observed(result) if result else None
+    return _Call(row["query"], expected, observed, latency, tokens[0], tokens[1], estimated, None)
+
+
+def _summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not len(values):
+        return {"mean": None, "p95": None}
+    return {"mean": round(float(np.mean(values)), 1), "p95": round(float(np.percentile(values, 95)), 1)}
+
+
+def evaluate_variant(provider: Any, variant: Variant, corpus: Sequence[Dict[str, Any]], concurrency: int = 1,
+                     keep_misses: bool = False) -> Dict[str, Any]:
+    """Field accuracy, latency and token counts of one variant over the queries labelled for its target"""
+    target = TARGETS[variant.target]
+    labelled = [(row, target.expected(row)) for row in corpus]
+    labelled = [(row, expected) for row, expected in labelled if expected]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        calls = list(pool.map(lambda item: _call(provider, variant, *item), labelled))
+
+    fields: Dict[str, List[int]] = {}
+    misses = []
+    for call in calls:
+        for field, expected in call.expected.items():
+            observed = call.observed.get(field) if call.observed is not None else None
+            correct = call.observed is not None and field_matches(field, expected, observed)
+            tally = fields.setdefault(field, [0, 0])
+            tally[0] += int(correct)
+            tally[1] += 1
+            if not correct and keep_misses:
+                misses.append({"query": call.query, "field": field, "expected": expected,
+                               "observed": call.error or observed})
+
+    correct, graded = sum(t[0] for t in fields.values()), sum(t[1] for t in fields.values())
+    answered = [call for call in calls if call.error is None]
+    report = {
+        "target": variant.target,
+        "model": variant.model,
+        "queries": len(calls),
+        "errors": len(calls) - len(answered),
+        "invalid_json": sum(1 for call in answered if call.observed is None),
+        "accuracy": round(correct / graded, 4) if graded else None,
+        "fields": {
+            field: {"correct": tally[0], "graded": tally[1], "accuracy": round(tally[0] / tally[1], 4)}
+            for field, tally in sorted(fields.items())
+        },
+        "latency_ms": _summary([call.latency * 1000 for call in answered]),
+        "tokens": {
+            "prompt": _summary([call.prompt_tokens for call in answered])["mean"],
+            "completion": _summary([call.completion_tokens for call in answered])["mean"],
+            "total": _summary([call.prompt_tokens + call.completion_tokens for call in answered])["mean"],
+            "estimated": any(call.estimated for call in answered),
+        },
+    }
+    if keep_misses:
+        report["misses"] = sorted(misses, key=lambda miss: (miss["query"], miss["field"]))
+    return report
+
+
+def _cost(report: Dict[str, Any]) -> Tuple[float, float]:
+    return (report["tokens"]["total"] if report["tokens"]["total"] is not None else float("inf"),
+            report["latency_ms"]["p95"] if report["latency_ms"]["p95"] is not None else float("inf"))
+
+
+def pareto_front(reports: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Variants no other variant of the same target beats on accuracy, tokens and p95 latency at once"""
+    def dominates(a, b):
+        if a["target"] != b["target"]:
+            return False
+        better_or_equal = (a["accuracy"] or 0) >= (b["accuracy"] or 0) and all(x <= y for x, y in zip(_cost(a), _cost(b)))
+        strictly = (a["accuracy"] or 0) > (b["accuracy"] or 0) or any(x < y for x, y in zip(_cost(a), _cost(b)))
+        return better_or_equal and strictly
+
+    return sorted(name for name, report in reports.items()
+                  if not any(dominates(other, report) for other_name, other in reports.items() if other_name != name))
+
+
+def recommend(reports: Dict[str, Dict[str, Any]], tolerance: float = 0.02,
+              baselines: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Per target, the cheapest variant within tolerance of the baseline's accuracy (or the best one's)"""
+    recommended = {}
+    for target in sorted({report["target"] for report in reports.values()}):
+        candidates = {name: report for name, report in reports.items() if report["target"] == target}
+        baseline = (baselines or {}).get(target)
+        if baseline in candidates:
+            floor = (candidates[baseline]["accuracy"] or 0) - tolerance
+        else:
+            floor = max(report["accuracy"] or 0 for report in candidates.values()) - tolerance
+        holding = [name for name, report in candidates.items() if (report["accuracy"] or 0) >= floor - 1e-9]
+        recommended[target] = min(holding, key=lambda name: (_cost(candidates[name]), name))
+    return recommended
+
+
+def evaluate(variants: Sequence[Variant], provider_for: Callable[[Optional[str]], Any],
+             corpus: Sequence[Dict[str, Any]], concurrency: int = 1, tolerance: float = 0.02,
+             keep_misses: bool = False) -> Dict[str, Any]:
+    """Report for every variant, with the Pareto front and the recommended variant per target"""
+    reports = {}
+    for variant in variants:
+        logger.info("Evaluating %s on %d queries", variant.name, len(corpus))
+        reports[variant.name] = evaluate_variant(provider_for(variant.model), variant, corpus,
+                                                 concurrency=concurrency, keep_misses=keep_misses)
+    front = set(pareto_front(reports))
+    for name, report in reports.items():
+        report["pareto"] = name in front
+    baselines = {variant.target: variant.name for variant in variants if variant.name.endswith(":baseline")}
+    return {
+        "queries": len(corpus),
+        "tolerance": tolerance,
+        "variants": reports,
+        "recommended": recommend(reports, tolerance, baselines),
+    }
+
+
+_QUERY = re.compile(r'Query:\s*"?(.*?)"?\s*$', re.MULTILINE)
+_PARKING_WORDS = {"parking", "park", "spot", "spots", "garage", "cheap", "near", "find", "show", "covered", "ev",
+                  "lot", "charging", "space", "spaces"}
+_GREETINGS = {"hello", "hi", "hey", "good morning", "hi there"}
+_SYSTEM_QUESTIONS = ("who are you", "what are you", "what can you do")
+
+
+class KeywordStandIn:
+    """Provider stand-in answering every target with the keyword extractor and the local intent model"""
+
+    # Costs nothing and ignores the prompt's wording, so it checks the harness and
+    # gives the rule-based floor that a model variant has to beat
+
+    model = "keyword"
+
+    def __init__(self, intent_classifier: Any = None):
+        self.intent_classifier = intent_classifier
+
+    def generate_structured(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
+        matches = _QUERY.findall(prompt)
+        query = matches[-1] if matches else prompt
+        text = query.lower().strip(" ?!.")
+        entities = extract_keyword_entities(query)
+
+        if text in _GREETINGS:
+            search_intent = "greeting"
+        elif text in _SYSTEM_QUESTIONS:
+            search_intent = "system_inquiry"
+        elif set(re.findall(r"[a-z]+", text)) & _PARKING_WORDS:
+            search_intent = "parking_search"
+        else:
+            search_intent = "off_topic"
+        intent = self.intent_classifier.predict(query)[0] if self.intent_classifier is not None else "find_parking"
+
+        return json.dumps({
+            "intent": {"type": search_intent, "confidence": 0.8},
+            "intent_type": intent,
+            "entities": {"location": entities["location"], "price_range": None, "features": entities["features"]},
+            "filters": {"max_price": entities["max_price"], "required_features": entities["features"],
+                        "radius": entities["radius"]},
+            **{field: entities[field] for field in ("location", "features", "max_price", "min_price", "radius")},
+        })
@@ -0,0 +1,48 @@
+"""Distance - Great-circle distances for scalars and NumPy arrays"""
+
+import math
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distance in meters between two coordinates"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_m_array(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances in meters from one coordinate to arrays of coordinates"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def _coordinate(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def number_column(rows: Sequence[Dict[str, Any]], field: str) -> np.ndarray:
+    """Float array of one field of dicts, NaN where the value is missing or not a number"""
+    try:
+        # Clean numbers convert without a Python call per value
+        return np.fromiter((row.get(field) for row in rows), dtype=np.float64, count=len(rows))
+    except (TypeError, ValueError):
+        return np.fromiter((_coordinate(row.get(field)) for row in rows), dtype=np.float64, count=len(rows))
+
+
+def poi_coordinates(pois: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitude and longitude arrays of POI dicts, NaN where a coordinate is missing or invalid"""
+    return number_column(pois, "lat"), number_column(pois, "lng")
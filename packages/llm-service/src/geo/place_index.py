@@ -0,0 +1,178 @@
+"""Place Index - Typo-tolerant place name lookup with a trigram inverted index and bounded edit distance"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_APOSTROPHE = re.compile(r"['’`]")
+_LETTER_DIGIT = re.compile(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+class PlaceMatch(NamedTuple):
+    name: str
+    lat: float
+    lng: float
+    confidence: float
+    matched: str
+
+
+def normalize_place(text: str) -> str:
+    """Lower-cased words without punctuation, with letters and digits split ("Taipei101" -> "taipei 101")"""
+    text = _APOSTROPHE.sub("", text.lower())
+    text = _LETTER_DIGIT.sub(" ", text)
+    return " ".join(_NON_ALNUM.sub(" ", text).split())
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of each word, padded so that word starts and ends count"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def substring_distance(pattern: str, text: str, bound: int) -> Optional[int]:
+    """Fewest edits (with transpositions) turning pattern into some substring of text, None if over bound"""
+    if pattern in text:
+        return 0
+    m = len(pattern)
+    cap = bound + 1
+    prev2: Optional[List[int]] = None
+    prev = [min(i, cap) for i in range(m + 1)]
+    # Ukkonen's cut-off: rows below the last one within bound cannot come back under it
+    last = min(m, bound)
+    best = prev[m]
+    for j, tc in enumerate(text):
+        cur = [cap] * (m + 1)
+        cur[0] = 0
+        top = min(m, last + 1)
+        for i in range(1, top + 1):
+            pc = pattern[i - 1]
+            v = prev[i - 1] if pc == tc else prev[i - 1] + 1
+            if prev[i] + 1 < v:
+                v = prev[i] + 1
+            if cur[i - 1] + 1 < v:
+                v = cur[i - 1] + 1
+            if i > 1 and prev2 is not None and pc == text[j - 1] and pattern[i - 2] == tc and prev2[i - 2] + 1 < v:
+                v = prev2[i - 2] + 1
+            cur[i] = v if v < cap else cap
+        last = top
+        while last > 0 and cur[last] >= cap:
+            last -= 1
+        if cur[m] < best:
+            best = cur[m]
+        prev2, prev = prev, cur
+    return best if best <= bound else None
+
+
+class PlaceIndex:
+    """Resolves free-text locations to known places, tolerating typos and missing spaces"""
+
+    def __init__(self, places: Sequence[Dict[str, Any]], max_edits: int = 2, min_overlap: float = 0.4,
+                 max_candidates: int = 8):
+        self.places = list(places)
+        self.max_edits = max_edits
+        self.min_overlap = min_overlap
+        self.max_candidates = max_candidates
+
+        # One entry per name or alias, pointing back at its place
+        self.entries: List[str] = []
+        self.entry_place: List[int] = []
+        self.exact: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+        for place_id, place in enumerate(self.places):
+            for name in [place["name"], *place.get("aliases", [])]:
+                key = normalize_place(name)
+                if not key or key in self.exact:
+                    continue
+                entry_id = len(self.entries)
+                self.entries.append(key)
+                self.entry_place.append(place_id)
+                self.exact[key] = entry_id
+                for gram in trigrams(key):
+                    postings.setdefault(gram, []).append(entry_id)
+
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = np.array([len(trigrams(key)) for key in self.entries], dtype=np.float32)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "PlaceIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _bound(self, key: str) -> int:
+        return min(self.max_edits, len(key) // 4)
+
+    def _match(self, entry_id: int, confidence: float) -> PlaceMatch:
+        place = self.places[self.entry_place[entry_id]]
+        return PlaceMatch(place["name"], float(place["lat"]), float(place["lng"]), round(confidence, 3),
+                          self.entries[entry_id])
+
+    def candidates(self, query: str) -> np.ndarray:
+        """Entries sharing the most of their trigrams with the query, best first"""
+        lists = [self.postings[gram] for gram in trigrams(query) if gram in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.entries))
+        overlap = shared / self.gram_counts
+        ids = np.flatnonzero(overlap >= self.min_overlap)
+        if len(ids) > self.max_candidates:
+            ids = ids[np.argpartition(-overlap[ids], self.max_candidates - 1)[:self.max_candidates]]
+        return ids[np.argsort(-overlap[ids], kind="stable")]
+
+    def resolve(self, location: str) -> Optional[PlaceMatch]:
+        """Best place named in location with a confidence in [0, 1], or None"""
+        query = normalize_place(location)
+        if not query:
+            return None
+        if query in self.exact:
+            return self._match(self.exact[query], 1.0)
+
+        # Spaces around both sides make a match line up with whole words, or pay edits for not doing so
+        padded = f" {query} "
+        best, best_key = None, None
+        for entry_id in self.candidates(query):
+            key = self.entries[entry_id]
+            distance = substring_distance(f" {key} ", padded, self._bound(key))
+            if distance is None:
+                continue
+            # Prefer the name covering most of the query: "taipie 101" means Taipei 101, not the alias "101"
+            rank = (len(key) - distance, -distance)
+            if best_key is None or rank > best_key:
+                best, best_key = (entry_id, 1.0 - distance / len(key)), rank
+        return self._match(*best) if best is not None else None
+
+
+_loaded: Dict[str, Optional[PlaceIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_place_index(path: Optional[str]) -> Optional[PlaceIndex]:
+    """Load (once per path) the place index, or None when unavailable"""
+    if not path:
+        return None
+    with _loaded_lock:
+        if path not in _loaded:
+            index = None
+            try:
+                if os.path.exists(path):
+                    index = PlaceIndex.load(path)
+                    logger.info("Loaded %d places from %s", len(index), path)
+                else:
+                    logger.info("No place list at %s, geocoding every location over the network", path)
+            except Exception as e:
+                logger.warning("Could not load places from %s: %s", path, e)
+            _loaded[path] = index
+        return _loaded[path]
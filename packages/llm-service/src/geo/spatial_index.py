@@ -0,0 +1,242 @@
+"""Spatial Index - In-memory grid index of parking spots over array-backed columns, updated in place"""
+
+import os
+import json
+import math
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+import numpy as np
+
+from src.availability.booking_index import BookingIndex, window
+from src.geo.distance import number_column
+from src.nlp.feature_vocabulary import FeatureVocabulary, feature_vocabulary
+from src.ranking.spot_ranker import DEFAULT_RADIUS_M, Ranking, SpotColumns, SpotRanker, ranked_spots
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+
+# Columns kept per row; the spot dicts themselves are only read to build responses
+_COLUMNS = {"lat": np.float64, "lng": np.float64, "price": np.float64, "available": bool,
+            "feature_mask": np.uint32, "alive": bool}
+
+
+def load_spots(path: str) -> List[Dict[str, Any]]:
+    """Spots from a JSON array, a {"spots": [...]} object or NDJSON"""
+    with open(path) as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        return data.get("spots", []) if isinstance(data, dict) else data
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class SpotIndex:
+    """Spots in growable NumPy columns, bucketed by grid cell so a radius query reads only nearby rows"""
+
+    def __init__(self, cell_m: float = 250.0, capacity: int = 1024, ranker: Optional[SpotRanker] = None,
+                 vocabulary: FeatureVocabulary = feature_vocabulary, bookings: Optional[BookingIndex] = None):
+        self.cell_m = cell_m
+        self.cell_degrees = cell_m / METERS_PER_DEGREE
+        self.ranker = ranker or SpotRanker(vocabulary=vocabulary)
+        self.vocabulary = vocabulary
+        self.bookings = bookings
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self.spots: List[Optional[Dict[str, Any]]] = []
+        self.rows: Dict[str, int] = {}
+        self.cell_of: List[Optional[int]] = []
+        self.cells: Dict[int, Set[int]] = {}
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, bookings: Optional[BookingIndex] = None) -> "SpotIndex":
+        """Build from SPOT_INDEX_* settings, loading the snapshot at SPOT_INDEX_PATH when set"""
+        index = cls(cell_m=float(os.getenv("SPOT_INDEX_CELL_M", "250")), bookings=bookings)
+        path = os.getenv("SPOT_INDEX_PATH")
+        if path:
+            try:
+                index.load(load_spots(path))
+                logger.info("Loaded %d parking spots from %s", len(index), path)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not load spot snapshot %s: %s", path, e)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def cell_key(self, lat: float, lng: float) -> Optional[int]:
+        """Grid cell containing a coordinate, packed as row << 32 | column, or None without coordinates"""
+        if math.isnan(lat) or math.isnan(lng):
+            return None
+        row = int(math.floor((lat + 90.0) / self.cell_degrees))
+        col = int(math.floor((lng + 180.0) / self.cell_degrees))
+        return (row << 32) | col
+
+    def _grow(self, needed: int):
+        capacity = len(self.columns["alive"])
+        if needed <= capacity:
+            return
+        size = max(needed, capacity * 2)
+        for name, column in self.columns.items():
+            grown = np.zeros(size, dtype=column.dtype)
+            grown[:capacity] = column
+            self.columns[name] = grown
+
+    def _place(self, row: int, cell: Optional[int]):
+        previous = self.cell_of[row]
+        if previous == cell:
+            return
+        if previous is not None:
+            bucket = self.cells[previous]
+            bucket.discard(row)
+            if not bucket:
+                del self.cells[previous]
+        if cell is not None:
+            self.cells.setdefault(cell, set()).add(row)
+        self.cell_of[row] = cell
+
+    def _write(self, row: int, spot: Dict[str, Any]):
+        columns = self.columns
+        columns["lat"][row] = number_column([spot], "lat")[0]
+        columns["lng"][row] = number_column([spot], "lng")[0]
+        columns["price"][row] = number_column([spot], "price")[0]
+        columns["available"][row] = spot.get("available", True) is not False
+        columns["feature_mask"][row] = self.vocabulary.masks([spot.get("features") or ()])[0]
+        columns["alive"][row] = True
+        self.spots[row] = spot
+        self._place(row, self.cell_key(columns["lat"][row], columns["lng"][row]))
+
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        row = len(self.spots)
+        self._grow(row + 1)
+        self.spots.append(None)
+        self.cell_of.append(None)
+        return row
+
+    def load(self, spots: Iterable[Dict[str, Any]]):
+        """Replace the index with spots, filling every column in one vectorized pass"""
+        spots = [dict(spot) for spot in spots if spot.get("id") is not None]
+        # The last copy of a repeated id wins, as it would with upserts
+        spots = list({str(spot["id"]): spot for spot in spots}.values())
+        count = len(spots)
+
+        columns = {name: np.zeros(max(count, 1024), dtype=dtype) for name, dtype in _COLUMNS.items()}
+        columns["lat"][:count] = number_column(spots, "lat")
+        columns["lng"][:count] = number_column(spots, "lng")
+        columns["price"][:count] = number_column(spots, "price")
+        columns["available"][:count] = np.fromiter((s.get("available", True) is not False for s in spots),
+                                                   dtype=bool, count=count)
+        columns["feature_mask"][:count] = self.vocabulary.masks([s.get("features") or () for s in spots])
+        columns["alive"][:count] = True
+
+        lats, lngs = columns["lat"][:count], columns["lng"][:count]
+        located = ~(np.isnan(lats) | np.isnan(lngs))
+        cell_keys = np.full(count, -1, dtype=np.int64)
+        cell_keys[located] = (
+            (np.floor((lats[located] + 90.0) / self.cell_degrees).astype(np.int64) << 32)
+            | np.floor((lngs[located] + 180.0) / self.cell_degrees).astype(np.int64)
+        )
+        cells: Dict[int, Set[int]] = {}
+        order = np.argsort(cell_keys[located], kind="stable")
+        located_rows = np.flatnonzero(located)[order]
+        keys, starts = np.unique(cell_keys[located_rows], return_index=True)
+        for key, rows in zip(keys.tolist(), np.split(located_rows, starts[1:])):
+            cells[key] = set(rows.tolist())
+
+        with self._lock:
+            self.columns = columns
+            self.spots = spots
+            self.rows = {str(spot["id"]): row for row, spot in enumerate(spots)}
+            self.cell_of = [int(key) if key >= 0 else None for key in cell_keys.tolist()]
+            self.cells = cells
+            self._free = []
+
+    def upsert(self, spot: Dict[str, Any]) -> bool:
+        """Add a spot or merge the given fields into the stored one, returning whether it was new"""
+        spot_id = str(spot["id"])
+        with self._lock:
+            row = self.rows.get(spot_id)
+            if row is None:
+                row = self._new_row()
+                self.rows[spot_id] = row
+                self._write(row, dict(spot))
+                return True
+            # Partial updates such as {"id": ..., "available": false} keep every other field
+            self._write(row, dict(self.spots[row], **spot))
+            return False
+
+    def delete(self, spot_id: str) -> bool:
+        """Remove a spot, returning whether it was indexed"""
+        with self._lock:
+            row = self.rows.pop(str(spot_id), None)
+            if row is None:
+                return False
+            self._place(row, None)
+            self.columns["alive"][row] = False
+            self.spots[row] = None
+            self._free.append(row)
+            return True
+
+    def get(self, spot_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.rows.get(str(spot_id))
+            return dict(self.spots[row]) if row is not None else None
+
+    def _candidates(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Rows in the cells the search circle overlaps, or every live row without a location"""
+        lat, lng = filters.get("lat"), filters.get("lng")
+        if lat is None or lng is None:
+            return np.flatnonzero(self.columns["alive"][:len(self.spots)])
+
+        lat, lng = float(lat), float(lng)
+        radius = float(filters.get("radius") or DEFAULT_RADIUS_M)
+        dlat = radius / METERS_PER_DEGREE
+        dlng = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        row_low = int(math.floor((lat - dlat + 90.0) / self.cell_degrees))
+        row_high = int(math.floor((lat + dlat + 90.0) / self.cell_degrees))
+        col_low = int(math.floor((lng - dlng + 180.0) / self.cell_degrees))
+        col_high = int(math.floor((lng + dlng + 180.0) / self.cell_degrees))
+
+        rows: List[int] = []
+        if (row_high - row_low + 1) * (col_high - col_low + 1) > len(self.cells):
+            # A circle wider than the populated area is cheaper to answer from the cell list
+            for key, bucket in self.cells.items():
+                if row_low <= key >> 32 <= row_high and col_low <= key & 0xFFFFFFFF <= col_high:
+                    rows.extend(bucket)
+        else:
+            for row in range(row_low, row_high + 1):
+                for col in range(col_low, col_high + 1):
+                    bucket = self.cells.get((row << 32) | col)
+                    if bucket:
+                        rows.extend(bucket)
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def query(self, filters: Dict[str, Any], top_k: int = 20, require_all_features: bool = True) -> Ranking:
+        """The best top_k indexed spots matching SearchFilters-shaped filters, scored like /api/rank"""
+        span = window(filters) if self.bookings is not None else None
+        with self._lock:
+            rows = self._candidates(filters)
+            if span is not None and rows.size:
+                # Spots booked at any point of the requested window drop out
+                rows = rows[self.bookings.free([self.spots[row]["id"] for row in rows.tolist()], *span)]
+            columns = SpotColumns(
+                self.columns["lat"][rows],
+                self.columns["lng"][rows],
+                self.columns["price"][rows],
+                self.columns["available"][rows],
+                self.columns["feature_mask"][rows],
+            )
+            positions, score, distances, matched = self.ranker.select(columns, filters, top_k, require_all_features)
+            spots = ranked_spots(self.spots, positions, score, distances, rows=rows)
+        return Ranking(spots, matched, len(rows))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"spots": len(self.rows), "cells": len(self.cells), "cell_m": self.cell_m,
+                    "capacity": len(self.columns["alive"])}
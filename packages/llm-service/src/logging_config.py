@@ -0,0 +1,115 @@
+"""Logging Config - Queue-backed service logging with per-message sampling of high-volume records"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.metrics import metrics
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limits records per message template with a token bucket, leaving higher levels untouched"""
+
+    def __init__(self, rate: float = 5.0, burst: float = 20.0, max_level: int = logging.INFO,
+                 max_keys: int = 2048, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or self.rate <= 0:
+            return True
+        # Records are grouped by logger and unformatted message, so calls must pass their values
+        # as arguments ("Parsed intent: %s", intent) for repeats of a message to share a bucket
+        key = (record.name, str(record.msg))
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    # Many distinct messages usually means f-strings; start over rather than grow
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens, updated, suppressed = bucket
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1.0:
+                bucket[:] = [tokens, now, suppressed + 1]
+                self.dropped += 1
+                metrics.increment("log_records_dropped_total", reason="sampled")
+                return False
+            bucket[:] = [tokens - 1.0, now, 0]
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the writer falls behind"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_records_dropped_total", reason="queue_full")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: str = LOG_FORMAT) -> Optional[logging.handlers.QueueListener]:
+    """Configure root logging once: a stream handler behind a queue drained by a writer thread"""
+    global _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    root = logging.getLogger()
+    if _listener is not None:
+        root.setLevel(level)
+        return _listener
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(fmt))
+    sampling = SamplingFilter(
+        rate=float(os.getenv("LOG_SAMPLE_PER_SECOND", "5")),
+        burst=float(os.getenv("LOG_SAMPLE_BURST", "20")),
+        max_level=logging.getLevelName(os.getenv("LOG_SAMPLE_LEVEL", "INFO").upper()),
+    )
+
+    # LOG_ASYNC=false keeps plain synchronous logging, as with logging.basicConfig
+    if os.getenv("LOG_ASYNC", "true").lower() != "true":
+        stream.addFilter(sampling)
+        logging.basicConfig(level=level, handlers=[stream], force=True)
+        return None
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    # Sampling runs before a record is formatted and queued, so dropped records cost almost nothing
+    handler.addFilter(sampling)
+    # prepare() stores the formatted text as the record's message, so the queue side only renders the
+    # message; the stream handler applies the full format once on the writer thread
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
+
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
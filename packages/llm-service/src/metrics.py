@@ -0,0 +1,79 @@
+"""Service Metrics - In-process counters, gauges and latency summaries exposed on /metrics"""
+
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple, Deque
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_key(key: Tuple[str, Tuple[Tuple[str, str], ...]]) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe metric registry keyed by name and labels"""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._samples: Dict[Tuple, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a sample (e.g. a latency) in a bounded rolling window"""
+        key = _key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {_format_key(k): v for k, v in self._counters.items()}
+            gauges = {_format_key(k): v for k, v in self._gauges.items()}
+            samples = {_format_key(k): sorted(v) for k, v in self._samples.items()}
+
+        summaries = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            summaries[name] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 6),
+                "p50": values[int(0.5 * (len(values) - 1))],
+                "p95": values[int(0.95 * (len(values) - 1))],
+                "max": values[-1],
+            }
+
+        return {"counters": counters, "gauges": gauges, "summaries": summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+
+
+# Singleton instance
+metrics = Metrics()
@@ -0,0 +1,240 @@
+"""Feature Vocabulary - Maps free-text parking features to canonical IDs and bitmasks"""
+
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Canonical feature IDs understood by the spot API; a feature's bit is its position here
+CANONICAL_FEATURES = (
+    "ev_charging",
+    "tesla_supercharger",
+    "covered",
+    "uncovered",
+    "handicap_accessible",
+    "security_patrol",
+    "cctv",
+    "24_7_access",
+    "overnight_allowed",
+    "motorcycle_allowed",
+    "bicycle_parking",
+    "wide_space",
+    "compact_only",
+    "valet_service",
+    "self_park",
+)
+
+# Phrases, in any spelling the tokenizer and stemmer reduce to the same words, for each feature
+SYNONYMS = {
+    "ev_charging": ["ev charging", "ev charger", "ev", "electric charging", "electric vehicle", "charging",
+                    "charger", "charging station", "plug in"],
+    "tesla_supercharger": ["tesla charging", "tesla", "supercharger", "tesla supercharger"],
+    "covered": ["covered", "indoor", "roofed", "roof", "sheltered", "underground", "garage", "shade"],
+    "uncovered": ["uncovered", "outdoor", "open air", "surface lot"],
+    "handicap_accessible": ["handicap", "handicapped", "disabled", "accessible", "wheelchair", "ada",
+                            "handicap accessible", "disability"],
+    "security_patrol": ["secure", "security", "guarded", "guard", "security patrol", "patrolled", "attendant"],
+    "cctv": ["surveillance", "camera", "cctv", "cctv camera", "video surveillance", "monitored"],
+    "24_7_access": ["24/7", "24 7", "24 hours", "24h", "24 hour access", "always open", "24 7 access"],
+    "overnight_allowed": ["overnight", "overnight allowed", "overnight parking", "all night"],
+    "motorcycle_allowed": ["motorcycle", "motorbike", "scooter", "moped", "bike"],
+    "bicycle_parking": ["bicycle", "bicycle parking", "cycle", "bike rack"],
+    "wide_space": ["wide space", "wide", "large vehicle", "large", "suv", "van", "oversized"],
+    "compact_only": ["compact", "compact only", "small car"],
+    "valet_service": ["valet", "valet service", "valet parking"],
+    "self_park": ["self park", "self parking"],
+}
+
+# Words that carry no feature on their own, as in "covered spot with cctv cameras"
+STOPWORDS = {"a", "an", "the", "with", "and", "or", "for", "spot", "spots", "space", "spaces", "parking",
+             "lot", "lots", "has", "have", "needs", "need", "must", "only", "required", "available"}
+
+# Words ruling out the features after them, as in "not covered" or "no valet or cctv"
+NEGATIONS = {"no", "not", "without", "non", "except", "excluding", "never"}
+# Words a negation carries over; any other stopword ("with", "and") ends it
+NEGATION_CARRIES = {"or", "nor", "a", "an", "the", "any"}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ing", "ers", "er", "ed", "es", "s")
+
+
+def stem(word: str) -> str:
+    """Strip one common English suffix, keeping at least three letters"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(stem(token) for token in _TOKEN.findall(text.lower()))
+
+
+def edit_distance(a: str, b: str, bound: int) -> Optional[int]:
+    """Edit distance with transpositions between two words, None if over bound"""
+    if abs(len(a) - len(b)) > bound:
+        return None
+    prev2: Optional[List[int]] = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > bound:
+            return None
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= bound else None
+
+
+class Resolved(NamedTuple):
+    mask: int
+    excluded: int
+    unknown: bool
+
+
+class FeatureMatch(NamedTuple):
+    ids: List[str]
+    mask: int
+    excluded: int
+    unknown: List[str]
+
+
+class FeatureVocabulary:
+    """Feature phrases compiled once into a token-sequence table, with fuzzy fallback for misspellings"""
+
+    def __init__(self, synonyms: Dict[str, Sequence[str]] = SYNONYMS,
+                 features: Sequence[str] = CANONICAL_FEATURES, max_edits: int = 2):
+        self.features = tuple(features)
+        if len(self.features) > 32:
+            raise ValueError("Feature bitmasks are uint32, so at most 32 features are supported")
+        self.bits = {feature: 1 << i for i, feature in enumerate(self.features)}
+        self.max_edits = max_edits
+
+        self.phrases: Dict[Tuple[str, ...], int] = {}
+        for feature in self.features:
+            for phrase in [feature.replace("_", " "), *synonyms.get(feature, ())]:
+                tokens = tokenize(phrase)
+                if tokens:
+                    self.phrases.setdefault(tokens, self.bits[feature])
+        self.max_phrase = max(len(tokens) for tokens in self.phrases)
+        # Single words the edit-distance fallback compares against
+        self.words = {tokens[0]: bit for tokens, bit in self.phrases.items() if len(tokens) == 1 and len(tokens[0]) >= 4}
+        self.stopwords = {stem(word) for word in STOPWORDS}
+        self.negations = {stem(word) for word in NEGATIONS}
+        self.carries = {stem(word) for word in NEGATION_CARRIES}
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def _fuzzy(self, token: str) -> int:
+        if len(token) < 4:
+            return 0
+        bound = min(self.max_edits, len(token) // 4)
+        best, best_distance = 0, bound + 1
+        for word, bit in self.words.items():
+            distance = edit_distance(token, word, bound)
+            if distance is not None and distance < best_distance:
+                best, best_distance = bit, distance
+        return best
+
+    def _resolve(self, item: str) -> Resolved:
+        """Bitmasks of the features one entity string asks for and rules out, and whether any word was not understood"""
+        tokens = tokenize(item.replace("_", " "))
+        mask, excluded, unknown, negated, i = 0, 0, False, False, 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in self.negations:
+                negated = True
+                i += 1
+                continue
+            # Longest phrase first, so "ev charging" wins over "ev" then "charging"
+            for size in range(min(self.max_phrase, len(tokens) - i), 0, -1):
+                bit = self.phrases.get(tokens[i:i + size])
+                if bit is not None:
+                    i += size
+                    break
+            else:
+                i += 1
+                if token in self.stopwords:
+                    negated = negated and token in self.carries
+                    continue
+                bit = self._fuzzy(token)
+                unknown = unknown or not bit
+            if negated:
+                excluded |= bit
+            else:
+                mask |= bit
+        # "covered, not covered" rules the feature out
+        return Resolved(mask & ~excluded, excluded, unknown)
+
+    def ids(self, mask: int) -> List[str]:
+        return [feature for feature, bit in self.bits.items() if mask & bit]
+
+    def _combine(self, items: Sequence[str]) -> Tuple[int, int, List[str]]:
+        mask, excluded, unknown = 0, 0, []
+        for item in items:
+            resolved = self.resolve(item)
+            mask |= resolved.mask
+            excluded |= resolved.excluded
+            if resolved.unknown:
+                unknown.append(item)
+        return mask & ~excluded, excluded, unknown
+
+    def match(self, items: Sequence[str]) -> FeatureMatch:
+        """Requested and ruled-out features of one list, plus the strings with words not understood"""
+        mask, excluded, unknown = self._combine(items)
+        if unknown:
+            metrics.increment("feature_strings_unrecognized_total", len(unknown))
+            logger.info("Unrecognized features, not filtered on: %s", unknown)
+        return FeatureMatch(self.ids(mask), mask, excluded, unknown)
+
+    def normalize(self, items: Sequence[str]) -> Tuple[List[str], int]:
+        """Canonical IDs (in vocabulary order) and bitmask for one list of requested features"""
+        match = self.match(items)
+        return match.ids, match.mask
+
+    def masks(self, batch: Sequence[Sequence[str]]) -> np.ndarray:
+        """uint32 bitmask per list, resolving each distinct list once and decoding no IDs"""
+        known: Dict[Tuple[str, ...], int] = {}
+
+        def mask(items: Sequence[str]) -> int:
+            key = tuple(items)
+            value = known.get(key)
+            if value is None:
+                value = known[key] = self._combine(key)[0]
+            return value
+
+        return np.fromiter((mask(items) for items in batch), dtype=np.uint32, count=len(batch))
+
+    def normalize_batch(self, batch: Sequence[Sequence[str]]) -> Tuple[List[List[str]], np.ndarray]:
+        """Canonical IDs and a uint32 bitmask per list, resolving each distinct string once"""
+        flat = [item for items in batch for item in items]
+        lengths = np.fromiter((len(items) for items in batch), dtype=np.int64, count=len(batch))
+        masks = np.zeros(len(batch), dtype=np.uint32)
+        if flat:
+            item_masks = np.fromiter((self.resolve(item).mask for item in flat), dtype=np.uint32, count=len(flat))
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            nonempty = lengths > 0
+            masks[nonempty] = np.bitwise_or.reduceat(item_masks, offsets[nonempty])
+
+        unknown = sum(self.resolve(item).unknown for item in flat)
+        if unknown:
+            metrics.increment("feature_strings_unrecognized_total", unknown)
+        # Bit patterns repeat heavily across a batch, so decode each distinct mask once
+        decoded = {int(mask): self.ids(int(mask)) for mask in np.unique(masks)}
+        return [list(decoded[int(mask)]) for mask in masks], masks
+
+
+feature_vocabulary = FeatureVocabulary()
+
+
+def normalize_features(features: Sequence[str]) -> Tuple[List[str], int]:
+    """Canonical feature IDs and bitmask using the shared vocabulary"""
+    return feature_vocabulary.normalize(features)
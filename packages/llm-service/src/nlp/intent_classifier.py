@@ -0,0 +1,233 @@
+"""Intent Classifier - Hashed n-gram features and a softmax linear model for CPU-only intent detection"""
+
+import os
+import re
+import zlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTENT_LABELS = [
+    "find_parking",
+    "check_availability",
+    "get_directions",
+    "price_inquiry",
+    "feature_inquiry",
+]
+
+_WORD = re.compile(r"[a-z0-9$]+")
+
+
+class HashingVectorizer:
+    """Maps text to a sparse, L2-normalised vector of signed hashed character and word n-grams"""
+
+    def __init__(self, n_features: int = 2 ** 14, char_ngrams: Tuple[int, int] = (2, 4),
+                 word_ngrams: Tuple[int, int] = (1, 2)):
+        self.n_features = n_features
+        self.char_ngrams = tuple(char_ngrams)
+        self.word_ngrams = tuple(word_ngrams)
+
+    def _grams(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        grams = []
+
+        low, high = self.word_ngrams
+        for n in range(low, high + 1):
+            grams.extend("w:" + " ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+        # Character n-grams inside word boundaries are robust to typos and inflections
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                grams.extend("c:" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Column indices and values of the non-zero features of one text"""
+        counts: Dict[int, float] = {}
+        for gram in self._grams(text):
+            # crc32 is stable across processes, unlike the salted built-in hash
+            h = zlib.crc32(gram.encode("utf-8"))
+            index = h % self.n_features
+            sign = 1.0 if (h >> 31) & 1 == 0 else -1.0
+            counts[index] = counts.get(index, 0.0) + sign
+
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        # Sublinear term frequency, then unit length
+        values = np.sign(values) * np.log1p(np.abs(values))
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        return indices, values
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Dense feature matrix, used for training"""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, values = self.features(text)
+            np.add.at(matrix[row], indices, values)
+        return matrix
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _fit_temperature(logits: np.ndarray, targets: np.ndarray) -> float:
+    """Temperature minimising held-out negative log-likelihood"""
+    best_t, best_nll = 1.0, float("inf")
+    for t in np.exp(np.linspace(np.log(0.05), np.log(10.0), 120)):
+        probs = _softmax(logits / t)
+        nll = -np.mean(np.log(probs[np.arange(len(targets)), targets] + 1e-12))
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    return best_t
+
+
+def expected_calibration_error(probs: np.ndarray, targets: np.ndarray, bins: int = 10) -> float:
+    """Gap between confidence and accuracy, averaged over confidence bins"""
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == targets
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        mask = (confidence > low) & (confidence <= high)
+        if mask.any():
+            ece += mask.mean() * abs(correct[mask].mean() - confidence[mask].mean())
+    return float(ece)
+
+
+class IntentClassifier:
+    """Multinomial logistic regression over hashed n-grams with temperature-scaled confidence"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: Sequence[str],
+                 vectorizer: Optional[HashingVectorizer] = None, temperature: float = 1.0):
+        self.vectorizer = vectorizer or HashingVectorizer(n_features=weights.shape[0])
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.labels = list(labels)
+        self.temperature = temperature
+
+    def logits(self, text: str) -> np.ndarray:
+        indices, values = self.vectorizer.features(text)
+        # Only the rows of the active features are touched, so a prediction is a tiny gather
+        return values @ self.weights[indices] + self.bias
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        return _softmax(self.logits(text) / self.temperature)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its calibrated probability"""
+        probs = self.predict_proba(text)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        return [self.predict(text) for text in texts]
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], label_names: Sequence[str] = INTENT_LABELS,
+            vectorizer: Optional[HashingVectorizer] = None, epochs: int = 400,
+            learning_rate: float = 5.0, l2: float = 1e-4) -> "IntentClassifier":
+        """Train with full-batch gradient descent on cross-entropy plus L2"""
+        vectorizer = vectorizer or HashingVectorizer()
+        label_index = {name: i for i, name in enumerate(label_names)}
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+        features = vectorizer.transform(texts)
+
+        n_classes = len(label_names)
+        # The objective is convex, so a zero start is fine and keeps unseen hash rows at zero
+        weights = np.zeros((vectorizer.n_features, n_classes), dtype=np.float32)
+        bias = np.zeros(n_classes, dtype=np.float32)
+        onehot = np.eye(n_classes, dtype=np.float32)[targets]
+
+        for _ in range(epochs):
+            probs = _softmax(features @ weights + bias)
+            error = (probs - onehot) / len(targets)
+            weights -= learning_rate * (features.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(weights, bias, label_names, vectorizer=vectorizer)
+
+    def calibrate(self, texts: Sequence[str], labels: Sequence[str]) -> float:
+        """Fit the softmax temperature on held-out examples"""
+        label_index = {name: i for i, name in enumerate(self.labels)}
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+        logits = np.stack([self.logits(text) for text in texts])
+        self.temperature = _fit_temperature(logits, targets)
+        return self.temperature
+
+    def evaluate(self, texts: Sequence[str], labels: Sequence[str]) -> Dict[str, Any]:
+        """Accuracy and calibration error on labelled examples"""
+        label_index = {name: i for i, name in enumerate(self.labels)}
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+        probs = np.stack([self.predict_proba(text) for text in texts])
+        return {
+            "examples": len(texts),
+            "accuracy": round(float((probs.argmax(axis=1) == targets).mean()), 4),
+            "ece": round(expected_calibration_error(probs, targets), 4),
+            "mean_confidence": round(float(probs.max(axis=1).mean()), 4),
+        }
+
+    def save(self, path: str):
+        """Write weights as a compressed float16 .npz (no pickle)"""
+        np.savez_compressed(
+            path,
+            weights=self.weights.astype(np.float16),
+            bias=self.bias,
+            labels=np.array(self.labels),
+            temperature=np.array(self.temperature, dtype=np.float32),
+            char_ngrams=np.array(self.vectorizer.char_ngrams),
+            word_ngrams=np.array(self.vectorizer.word_ngrams),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            weights = data["weights"].astype(np.float32)
+            vectorizer = HashingVectorizer(
+                n_features=weights.shape[0],
+                char_ngrams=tuple(int(n) for n in data["char_ngrams"]),
+                word_ngrams=tuple(int(n) for n in data["word_ngrams"]),
+            )
+            return cls(
+                weights,
+                data["bias"],
+                [str(label) for label in data["labels"]],
+                vectorizer=vectorizer,
+                temperature=float(data["temperature"]),
+            )
+
+
+_loaded: Dict[str, Optional[IntentClassifier]] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_intent_classifier(path: Optional[str]) -> Optional[IntentClassifier]:
+    """Load (once per path) the classifier weights, or None when unavailable"""
+    if not path:
+        return None
+    with _loaded_lock:
+        if path not in _loaded:
+            classifier = None
+            try:
+                if os.path.exists(path):
+                    classifier = IntentClassifier.load(path)
+                    logger.info(f"Loaded intent classifier from {path}")
+                else:
+                    logger.info(f"No intent classifier at {path}, using the LLM for intents")
+            except Exception as e:
+                logger.warning(f"Could not load intent classifier from {path}: {e}")
+            _loaded[path] = classifier
+        return _loaded[path]
@@ -0,0 +1,134 @@
+"""Keyword Entities - Cheap rule-based entity extraction used when the LLM stage is unavailable"""
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+# Phrases that map directly to known parking features
+FEATURE_KEYWORDS = {
+    "ev": "ev_charging",
+    "electric": "electric_charging",
+    "charging": "ev_charging",
+    "charger": "ev_charging",
+    "tesla": "tesla_charging",
+    "covered": "covered",
+    "indoor": "indoor",
+    "garage": "covered",
+    "outdoor": "outdoor",
+    "uncovered": "uncovered",
+    "handicap": "handicap",
+    "disabled": "disabled",
+    "accessible": "accessible",
+    "wheelchair": "accessible",
+    "24/7": "24/7",
+    "overnight": "overnight",
+    "secure": "secure",
+    "guarded": "guarded",
+    "surveillance": "surveillance",
+    "cctv": "surveillance",
+    "valet": "valet",
+    "motorcycle": "motorcycle",
+    "scooter": "motorcycle",
+    "bike": "bike",
+    "bicycle": "bicycle",
+    "compact": "compact",
+}
+
+# Words that negate the features after them, as in "without ev charging" or "no covered or valet"
+NEGATIONS = {"no", "not", "without", "non", "except", "excluding"}
+# Words a negation carries over, so "no covered or ev" negates both features
+_NEGATION_CARRIES = {"or", "nor", "a", "an", "the", "any", "need", "needed", "required"}
+
+# "cheap parking" -> max_price 5, matching the extractor prompt's examples
+CHEAP_WORDS = {"cheap", "cheapest", "budget", "affordable", "inexpensive"}
+CHEAP_MAX_PRICE = 5
+
+_LOCATION = re.compile(
+    r"\b(?:near|nearby|at|around|by|close to|next to|in)\s+"
+    r"(.+?)(?=\s+(?:with|without|not|no|except|excluding|under|below|within|for|that|which|tomorrow|today|tonight"
+    r"|at\s+\d)\b|[,.?!]|$)"
+)
+_MAX_PRICE = re.compile(r"\b(?:under|below|less than|max(?:imum)?|up to|at most)\s*\$?\s*(\d+(?:\.\d+)?)")
+_MIN_PRICE = re.compile(r"\b(?:over|above|more than|at least|min(?:imum)?)\s*\$?\s*(\d+(?:\.\d+)?)")
+_RADIUS = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kilometers?|m|meters?|metres?)\b")
+_DURATION = re.compile(r"\bfor\s+(\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?)\b")
+_TOKEN = re.compile(r"[a-z0-9/]+")
+_LAST_WORD = re.compile(r"([a-z]+)\W*$")
+
+
+def _negated(text: str, start: int) -> bool:
+    """Whether the word before position start negates what follows, as in 'not cheap' or 'not under $5'"""
+    match = _LAST_WORD.search(text, 0, start)
+    return match is not None and match.group(1) in NEGATIONS
+
+
+def _location(query: str) -> Optional[str]:
+    match = _LOCATION.search(query)
+    if not match:
+        return None
+    location = match.group(1).strip()
+    # "near me" is the user's own position, and "in 30 minutes" is a time
+    if location in {"me", "here", "my location", "my place"} or location[:1].isdigit():
+        return None
+    return location or None
+
+
+def split_features(query: str) -> Tuple[List[str], List[str]]:
+    """(requested, negated) features named in a query, in order of appearance"""
+    requested: List[str] = []
+    negated: List[str] = []
+    negating = False
+    for token in _TOKEN.findall(query.lower()):
+        if token in NEGATIONS:
+            negating = True
+        elif token in FEATURE_KEYWORDS:
+            target = negated if negating else requested
+            if FEATURE_KEYWORDS[token] not in target:
+                target.append(FEATURE_KEYWORDS[token])
+        elif token not in _NEGATION_CARRIES:
+            negating = False
+    # A feature both asked for and ruled out ("ev charging, no ev") counts as ruled out
+    return [feature for feature in requested if feature not in negated], negated
+
+
+def extract_keyword_entities(query: str) -> Dict[str, Any]:
+    """Extract entities from a query with regexes and keyword lists only"""
+    text = query.lower()
+
+    # Negated features ("without ev charging") are left out rather than required
+    features, _ = split_features(text)
+
+    # Price words under a negation ("not cheap", "not under $5") set no limit
+    max_price = None
+    match = next((m for m in _MAX_PRICE.finditer(text) if not _negated(text, m.start())), None)
+    if match:
+        max_price = float(match.group(1))
+    elif any(not _negated(text, m.start()) for m in _TOKEN.finditer(text) if m.group() in CHEAP_WORDS):
+        max_price = CHEAP_MAX_PRICE
+
+    min_price = None
+    match = next((m for m in _MIN_PRICE.finditer(text) if not _negated(text, m.start())), None)
+    if match:
+        min_price = float(match.group(1))
+
+    radius = 1000
+    match = _RADIUS.search(text)
+    if match:
+        value = float(match.group(1))
+        radius = int(value * 1000) if match.group(2).startswith("k") else int(value)
+
+    duration = None
+    match = _DURATION.search(text)
+    if match:
+        value = float(match.group(1))
+        duration = int(value * 60) if match.group(2).startswith("h") else int(value)
+
+    return {
+        "location": _location(text),
+        "features": features,
+        "max_price": max_price,
+        "min_price": min_price,
+        "radius": radius,
+        "time_start": None,
+        "time_end": None,
+        "duration": duration,
+    }
@@ -0,0 +1,190 @@
+"""Refinement - Reads follow-ups like "cheaper ones" as changes to the previous search's entities"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional
+
+from src.nlp.feature_vocabulary import normalize_features
+from src.nlp.keyword_entities import CHEAP_MAX_PRICE
+from src.nlp.time_expressions import parse_time_expressions
+
+# "cheaper" lowers the previous price cap by this factor
+CHEAPER_FACTOR = 0.75
+# "closer" halves the radius and "further" doubles it, within these bounds in meters
+MIN_RADIUS = 100
+MAX_RADIUS = 5000
+
+# Longer utterances are treated as new searches
+MAX_WORDS = 10
+
+_CHEAPER = re.compile(r"\b(?:cheaper|cheapest|less expensive|lower prices?|more affordable)\b")
+_ANY_PRICE = re.compile(r"\b(?:any price|whatever (?:the )?price|price doesn'?t matter)\b")
+_MAX_PRICE = re.compile(
+    r"\b(?:under|below|less than|max(?:imum)?|up to|at most)\s*\$?\s*(\d+(?:\.\d+)?)(?:\s*(?:dollars?|bucks))?"
+)
+_RADIUS = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kilometers?|m|meters?|metres?)\b")
+_CLOSER = re.compile(r"\b(?:closer(?: by)?|nearer|shorter walk)\b")
+_WIDER = re.compile(r"\b(?:further(?: away| out)?|farther(?: away| out)?|wider|bigger radius|larger radius)\b")
+
+# Where the location of "near X", "what about X" and "X instead" ends
+_LOCATION_END = r"(?=\s+(?:with|without|under|below|within|for|that|which|instead)\b|[,.?!]|$)"
+_LOCATION_CUES = (
+    re.compile(r"\b(?:near|around|by|at|in|close to|next to)\s+(?P<place>.+?)" + _LOCATION_END),
+    re.compile(r"\b(?:what|how)\s+about\s+(?P<place>.+?)" + _LOCATION_END),
+    re.compile(r"^(?:try\s+|go\s+to\s+)?(?P<place>.+?)\s+instead\b"),
+)
+
+# Words opening a location, which "what about near me" leaves in front of the place
+PREPOSITIONS = {"near", "around", "by", "at", "in", "close", "next", "to"}
+NEGATIONS = {"without", "no", "not", "skip", "except"}
+# Words that carry no change of their own in a follow-up
+FILLER = {
+    "a", "about", "actually", "also", "an", "and", "any", "are", "bit", "but", "can", "could", "do", "find", "for",
+    "get", "give", "go", "have", "has", "how", "i", "instead", "is", "it", "just", "maybe", "me", "need",
+    "now", "of", "ok", "okay", "one", "ones", "only", "option", "options", "or", "parking", "place", "places",
+    "please", "rather", "show", "some", "something", "spot", "spots", "that", "the", "them", "then",
+    "there", "those", "to", "try", "want", "what", "with", "you",
+}
+
+_TOKEN = re.compile(r"[a-z0-9/]+")
+
+
+class Refinement(NamedTuple):
+    """The previous entities with a follow-up's changes applied, and which fields it changed"""
+    entities: Dict[str, Any]
+    changed: FrozenSet[str]
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text)
+
+
+def _feature(token: str) -> Optional[str]:
+    ids, _ = normalize_features([token])
+    return ids[0] if ids else None
+
+
+def _names_place(place: str) -> bool:
+    """Whether a location cue's text has words besides times, features and filler"""
+    for expression in parse_time_expressions(place).expressions:
+        place = place.replace(expression, " ", 1)
+    words = _tokens(place)
+    while words and words[0] in PREPOSITIONS:
+        words = words[1:]
+    if not words or words[0] in {"me", "here"} or words[0][:1].isdigit():
+        return False
+    return not all(word in NEGATIONS or word in FILLER or _feature(word) for word in words)
+
+
+def _cut(text: str, match) -> str:
+    return text[:match.start()] + " " + text[match.end():]
+
+
+def _location(text: str):
+    """(place, text without it) for the first location cue that names a place rather than features or times"""
+    for cue in _LOCATION_CUES:
+        for match in cue.finditer(text):
+            place = match.group("place").strip()
+            if _names_place(place):
+                return place, _cut(text, match)
+    return None, text
+
+
+def _times(times, previous: Dict[str, Any]) -> Dict[str, Any]:
+    """Time fields after a follow-up, keeping what it did not say: "tomorrow at 3pm" keeps the duration"""
+    start = times.start or previous.get("time_start")
+    duration = times.duration_minutes if times.duration_minutes is not None else previous.get("duration")
+    end = times.end
+    if end is None and start is not None and duration:
+        end = start + timedelta(minutes=duration)
+    elif end is None and times.start is not None and previous.get("time_start") and previous.get("time_end"):
+        # A moved start keeps the previous length of stay
+        end = start + (previous["time_end"] - previous["time_start"])
+    elif end is None and times.start is None:
+        end = previous.get("time_end")
+    return {"time_start": start, "time_end": end, "duration": duration}
+
+
+def parse_refinement(query: str, previous: Dict[str, Any], now: Optional[datetime] = None) -> Optional[Refinement]:
+    """Refinement of the previous entities, or None when the query reads as a new search"""
+    text = query.lower().strip()
+    if not text or len(_tokens(text)) > MAX_WORDS:
+        return None
+
+    entities = dict(previous)
+    changed = set()
+
+    match = _MAX_PRICE.search(text)
+    if match:
+        entities["max_price"] = float(match.group(1))
+        text = _cut(text, match)
+    elif _CHEAPER.search(text):
+        cap = previous.get("max_price")
+        entities["max_price"] = round(float(cap) * CHEAPER_FACTOR, 2) if cap else CHEAP_MAX_PRICE
+        text = _CHEAPER.sub(" ", text)
+    elif _ANY_PRICE.search(text):
+        entities["max_price"] = None
+        text = _ANY_PRICE.sub(" ", text)
+    if entities.get("max_price") != previous.get("max_price"):
+        changed.add("max_price")
+        minimum = entities.get("min_price")
+        if minimum is not None and entities["max_price"] is not None and minimum > entities["max_price"]:
+            entities["min_price"] = None
+            changed.add("min_price")
+
+    radius = int(previous.get("radius") or 1000)
+    match = _RADIUS.search(text)
+    if match:
+        value = float(match.group(1))
+        entities["radius"] = int(value * 1000) if match.group(2).startswith("k") else int(value)
+        text = _cut(text, match)
+    elif _CLOSER.search(text):
+        entities["radius"] = max(MIN_RADIUS, radius // 2)
+        text = _CLOSER.sub(" ", text)
+    elif _WIDER.search(text):
+        entities["radius"] = min(MAX_RADIUS, radius * 2)
+        text = _WIDER.sub(" ", text)
+    if entities.get("radius", radius) != radius:
+        changed.add("radius")
+
+    place, text = _location(text)
+    if place is not None:
+        entities["location"] = place
+        changed.add("location")
+
+    # Times are read after the place, so "Shilin night market" is not a time of night
+    times = parse_time_expressions(text, now)
+    if times.expressions:
+        entities.update(_times(times, previous))
+        changed.update(field for field in ("time_start", "time_end", "duration")
+                       if entities.get(field) != previous.get(field))
+        for expression in times.expressions:
+            text = text.replace(expression, " ", 1)
+
+    before, _ = normalize_features(previous.get("features") or [])
+    features = list(before)
+    negated = False
+    for token in _tokens(text):
+        if token in NEGATIONS:
+            negated = True
+            continue
+        if token == "with":
+            negated = False
+        if token in FILLER:
+            continue
+        feature = _feature(token)
+        if feature is not None:
+            if negated and feature in features:
+                features.remove(feature)
+            elif not negated and feature not in features:
+                features.append(feature)
+            continue
+        # Anything else is not a change we understand, so the query gets a full run
+        return None
+    if features != before:
+        entities["features"] = features
+        changed.add("features")
+
+    if not changed:
+        return None
+    return Refinement(entities, frozenset(changed))
@@ -0,0 +1,323 @@
+"""Time Expressions - Table-driven, precompiled parser for the times and durations in a search query"""
+
+import os
+import re
+import logging
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+
+RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1, "tmr": 1, "tmrw": 1}
+
+# Start and end hour of each part of the day
+DAYPARTS = {
+    "morning": (9, 12),
+    "afternoon": (14, 18),
+    "evening": (18, 22),
+    "tonight": (19, 23),
+    "night": (20, 24),
+}
+_PM_DAYPARTS = {"afternoon", "evening", "tonight", "night"}
+
+# Hours a day or weekday alone starts at, as in "tomorrow" or "on friday"
+DEFAULT_HOUR = 9
+
+UNIT_MINUTES = {"m": 1, "h": 60, "d": 1440}
+
+_NUMBER = r"\d+(?:\.\d+)?|an?|half\s+an?"
+_UNIT = r"minutes?|mins?|hours?|hrs?|h|days?"
+_MERIDIEM = r"[ap]\.?m\.?(?![a-z])"
+# Keeps numbers that are prices, distances or durations from being read as clock times
+_NOT_TIME = r"(?!\s*(?:minutes?|mins?|hours?|hrs?|h\b|days?|km|m\b|meters?|metres?|dollars?|bucks|twd|ntd|nt\b|usd|spots?|%)|[\d/])"
+
+
+class TimeRange(NamedTuple):
+    start: Optional[datetime]
+    end: Optional[datetime]
+    duration_minutes: Optional[int]
+    expressions: List[str]
+
+
+class _Parts:
+    """What the matched expressions said, before it is resolved against the clock"""
+
+    __slots__ = ("day_offset", "weekday", "daypart", "start", "end", "offset", "duration", "now", "expressions")
+
+    def __init__(self):
+        self.day_offset: Optional[int] = None
+        self.weekday: Optional[Tuple[int, bool]] = None
+        self.daypart: Optional[str] = None
+        self.start: Optional[Tuple[int, int, Optional[str]]] = None
+        self.end: Optional[Tuple[int, int, Optional[str]]] = None
+        self.offset: Optional[timedelta] = None
+        self.duration: Optional[timedelta] = None
+        self.now = False
+        self.expressions: List[str] = []
+
+
+def _quantity(number: str) -> float:
+    if number[0].isdigit():
+        return float(number)
+    return 0.5 if number.startswith("half") else 1.0
+
+
+def _minutes(number: str, unit: str) -> float:
+    return _quantity(number) * UNIT_MINUTES[unit[0]]
+
+
+def _clock(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[Tuple[int, int, Optional[str]]]:
+    """(hour, minute, "a"/"p"/None) if the numbers make a time of day"""
+    h, m = int(hour), int(minute or 0)
+    if m > 59 or h > 24 or (meridiem and not 1 <= h <= 12):
+        return None
+    return h % 24, m, meridiem[0] if meridiem else None
+
+
+def _on_range(parts: _Parts, match) -> bool:
+    start = _clock(match.group("r1h"), match.group("r1m"), match.group("r1ap"))
+    end = _clock(match.group("r2h"), match.group("r2m"), match.group("r2ap"))
+    explicit = match.group("r1ap") or match.group("r2ap") or match.group("r1m") or match.group("r2m")
+    # "2 to 5" alone is as likely to be a count as a time
+    if start is None or end is None or not (explicit or match.group("rfrom")):
+        return False
+    parts.start, parts.end = _share_meridiem(start, end)
+    return True
+
+
+def _on_offset(parts: _Parts, match) -> bool:
+    parts.offset = timedelta(minutes=_minutes(match.group("inn"), match.group("inunit")))
+    return True
+
+
+def _on_duration(parts: _Parts, match) -> bool:
+    minutes = _minutes(match.group("durn"), match.group("durunit"))
+    if match.group("durhalf"):
+        minutes += UNIT_MINUTES[match.group("durunit")[0]] / 2
+    parts.duration = timedelta(minutes=minutes)
+    return True
+
+
+def _on_clock(parts: _Parts, match) -> bool:
+    clock = _clock(match.group("th"), match.group("tm"), match.group("tap"))
+    prefix = match.group("tpre")
+    if clock is None or not (match.group("tm") or match.group("tap") or prefix):
+        return False
+    if prefix in ("until", "till") and parts.end is None:
+        parts.end = clock
+    elif parts.start is None:
+        parts.start = clock
+    else:
+        parts.end = clock
+    return True
+
+
+def _on_named_time(parts: _Parts, match) -> bool:
+    parts.start = (0, 0, None) if match.group("named") == "midnight" else (12, 0, None)
+    return True
+
+
+def _on_day_after_tomorrow(parts: _Parts, match) -> bool:
+    parts.day_offset = 2
+    return True
+
+
+def _on_relative_day(parts: _Parts, match) -> bool:
+    day = match.group("day")
+    parts.day_offset = RELATIVE_DAYS[day]
+    if day == "tonight":
+        parts.daypart = "tonight"
+    return True
+
+
+def _on_weekday(parts: _Parts, match) -> bool:
+    parts.weekday = (WEEKDAYS[match.group("wd")], match.group("wdmod") == "next")
+    return True
+
+
+def _on_weekend(parts: _Parts, match) -> bool:
+    parts.weekday = (5, match.group("wemod") == "next")
+    return True
+
+
+def _on_daypart(parts: _Parts, match) -> bool:
+    parts.daypart = match.group("part")
+    return True
+
+
+def _on_now(parts: _Parts, match) -> bool:
+    parts.now = True
+    return True
+
+
+# (name, pattern, handler) in priority order: where several rules match at the same
+# position the first one wins, so ranges come before single times and so on
+GRAMMAR = (
+    ("range",
+     rf"(?:\b(?P<rfrom>from|between)\s+)?(?<![\d$.:/])(?P<r1h>\d{{1,2}})(?::(?P<r1m>\d{{2}}))?\s*(?P<r1ap>{_MERIDIEM})?"
+     rf"\s*(?:-|–|—|\bto\b|\buntil\b|\btill\b|\band\b)\s*"
+     rf"(?P<r2h>\d{{1,2}})(?::(?P<r2m>\d{{2}}))?\s*(?P<r2ap>{_MERIDIEM})?{_NOT_TIME}",
+     _on_range),
+    ("offset", rf"\bin\s+(?P<inn>{_NUMBER})\s*(?P<inunit>{_UNIT})\b", _on_offset),
+    ("duration",
+     rf"\bfor\s+(?P<durn>{_NUMBER})\s*(?P<durunit>{_UNIT})\b(?P<durhalf>\s+and\s+a\s+half)?",
+     _on_duration),
+    ("clock",
+     rf"(?:\b(?P<tpre>at|by|around|after|from|until|till)\s+)?(?<![\d$.:/])(?P<th>\d{{1,2}})"
+     rf"(?::(?P<tm>\d{{2}}))?\s*(?P<tap>{_MERIDIEM})?{_NOT_TIME}",
+     _on_clock),
+    ("named_time", r"\b(?P<named>noon|midday|midnight)\b", _on_named_time),
+    ("day_after_tomorrow", r"\b(?:the\s+)?day\s+after\s+tomorrow\b", _on_day_after_tomorrow),
+    ("relative_day", rf"\b(?P<day>{'|'.join(RELATIVE_DAYS)})\b", _on_relative_day),
+    ("weekday", rf"\b(?:(?P<wdmod>next|this|on)\s+)?(?P<wd>{'|'.join(WEEKDAYS)})\b", _on_weekday),
+    ("weekend", r"\b(?:(?P<wemod>next|this)\s+)?weekend\b", _on_weekend),
+    ("daypart", rf"\b(?P<part>{'|'.join(p for p in DAYPARTS if p != 'tonight')})\b", _on_daypart),
+    ("now", r"\b(?:right\s+now|now|asap|immediately)\b", _on_now),
+)
+
+
+@lru_cache(maxsize=8)
+def compile_grammar(grammar: Tuple[Tuple[str, str, Callable], ...] = GRAMMAR) -> Tuple[Pattern, Dict[str, Callable]]:
+    """One alternation of every rule, so a query is scanned once whatever the number of rules"""
+    pattern = re.compile("|".join(f"(?P<{name}>{rule})" for name, rule, _ in grammar))
+    return pattern, {name: handler for name, _, handler in grammar}
+
+
+def _share_meridiem(start, end):
+    """Give "2-5pm" the am/pm of whichever end has one, without putting the start after the end"""
+    (h1, m1, ap1), (h2, m2, ap2) = start, end
+    if ap1 is None and ap2 is not None:
+        ap1 = ap2
+        if _hour(h1, ap1) * 60 + m1 > _hour(h2, ap2) * 60 + m2:
+            ap1 = "a" if ap2 == "p" else "p"
+    elif ap2 is None and ap1 is not None:
+        ap2 = ap1
+        if _hour(h2, ap2) * 60 + m2 < _hour(h1, ap1) * 60 + m1:
+            ap2 = "p" if ap1 == "a" else "a"
+    return (h1, m1, ap1), (h2, m2, ap2)
+
+
+def _hour(hour: int, meridiem: Optional[str], daypart: Optional[str] = None) -> int:
+    """24-hour clock hour; without am/pm, evening dayparts and 1-6 are read as pm"""
+    if meridiem == "a":
+        return 0 if hour == 12 else hour
+    if meridiem == "p":
+        return hour if hour == 12 else hour + 12
+    if 1 <= hour < 12 and (daypart in _PM_DAYPARTS or (daypart is None and hour <= 6)):
+        return hour + 12
+    return hour
+
+
+def load_timezone(name: Optional[str]) -> tzinfo:
+    """Zone by IANA name, falling back to UTC when it or the tz database is unavailable"""
+    if not name or name.upper() == "UTC" or ZoneInfo is None:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown timezone %s, resolving times in UTC", name)
+        return timezone.utc
+
+
+class TimeExpressionParser:
+    """Finds time expressions in a query in one pass and resolves them against a timezone-aware clock"""
+
+    def __init__(self, tz: Optional[tzinfo] = None, clock: Optional[Callable[[], datetime]] = None,
+                 grammar: Tuple[Tuple[str, str, Callable], ...] = GRAMMAR):
+        self.tz = tz or timezone.utc
+        self.clock = clock or (lambda: datetime.now(self.tz))
+        self.pattern, self.handlers = compile_grammar(grammar)
+
+    @classmethod
+    def from_env(cls) -> "TimeExpressionParser":
+        return cls(tz=load_timezone(os.getenv("SEARCH_TIMEZONE", "Asia/Taipei")))
+
+    def scan(self, query: str) -> _Parts:
+        parts = _Parts()
+        for match in self.pattern.finditer(query.lower()):
+            if self.handlers[match.lastgroup](parts, match):
+                parts.expressions.append(match.group(0).strip())
+        return parts
+
+    def parse(self, query: str, now: Optional[datetime] = None) -> TimeRange:
+        """Start, end and duration of the stay the query asks for, None where it says nothing"""
+        parts = self.scan(query)
+        now = now or self.clock()
+        now = now.replace(tzinfo=self.tz) if now.tzinfo is None else now.astimezone(self.tz)
+        now = now.replace(second=0, microsecond=0)
+
+        start = self._start(parts, now)
+        end = None
+        if parts.end is not None:
+            start = start or now
+            end = self._at(start, parts.end, parts.daypart)
+            if end <= start:
+                end += timedelta(days=1)
+        elif start is not None and parts.duration is not None:
+            end = start + parts.duration
+
+        duration = parts.duration if parts.duration is not None else (end - start if end else None)
+        duration_minutes = int(duration.total_seconds() // 60) if duration is not None else None
+        return TimeRange(start, end, duration_minutes, parts.expressions)
+
+    def _start(self, parts: _Parts, now: datetime) -> Optional[datetime]:
+        if parts.offset is not None:
+            return now + parts.offset
+
+        day = now
+        explicit_day = parts.day_offset is not None or parts.weekday is not None
+        if parts.weekday is not None:
+            weekday, following = parts.weekday
+            ahead = (weekday - now.weekday()) % 7
+            day = now + timedelta(days=ahead or (7 if following else 0))
+        elif parts.day_offset is not None:
+            day = now + timedelta(days=parts.day_offset)
+
+        if parts.start is not None:
+            start = self._at(day, parts.start, parts.daypart)
+        elif parts.daypart is not None:
+            start = day.replace(hour=DAYPARTS[parts.daypart][0], minute=0)
+        elif explicit_day:
+            start = now if day == now else day.replace(hour=DEFAULT_HOUR, minute=0)
+        elif parts.now:
+            return now
+        else:
+            return None
+
+        if start < now and (not explicit_day or day == now):
+            # "this morning" while it is still morning means now; a time already passed means the next one
+            if parts.start is None and parts.daypart is not None and now.hour < DAYPARTS[parts.daypart][1]:
+                return now
+            if not explicit_day:
+                start += timedelta(days=1)
+        return start
+
+    @staticmethod
+    def _at(day: datetime, clock: Tuple[int, int, Optional[str]], daypart: Optional[str]) -> datetime:
+        hour, minute, meridiem = clock
+        return day.replace(hour=_hour(hour, meridiem, daypart), minute=minute)
+
+
+time_parser = TimeExpressionParser.from_env()
+
+
+def parse_time_expressions(query: str, now: Optional[datetime] = None) -> TimeRange:
+    """Times and durations in a query, resolved by the shared parser"""
+    return time_parser.parse(query, now)
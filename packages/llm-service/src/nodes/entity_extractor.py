@@ -1,14 +1,14 @@
 """Entity Extractor Node - Extracts entities like location, price, features from the query"""
 
-from typing import Dict, Any, List
+from typing import Dict, Any
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from src.config import config
+from src.nlp.time_expressions import parse_time_expressions
+from src.prompts import ENTITY_SYSTEM_PROMPT, KNOWN_FEATURES
 import json
 import logging
-from datetime import datetime, timedelta
-import re
 import boto3
 
 logger = logging.getLogger(__name__)
@@ -74,44 +74,17 @@ class EntityExtractorNode:
             raise ValueError(f"Invalid LLM_API_TYPE: {config.LLM_API_TYPE}")
         
         # Common parking features
-        self.known_features = [
-            "covered", "uncovered", "indoor", "outdoor",
-            "ev_charging", "electric_charging", "tesla_charging",
-            "handicap", "disabled", "accessible",
-            "24/7", "24_hours", "overnight",
-            "secure", "guarded", "surveillance",
-            "valet", "self_park",
-            "motorcycle", "bike", "bicycle",
-            "wide_space", "compact", "large_vehicle"
-        ]
+        self.known_features = list(KNOWN_FEATURES)
     
     async def extract_entities(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Extract entities from the search query"""
         query = state.get("query", "")
         user_location = state.get("user_location", {})
         
-        system_prompt = f"""You are a parking search entity extractor. Extract relevant information from the user's query.
-
-Known parking features: {', '.join(self.known_features)}
-
-Extract and return a JSON object with these fields (use null for missing values):
-{{
-    "location": "specific location or landmark mentioned",
-    "features": ["list", "of", "requested", "features"],
-    "max_price": null or number (per hour),
-    "min_price": null or number (per hour),
-    "radius": null or number (in meters, default 1000),
-    "time_expressions": ["tomorrow morning", "2pm", etc],
-    "duration_hours": null or number
-}}
-
-Examples:
-- "cheap parking" -> max_price: 5
-- "under $10" -> max_price: 10
-- "within 500m" -> radius: 500
-- "covered spot with EV charging" -> features: ["covered", "ev_charging"]
-- "tomorrow 2pm for 3 hours" -> time_expressions: ["tomorrow 2pm"], duration_hours: 3
-"""
+        # Times are parsed from the query itself, so the LLM only has to find the rest
+        times = parse_time_expressions(query)
+        
+        system_prompt = ENTITY_SYSTEM_PROMPT.format(features=', '.join(self.known_features))
 
         user_prompt = f"Query: {query}"
         if user_location:
@@ -126,12 +99,6 @@ Examples:
             # Parse the JSON response
             result = json.loads(response.content)
             
-            # Process time expressions
-            time_start, time_end = self._parse_time_expressions(
-                result.get("time_expressions", []),
-                result.get("duration_hours")
-            )
-            
             # Update state with extracted entities
             state["entities"] = {
                 "location": result.get("location"),
@@ -139,85 +106,25 @@ Examples:
                 "max_price": result.get("max_price"),
                 "min_price": result.get("min_price"),
                 "radius": result.get("radius", 1000),
-                "time_start": time_start,
-                "time_end": time_end,
-                "duration": result.get("duration_hours") * 60 if result.get("duration_hours") else None
+                "time_start": times.start,
+                "time_end": times.end,
+                "duration": times.duration_minutes
             }
             
-            logger.info(f"Extracted entities: {state['entities']}")
+            logger.info("Extracted entities: %s", state['entities'])
             
         except Exception as e:
-            logger.error(f"Error extracting entities: {e}")
+            logger.error("Error extracting entities: %s", e)
             state["entities"] = {
                 "location": None,
                 "features": [],
                 "max_price": None,
                 "min_price": None,
                 "radius": 1000,
-                "time_start": None,
-                "time_end": None,
-                "duration": None
+                "time_start": times.start,
+                "time_end": times.end,
+                "duration": times.duration_minutes
             }
             state["error"] = str(e)
         
         return state
-    
-    def _parse_time_expressions(self, expressions: List[str], duration_hours: float = None) -> tuple:
-        """Parse time expressions into datetime objects"""
-        if not expressions:
-            return None, None
-        
-        now = datetime.now()
-        time_start = None
-        
-        for expr in expressions:
-            expr_lower = expr.lower()
-            
-            # Handle relative times
-            if "tomorrow" in expr_lower:
-                time_start = now.replace(hour=9, minute=0, second=0) + timedelta(days=1)
-                # Extract specific time if mentioned
-                time_match = re.search(r'(\d{1,2})\s*(am|pm)?', expr_lower)
-                if time_match:
-                    hour = int(time_match.group(1))
-                    if time_match.group(2) == 'pm' and hour != 12:
-                        hour += 12
-                    elif time_match.group(2) == 'am' and hour == 12:
-                        hour = 0
-                    time_start = time_start.replace(hour=hour)
-            
-            elif "today" in expr_lower or re.match(r'^\d{1,2}\s*(am|pm)?', expr_lower):
-                time_start = now
-                time_match = re.search(r'(\d{1,2})\s*(am|pm)?', expr_lower)
-                if time_match:
-                    hour = int(time_match.group(1))
-                    if time_match.group(2) == 'pm' and hour != 12:
-                        hour += 12
-                    elif time_match.group(2) == 'am' and hour == 12:
-                        hour = 0
-                    time_start = time_start.replace(hour=hour, minute=0, second=0)
-            
-            elif "now" in expr_lower:
-                time_start = now
-            
-            elif "morning" in expr_lower:
-                time_start = now.replace(hour=9, minute=0, second=0)
-                if "tomorrow" in expr_lower:
-                    time_start += timedelta(days=1)
-            
-            elif "afternoon" in expr_lower:
-                time_start = now.replace(hour=14, minute=0, second=0)
-                if "tomorrow" in expr_lower:
-                    time_start += timedelta(days=1)
-            
-            elif "evening" in expr_lower:
-                time_start = now.replace(hour=18, minute=0, second=0)
-                if "tomorrow" in expr_lower:
-                    time_start += timedelta(days=1)
-        
-        # Calculate end time based on duration
-        time_end = None
-        if time_start and duration_hours:
-            time_end = time_start + timedelta(hours=duration_hours)
-        
-        return time_start, time_end
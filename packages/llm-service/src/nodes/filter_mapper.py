@@ -5,6 +5,9 @@ import logging
 from datetime import datetime
 import httpx
 from src.config import config
+from src.geo.place_index import load_place_index
+from src.nlp.feature_vocabulary import feature_vocabulary
+from src.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +16,11 @@ class FilterMapperNode:
         self.geocoding_api_url = "https://api.mapbox.com/geocoding/v5/mapbox.places"
         # In production, this would come from config
         self.mapbox_token = None
+        self.place_index = load_place_index(config.PLACES_PATH)
     
-    async def map_to_filters(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Map extracted entities to search filters"""
+    async def map_to_filters(self, state: Dict[str, Any], allow_network: bool = True,
+                             coordinates: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Map extracted entities to search filters, reusing coordinates already resolved for the location"""
         entities = state.get("entities", {})
         user_location = state.get("user_location", {})
         
@@ -31,7 +36,7 @@ class FilterMapperNode:
             if entities.get("location"):
                 # In a real implementation, we would geocode the location
                 # For now, we'll use a mock geocoding
-                coords = await self._geocode_location(entities["location"])
+                coords = coordinates or await self._geocode_location(entities["location"], allow_network=allow_network)
                 if coords:
                     filters["lat"] = coords["lat"]
                     filters["lng"] = coords["lng"]
@@ -53,7 +58,13 @@ class FilterMapperNode:
             
             # Map features
             if entities.get("features"):
-                filters["features"] = self._normalize_features(entities["features"])
+                match = feature_vocabulary.match(entities["features"])
+                filters["features"], filters["feature_mask"] = match.ids, match.mask
+                if match.excluded:
+                    filters["excluded_features"] = feature_vocabulary.ids(match.excluded)
+                    filters["excluded_mask"] = match.excluded
+                if match.unknown:
+                    filters["unrecognized_features"] = match.unknown
             
             # Map time constraints
             if entities.get("time_start"):
@@ -63,10 +74,10 @@ class FilterMapperNode:
             
             # Update state
             state["filters"] = filters
-            logger.info(f"Mapped filters: {filters}")
+            logger.info("Mapped filters: %s", filters)
             
         except Exception as e:
-            logger.error(f"Error mapping filters: {e}")
+            logger.error("Error mapping filters: %s", e)
             state["filters"] = {
                 "available": True,
                 "radius": 1000
@@ -75,32 +86,18 @@ class FilterMapperNode:
         
         return state
     
-    async def _geocode_location(self, location: str) -> Optional[Dict[str, float]]:
+    async def _geocode_location(self, location: str, allow_network: bool = True) -> Optional[Dict[str, float]]:
         """Geocode a location string to coordinates"""
-        # Mock geocoding for common Taipei locations
-        mock_locations = {
-            "taipei 101": {"lat": 25.0330, "lng": 121.5654},
-            "taipei main station": {"lat": 25.0478, "lng": 121.5170},
-            "xinyi district": {"lat": 25.0329, "lng": 121.5670},
-            "da'an district": {"lat": 25.0261, "lng": 121.5462},
-            "zhongshan district": {"lat": 25.0642, "lng": 121.5331},
-            "ximending": {"lat": 25.0420, "lng": 121.5069},
-            "national taiwan university": {"lat": 25.0174, "lng": 121.5405},
-            "ntu": {"lat": 25.0174, "lng": 121.5405},
-            "shilin night market": {"lat": 25.0880, "lng": 121.5240},
-            "beitou": {"lat": 25.1321, "lng": 121.5011},
-            "the mall": {"lat": 25.0330, "lng": 121.5654},  # Default to Taipei 101 area
-        }
-        
-        # Check if location matches any mock location
-        location_lower = location.lower()
-        for key, coords in mock_locations.items():
-            if key in location_lower:
-                logger.info(f"Geocoded '{location}' to {coords}")
-                return coords
+        # Known places first, tolerating typos like "taipie 101" or "shilin nightmarket"
+        if self.place_index is not None:
+            match = self.place_index.resolve(location)
+            if match is not None and match.confidence >= config.PLACE_MATCH_MIN_CONFIDENCE:
+                logger.info("Resolved '%s' to %s (confidence %.2f)", location, match.name, match.confidence)
+                metrics.increment("geocode_requests_total", source="local")
+                return {"lat": match.lat, "lng": match.lng}
         
         # In production, make actual geocoding API call
-        if self.mapbox_token:
+        if self.mapbox_token and allow_network:
             try:
                 async with httpx.AsyncClient() as client:
                     response = await client.get(
@@ -115,68 +112,11 @@ class FilterMapperNode:
                         data = response.json()
                         if data.get("features"):
                             coords = data["features"][0]["geometry"]["coordinates"]
+                            metrics.increment("geocode_requests_total", source="network")
                             return {"lat": coords[1], "lng": coords[0]}
             except Exception as e:
-                logger.error(f"Geocoding API error: {e}")
+                logger.error("Geocoding API error: %s", e)
         
-        logger.warning(f"Could not geocode location: {location}")
+        logger.warning("Could not geocode location: %s", location)
+        metrics.increment("geocode_requests_total", source="unresolved")
         return None
-    
-    def _normalize_features(self, features: list) -> list:
-        """Normalize feature names to match API expectations"""
-        feature_mapping = {
-            # Charging
-            "ev_charging": "ev_charging",
-            "electric_charging": "ev_charging",
-            "tesla_charging": "tesla_supercharger",
-            "charging": "ev_charging",
-            
-            # Coverage
-            "covered": "covered",
-            "indoor": "covered",
-            "uncovered": "uncovered",
-            "outdoor": "uncovered",
-            
-            # Accessibility
-            "handicap": "handicap_accessible",
-            "disabled": "handicap_accessible",
-            "accessible": "handicap_accessible",
-            "wheelchair": "handicap_accessible",
-            
-            # Security
-            "secure": "security_patrol",
-            "guarded": "security_patrol",
-            "surveillance": "cctv",
-            "camera": "cctv",
-            
-            # Time
-            "24/7": "24_7_access",
-            "24_hours": "24_7_access",
-            "overnight": "overnight_allowed",
-            
-            # Vehicle types
-            "motorcycle": "motorcycle_allowed",
-            "bike": "motorcycle_allowed",
-            "bicycle": "bicycle_parking",
-            
-            # Space size
-            "wide_space": "wide_space",
-            "large_vehicle": "wide_space",
-            "compact": "compact_only",
-            
-            # Service
-            "valet": "valet_service",
-            "self_park": "self_park"
-        }
-        
-        normalized = []
-        for feature in features:
-            feature_lower = feature.lower().replace(" ", "_")
-            if feature_lower in feature_mapping:
-                normalized.append(feature_mapping[feature_lower])
-            else:
-                # Keep original if no mapping found
-                normalized.append(feature_lower)
-        
-        # Remove duplicates
-        return list(set(normalized))
@@ -1,11 +1,14 @@
 """Query Parser Node - Understands the intent of the search query"""
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from openai import OpenAI
 from src.config import config
+from src.metrics import metrics
+from src.nlp.intent_classifier import load_intent_classifier
+from src.prompts import INTENT_SYSTEM_PROMPT
 import json
 import logging
 import boto3
@@ -71,26 +74,39 @@ class QueryParserNode:
             )
         else:
             raise ValueError(f"Invalid LLM_API_TYPE: {config.LLM_API_TYPE}")
+        
+        # Initialize the local classifier (None when no weights file is available)
+        self.intent_classifier = load_intent_classifier(config.INTENT_CLASSIFIER_PATH)
+    
+    def _classify_locally(self, query: str) -> Optional[Dict[str, Any]]:
+        """Classify with the local model, or None when it is missing or unsure"""
+        if self.intent_classifier is None:
+            return None
+        
+        intent_type, confidence = self.intent_classifier.predict(query)
+        if confidence < config.INTENT_CONFIDENCE_THRESHOLD:
+            metrics.increment("intent_classifications_total", source="llm_fallback")
+            logger.debug("Local intent %s below threshold (%.2f), asking the LLM", intent_type, confidence)
+            return None
+        
+        metrics.increment("intent_classifications_total", source="local")
+        return {
+            "intent_type": intent_type,
+            "confidence": round(confidence, 3),
+            "reasoning": "Classified by the local intent model"
+        }
     
     async def parse_intent(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Parse the intent from the search query"""
         query = state.get("query", "")
         
-        system_prompt = """You are a parking search intent classifier. Analyze the user's query and determine their intent.
-
-Possible intents:
-- find_parking: User wants to find parking spots
-- check_availability: User wants to check if specific spots are available
-- get_directions: User wants directions to a parking spot
-- price_inquiry: User is asking about parking prices
-- feature_inquiry: User is asking about parking features
-
-Return a JSON object with:
-{
-    "intent_type": "the intent type",
-    "confidence": 0.0-1.0,
-    "reasoning": "brief explanation"
-}"""
+        local_intent = self._classify_locally(query)
+        if local_intent is not None:
+            state["intent"] = local_intent
+            logger.info("Parsed intent: %s", state['intent'])
+            return state
+        
+        system_prompt = INTENT_SYSTEM_PROMPT
 
         user_prompt = f"Query: {query}"
         
@@ -110,10 +126,10 @@ Return a JSON object with:
                 "reasoning": result.get("reasoning", "")
             }
             
-            logger.info(f"Parsed intent: {state['intent']}")
+            logger.info("Parsed intent: %s", state['intent'])
             
         except Exception as e:
-            logger.error(f"Error parsing intent: {e}")
+            logger.error("Error parsing intent: %s", e)
             state["intent"] = {
                 "intent_type": "find_parking",
                 "confidence": 0.5,
@@ -0,0 +1,127 @@
+"""Prompts - Prompt templates and response parsing shared by the API routes and offline jobs"""
+
+import re
+import json
+from typing import Dict
+
+# Both templates keep the request-specific values in the last lines. Everything
+# before them is identical for every call, so vLLM automatic prefix caching and
+# provider-side prompt caches can reuse its KV cache instead of prefilling it again.
+SEARCH_PROMPT = """Classify a parking app query and extract its details.
+
+If the query contains words like "parking", "park", "spot", "garage", "cheap", "near", "find", "show", "covered", "EV", then it's about parking.
+If the query is "who are you", "what are you", "what can you do", it's asking about the assistant.
+If the query is "hello", "hi", "hey", "good morning", it's a greeting.
+Otherwise, it's off-topic.
+
+Return JSON:
+{{
+  "intent": {{
+    "type": "parking_search" or "system_inquiry" or "greeting" or "off_topic",
+    "confidence": 0.8
+  }},
+  "response": "I'm your parking assistant! I help you find the best parking spots in your area." (for system_inquiry) or "Hello! I'm here to help you find parking." (for greeting) or "I specialize in parking. How can I help you find parking?" (for off_topic) or "" (for parking_search),
+  "entities": {{
+    "location": null,
+    "price_range": null,
+    "features": []
+  }},
+  "filters": {{
+    "max_price": null,
+    "required_features": [],
+    "radius": 500
+  }}
+}}
+
+Query: "{query}"
+"""
+
+VIBE_PROMPT = """Analyze the location below and provide parking insights.
+
+Return a JSON object with:
+{{
+  "vibe": {{
+    "score": 1-10,
+    "summary": "brief description",
+    "hashtags": ["#tag1", "#tag2", "#tag3"]
+  }},
+  "parking": {{
+    "difficulty": 1-10,
+    "level": "Easy|Moderate|Hard",
+    "tips": ["tip1", "tip2"],
+    "hashtags": ["#parking-tags"]
+  }},
+  "transport": [
+    {{"method": "Car|Public|Walk", "reason": "why"}}
+  ]
+}}
+
+Return ONLY valid JSON.
+
+Location: ({lat}, {lng})
+Nearby POIs: {pois}"""
+
+SEARCH_SYSTEM_PROMPT = "You are a parking assistant. Always return valid JSON."
+VIBE_SYSTEM_PROMPT = "You are a location analyst. Always return valid JSON."
+
+# System prompts of the search workflow's QueryParserNode and EntityExtractorNode
+INTENT_SYSTEM_PROMPT = """You are a parking search intent classifier. Analyze the user's query and determine their intent.
+
+Possible intents:
+- find_parking: User wants to find parking spots
+- check_availability: User wants to check if specific spots are available
+- get_directions: User wants directions to a parking spot
+- price_inquiry: User is asking about parking prices
+- feature_inquiry: User is asking about parking features
+
+Return a JSON object with:
+{
+    "intent_type": "the intent type",
+    "confidence": 0.0-1.0,
+    "reasoning": "brief explanation"
+}"""
+
+# Common parking features named in the entity prompt
+KNOWN_FEATURES = [
+    "covered", "uncovered", "indoor", "outdoor",
+    "ev_charging", "electric_charging", "tesla_charging",
+    "handicap", "disabled", "accessible",
+    "24/7", "24_hours", "overnight",
+    "secure", "guarded", "surveillance",
+    "valet", "self_park",
+    "motorcycle", "bike", "bicycle",
+    "wide_space", "compact", "large_vehicle"
+]
+
+ENTITY_SYSTEM_PROMPT = """You are a parking search entity extractor. Extract relevant information from the user's query.
+
+Known parking features: {features}
+
+Extract and return a JSON object with these fields (use null for missing values):
+{{
+    "location": "specific location or landmark mentioned",
+    "features": ["list", "of", "requested", "features"],
+    "max_price": null or number (per hour),
+    "min_price": null or number (per hour),
+    "radius": null or number (in meters, default 1000)
+}}
+
+Examples:
+- "cheap parking" -> max_price: 5
+- "under $10" -> max_price: 10
+- "within 500m" -> radius: 500
+- "covered spot with EV charging" -> features: ["covered", "ev_charging"]
+"""
+
+
+def extract_json(text: str) -> Dict:
+    """Extract JSON from LLM response"""
+    try:
+        # Try to find JSON in the response
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        return json.loads(text)
+    except:
+        # Fallback response
+        return {}
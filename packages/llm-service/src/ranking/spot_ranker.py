@@ -0,0 +1,167 @@
+"""Spot Ranker - Vectorized filtering and scoring of candidate parking spots against parsed search filters"""
+
+import os
+import logging
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.geo.distance import haversine_m_array, number_column, poi_coordinates
+from src.nlp.feature_vocabulary import FeatureVocabulary, feature_vocabulary
+
+logger = logging.getLogger(__name__)
+
+# Share of the score from closeness to the searched location, low price and requested features
+DEFAULT_WEIGHTS = {"distance": 0.5, "price": 0.3, "features": 0.2}
+DEFAULT_RADIUS_M = 1000.0
+
+
+def parse_weights(text: Optional[str]) -> Dict[str, float]:
+    """Weights from "distance=0.6,price=0.4", unnamed ones keeping their defaults"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in (text or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() in weights and value.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    """Set bits of each uint32 mask"""
+    return np.unpackbits(masks.astype(np.uint32).view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+
+
+class SpotColumns(NamedTuple):
+    lats: np.ndarray
+    lngs: np.ndarray
+    prices: np.ndarray
+    available: np.ndarray
+    feature_masks: np.ndarray
+
+
+class Ranking(NamedTuple):
+    spots: List[Dict[str, Any]]
+    matched: int
+    considered: int
+
+
+class SpotRanker:
+    """Masks and scores every candidate in one NumPy pass and keeps the top k"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 vocabulary: FeatureVocabulary = feature_vocabulary):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_env(cls) -> "SpotRanker":
+        return cls(weights=parse_weights(os.getenv("RANK_WEIGHTS")))
+
+    def columns(self, spots: Sequence[Dict[str, Any]]) -> SpotColumns:
+        """Arrays of the fields ranking reads, NaN where a number is missing or invalid"""
+        count = len(spots)
+        lats, lngs = poi_coordinates(spots)
+        prices = number_column(spots, "price")
+        available = np.fromiter((s.get("available", True) is not False for s in spots), dtype=bool, count=count)
+        # Spots share a handful of feature lists, which the vocabulary resolves once each
+        feature_masks = self.vocabulary.masks([s.get("features") or () for s in spots])
+        return SpotColumns(lats, lngs, prices, available, feature_masks)
+
+    def feature_masks(self, filters: Dict[str, Any]) -> Tuple[int, int]:
+        """(required, excluded) feature bitmasks, as mapped by the workflow or named by /api/search"""
+        if filters.get("feature_mask") is not None:
+            return int(filters["feature_mask"]), int(filters.get("excluded_mask") or 0)
+        match = self.vocabulary.match(filters.get("features") or filters.get("required_features") or [])
+        excluded = match.excluded | self.vocabulary.match(filters.get("excluded_features") or []).mask
+        return match.mask & ~excluded, excluded
+
+    def required_mask(self, filters: Dict[str, Any]) -> int:
+        """Feature bitmask the filters ask for"""
+        return self.feature_masks(filters)[0]
+
+    def score(self, columns: SpotColumns, filters: Dict[str, Any], require_all_features: bool = True):
+        """(match mask, score, distances in meters or None) of every candidate"""
+        count = len(columns.lats)
+        matches = np.ones(count, dtype=bool)
+        score = np.zeros(count, dtype=np.float64)
+
+        distances = None
+        if filters.get("lat") is not None and filters.get("lng") is not None:
+            radius = float(filters.get("radius") or DEFAULT_RADIUS_M)
+            distances = haversine_m_array(float(filters["lat"]), float(filters["lng"]), columns.lats, columns.lngs)
+            # NaN distances (spots without coordinates) fail the comparison and drop out
+            matches &= distances <= radius
+            score += self.weights["distance"] * (1.0 - np.clip(distances / radius, 0.0, 1.0))
+
+        if filters.get("available"):
+            matches &= columns.available
+
+        max_price, min_price = _number(filters.get("max_price")), _number(filters.get("min_price"))
+        if not np.isnan(max_price):
+            matches &= columns.prices <= max_price
+        if not np.isnan(min_price):
+            matches &= columns.prices >= min_price
+        # Cheaper is better, relative to the cap or else to the dearest matching spot
+        cap = max_price
+        if np.isnan(cap):
+            priced = columns.prices[matches & ~np.isnan(columns.prices)]
+            cap = float(priced.max()) if priced.size else np.nan
+        if not np.isnan(cap) and cap > 0:
+            price_score = 1.0 - np.clip(columns.prices / cap, 0.0, 1.0)
+            score += self.weights["price"] * np.nan_to_num(price_score, nan=0.0)
+
+        required, excluded = self.feature_masks(filters)
+        if excluded:
+            matches &= (columns.feature_masks & np.uint32(excluded)) == 0
+        if required:
+            shared = _popcount(columns.feature_masks & np.uint32(required))
+            wanted = bin(required).count("1")
+            if require_all_features:
+                matches &= shared == wanted
+            else:
+                matches &= shared > 0
+            score += self.weights["features"] * (shared / wanted)
+
+        return matches, score, distances
+
+    def select(self, columns: SpotColumns, filters: Dict[str, Any], top_k: int = 20,
+               require_all_features: bool = True) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], int]:
+        """(positions of the best top_k matches in order, scores, distances or None, number of matches)"""
+        matches, score, distances = self.score(columns, filters, require_all_features)
+
+        candidates = np.flatnonzero(matches)
+        if top_k and candidates.size > top_k:
+            # Partial selection of the top k, then a full sort of just those
+            candidates = candidates[np.argpartition(-score[candidates], top_k - 1)[:top_k]]
+        # Best score first; ties go to the closer, then the cheaper spot
+        closeness = distances[candidates] if distances is not None else np.zeros(candidates.size)
+        order = np.lexsort((np.nan_to_num(columns.prices[candidates], nan=np.inf), closeness, -score[candidates]))
+        return candidates[order], score, distances, int(matches.sum())
+
+    def rank(self, spots: Sequence[Dict[str, Any]], filters: Dict[str, Any], top_k: int = 20,
+             require_all_features: bool = True) -> Ranking:
+        """The best top_k spots matching the filters, best first, with their distance and score"""
+        if not spots:
+            return Ranking([], 0, 0)
+        positions, score, distances, matched = self.select(self.columns(spots), filters, top_k, require_all_features)
+        return Ranking(ranked_spots(spots, positions, score, distances), matched, len(spots))
+
+
+def ranked_spots(spots: Sequence[Dict[str, Any]], positions: np.ndarray, score: np.ndarray,
+                 distances: Optional[np.ndarray], rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Copies of the spots at positions with their score and distance, rows mapping positions to spots"""
+    ranked = []
+    for position in positions:
+        spot = dict(spots[rows[position] if rows is not None else position])
+        spot["score"] = round(float(score[position]), 4)
+        if distances is not None:
+            spot["distance_m"] = round(float(distances[position]), 1)
+        ranked.append(spot)
+    return ranked
@@ -0,0 +1,307 @@
+"""Traffic Recorder - Opt-in capture of requests, prompts, raw completions and stage timings to rotating gzip NDJSON
+
+Each line is one request:
+    {"id", "ts", "method", "path", "request", "status", "latency_ms", "response",
+     "calls": [{"prompt", "system_prompt", "response", "error", "latency_ms"}], "stages": {name: ms}}
+src/scripts/replay_traffic.py feeds these back through the app or SearchWorkflow.
+"""
+
+import os
+import glob
+import atexit
+import gzip
+import json
+import time
+import uuid
+import zlib
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Sequence
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FILE_PREFIX = "traffic"
+# SearchWorkflow.process_search is recorded under this pseudo path
+WORKFLOW_PATH = "workflow:search"
+DEFAULT_PATHS = ("/api/search", "/api/vibe/analyze", WORKFLOW_PATH)
+
+
+class Recording:
+    """Everything captured while serving one request"""
+
+    def __init__(self, method: str, path: str, request: Any = None):
+        self.id = uuid.uuid4().hex
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        self.method = method
+        self.path = path
+        self.request = request
+        self.status: Optional[int] = None
+        self.response: Any = None
+        self.calls: List[Dict[str, Any]] = []
+        self.stages: Dict[str, float] = {}
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add_call(self, call: Dict[str, Any]):
+        # Background work started by the request (vibe refinement) may finish after it was written
+        with self._lock:
+            if not self.closed:
+                self.calls.append(call)
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            if not self.closed:
+                self.stages[name] = round(self.stages.get(name, 0.0) + seconds * 1000, 3)
+
+    def close(self) -> Dict[str, Any]:
+        with self._lock:
+            self.closed = True
+            return {
+                "id": self.id,
+                "ts": self.ts,
+                "method": self.method,
+                "path": self.path,
+                "request": self.request,
+                "status": self.status,
+                "latency_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "response": self.response,
+                "calls": self.calls,
+                "stages": self.stages,
+            }
+
+
+current_recording: contextvars.ContextVar = contextvars.ContextVar("current_recording", default=None)
+
+
+def get_recording() -> Optional[Recording]:
+    return current_recording.get()
+
+
+def record_call(prompt: str, system_prompt: Optional[str], response: Optional[str], seconds: float,
+                error: Optional[str] = None):
+    """Add a provider completion to the request being recorded, if any"""
+    recording = current_recording.get()
+    if recording is not None:
+        recording.add_call({
+            "prompt": prompt,
+            "system_prompt": system_prompt,
+            "response": response,
+            "error": error,
+            "latency_ms": round(seconds * 1000, 3),
+        })
+
+
+def record_stage(name: str, seconds: float):
+    """Add time spent in a named stage to the request being recorded, if any"""
+    recording = current_recording.get()
+    if recording is not None:
+        recording.add_stage(name, seconds)
+
+
+def _decode(body: bytes) -> Any:
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", "replace")
+
+
+class RotatingNdjsonWriter:
+    """Appends lines to gzip files, starting a new file past max_bytes and keeping the newest max_files"""
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_files: int = 20,
+                 prefix: str = FILE_PREFIX):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.prefix = prefix
+        self._file = None
+        self._written = 0
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self._sequence += 1
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}.ndjson.gz"
+        self._file = gzip.open(os.path.join(self.directory, name), "wb")
+        self._written = 0
+        files = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}-*.ndjson.gz")), key=os.path.getmtime)
+        for old in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def write(self, line: bytes):
+        if self._file is None or self._written >= self.max_bytes:
+            self.close()
+            self._open()
+        self._file.write(line)
+        self._written += len(line)
+
+    def flush(self):
+        # A sync flush keeps everything written so far readable while the file is still open
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TrafficRecorder:
+    """Queues finished recordings for a writer thread so requests never wait on disk or compression"""
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_files: int = 20,
+                 sample_rate: float = 1.0, paths: Sequence[str] = DEFAULT_PATHS, queue_size: int = 1000):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.paths = set(paths)
+        self.writer = RotatingNdjsonWriter(directory, max_bytes=max_bytes, max_files=max_files)
+        self.recorded = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        """Recorder writing to TRAFFIC_RECORD_DIR, or None when recording is off"""
+        directory = os.getenv("TRAFFIC_RECORD_DIR")
+        if not directory:
+            return None
+        paths = [p.strip() for p in os.getenv("TRAFFIC_RECORD_PATHS", ",".join(DEFAULT_PATHS)).split(",") if p.strip()]
+        recorder = cls(
+            directory,
+            max_bytes=int(float(os.getenv("TRAFFIC_RECORD_MAX_MB", "64")) * 1024 * 1024),
+            max_files=int(os.getenv("TRAFFIC_RECORD_MAX_FILES", "20")),
+            sample_rate=float(os.getenv("TRAFFIC_RECORD_SAMPLE", "1.0")),
+            paths=paths,
+        )
+        atexit.register(recorder.close)
+        logger.info("Recording traffic for %s to %s", ", ".join(paths), directory)
+        return recorder
+
+    def wants(self, path: str) -> bool:
+        return path in self.paths and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    @contextmanager
+    def recording(self, method: str, path: str, request: Any = None) -> Iterator[Recording]:
+        """Capture the block as one request; nested scopes add to the outer recording"""
+        outer = current_recording.get()
+        if outer is not None:
+            yield outer
+            return
+        recording = Recording(method, path, request)
+        token = current_recording.set(recording)
+        try:
+            yield recording
+        finally:
+            current_recording.reset(token)
+            self.submit(recording.close())
+
+    def submit(self, record: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("traffic_records_dropped_total")
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self.writer.write(json.dumps(record, default=str, separators=(",", ":")).encode("utf-8") + b"\n")
+                self.recorded += 1
+                metrics.increment("traffic_records_total")
+                if self._queue.empty():
+                    self.writer.flush()
+            except Exception as e:
+                logger.warning("Could not write traffic record: %s", e)
+        self.writer.close()
+
+    def close(self):
+        """Write what is queued and close the current file"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+
+
+_shared: Dict[str, Optional[TrafficRecorder]] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_recorder() -> Optional[TrafficRecorder]:
+    """The process-wide recorder configured by TRAFFIC_RECORD_DIR, created on first use"""
+    with _shared_lock:
+        if "recorder" not in _shared:
+            _shared["recorder"] = TrafficRecorder.from_env()
+        return _shared["recorder"]
+
+
+class TrafficRecorderMiddleware:
+    """ASGI middleware recording the body, status and response of requests to the recorder's paths"""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.recorder.wants(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        request_body: List[bytes] = []
+        response_body: List[bytes] = []
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.append(message.get("body", b""))
+            return message
+
+        with self.recorder.recording(scope["method"], scope["path"]) as recording:
+            async def capture_send(message):
+                if message["type"] == "http.response.start":
+                    recording.status = message["status"]
+                elif message["type"] == "http.response.body":
+                    response_body.append(message.get("body", b""))
+                await send(message)
+
+            try:
+                await self.app(scope, capture_receive, capture_send)
+            finally:
+                recording.request = _decode(b"".join(request_body))
+                recording.response = _decode(b"".join(response_body))
+
+
+def traffic_files(paths: Iterable[str]) -> List[str]:
+    """Recording files named by paths, with directories expanded, oldest first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, f"{FILE_PREFIX}-*.ndjson.gz")), key=os.path.getmtime))
+        else:
+            files.append(path)
+    return files
+
+
+def read_traffic(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Records from recording files, tolerating the unfinished end of a file still being written"""
+    for path in traffic_files(paths):
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        yield json.loads(line)
+        except (EOFError, zlib.error):
+            logger.info("Stopped at the unfinished end of %s", path)
@@ -0,0 +1,24 @@
+"""Responses - JSON responses that skip FastAPI's second validation and encoding pass"""
+
+from typing import Optional, Set
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:
+    orjson = None
+    ORJSONResponse = None
+
+# Response class for routes that return plain dicts
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def json_response(model: BaseModel, status_code: int = 200, exclude: Optional[Set[str]] = None) -> Response:
+    """Serialize an already validated model straight to JSON bytes"""
+    # Returning a Response makes FastAPI skip response_model validation and jsonable_encoder,
+    # while response_model still documents the route. pydantic's Rust serializer beats
+    # model_dump() followed by orjson for models (see src/scripts/bench_serialization.py)
+    return Response(model.model_dump_json(exclude=exclude), status_code=status_code, media_type="application/json")
@@ -31,6 +31,10 @@ class SearchFilters(BaseModel):
     max_price: Optional[float] = Field(None, description="Maximum price filter")
     min_price: Optional[float] = Field(None, description="Minimum price filter")
     features: Optional[List[str]] = Field(default_factory=list, description="Required features")
+    feature_mask: int = Field(0, description="Required features as bits in CANONICAL_FEATURES order")
+    excluded_features: List[str] = Field(default_factory=list, description="Features the spot must not have")
+    excluded_mask: int = Field(0, description="Excluded features as bits in CANONICAL_FEATURES order")
+    unrecognized_features: List[str] = Field(default_factory=list, description="Requested features not filtered on")
     available: Optional[bool] = Field(True, description="Only show available spots")
     start_time: Optional[str] = Field(None, description="ISO format start time")
     end_time: Optional[str] = Field(None, description="ISO format end time")
@@ -56,6 +60,10 @@ class ParsedSearchResponse(BaseModel):
     entities: ExtractedEntities = Field(..., description="Extracted entities")
     filters: SearchFilters = Field(..., description="Generated search filters")
     explanation: Optional[str] = Field(None, description="Explanation of parsing")
+    degraded_stages: List[str] = Field(
+        default_factory=list,
+        description="Workflow stages that exceeded their latency budget and used a fallback"
+    )
     error: Optional[str] = Field(None, description="Error message if parsing failed")
 
 class HealthResponse(BaseModel):
@@ -0,0 +1,83 @@
+"""Bench Availability - Time-window availability checks of the booking index against a linear scan
+
+Usage:
+    python -m src.scripts.bench_availability [--sizes 1000,10000,100000,1000000] [--spots 5000] [--queries 20]
+
+For each number of bookings, spread over --spots spots in a 30-day calendar:
+    load     building the index from booking dicts
+    query    one batch window check of every spot
+    scan     the same check looping over each spot's bookings in Python
+    update   one add plus one remove, including amortized compactions
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from src.availability.booking_index import BookingIndex
+
+START = 1772409600  # 2026-03-02T00:00:00Z
+SLOT = 900
+
+
+def make_bookings(count: int, spots: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    starts = START + rng.integers(0, 30 * 96, count) * SLOT
+    ends = starts + rng.integers(1, 16, count) * SLOT
+    spot_ids = rng.integers(0, spots, count)
+    return [{"id": f"b{i}", "spot_id": f"s{spot}", "start": int(start), "end": int(end)}
+            for i, (spot, start, end) in enumerate(zip(spot_ids.tolist(), starts.tolist(), ends.tolist()))]
+
+
+def linear_free(by_spot, spot_ids, start: int, end: int):
+    """Whether each spot is free, checking each of its bookings in turn"""
+    return np.array([not any(s < end and e > start for s, e in by_spot.get(spot_id, ())) for spot_id in spot_ids])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark time-window availability queries")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--spots", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    spot_ids = [f"s{i}" for i in range(args.spots)]
+    rng = np.random.default_rng(2)
+    windows = [(START + int(slot) * SLOT, START + int(slot) * SLOT + 2 * 3600)
+               for slot in rng.integers(0, 30 * 96, args.queries)]
+
+    print(f"{'bookings':>10}{'load ms':>10}{'query ms':>10}{'scan ms':>10}{'speedup':>9}{'update us':>11}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        bookings = make_bookings(size, args.spots)
+        index = BookingIndex()
+        started = time.perf_counter()
+        index.load(bookings)
+        load_ms = (time.perf_counter() - started) * 1e3
+
+        started = time.perf_counter()
+        answers = [index.free(spot_ids, start, end) for start, end in windows]
+        query_ms = (time.perf_counter() - started) * 1e3 / len(windows)
+
+        by_spot = {}
+        for b in bookings:
+            by_spot.setdefault(b["spot_id"], []).append((b["start"], b["end"]))
+        started = time.perf_counter()
+        expected = [linear_free(by_spot, spot_ids, start, end) for start, end in windows]
+        scan_ms = (time.perf_counter() - started) * 1e3 / len(windows)
+        assert all((a == e).all() for a, e in zip(answers, expected))
+
+        updates = make_bookings(10000, args.spots, seed=3)
+        started = time.perf_counter()
+        for b in updates:
+            index.add(dict(b, id=f"new-{b['id']}"))
+            index.remove(b["id"])
+        update_us = (time.perf_counter() - started) * 1e6 / len(updates)
+
+        print(f"{size:>10}{load_ms:>10.1f}{query_ms:>10.2f}{scan_ms:>10.2f}{scan_ms / query_ms:>8.0f}x{update_us:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
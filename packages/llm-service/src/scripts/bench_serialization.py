@@ -0,0 +1,132 @@
+"""Bench Serialization - Per-request CPU of the response path before and after the direct JSON responses
+
+Usage:
+    python -m src.scripts.bench_serialization [--requests 20000]
+
+Compares, for typical search and vibe payloads:
+    serialize   building the response body from a validated model
+    asgi        a full request through a minimal FastAPI app, called in-process
+The "before" variants return the model and let FastAPI validate it against
+response_model, run jsonable_encoder and render with the stdlib encoder.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.responses import DefaultResponse, json_response
+
+os.environ.setdefault("LLM_MODE", "none")
+from app import SearchResponse, VibeResponse  # noqa: E402
+
+SEARCH = {
+    "success": True,
+    "query": "covered parking near Taipei 101 under $5 tomorrow morning",
+    "intent": {"type": "parking_search", "confidence": 0.93},
+    "entities": {"location": "Taipei 101", "price_range": "cheap", "features": ["covered"],
+                 "time_expressions": ["tomorrow morning"]},
+    "filters": {"max_price": 5, "required_features": ["covered"], "radius": 500},
+    "response": "",
+    "mode": "api",
+}
+
+VIBE = {
+    "success": True,
+    "vibe": {"score": 8, "summary": "Dining area with about 40 nearby places",
+             "hashtags": ["#foodie", "#nightlife", "#shopping"]},
+    "parking": {"difficulty": 7, "level": "Hard", "tips": ["Book a garage in advance", "Consider public transport"],
+                "hashtags": ["#hard-parking", "#garage-nearby"]},
+    "transport": [{"method": "Public", "reason": "Transit stops close by"},
+                  {"method": "Walk", "reason": "Dense area where parking is scarce"}],
+    "mode": "api",
+}
+
+
+def cpu_per_call(fn, n: int) -> float:
+    """Microseconds of process CPU per call"""
+    for _ in range(min(n, 500)):
+        fn()
+    started = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - started) / n * 1e6
+
+
+def bench_serialize(model_class, payload, n: int):
+    field = create_response_field(name=f"Response_{model_class.__name__}", type_=model_class)
+    loop = asyncio.new_event_loop()
+
+    def before():
+        model = model_class(**payload)
+        content = loop.run_until_complete(serialize_response(field=field, response_content=model))
+        return JSONResponse(content).body
+
+    def after():
+        return json_response(model_class(**payload)).body
+
+    assert json.loads(before()) == json.loads(after())
+    result = cpu_per_call(before, n), cpu_per_call(after, n)
+    loop.close()
+    return result
+
+
+def build_apps(model_class, payload):
+    slow = FastAPI(default_response_class=JSONResponse)
+    fast = FastAPI(default_response_class=DefaultResponse)
+
+    @slow.post("/", response_model=model_class)
+    async def slow_route():
+        return model_class(**payload)
+
+    @fast.post("/", response_model=model_class)
+    async def fast_route():
+        return json_response(model_class(**payload))
+
+    return slow, fast
+
+
+def asgi_caller(app, loop):
+    """Run one POST / through the ASGI app without a server or HTTP client"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    return lambda: loop.run_until_complete(app(scope, receive, send))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the response serialization path")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    print(f"{'route':<8}{'stage':<12}{'before us':>12}{'after us':>12}{'saved':>9}")
+    for name, model_class, payload in (("search", SearchResponse, SEARCH), ("vibe", VibeResponse, VIBE)):
+        rows = [("serialize", *bench_serialize(model_class, payload, args.requests))]
+        slow, fast = build_apps(model_class, payload)
+        n = max(1, args.requests // 4)
+        rows.append(("asgi", cpu_per_call(asgi_caller(slow, loop), n), cpu_per_call(asgi_caller(fast, loop), n)))
+        for stage, before, after in rows:
+            print(f"{name:<8}{stage:<12}{before:>12.1f}{after:>12.1f}{(1 - after / before) * 100:>8.0f}%")
+    loop.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Evaluate Prompts - Compares prompt and model variants for field accuracy, latency and token counts
+
+Usage:
+    python -m src.scripts.evaluate_prompts [--variants variants.json] [--targets search,intent,entities]
+                                           [--provider api|replay|keyword] [--recordings recordings/]
+                                           [--corpus src/data/eval_queries.jsonl] [--concurrency 1]
+                                           [--tolerance 0.02] [--misses] [--output report.json]
+
+Without --variants the shipped prompts of each target are evaluated. A variants
+file is a JSON list such as
+    [{"name": "search:short", "target": "search", "prompt_file": "search_short.txt", "model": "gpt-4o-mini"}]
+where prompts are format strings with a {query} field (literal braces doubled) and
+missing prompts keep the shipped ones. Name the reference variant of a target
+"<target>:baseline" to hold the others to its accuracy.
+
+Providers:
+    api       OpenAI-compatible endpoint from the API_* settings, one client per variant model
+    replay    completions recorded with TRAFFIC_RECORD_DIR; unrecorded prompts count as errors
+    keyword   the rule-based extractor and local intent model, which ignore the prompt
+
+The report is JSON with sorted keys, so two runs can be compared with diff.
+"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, Optional
+
+from src.config import config
+from src.evaluation.prompt_eval import (
+    DEFAULT_CORPUS, TARGETS, KeywordStandIn, default_variants, evaluate, load_corpus, load_variants
+)
+
+
+def provider_factory(args):
+    """Function returning the provider for a variant's model"""
+    if args.provider == "keyword":
+        from src.nlp.intent_classifier import load_intent_classifier
+        stand_in = KeywordStandIn(load_intent_classifier(config.INTENT_CLASSIFIER_PATH))
+        return lambda model: stand_in
+
+    if args.provider == "replay":
+        from llm_providers.replay_provider import ReplayProvider
+        from src.replay.recorder import read_traffic
+        if not args.recordings:
+            raise SystemExit("--provider replay needs --recordings")
+        replay = ReplayProvider(read_traffic(args.recordings), latency=args.latency)
+        return lambda model: replay
+
+    from llm_providers.api_provider import OpenAICompatibleProvider
+    providers: Dict[Optional[str], Any] = {}
+
+    def provider_for(model: Optional[str]):
+        if model not in providers:
+            providers[model] = OpenAICompatibleProvider(model=model)
+        return providers[model]
+
+    return provider_for
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate prompt and model variants on a labelled query corpus")
+    parser.add_argument("--variants", help="JSON list of variants (default: the shipped prompts)")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Targets to evaluate, comma-separated")
+    parser.add_argument("--provider", choices=["api", "replay", "keyword"], default="api")
+    parser.add_argument("--recordings", nargs="*", default=[], help="Recording files or directories for --provider replay")
+    parser.add_argument("--latency", choices=["recorded", "instant"], default="recorded",
+                        help="Replayed completion latency")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--limit", type=int, default=0, help="Evaluate at most this many queries (0 = all)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Accuracy a recommended variant may lose against the baseline")
+    parser.add_argument("--misses", action="store_true", help="List every wrong field per variant")
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+    variants = load_variants(args.variants) if args.variants else default_variants(targets)
+    variants = [variant for variant in variants if variant.target in targets]
+
+    corpus = load_corpus(args.corpus)
+    if args.limit:
+        corpus = corpus[:args.limit]
+
+    report = evaluate(variants, provider_factory(args), corpus, concurrency=args.concurrency,
+                      tolerance=args.tolerance, keep_misses=args.misses)
+    report["provider"] = args.provider
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
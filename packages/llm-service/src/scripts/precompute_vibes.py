@@ -0,0 +1,247 @@
+"""Precompute Vibes - Builds the vibe tile store for an area from a POI dump
+
+Usage:
+    python -m src.scripts.precompute_vibes --city taipei --pois pois.geojson --output vibes.tiles
+    python -m src.scripts.precompute_vibes --bbox 25.02,121.50,25.06,121.57 --pois pois.ndjson \
+        --output vibes.tiles --resolution 250 --batch-size 32
+
+Runs are resumable and incremental. Finished tiles are appended to
+<output>.partial as they complete, so an interrupted run picks up where it
+stopped. Tiles already in the store are only regenerated when their nearby
+POIs have changed (or with --force).
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple, Iterator
+
+from src.geo.distance import haversine_m
+from src.prompts import VIBE_PROMPT, VIBE_SYSTEM_PROMPT, extract_json
+from src.vibe.poi_summarizer import PoiSummarizer
+from src.vibe.tile_store import TileStoreReader, write_tile_store, tile_key, tile_center, tile_size_degrees
+
+logger = logging.getLogger(__name__)
+
+# south, west, north, east
+CITY_BBOXES = {
+    "taipei": (24.96, 121.45, 25.21, 121.67),
+    "san-francisco": (37.70, -122.52, 37.83, -122.35),
+}
+
+# OpenStreetMap tags that name a POI's type, in order of preference
+POI_TYPE_TAGS = ("type", "category", "amenity", "shop", "tourism", "leisure", "public_transport", "railway")
+
+
+def _poi_from_properties(properties: Dict[str, Any], lat: float, lng: float) -> Dict[str, Any]:
+    poi_type = next((properties[tag] for tag in POI_TYPE_TAGS if properties.get(tag)), "place")
+    return {"name": properties.get("name") or "Unknown", "type": poi_type, "lat": float(lat), "lng": float(lng)}
+
+
+def load_pois(path: str) -> List[Dict[str, Any]]:
+    """Read POIs from GeoJSON, a JSON array or NDJSON with name/type/lat/lng"""
+    with open(path) as f:
+        text = f.read()
+
+    try:
+        data = json.loads(text)
+        rows = data.get("features", []) if isinstance(data, dict) else data
+    except ValueError:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    pois = []
+    for row in rows:
+        if row.get("type") == "Feature":
+            geometry = row.get("geometry") or {}
+            if geometry.get("type") != "Point":
+                continue
+            lng, lat = geometry["coordinates"][:2]
+            pois.append(_poi_from_properties(row.get("properties") or {}, lat, lng))
+        elif "lat" in row and ("lng" in row or "lon" in row):
+            pois.append(_poi_from_properties(row, row["lat"], row.get("lng", row.get("lon"))))
+    return pois
+
+
+def iter_tiles(bbox: Tuple[float, float, float, float], resolution_m: float) -> Iterator[int]:
+    south, west, north, east = bbox
+    first, last = tile_key(south, west, resolution_m), tile_key(north, east, resolution_m)
+    for row in range(first >> 32, (last >> 32) + 1):
+        for col in range(first & 0xFFFFFFFF, (last & 0xFFFFFFFF) + 1):
+            yield (row << 32) | col
+
+
+class PoiIndex:
+    """POIs bucketed by tile so each tile's neighbourhood is found without a full scan"""
+
+    def __init__(self, pois: List[Dict[str, Any]], resolution_m: float):
+        self.resolution_m = resolution_m
+        self.buckets: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for poi in pois:
+            self.buckets[tile_key(poi["lat"], poi["lng"], resolution_m)].append(poi)
+
+    def near(self, lat: float, lng: float, radius_m: float, limit: int = 10) -> List[Dict[str, Any]]:
+        # Tiles are square in degrees, so they narrow in meters away from the equator
+        row_reach = int(math.ceil(radius_m / self.resolution_m))
+        col_reach = int(math.ceil(radius_m / (self.resolution_m * max(math.cos(math.radians(lat)), 0.01))))
+        center = tile_key(lat, lng, self.resolution_m)
+        row, col = center >> 32, center & 0xFFFFFFFF
+        found = []
+        for r in range(row - row_reach, row + row_reach + 1):
+            for c in range(col - col_reach, col + col_reach + 1):
+                for poi in self.buckets.get((r << 32) | c, ()):
+                    distance = haversine_m(lat, lng, poi["lat"], poi["lng"])
+                    if distance <= radius_m:
+                        found.append((distance, poi))
+        found.sort(key=lambda item: item[0])
+        return [poi for _, poi in found[:limit]]
+
+
+def poi_hash(pois: List[Dict[str, Any]]) -> int:
+    """Changes whenever the POIs that feed a tile's prompt change"""
+    return zlib.crc32(json.dumps([(p["name"], p["type"]) for p in pois]).encode("utf-8"))
+
+
+def load_done(output: str, partial: str, resolution_m: float) -> Dict[int, Dict[str, Any]]:
+    """Tiles finished by earlier runs: the existing store overlaid with the partial log"""
+    done = {}
+    if os.path.exists(output):
+        reader = TileStoreReader(output)
+        if reader.resolution_m != resolution_m:
+            raise SystemExit(f"{output} was built at {reader.resolution_m}m; "
+                             f"use --resolution {reader.resolution_m:g} or a new --output")
+        done.update((tile["key"], tile) for tile in reader)
+    if os.path.exists(partial):
+        with open(partial) as f:
+            for line in f:
+                try:
+                    tile = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                done[tile["key"]] = tile
+    return done
+
+
+def generate_batch(provider: Any, prompts: List[str], concurrency: int) -> List[str]:
+    """Run one batch through the provider, natively batched when supported"""
+    if hasattr(provider, "batch_generate_structured"):
+        return provider.batch_generate_structured(prompts, system_prompt=VIBE_SYSTEM_PROMPT)
+
+    def one(prompt: str) -> str:
+        try:
+            return provider.generate_structured(prompt, system_prompt=VIBE_SYSTEM_PROMPT)
+        except Exception as e:
+            logger.warning(f"Tile generation failed: {e}")
+            return ""
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, prompts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute vibe analyses into a tile store")
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument("--bbox", help="south,west,north,east")
+    area.add_argument("--city", choices=sorted(CITY_BBOXES))
+    parser.add_argument("--pois", required=True, help="POI dump (GeoJSON, JSON array or NDJSON)")
+    parser.add_argument("--output", required=True, help="Tile store file to create or update")
+    parser.add_argument("--resolution", type=float, default=250.0, help="Tile size in meters")
+    parser.add_argument("--radius", type=float, default=500.0, help="POI search radius around each tile center")
+    parser.add_argument("--min-pois", type=int, default=1, help="Skip tiles with fewer nearby POIs")
+    parser.add_argument("--max-pois", type=int, default=10,
+                        help="Nearest POIs summarized into each tile's prompt (changing it regenerates tiles)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel calls for providers without batching")
+    parser.add_argument("--mode", choices=["api", "vllm"], help="Provider mode (default: LLM_MODE)")
+    parser.add_argument("--limit", type=int, help="Generate at most this many tiles")
+    parser.add_argument("--force", action="store_true", help="Regenerate tiles even if their POIs are unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many tiles would be generated")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    bbox = tuple(float(v) for v in args.bbox.split(",")) if args.bbox else CITY_BBOXES[args.city]
+    partial = f"{args.output}.partial"
+    done = load_done(args.output, partial, args.resolution)
+
+    index = PoiIndex(load_pois(args.pois), args.resolution)
+    pending = []
+    skipped = unchanged = 0
+    for key in iter_tiles(bbox, args.resolution):
+        lat, lng = tile_center(key, args.resolution)
+        pois = index.near(lat, lng, args.radius, limit=args.max_pois)
+        if len(pois) < args.min_pois:
+            skipped += 1
+            continue
+        digest = poi_hash(pois)
+        if not args.force and key in done and done[key].get("poi_hash") == digest:
+            unchanged += 1
+            continue
+        pending.append((key, lat, lng, pois, digest))
+
+    if args.limit is not None:
+        pending = pending[:args.limit]
+    print(f"{len(pending)} tiles to generate, {unchanged} unchanged, {skipped} without POIs "
+          f"({tile_size_degrees(args.resolution) * 111320:.0f}m tiles)")
+    if args.dry_run:
+        return 0
+
+    generated = failed = 0
+    if pending:
+        from llm_providers.registry import build_provider
+        provider, mode = build_provider(args.mode)
+        print(f"Generating with {mode} provider")
+        summarizer = PoiSummarizer.from_env()
+
+        started = time.time()
+        with open(partial, "a") as log:
+            for start in range(0, len(pending), args.batch_size):
+                batch = pending[start:start + args.batch_size]
+                prompts = [
+                    VIBE_PROMPT.format(lat=round(lat, 5), lng=round(lng, 5),
+                                       pois=summarizer.format(pois, lat, lng, route="precompute"))
+                    for _, lat, lng, pois, _ in batch
+                ]
+                for (key, lat, lng, pois, digest), text in zip(batch, generate_batch(provider, prompts, args.concurrency)):
+                    result = extract_json(text or "")
+                    if not result.get("vibe") or not result.get("parking"):
+                        # Left out of the log so the next run retries it
+                        failed += 1
+                        continue
+                    tile = {
+                        "key": key,
+                        "lat": lat,
+                        "lng": lng,
+                        "poi_count": len(pois),
+                        "poi_hash": digest,
+                        "generated_at": int(time.time()),
+                        "vibe": result["vibe"],
+                        "parking": result["parking"],
+                        "transport": result.get("transport", []),
+                    }
+                    log.write(json.dumps(tile) + "\n")
+                    done[key] = tile
+                    generated += 1
+                log.flush()
+                os.fsync(log.fileno())
+                elapsed = time.time() - started
+                print(f"  {start + len(batch)}/{len(pending)} tiles ({generated / max(elapsed, 1e-6):.1f} tiles/s)")
+
+    count = write_tile_store(args.output, done.values(), args.resolution)
+    # Everything in the partial log is in the store now; failed tiles are retried next run
+    if os.path.exists(partial):
+        os.remove(partial)
+    print(f"Wrote {count} tiles to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB); "
+          f"{generated} generated, {failed} failed")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Replay Search Cache - Measures the near-duplicate cache hit rate against a log of past queries
+
+Usage:
+    python -m src.scripts.replay_search_cache queries.jsonl [--threshold 0.75] [--max-entries 2048]
+
+Each line is either a JSON object with a "query" field (optionally nested under
+"request") or a plain query string. The keyword extractor stands in for the
+real parse, so reused results that would differ from a fresh parse are counted
+as wrong reuses.
+"""
+
+import re
+import sys
+import json
+import argparse
+
+from src.cache.similarity_cache import SimilarityCache
+from src.nlp.keyword_entities import extract_keyword_entities
+
+
+def read_queries(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line
+                continue
+            if isinstance(record, str):
+                yield record
+            elif isinstance(record, dict):
+                query = record.get("query") or (record.get("request") or {}).get("query")
+                if query:
+                    yield query
+
+
+def comparable(entities):
+    """Entities with spacing differences in the location ignored"""
+    entities = dict(entities)
+    if entities.get("location"):
+        entities["location"] = re.sub(r"[^a-z0-9]+", "", entities["location"].lower())
+    return entities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a query log through the similarity cache")
+    parser.add_argument("log", help="JSONL or plain-text query log")
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--max-entries", type=int, default=2048)
+    args = parser.parse_args(argv)
+
+    cache = SimilarityCache(name="replay", max_entries=args.max_entries, threshold=args.threshold,
+                            ttl_seconds=float("inf"))
+    exact = set()
+    total = exact_hits = wrong = 0
+
+    for query in read_queries(args.log):
+        total += 1
+        fresh = extract_keyword_entities(query)
+        if query in exact:
+            exact_hits += 1
+        exact.add(query)
+
+        match = cache.lookup(query)
+        if match is None:
+            cache.put(query, fresh)
+        elif comparable(match.value) != comparable(fresh):
+            wrong += 1
+            print(f"wrong reuse: {query!r} <- {match.matched_query!r}")
+
+    stats = cache.stats()
+    print(json.dumps({
+        "queries": total,
+        "exact_hit_rate": round(exact_hits / total, 4) if total else 0.0,
+        "similarity_hit_rate": stats["hit_rate"],
+        "rejected_candidates": stats["rejected"],
+        "wrong_reuses": wrong,
+        "evictions": stats["evictions"],
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
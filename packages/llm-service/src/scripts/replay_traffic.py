@@ -0,0 +1,163 @@
+"""Replay Traffic - Feeds recorded production traffic back through the app or SearchWorkflow
+
+Usage:
+    python -m src.scripts.replay_traffic recordings/ [--target app|workflow] [--latency recorded|instant]
+                                         [--concurrency 8] [--limit N] [--no-caches]
+
+Recordings are the traffic-*.ndjson.gz files written while TRAFFIC_RECORD_DIR is set.
+Every LLM completion is answered from the recording, so a run is deterministic:
+    --latency instant    measures the service's own overhead and throughput
+    --latency recorded   waits as long as each recorded completion took
+Prints throughput, latency percentiles, replay misses (prompts that were never
+recorded, usually because a prompt template changed) and how many responses
+differ from the recorded ones. Fields derived from the clock, such as resolved
+times, differ whenever the recording is replayed on another day.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from llm_providers.replay_provider import ReplayChatModel, ReplayProvider
+from src.replay.recorder import WORKFLOW_PATH, read_traffic
+
+
+def comparable(response: Any) -> Any:
+    """Response without the fields that name the provider rather than describe the answer"""
+    if isinstance(response, dict):
+        return {key: value for key, value in response.items() if key not in ("mode", "original_query")}
+    return response
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "max": round(float(max(values)), 2)}
+
+
+def load_app(replay: ReplayProvider, no_caches: bool):
+    """The FastAPI app with the replay provider installed and nothing recorded"""
+    os.environ.pop("TRAFFIC_RECORD_DIR", None)
+    os.environ["LLM_MODE"] = "none"
+    import app as service
+
+    service.registry.install(replay, "replay")
+    if no_caches:
+        service.search_cache = None
+        service.vibe_cache = None
+        service.vibe_tiles = None
+    return service.app
+
+
+def load_workflow(replay: ReplayProvider, no_caches: bool):
+    """The search workflow with its nodes' chat models answered by the replay provider"""
+    os.environ.pop("TRAFFIC_RECORD_DIR", None)
+    from src.workflows.search_workflow import search_workflow
+
+    search_workflow.query_parser.llm = ReplayChatModel(replay)
+    search_workflow.entity_extractor.llm = ReplayChatModel(replay)
+    if no_caches:
+        search_workflow.result_cache = None
+    return search_workflow
+
+
+async def run(records: List[Dict[str, Any]], send, concurrency: int) -> Tuple[List[Dict[str, Any]], float]:
+    """Per-request results and the wall time of sending every record"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(record):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status, response = await send(record)
+                error = None
+            except Exception as e:
+                status, response, error = None, None, f"{type(e).__name__}: {e}"
+            return {
+                "latency_ms": (time.perf_counter() - started) * 1000,
+                "status": status,
+                "error": error,
+                "matches": comparable(response) == comparable(record.get("response")),
+            }
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(record) for record in records))
+    return results, time.perf_counter() - started
+
+
+async def replay_app(records, replay, concurrency: int, no_caches: bool):
+    import httpx
+
+    app = load_app(replay, no_caches)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        async def send(record):
+            response = await client.request(record["method"], record["path"], json=record.get("request"))
+            return response.status_code, response.json()
+
+        return await run(records, send, concurrency)
+
+
+async def replay_workflow(records, replay, concurrency: int, no_caches: bool):
+    workflow = load_workflow(replay, no_caches)
+
+    async def send(record):
+        request = dict(record["request"])
+        # A conversation's first search keeps its recorded session, so its follow-ups find it
+        if not request.get("session_id") and isinstance(record.get("response"), dict):
+            request["session_id"] = record["response"].get("session_id")
+        response = await workflow.process_search(**request)
+        return 200, response
+
+    return await run(records, send, concurrency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded traffic with recorded completions")
+    parser.add_argument("paths", nargs="+", help="Recording files or directories")
+    parser.add_argument("--target", choices=["app", "workflow"], default="app")
+    parser.add_argument("--latency", choices=["recorded", "instant"], default="instant")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most this many requests (0 = all)")
+    parser.add_argument("--no-caches", action="store_true", help="Disable the response caches and vibe tiles")
+    args = parser.parse_args(argv)
+
+    records = [
+        record for record in read_traffic(args.paths)
+        if (record.get("path") == WORKFLOW_PATH) == (args.target == "workflow")
+    ]
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print(f"No recorded {args.target} requests in {', '.join(args.paths)}", file=sys.stderr)
+        return 1
+
+    replay = ReplayProvider(records, latency=args.latency)
+    target = replay_app if args.target == "app" else replay_workflow
+    results, elapsed = asyncio.run(target(records, replay, args.concurrency, args.no_caches))
+
+    print(json.dumps({
+        "target": args.target,
+        "latency": args.latency,
+        "requests": len(results),
+        "errors": sum(1 for r in results if r["error"] or (r["status"] or 0) >= 400),
+        "mismatched_responses": sum(1 for r in results if not r["matches"]),
+        "replay": replay.stats(),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else None,
+        "latency_ms": percentiles([r["latency_ms"] for r in results]),
+        "recorded_latency_ms": percentiles([record["latency_ms"] for record in records if "latency_ms" in record]),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Train Intent Classifier - Fits the hashed n-gram intent model from a labelled JSONL file
+
+Usage:
+    python -m src.scripts.train_intent_classifier \
+        --data src/data/intent_queries.jsonl --output src/data/intent_classifier.npz
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from src.nlp.intent_classifier import INTENT_LABELS, HashingVectorizer, IntentClassifier
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+def load_examples(path):
+    """Read {"query": ..., "intent": ...} lines"""
+    texts, labels = [], []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row["intent"] not in INTENT_LABELS:
+                raise ValueError(f"{path}:{line_number}: unknown intent {row['intent']!r}")
+            texts.append(row["query"])
+            labels.append(row["intent"])
+    return texts, labels
+
+
+def stratified_split(texts, labels, holdout_fraction, seed):
+    """Hold out the same fraction of every label for calibration"""
+    by_label = defaultdict(list)
+    for i, label in enumerate(labels):
+        by_label[label].append(i)
+
+    rng = np.random.default_rng(seed)
+    train, holdout = [], []
+    for indices in by_label.values():
+        indices = rng.permutation(indices)
+        cut = int(round(len(indices) * holdout_fraction))
+        holdout.extend(indices[:cut])
+        train.extend(indices[cut:])
+
+    pick = lambda idx, seq: [seq[i] for i in idx]
+    return pick(train, texts), pick(train, labels), pick(holdout, texts), pick(holdout, labels)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the local intent classifier")
+    parser.add_argument("--data", default=os.path.join(DATA_DIR, "intent_queries.jsonl"))
+    parser.add_argument("--output", default=os.path.join(DATA_DIR, "intent_classifier.npz"))
+    parser.add_argument("--features", type=int, default=2 ** 14, help="Hashed feature space size")
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--learning-rate", type=float, default=5.0)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for calibration")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    texts, labels = load_examples(args.data)
+    train_texts, train_labels, holdout_texts, holdout_labels = stratified_split(
+        texts, labels, args.holdout, args.seed
+    )
+    print(f"Loaded {len(texts)} examples ({len(train_texts)} train, {len(holdout_texts)} holdout)")
+
+    started = time.perf_counter()
+    classifier = IntentClassifier.fit(
+        train_texts,
+        train_labels,
+        vectorizer=HashingVectorizer(n_features=args.features),
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        l2=args.l2,
+    )
+    print(f"Trained in {time.perf_counter() - started:.1f}s")
+
+    if holdout_texts:
+        before = classifier.evaluate(holdout_texts, holdout_labels)
+        temperature = classifier.calibrate(holdout_texts, holdout_labels)
+        after = classifier.evaluate(holdout_texts, holdout_labels)
+        print(f"Holdout accuracy {after['accuracy']:.3f}, "
+              f"ECE {before['ece']:.3f} -> {after['ece']:.3f} (temperature {temperature:.2f})")
+
+    started = time.perf_counter()
+    for text in texts:
+        classifier.predict(text)
+    per_query_us = (time.perf_counter() - started) / len(texts) * 1e6
+    print(f"Prediction latency: {per_query_us:.0f}us per query")
+
+    classifier.save(args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Tokens - Prompt token counting with tiktoken when installed and a calibrated estimate otherwise"""
+
+import os
+import re
+import math
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and single punctuation marks, roughly how BPE vocabularies split English text
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+class TokenCounter:
+    """Counts prompt tokens exactly with a tiktoken encoding, or estimates them from text pieces"""
+
+    def __init__(self, encoding: Optional[str] = None, chars_per_token: float = 4.0):
+        self.encoding = encoding
+        self.chars_per_token = chars_per_token
+        self._encoder = None
+        self._loaded = not encoding
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TokenCounter":
+        return cls(
+            encoding=os.getenv("TOKENIZER_ENCODING", "o200k_base"),
+            chars_per_token=float(os.getenv("TOKENIZER_CHARS_PER_TOKEN", "4.0")),
+        )
+
+    def _load(self):
+        # tiktoken may fetch the encoding file on first use, so it is loaded lazily
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                import tiktoken
+                self._encoder = tiktoken.get_encoding(self.encoding)
+            except Exception as e:
+                logger.info(f"tiktoken encoding {self.encoding} unavailable, estimating token counts: {e}")
+            self._loaded = True
+
+    @property
+    def exact(self) -> bool:
+        if not self._loaded:
+            self._load()
+        return self._encoder is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.exact:
+            return len(self._encoder.encode(text, disallowed_special=()))
+        # Every piece costs at least a token; longer words split into chunks of about chars_per_token
+        return int(math.ceil(sum(max(1.0, len(piece) / self.chars_per_token) for piece in _PIECE.findall(text))))
+
+    def observe(self, text: str, actual_tokens: int):
+        """Move the estimate toward a token count reported by the provider for text"""
+        if self.exact or not text or actual_tokens <= 0:
+            return
+        with self._lock:
+            estimate = self.count(text)
+            # Scale chars_per_token by the estimate's error, smoothed over many observations
+            ratio = min(2.0, max(0.5, estimate / actual_tokens))
+            self.chars_per_token = min(8.0, max(1.5, self.chars_per_token * (1 + 0.1 * (ratio - 1))))
+
+
+token_counter = TokenCounter.from_env()
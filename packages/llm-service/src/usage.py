@@ -0,0 +1,208 @@
+"""Usage - Token counts, queue and generation time of each completion, per request, per route and rolling"""
+
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Deque, Iterator, NamedTuple, Optional, Tuple, Callable
+
+from src.deadline import get_deadline
+from src.metrics import metrics
+
+
+class Completion(NamedTuple):
+    """One provider completion and what it cost"""
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    # Time spent waiting for a rate limit budget or a busy engine, then producing the answer
+    queue_seconds: float
+    generation_seconds: float
+    model: str
+    # Token counts were estimated because the backend did not report them
+    estimated: bool = False
+
+
+def parse_prices(value: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    """Per-model (prompt, completion) USD prices per million tokens from "gpt-4o-mini=0.15/0.6,..." """
+    prices = {}
+    for item in (value or "").split(","):
+        model, _, price = item.rpartition("=")
+        prompt_price, _, completion_price = price.partition("/")
+        if model.strip() and prompt_price.strip():
+            prices[model.strip()] = (float(prompt_price), float(completion_price or 0))
+    return prices
+
+
+def _cost(prices: Dict[str, Tuple[float, float]], completion: Completion) -> Optional[float]:
+    price = prices.get(completion.model)
+    if price is None:
+        return None
+    return (completion.prompt_tokens * price[0] + completion.completion_tokens * price[1]) / 1_000_000
+
+
+class _Totals:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.queue_seconds = 0.0
+        self.generation_seconds = 0.0
+        self.cost_usd: Optional[float] = None
+        self.estimated = 0
+
+    def add(self, completion: Completion, cost: Optional[float]):
+        self.calls += 1
+        self.prompt_tokens += completion.prompt_tokens
+        self.completion_tokens += completion.completion_tokens
+        self.queue_seconds += completion.queue_seconds
+        self.generation_seconds += completion.generation_seconds
+        self.estimated += int(completion.estimated)
+        if cost is not None:
+            self.cost_usd = (self.cost_usd or 0.0) + cost
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "queue_ms": round(self.queue_seconds * 1000, 1),
+            "generation_ms": round(self.generation_seconds * 1000, 1),
+            # Decode speed while generating, as opposed to tokens over wall time
+            "completion_tokens_per_second": (
+                round(self.completion_tokens / self.generation_seconds, 1) if self.generation_seconds else None
+            ),
+            "cost_usd": round(self.cost_usd, 6) if self.cost_usd is not None else None,
+            "estimated_calls": self.estimated,
+        }
+
+
+class RequestUsage:
+    """Completions made while serving one request"""
+
+    def __init__(self):
+        self.totals = _Totals()
+        self.models: Dict[str, int] = {}
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add(self, completion: Completion, cost: Optional[float]):
+        # A background refinement may outlive the request it was started from
+        with self._lock:
+            if not self.closed:
+                self.totals.add(completion, cost)
+                self.models[completion.model] = self.models.get(completion.model, 0) + 1
+
+    def close(self) -> Dict[str, Any]:
+        with self._lock:
+            self.closed = True
+            return dict(self.totals.as_dict(), models=dict(self.models))
+
+
+current_usage: contextvars.ContextVar = contextvars.ContextVar("current_usage", default=None)
+
+
+@contextmanager
+def usage_scope() -> Iterator[RequestUsage]:
+    """Count the completions made in the block, including those in threads started with its context"""
+    usage = RequestUsage()
+    token = current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        current_usage.reset(token)
+
+
+class UsageStats:
+    """Totals per route and model since startup, plus tokens per second over a rolling window"""
+
+    def __init__(self, window_seconds: float = 60.0, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.prices = prices or {}
+        self.clock = clock
+        self.started = clock()
+        self._routes: Dict[Tuple[str, str], _Totals] = {}
+        self._recent: Deque[Tuple[float, int, int]] = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "UsageStats":
+        return cls(
+            window_seconds=float(os.getenv("USAGE_WINDOW_SECONDS", "60")),
+            prices=parse_prices(os.getenv("USAGE_PRICES")),
+        )
+
+    def _trim(self, now: float):
+        while self._recent and now - self._recent[0][0] > self.window_seconds:
+            self._recent.popleft()
+
+    def record(self, completion: Completion, route: Optional[str] = None):
+        """Count a completion for route (the current request's by default) and the request itself"""
+        if route is None:
+            deadline = get_deadline()
+            route = (deadline.route if deadline is not None else None) or "unknown"
+        cost = _cost(self.prices, completion)
+        now = self.clock()
+        with self._lock:
+            totals = self._routes.get((route, completion.model))
+            if totals is None:
+                totals = self._routes[(route, completion.model)] = _Totals()
+            totals.add(completion, cost)
+            self._recent.append((now, completion.prompt_tokens, completion.completion_tokens))
+            self._trim(now)
+
+        usage = current_usage.get()
+        if usage is not None:
+            usage.add(completion, cost)
+        metrics.increment("llm_tokens_total", completion.prompt_tokens, route=route, kind="prompt")
+        metrics.increment("llm_tokens_total", completion.completion_tokens, route=route, kind="completion")
+        metrics.observe("llm_queue_seconds", completion.queue_seconds, route=route)
+        metrics.observe("llm_generation_seconds", completion.generation_seconds, route=route)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        with self._lock:
+            self._trim(now)
+            routes: Dict[str, Dict[str, Any]] = {}
+            total = _Totals()
+            for (route, model), totals in sorted(self._routes.items()):
+                routes.setdefault(route, {})[model] = totals.as_dict()
+                total.calls += totals.calls
+                total.prompt_tokens += totals.prompt_tokens
+                total.completion_tokens += totals.completion_tokens
+                total.queue_seconds += totals.queue_seconds
+                total.generation_seconds += totals.generation_seconds
+                total.estimated += totals.estimated
+                if totals.cost_usd is not None:
+                    total.cost_usd = (total.cost_usd or 0.0) + totals.cost_usd
+            prompt_tokens = sum(item[1] for item in self._recent)
+            completion_tokens = sum(item[2] for item in self._recent)
+            calls = len(self._recent)
+
+        # Until a full window has passed, rates are over the time since startup
+        span = max(min(self.window_seconds, now - self.started), 1e-9)
+        return {
+            "totals": total.as_dict(),
+            "routes": routes,
+            "rolling": {
+                "window_seconds": self.window_seconds,
+                "calls": calls,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "prompt_tokens_per_second": round(prompt_tokens / span, 2),
+                "completion_tokens_per_second": round(completion_tokens / span, 2),
+            },
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._recent.clear()
+            self.started = self.clock()
+
+
+# Singleton instance
+usage_stats = UsageStats.from_env()
@@ -0,0 +1,230 @@
+"""Heuristic Scorer - Deterministic NumPy vibe and parking-difficulty scoring from POI data"""
+
+import os
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from src.geo.distance import haversine_m_array, poi_coordinates
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = [
+    "food", "nightlife", "shopping", "transit", "parking", "office",
+    "culture", "nature", "education", "health", "lodging", "residential", "other",
+]
+_CATEGORY_INDEX = {name: i for i, name in enumerate(CATEGORIES)}
+
+# POI type keywords per category; the first category with a matching keyword wins
+CATEGORY_KEYWORDS = {
+    "parking": ["parking", "garage", "car_park", "carpark"],
+    "transit": ["station", "subway", "metro", "mrt", "bus", "train", "tram", "transit", "ferry", "rail"],
+    "nightlife": ["bar", "pub", "nightclub", "club", "lounge", "karaoke", "night_market"],
+    "food": ["restaurant", "cafe", "coffee", "food", "bakery", "diner", "bistro", "tea", "dessert", "eatery"],
+    "shopping": ["mall", "shop", "store", "market", "supermarket", "boutique", "retail", "department"],
+    "office": ["office", "company", "bank", "coworking", "business", "government", "city_hall"],
+    "culture": ["museum", "theatre", "theater", "cinema", "gallery", "landmark", "attraction", "temple",
+                "monument", "stadium", "arena", "library"],
+    "nature": ["park", "garden", "beach", "trail", "river", "lake", "playground"],
+    "education": ["school", "university", "college", "campus", "kindergarten"],
+    "health": ["hospital", "clinic", "pharmacy", "doctor", "dentist", "medical"],
+    "lodging": ["hotel", "hostel", "motel", "inn", "guest_house"],
+    "residential": ["residential", "apartment", "housing", "condo"],
+}
+
+# Per-category weights: how much a nearby POI adds to the vibe, to parking demand and to parking supply
+DEFAULT_WEIGHTS = {
+    "categories": {
+        "food":        {"vibe": 0.45, "demand": 0.35, "supply": 0.0},
+        "nightlife":   {"vibe": 0.55, "demand": 0.45, "supply": 0.0},
+        "shopping":    {"vibe": 0.40, "demand": 0.50, "supply": 0.0},
+        "transit":     {"vibe": 0.25, "demand": 0.30, "supply": 0.0},
+        "parking":     {"vibe": 0.00, "demand": 0.00, "supply": 1.20},
+        "office":      {"vibe": 0.10, "demand": 0.45, "supply": 0.0},
+        "culture":     {"vibe": 0.50, "demand": 0.40, "supply": 0.0},
+        "nature":      {"vibe": 0.35, "demand": 0.10, "supply": 0.0},
+        "education":   {"vibe": 0.10, "demand": 0.25, "supply": 0.0},
+        "health":      {"vibe": 0.00, "demand": 0.30, "supply": 0.0},
+        "lodging":     {"vibe": 0.20, "demand": 0.20, "supply": 0.0},
+        "residential": {"vibe": 0.05, "demand": 0.20, "supply": 0.0},
+        "other":       {"vibe": 0.10, "demand": 0.10, "supply": 0.0},
+    },
+    # Distance (meters) over which a POI's influence decays by a factor e
+    "distance_decay_m": 250.0,
+    # Influence of POIs sent without coordinates
+    "unlocated_weight": 0.5,
+    "vibe_bias": -1.5,
+    "difficulty_bias": -1.2,
+    # Levels by difficulty: <= easy_max is Easy, >= hard_min is Hard
+    "easy_max": 3,
+    "hard_min": 7,
+    # Weighted transit POIs that make public transport the first suggestion
+    "transit_threshold": 1.0,
+    # Weighted POI total below which the area counts as spread out (car-friendly)
+    "sparse_threshold": 2.0,
+}
+
+HASHTAGS = {
+    "food": "#foodie",
+    "nightlife": "#nightlife",
+    "shopping": "#shopping",
+    "transit": "#transit-hub",
+    "parking": "#parking-nearby",
+    "office": "#business-district",
+    "culture": "#culture",
+    "nature": "#green-space",
+    "education": "#campus",
+    "health": "#medical",
+    "lodging": "#hotels",
+    "residential": "#residential",
+    "other": "#local",
+}
+
+LABELS = {
+    "food": "Dining",
+    "nightlife": "Nightlife",
+    "shopping": "Shopping",
+    "transit": "Transit",
+    "parking": "Parking",
+    "office": "Business",
+    "culture": "Cultural",
+    "nature": "Green",
+    "education": "Campus",
+    "health": "Medical",
+    "lodging": "Hotel",
+    "residential": "Residential",
+    "other": "Mixed-use",
+}
+
+TIPS = {
+    "Easy": ["Street parking is usually available", "Short walks from most spots"],
+    "Moderate": ["Check peak hours before you go", "Nearby garages fill up in the evening"],
+    "Hard": ["Book a garage in advance", "Consider public transport at peak times"],
+}
+
+
+@lru_cache(maxsize=4096)
+def category_of(poi_type: str) -> int:
+    """Category index for a free-form POI type"""
+    text = (poi_type or "").lower().replace(" ", "_").replace("-", "_")
+    if text in _CATEGORY_INDEX:
+        return _CATEGORY_INDEX[text]
+    # Whole words (singular) always match; longer keywords may also match inside words,
+    # so "bus" does not match "business" but "restaurant" matches "restaurants"
+    words = {word[:-1] if word.endswith("s") else word for word in text.split("_")} | set(text.split("_"))
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in words or (len(keyword) >= 5 and keyword in text) for keyword in keywords):
+            return _CATEGORY_INDEX[category]
+    return _CATEGORY_INDEX["other"]
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class HeuristicVibeScorer:
+    """Scores a location from weighted POI category counts using configurable weight tables"""
+
+    def __init__(self, weights: Optional[Dict[str, Any]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            categories = {name: dict(values) for name, values in DEFAULT_WEIGHTS["categories"].items()}
+            for name, values in (weights.get("categories") or {}).items():
+                categories.setdefault(name, {}).update(values)
+            self.weights.update({k: v for k, v in weights.items() if k != "categories"})
+            self.weights["categories"] = categories
+
+        table = self.weights["categories"]
+        self.vibe_weights = np.array([table.get(c, {}).get("vibe", 0.0) for c in CATEGORIES])
+        self.demand_weights = np.array([table.get(c, {}).get("demand", 0.0) for c in CATEGORIES])
+        self.supply_weights = np.array([table.get(c, {}).get("supply", 0.0) for c in CATEGORIES])
+
+    @classmethod
+    def from_env(cls) -> "HeuristicVibeScorer":
+        """Default tables, overridden by the JSON file at VIBE_HEURISTIC_WEIGHTS if set"""
+        path = os.getenv("VIBE_HEURISTIC_WEIGHTS")
+        if not path:
+            return cls()
+        try:
+            with open(path) as f:
+                return cls(json.load(f))
+        except Exception as e:
+            logger.error(f"Could not load heuristic weights from {path}, using defaults: {e}")
+            return cls()
+
+    def features(self, lat: float, lng: float, poi_data: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Distance-weighted POI counts per category"""
+        n = len(poi_data)
+        if n == 0:
+            return np.zeros(len(CATEGORIES))
+
+        categories = np.fromiter((category_of(str(p.get("type", ""))) for p in poi_data), dtype=np.int64, count=n)
+        lats, lngs = poi_coordinates(poi_data)
+        return self.features_from_arrays(lat, lng, categories, lats, lngs)
+
+    def features_from_arrays(self, lat: float, lng: float, categories: np.ndarray,
+                             lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Same as features() for callers that already hold columnar POI arrays"""
+        distances = haversine_m_array(lat, lng, lats, lngs)
+        weights = np.exp(-distances / self.weights["distance_decay_m"])
+        weights = np.where(np.isnan(weights), self.weights["unlocated_weight"], weights)
+        return np.bincount(categories, weights=weights, minlength=len(CATEGORIES))
+
+    def score_features(self, counts: np.ndarray) -> Dict[str, Any]:
+        """Turn category counts into a response shaped like the LLM's"""
+        w = self.weights
+        # log1p keeps one more cafe in a dense block from dominating the score
+        signal = np.log1p(counts)
+        total = float(counts.sum())
+
+        vibe_score = int(np.clip(round(1 + 9 * _sigmoid(signal @ self.vibe_weights + w["vibe_bias"])), 1, 10))
+        pressure = signal @ self.demand_weights - signal @ self.supply_weights + w["difficulty_bias"]
+        difficulty = int(np.clip(round(1 + 9 * _sigmoid(pressure)), 1, 10))
+        if difficulty <= w["easy_max"]:
+            level = "Easy"
+        elif difficulty >= w["hard_min"]:
+            level = "Hard"
+        else:
+            level = "Moderate"
+
+        ranked = [CATEGORIES[i] for i in np.argsort(-counts, kind="stable") if counts[i] > 0]
+        top = [c for c in ranked if c != "parking"][:3]
+        summary = (
+            f"{LABELS[top[0]]} area with about {int(round(total))} nearby places" if top
+            else "Quiet area with few points of interest"
+        )
+
+        parking_hashtags = ["#" + level.lower() + "-parking"]
+        parking_hashtags.append("#garage-nearby" if counts[_CATEGORY_INDEX["parking"]] > 0.2 else "#street-parking")
+
+        transport = []
+        if counts[_CATEGORY_INDEX["transit"]] >= w["transit_threshold"]:
+            transport.append({"method": "Public", "reason": "Transit stops close by"})
+        if total < w["sparse_threshold"]:
+            transport.append({"method": "Car", "reason": "Spread-out area with few destinations"})
+        elif level == "Hard":
+            transport.append({"method": "Walk", "reason": "Dense area where parking is scarce"})
+        else:
+            transport.append({"method": "Car", "reason": "Parking is manageable"})
+
+        return {
+            "vibe": {
+                "score": vibe_score,
+                "summary": summary,
+                "hashtags": [HASHTAGS[c] for c in top] or ["#quiet"],
+            },
+            "parking": {
+                "difficulty": difficulty,
+                "level": level,
+                "tips": list(TIPS[level]),
+                "hashtags": parking_hashtags,
+            },
+            "transport": transport,
+        }
+
+    def score(self, lat: float, lng: float, poi_data: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Vibe, parking and transport for a location"""
+        return self.score_features(self.features(lat, lng, poi_data))
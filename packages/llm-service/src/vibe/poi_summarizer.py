@@ -0,0 +1,197 @@
+"""POI Summarizer - Condenses nearby POIs into type counts and the most telling places within a token budget"""
+
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.geo.distance import haversine_m_array, poi_coordinates
+from src.metrics import metrics
+from src.tokens import TokenCounter, token_counter
+from src.vibe.heuristic_scorer import CATEGORIES, category_of
+
+logger = logging.getLogger(__name__)
+
+# How much a place of each category says about an area; chains of cafes say less than a landmark
+SALIENCE = {
+    "culture": 1.0,
+    "transit": 0.9,
+    "parking": 0.9,
+    "nightlife": 0.8,
+    "shopping": 0.7,
+    "nature": 0.7,
+    "lodging": 0.6,
+    "education": 0.6,
+    "health": 0.6,
+    "food": 0.5,
+    "office": 0.5,
+    "residential": 0.4,
+    "other": 0.3,
+}
+_SALIENCE = np.array([SALIENCE[c] for c in CATEGORIES])
+
+# The vibe prompt used to list this many POIs, which is what savings are measured against
+BASELINE_POIS = 10
+
+_SPACES = re.compile(r"[\s_]+")
+
+# Types that read wrong with a plural s
+_UNCOUNTABLE = {"parking", "transit", "housing", "coworking", "food", "public transport"}
+
+
+class PoiSummary(NamedTuple):
+    text: str
+    tokens: int
+    # Tokens the previous "name (type)" listing of the first BASELINE_POIS would have used
+    baseline_tokens: int
+    pois: int
+    named: int
+
+
+def _type_label(poi_type: str, count: int) -> str:
+    label = _SPACES.sub(" ", poi_type.strip().lower()) or "place"
+    if count == 1 or label.endswith("s") or label in _UNCOUNTABLE:
+        return label
+    if label.endswith("y") and label[-2:-1] not in "aeiou":
+        return label[:-1] + "ies"
+    if label.endswith(("sh", "ch", "x")):
+        return label + "es"
+    return label + "s"
+
+
+def _format_distance(meters: float) -> str:
+    if np.isnan(meters):
+        return ""
+    return f", {int(round(meters, -1))}m" if meters < 1000 else f", {meters / 1000:.1f}km"
+
+
+class PoiSummarizer:
+    """Builds the POI section of the vibe prompt to fit a token budget"""
+
+    def __init__(self, token_budget: int = 120, per_type: int = 2, distance_decay_m: float = 300.0,
+                 counter: Optional[TokenCounter] = None):
+        self.token_budget = token_budget
+        self.per_type = per_type
+        self.distance_decay_m = distance_decay_m
+        self.counter = counter or token_counter
+
+    @classmethod
+    def from_env(cls) -> "PoiSummarizer":
+        return cls(
+            token_budget=int(os.getenv("VIBE_POI_TOKEN_BUDGET", "120")),
+            per_type=int(os.getenv("VIBE_POI_PER_TYPE", "2")),
+        )
+
+    def _dedupe(self, poi_data: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        seen = set()
+        unique = []
+        for poi in poi_data:
+            if not isinstance(poi, dict):
+                continue
+            key = (_SPACES.sub(" ", str(poi.get("name", "")).strip().lower()), str(poi.get("type", "")).lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(poi)
+        return unique
+
+    def summarize(self, poi_data: Sequence[Dict[str, Any]], lat: Optional[float] = None,
+                  lng: Optional[float] = None) -> PoiSummary:
+        listing = ", ".join(
+            f"{poi.get('name', 'Unknown')} ({poi.get('type', 'place')})"
+            for poi in poi_data[:BASELINE_POIS] if isinstance(poi, dict)
+        ) if poi_data else "No POI data"
+        baseline = self.counter.count(listing)
+        pois = self._dedupe(poi_data or [])
+        if not pois:
+            return PoiSummary("No POI data", self.counter.count("No POI data"), baseline, 0, 0)
+        # A summary is never longer than the listing it replaces
+        budget = min(self.token_budget, baseline)
+
+        types = [str(poi.get("type") or "place") for poi in pois]
+        categories = np.fromiter((category_of(t) for t in types), dtype=np.int64, count=len(pois))
+        if lat is not None and lng is not None:
+            lats, lngs = poi_coordinates(pois)
+            distances = haversine_m_array(lat, lng, lats, lngs)
+        else:
+            distances = np.full(len(pois), np.nan)
+        # Places without coordinates rank as if they were a decay length away
+        proximity = np.exp(-np.nan_to_num(distances, nan=self.distance_decay_m) / self.distance_decay_m)
+        order = np.argsort(-(_SALIENCE[categories] * proximity), kind="stable")
+
+        # Counts carry the density signal for every type, however long the list
+        type_counts = Counter(_SPACES.sub(" ", t.strip().lower()) for t in types)
+        counts = [f"{n} {_type_label(t, n)}" for t, n in type_counts.most_common()]
+
+        if max(type_counts.values()) <= self.per_type:
+            # Few enough to name every place, so the counts would only repeat them
+            for with_distance in (True, False):
+                named = [
+                    f"{pois[i].get('name', 'Unknown')} ({_SPACES.sub(' ', types[i].strip().lower())}"
+                    f"{_format_distance(distances[i]) if with_distance else ''})"
+                    for i in order
+                ]
+                text = ", ".join(named)
+                tokens = self.counter.count(text)
+                if tokens <= budget:
+                    return PoiSummary(text, tokens, baseline, len(pois), len(named))
+
+        # Name the best-ranked places, at most per_type of each type, while they fit the budget
+        text = self._fit_counts(counts, budget)
+        used = self.counter.count(text) + self.counter.count(". Notable:")
+        named = []
+        per_type: Counter = Counter()
+        for index in order:
+            poi_type = _SPACES.sub(" ", types[index].strip().lower())
+            if per_type[poi_type] >= self.per_type:
+                continue
+            name = pois[index].get("name", "Unknown")
+            entry = f"{name} ({poi_type}{_format_distance(distances[index])})"
+            # Entries are joined with ", ", about one token each
+            cost = self.counter.count(entry) + 1
+            if used + cost > budget:
+                # The distance is the first thing to go
+                entry = f"{name} ({poi_type})"
+                cost = self.counter.count(entry) + 1
+                if used + cost > budget:
+                    continue
+            named.append(entry)
+            per_type[poi_type] += 1
+            used += cost
+
+        if named:
+            text = f"{text}. Notable: {', '.join(named)}"
+        if self.counter.count(text) > baseline:
+            # Per-entry costs are estimates; the old listing itself always fits
+            text = listing
+        return PoiSummary(text, self.counter.count(text), baseline, len(pois), len(named))
+
+    def _fit_counts(self, counts: List[str], budget: int) -> str:
+        """Type counts, most common first, with the tail folded into 'N other places' past half the budget"""
+        limit = budget // 2
+        kept: List[str] = []
+        used = self.counter.count("0 places:")
+        for i, item in enumerate(counts):
+            cost = self.counter.count(item) + 1
+            if kept and used + cost > limit:
+                rest = sum(int(c.split(" ", 1)[0]) for c in counts[i:])
+                kept.append(f"{rest} other places")
+                break
+            kept.append(item)
+            used += cost
+        total = sum(int(c.split(" ", 1)[0]) for c in counts)
+        return f"{total} {'place' if total == 1 else 'places'}: {', '.join(kept)}"
+
+    def format(self, poi_data: Sequence[Dict[str, Any]], lat: Optional[float] = None,
+               lng: Optional[float] = None, route: str = "vibe") -> str:
+        """Summary text for the prompt, recording the tokens it saved"""
+        summary = self.summarize(poi_data, lat, lng)
+        metrics.observe("prompt_poi_tokens", summary.tokens, route=route)
+        if summary.baseline_tokens > summary.tokens:
+            metrics.increment("prompt_poi_tokens_saved_total", summary.baseline_tokens - summary.tokens, route=route)
+        logger.debug("POI summary: %d places, %d named, %d tokens instead of %d",
+                     summary.pois, summary.named, summary.tokens, summary.baseline_tokens)
+        return summary.text
@@ -0,0 +1,131 @@
+"""Vibe Prefetcher - Speculative background vibe analyses for locations a search just resolved"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from src.cache.vibe_cache import VibeCache, vibe_key
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Analysis of (lat, lng) without POIs as (source, analysis), or None when the model gave no usable answer
+Analyze = Callable[[float, float], Awaitable[Optional[Tuple[str, Dict[str, Any]]]]]
+
+
+class VibePrefetcher:
+    """Computes the vibe of a searched location into the vibe cache before it is asked for"""
+
+    def __init__(self, max_in_flight: int = 1, per_minute: int = 30, clock: Callable[[], float] = time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.per_minute = per_minute
+        self.clock = clock
+        self._analyze: Optional[Analyze] = None
+        self._cache: Optional[VibeCache] = None
+        self._busy: Callable[[], bool] = lambda: False
+        self._tasks: Dict[Tuple, asyncio.Task] = {}
+        self._started: deque = deque()
+        self._lock = threading.Lock()
+        self.outcomes: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["VibePrefetcher"]:
+        """Build from VIBE_PREFETCH_* settings, or None unless prefetching is enabled"""
+        if os.getenv("VIBE_PREFETCH_ENABLED", "false").lower() != "true":
+            return None
+        return cls(
+            max_in_flight=int(os.getenv("VIBE_PREFETCH_MAX_IN_FLIGHT", "1")),
+            per_minute=int(os.getenv("VIBE_PREFETCH_PER_MINUTE", "30")),
+        )
+
+    def bind(self, analyze: Analyze, cache: VibeCache, busy: Optional[Callable[[], bool]] = None):
+        """Attach the analysis, the cache it fills and the check for interactive load"""
+        self._analyze = analyze
+        self._cache = cache
+        if busy is not None:
+            self._busy = busy
+
+    def _count(self, outcome: str) -> str:
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        metrics.increment("vibe_prefetch_total", outcome=outcome)
+        return outcome
+
+    def _take_budget(self) -> bool:
+        """Spend one prefetch of the per-minute budget, or False when it is used up"""
+        with self._lock:
+            now = self.clock()
+            while self._started and now - self._started[0] >= 60.0:
+                self._started.popleft()
+            if len(self._started) >= self.per_minute:
+                return False
+            self._started.append(now)
+            return True
+
+    def prefetch(self, filters: Dict[str, Any]) -> str:
+        """Schedule the vibe of the filters' location when it is worth it, returning the outcome"""
+        lat, lng = filters.get("lat"), filters.get("lng")
+        if lat is None or lng is None or self._analyze is None or self._cache is None:
+            return "skipped"
+
+        # The map asks for the vibe of a searched spot without POIs, so that is the key to fill
+        key = vibe_key(float(lat), float(lng), [])
+        if key in self._tasks:
+            return self._count("duplicate")
+        # A peek, so prefetch checks do not count as cache hits or misses
+        if self._cache.contains(key):
+            return self._count("cached")
+        # Prefetches are speculative and give way to requests someone is waiting for
+        if len(self._tasks) >= self.max_in_flight or self._busy():
+            return self._count("busy")
+        if not self._take_budget():
+            return self._count("budget")
+
+        try:
+            task = asyncio.get_running_loop().create_task(self._run(key, float(lat), float(lng)))
+        except RuntimeError:
+            return self._count("no_loop")
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return self._count("scheduled")
+
+    async def _run(self, key: Tuple, lat: float, lng: float):
+        try:
+            result = await self._analyze(lat, lng)
+            if result is None:
+                self._count("empty")
+                return
+            source, analysis = result
+            self._cache.put(key, source, analysis)
+            self._count("stored")
+        except Exception as e:
+            self._count("failed")
+            logger.warning("Vibe prefetch for %.4f,%.4f failed: %s", lat, lng, e)
+
+    async def wait(self, key: Tuple) -> bool:
+        """Wait for a prefetch of key in flight, returning whether there was one"""
+        task = self._tasks.get(key)
+        if task is None:
+            return False
+        # Shielded, so a caller that gives up does not cancel the prefetch for the next one
+        await asyncio.shield(task)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._tasks), "max_in_flight": self.max_in_flight,
+                "per_minute": self.per_minute, "outcomes": dict(self.outcomes)}
+
+
+_shared: Dict[str, Optional[VibePrefetcher]] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_prefetcher() -> Optional[VibePrefetcher]:
+    """The process-wide prefetcher configured by VIBE_PREFETCH_ENABLED, created on first use"""
+    with _shared_lock:
+        if "prefetcher" not in _shared:
+            _shared["prefetcher"] = VibePrefetcher.from_env()
+        return _shared["prefetcher"]
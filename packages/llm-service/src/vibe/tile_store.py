@@ -0,0 +1,298 @@
+"""Vibe Tile Store - Memory-mapped file of precomputed vibe analyses, one fixed-width record per map tile
+
+Layout (little endian):
+    header    64 bytes, see HEADER
+    records   record_count x RECORD_DTYPE
+    table     table_capacity x uint32 record indices (open addressing, linear probing)
+    strings   UTF-8 string table referenced by (offset, length) pairs
+"""
+
+import os
+import math
+import mmap
+import time
+import struct
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PWVIBE1\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIIdQQQQQ")
+
+METERS_PER_DEGREE = 111320.0
+EMPTY_SLOT = np.uint32(0xFFFFFFFF)
+_FIBONACCI = 11400714819323198485
+_MASK64 = (1 << 64) - 1
+
+# Separators inside joined string-table entries
+LIST_SEPARATOR = "\x1f"
+FIELD_SEPARATOR = "\x1e"
+
+PARKING_LEVELS = ["Easy", "Moderate", "Hard", "Unknown"]
+
+RECORD_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("lat", "<f4"),
+    ("lng", "<f4"),
+    ("generated_at", "<u4"),
+    ("poi_hash", "<u4"),
+    ("poi_count", "<u2"),
+    ("vibe_score", "u1"),
+    ("parking_difficulty", "u1"),
+    ("parking_level", "u1"),
+    ("_pad", "u1", (3,)),
+    ("summary", "<u4", (2,)),
+    ("vibe_hashtags", "<u4", (2,)),
+    ("parking_tips", "<u4", (2,)),
+    ("parking_hashtags", "<u4", (2,)),
+    ("transport", "<u4", (2,)),
+])
+
+_STRING_FIELDS = ("summary", "vibe_hashtags", "parking_tips", "parking_hashtags", "transport")
+
+
+def tile_size_degrees(resolution_m: float) -> float:
+    return resolution_m / METERS_PER_DEGREE
+
+
+def tile_key(lat: float, lng: float, resolution_m: float) -> int:
+    """Grid cell containing a coordinate, packed as row << 32 | column"""
+    size = tile_size_degrees(resolution_m)
+    row = int(math.floor((lat + 90.0) / size))
+    col = int(math.floor((lng + 180.0) / size))
+    return (row << 32) | col
+
+
+def tile_center(key: int, resolution_m: float) -> Tuple[float, float]:
+    size = tile_size_degrees(resolution_m)
+    row, col = key >> 32, key & 0xFFFFFFFF
+    return (row + 0.5) * size - 90.0, (col + 0.5) * size - 180.0
+
+
+def _slot(key: int, bits: int) -> int:
+    return ((key * _FIBONACCI) & _MASK64) >> (64 - bits)
+
+
+def _clamp_byte(value: Any, low: int = 0, high: int = 10) -> int:
+    try:
+        return max(low, min(high, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _StringTable:
+    """Deduplicating builder for the string section"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, text: str) -> Tuple[int, int]:
+        ref = self.offsets.get(text)
+        if ref is None:
+            encoded = text.encode("utf-8")
+            ref = (len(self.data), len(encoded))
+            self.data.extend(encoded)
+            self.offsets[text] = ref
+        return ref
+
+
+def _join(items: Iterable[Any]) -> str:
+    return LIST_SEPARATOR.join(str(item).replace(LIST_SEPARATOR, " ") for item in items or [])
+
+
+def _split(text: str) -> List[str]:
+    return text.split(LIST_SEPARATOR) if text else []
+
+
+def write_tile_store(path: str, tiles: Iterable[Dict[str, Any]], resolution_m: float) -> int:
+    """Write tiles (dicts as returned by TileStoreReader.get) to path atomically, return the record count"""
+    tiles = list({tile["key"]: tile for tile in tiles}.values())
+    strings = _StringTable()
+    records = np.zeros(len(tiles), dtype=RECORD_DTYPE)
+
+    for i, tile in enumerate(tiles):
+        vibe = tile.get("vibe") or {}
+        parking = tile.get("parking") or {}
+        level = str(parking.get("level", "Unknown")).capitalize()
+        record = records[i]
+        record["key"] = tile["key"]
+        record["lat"] = tile["lat"]
+        record["lng"] = tile["lng"]
+        record["generated_at"] = int(tile.get("generated_at") or time.time())
+        record["poi_hash"] = int(tile.get("poi_hash") or 0)
+        record["poi_count"] = min(int(tile.get("poi_count") or 0), 0xFFFF)
+        record["vibe_score"] = _clamp_byte(vibe.get("score"))
+        record["parking_difficulty"] = _clamp_byte(parking.get("difficulty"))
+        record["parking_level"] = PARKING_LEVELS.index(level) if level in PARKING_LEVELS else 3
+        record["summary"] = strings.add(str(vibe.get("summary") or ""))
+        record["vibe_hashtags"] = strings.add(_join(vibe.get("hashtags")))
+        record["parking_tips"] = strings.add(_join(parking.get("tips")))
+        record["parking_hashtags"] = strings.add(_join(parking.get("hashtags")))
+        record["transport"] = strings.add(_join(
+            f"{item.get('method', '')}{FIELD_SEPARATOR}{item.get('reason', '')}"
+            for item in tile.get("transport") or [] if isinstance(item, dict)
+        ))
+
+    # Load factor at most 0.5 keeps probe sequences short
+    bits = max(4, math.ceil(math.log2(max(1, len(tiles)) * 2)))
+    capacity = 1 << bits
+    table = np.full(capacity, EMPTY_SLOT, dtype="<u4")
+    mask = capacity - 1
+    for index, key in enumerate(records["key"].tolist()):
+        slot = _slot(key, bits)
+        while table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        table[slot] = index
+
+    records_offset = HEADER.size
+    table_offset = records_offset + records.nbytes
+    strings_offset = table_offset + table.nbytes
+    header = HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, float(resolution_m), len(tiles),
+                         capacity, records_offset, table_offset, strings_offset)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(records.tobytes())
+        f.write(table.tobytes())
+        f.write(bytes(strings.data))
+    # Readers holding the old file keep their mapping; new readers see the new one
+    os.replace(tmp_path, path)
+    return len(tiles)
+
+
+class TileStoreReader:
+    """Read-only, memory-mapped view of a tile store file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, record_size, self.resolution_m, count, capacity,
+         records_offset, table_offset, self._strings_offset) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a version {VERSION} vibe tile store")
+
+        self._records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=records_offset)
+        self._keys = self._records["key"]
+        self._table = np.frombuffer(self._mmap, dtype="<u4", count=capacity, offset=table_offset)
+        self._bits = capacity.bit_length() - 1
+        self._mask = capacity - 1
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _string(self, ref) -> str:
+        start = self._strings_offset + int(ref[0])
+        return self._mmap[start:start + int(ref[1])].decode("utf-8")
+
+    def _index(self, key: int) -> Optional[int]:
+        slot = _slot(key, self._bits)
+        while True:
+            index = self._table[slot]
+            if index == EMPTY_SLOT:
+                return None
+            if self._keys[index] == key:
+                return int(index)
+            slot = (slot + 1) & self._mask
+
+    def _decode(self, index: int) -> Dict[str, Any]:
+        record = self._records[index]
+        transport = []
+        for item in _split(self._string(record["transport"])):
+            method, _, reason = item.partition(FIELD_SEPARATOR)
+            transport.append({"method": method, "reason": reason})
+        return {
+            "key": int(record["key"]),
+            "lat": float(record["lat"]),
+            "lng": float(record["lng"]),
+            "generated_at": int(record["generated_at"]),
+            "poi_hash": int(record["poi_hash"]),
+            "poi_count": int(record["poi_count"]),
+            "vibe": {
+                "score": int(record["vibe_score"]),
+                "summary": self._string(record["summary"]),
+                "hashtags": _split(self._string(record["vibe_hashtags"])),
+            },
+            "parking": {
+                "difficulty": int(record["parking_difficulty"]),
+                "level": PARKING_LEVELS[min(int(record["parking_level"]), 3)],
+                "tips": _split(self._string(record["parking_tips"])),
+                "hashtags": _split(self._string(record["parking_hashtags"])),
+            },
+            "transport": transport,
+        }
+
+    def get_key(self, key: int) -> Optional[Dict[str, Any]]:
+        index = self._index(key)
+        return self._decode(index) if index is not None else None
+
+    def get(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        """Precomputed analysis of the tile containing (lat, lng), if stored"""
+        return self.get_key(tile_key(lat, lng, self.resolution_m))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self._records)):
+            yield self._decode(index)
+
+
+class VibeTileStore:
+    """Tile store at a path that picks up files rewritten by the precompute job"""
+
+    def __init__(self, path: str, check_interval: float = 30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reader: Optional[TileStoreReader] = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["VibeTileStore"]:
+        """Open VIBE_TILE_STORE, or None when it is not configured"""
+        path = os.getenv("VIBE_TILE_STORE")
+        if not path:
+            return None
+        return cls(path, check_interval=float(os.getenv("VIBE_TILE_STORE_CHECK_SECONDS", "30")))
+
+    def _maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                if force:
+                    logger.warning(f"Vibe tile store {self.path} not found")
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                self._reader = TileStoreReader(self.path)
+                self._mtime = mtime
+                logger.info(f"Loaded {len(self._reader)} vibe tiles from {self.path}")
+            except Exception as e:
+                logger.error(f"Could not open vibe tile store {self.path}: {e}")
+
+    def get(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        self._maybe_reload()
+        reader = self._reader
+        return reader.get(lat, lng) if reader is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        reader = self._reader
+        return {
+            "path": self.path,
+            "tiles": len(reader) if reader is not None else 0,
+            "resolution_m": reader.resolution_m if reader is not None else None,
+        }
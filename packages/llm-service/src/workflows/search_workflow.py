@@ -1,11 +1,23 @@
 """LangGraph workflow for natural language search processing"""
 
-from typing import Dict, Any, TypedDict, Optional
+from typing import Dict, Any, TypedDict, Optional, Callable, Awaitable, List
 from langgraph.graph import StateGraph, END
 from src.nodes.query_parser import QueryParserNode
 from src.nodes.entity_extractor import EntityExtractorNode
 from src.nodes.filter_mapper import FilterMapperNode
+from src.nlp.keyword_entities import extract_keyword_entities
+from src.nlp.time_expressions import parse_time_expressions
+from src.cache.similarity_cache import SimilarityCache
+from src.cache.session_store import SessionStore, new_session_id
+from src.nlp.refinement import parse_refinement
+from src.deadline import Deadline, DeadlineExceeded, deadline_scope, get_deadline, await_with_deadline
+from src.metrics import metrics
+from src.replay.recorder import WORKFLOW_PATH, record_stage, shared_recorder
+from src.vibe.prefetcher import shared_prefetcher
+from llm_providers.replay_provider import RecordingChatModel
+from src.config import config
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +31,7 @@ class SearchState(TypedDict):
     filters: Optional[Dict[str, Any]]
     error: Optional[str]
     explanation: Optional[str]
+    degraded_stages: Optional[List[str]]
 
 class SearchWorkflow:
     def __init__(self):
@@ -27,6 +40,28 @@ class SearchWorkflow:
         self.entity_extractor = EntityExtractorNode()
         self.filter_mapper = FilterMapperNode()
         
+        # Latency budget per stage in seconds; a stage that overruns is replaced by its fallback
+        self.stage_budgets = {
+            "parse_intent": config.STAGE_BUDGET_PARSE_INTENT_MS / 1000.0,
+            "extract_entities": config.STAGE_BUDGET_EXTRACT_ENTITIES_MS / 1000.0,
+            "map_filters": config.STAGE_BUDGET_MAP_FILTERS_MS / 1000.0,
+        }
+        
+        # Results of near-duplicate queries are reused instead of re-running the graph
+        self.result_cache = SimilarityCache.from_env("workflow")
+        
+        # With TRAFFIC_RECORD_DIR set, each search is recorded with its completions for offline replay
+        self.traffic_recorder = shared_recorder()
+        if self.traffic_recorder is not None:
+            self.query_parser.llm = RecordingChatModel(self.query_parser.llm)
+            self.entity_extractor.llm = RecordingChatModel(self.entity_extractor.llm)
+        
+        # Last state per conversation, so follow-ups like "cheaper ones" only re-run what they change
+        self.sessions = SessionStore.from_env()
+        
+        # With VIBE_PREFETCH_ENABLED, the vibe of a resolved location is computed before the map asks for it
+        self.vibe_prefetcher = shared_prefetcher()
+        
         # Build the workflow
         self.workflow = self._build_workflow()
         self.app = self.workflow.compile()
@@ -37,9 +72,15 @@ class SearchWorkflow:
         workflow = StateGraph(SearchState)
         
         # Add nodes
-        workflow.add_node("parse_intent", self.query_parser.parse_intent)
-        workflow.add_node("extract_entities", self.entity_extractor.extract_entities)
-        workflow.add_node("map_filters", self.filter_mapper.map_to_filters)
+        workflow.add_node("parse_intent", self._stage(
+            "parse_intent", self.query_parser.parse_intent, self._fallback_intent
+        ))
+        workflow.add_node("extract_entities", self._stage(
+            "extract_entities", self.entity_extractor.extract_entities, self._fallback_entities
+        ))
+        workflow.add_node("map_filters", self._stage(
+            "map_filters", self.filter_mapper.map_to_filters, self._fallback_filters
+        ))
         workflow.add_node("validate_result", self._validate_result)
         
         # Define the flow
@@ -62,6 +103,66 @@ class SearchWorkflow:
         
         return workflow
     
+    def _stage(self, name: str, node: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+               fallback: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        """Wrap a node with its latency budget, degrading to fallback when the budget or deadline runs out"""
+        async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            deadline = get_deadline()
+            budget = self.stage_budgets.get(name) or None
+            if deadline is not None:
+                stage_deadline = deadline.child(budget)
+            elif budget is not None:
+                stage_deadline = Deadline(budget)
+            else:
+                return await node(state)
+            
+            async def scoped() -> Dict[str, Any]:
+                # Calls inside the node see the stage deadline, so their timeouts stop at its budget
+                with deadline_scope(stage_deadline):
+                    return await node(dict(state))
+            
+            try:
+                # The node works on a copy so a cancelled run leaves no partial writes behind
+                return await await_with_deadline(stage_deadline, scoped(), route="workflow", stage=name)
+            except DeadlineExceeded:
+                logger.warning("Stage %s exceeded its latency budget, using degraded result", name)
+                metrics.increment("workflow_stage_degraded_total", stage=name)
+                state = await fallback(dict(state))
+                state["degraded_stages"] = (state.get("degraded_stages") or []) + [name]
+                return state
+        
+        async def timed(state: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                return await run(state)
+            finally:
+                record_stage(name, time.perf_counter() - started)
+        
+        return timed
+    
+    async def _fallback_intent(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Default intent used when intent parsing is too slow"""
+        state["intent"] = {
+            "intent_type": "find_parking",
+            "confidence": 0.5,
+            "reasoning": "Intent parsing exceeded its latency budget, defaulting to find_parking"
+        }
+        return state
+    
+    async def _fallback_entities(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Keyword-derived entities used when LLM extraction is too slow"""
+        entities = extract_keyword_entities(state.get("query", ""))
+        times = parse_time_expressions(state.get("query", ""))
+        entities["time_start"], entities["time_end"] = times.start, times.end
+        if times.duration_minutes is not None:
+            entities["duration"] = times.duration_minutes
+        state["entities"] = entities
+        return state
+    
+    async def _fallback_filters(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Filters built without network geocoding when mapping is too slow"""
+        return await self.filter_mapper.map_to_filters(state, allow_network=False)
+    
     async def _validate_result(self, state: SearchState) -> SearchState:
         """Validate the final result and add explanation"""
         try:
@@ -95,7 +196,7 @@ class SearchWorkflow:
             state["explanation"] = " ".join(explanation_parts)
             
         except Exception as e:
-            logger.error(f"Validation error: {e}")
+            logger.error("Validation error: %s", e)
             state["error"] = str(e)
         
         return state
@@ -105,8 +206,116 @@ class SearchWorkflow:
         # For now, always end. In production, could implement retry logic
         return "end"
     
-    async def process_search(self, query: str, user_location: Optional[Dict[str, float]] = None, language: str = "en") -> Dict[str, Any]:
-        """Process a natural language search query"""
+    def _prefetch_vibe(self, response: Dict[str, Any]):
+        if self.vibe_prefetcher is not None and response["success"]:
+            self.vibe_prefetcher.prefetch(response["filters"])
+    
+    @staticmethod
+    def _cache_context(user_location: Optional[Dict[str, float]], language: Optional[str]) -> str:
+        """Inputs besides the query that change the result"""
+        if not user_location:
+            return language or ""
+        return f"{language}:{user_location.get('lat', 0):.4f},{user_location.get('lng', 0):.4f}"
+    
+    async def process_search(self, query: str, user_location: Optional[Dict[str, float]] = None, language: str = "en",
+                             deadline: Optional[Deadline] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process a natural language search query, as a follow-up to the session's last search when given one"""
+        recorder = self.traffic_recorder
+        if recorder is None or not recorder.wants(WORKFLOW_PATH):
+            return await self._process_search(query, user_location, language, deadline, session_id)
+        
+        request = {"query": query, "user_location": user_location, "language": language, "session_id": session_id}
+        with recorder.recording("CALL", WORKFLOW_PATH, request) as recording:
+            response = await self._process_search(query, user_location, language, deadline, session_id)
+            recording.response = response
+            return response
+    
+    async def _process_search(self, query: str, user_location: Optional[Dict[str, float]], language: str,
+                              deadline: Optional[Deadline], session_id: Optional[str]) -> Dict[str, Any]:
+        if self.sessions is None:
+            return await self._run_search(query, user_location, language, deadline)
+        
+        session_id = session_id or new_session_id()
+        previous = self.sessions.get(session_id)
+        response = None
+        if previous is not None:
+            with deadline_scope(deadline or get_deadline()):
+                response = await self._refine(query, previous, user_location, language)
+        if response is None:
+            response = await self._run_search(query, user_location, language, deadline)
+        
+        response["session_id"] = session_id
+        response.setdefault("refined_fields", [])
+        if response.get("entities"):
+            self.sessions.put(session_id, {
+                "query": query,
+                "intent": response["intent"],
+                "entities": response["entities"],
+                "filters": response["filters"],
+            })
+        return response
+    
+    async def _refine(self, query: str, previous: Dict[str, Any], user_location: Optional[Dict[str, float]],
+                      language: str) -> Optional[Dict[str, Any]]:
+        """Apply a follow-up to the previous search, or None when it reads as a new search"""
+        refinement = parse_refinement(query, previous["entities"])
+        if refinement is None:
+            metrics.increment("search_refinements_total", outcome="full")
+            return None
+        
+        # Intent and entities carry over with the changes applied, so neither LLM stage runs;
+        # the location is only geocoded again when the follow-up names a new one
+        coordinates = None
+        previous_filters = previous.get("filters") or {}
+        if ("location" not in refinement.changed and previous["entities"].get("location")
+                and previous_filters.get("lat") is not None):
+            coordinates = {"lat": previous_filters["lat"], "lng": previous_filters["lng"]}
+        map_filters = self._stage(
+            "map_filters",
+            lambda state: self.filter_mapper.map_to_filters(state, coordinates=coordinates),
+            self._fallback_filters
+        )
+        
+        state = {
+            "query": query,
+            "user_location": user_location,
+            "language": language,
+            "intent": previous["intent"],
+            "entities": refinement.entities,
+        }
+        result = await self._validate_result(await map_filters(state))
+        metrics.increment("search_refinements_total", outcome="refined")
+        logger.info("Refined previous search '%s' with '%s': %s", previous["query"], query, sorted(refinement.changed))
+        
+        response = self._response(query, result)
+        response["refined_fields"] = sorted(refinement.changed)
+        self._prefetch_vibe(response)
+        return response
+    
+    @staticmethod
+    def _response(query: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": not bool(result.get("error")),
+            "original_query": query,
+            "intent": result.get("intent", {}),
+            "entities": result.get("entities", {}),
+            "filters": result.get("filters", {}),
+            "explanation": result.get("explanation", ""),
+            "degraded_stages": result.get("degraded_stages") or [],
+            "error": result.get("error")
+        }
+    
+    async def _run_search(self, query: str, user_location: Optional[Dict[str, float]], language: str,
+                          deadline: Optional[Deadline]) -> Dict[str, Any]:
+        cache_context = self._cache_context(user_location, language)
+        if self.result_cache is not None:
+            match = self.result_cache.lookup(query, cache_context)
+            if match is not None:
+                logger.info("Reusing result of '%s' for '%s' (similarity %.2f)", match.matched_query, query, match.similarity)
+                match.value["original_query"] = query
+                self._prefetch_vibe(match.value)
+                return match.value
+        
         # Initialize state
         initial_state = {
             "query": query,
@@ -115,22 +324,23 @@ class SearchWorkflow:
         }
         
         try:
-            # Run the workflow
-            result = await self.app.ainvoke(initial_state)
+            # Run the workflow, with every node bound by the request deadline
+            with deadline_scope(deadline or get_deadline()):
+                result = await self.app.ainvoke(initial_state)
             
             # Format the response
-            return {
-                "success": not bool(result.get("error")),
-                "original_query": query,
-                "intent": result.get("intent", {}),
-                "entities": result.get("entities", {}),
-                "filters": result.get("filters", {}),
-                "explanation": result.get("explanation", ""),
-                "error": result.get("error")
-            }
+            response = self._response(query, result)
+            
+            self._prefetch_vibe(response)
+            
+            # Only complete results are worth reusing
+            if self.result_cache is not None and response["success"] and not response["degraded_stages"]:
+                self.result_cache.put(query, response, cache_context)
+            
+            return response
             
         except Exception as e:
-            logger.error(f"Workflow processing error: {e}")
+            logger.error("Workflow processing error: %s", e)
             return {
                 "success": False,
                 "original_query": query,
@@ -138,6 +348,7 @@ class SearchWorkflow:
                 "entities": {},
                 "filters": {},
                 "explanation": "",
+                "degraded_stages": [],
                 "error": str(e)
             }
 
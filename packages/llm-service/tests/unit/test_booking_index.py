@@ -0,0 +1,140 @@
+"""
+Unit tests for the booking interval index behind time-window availability.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from src.availability.booking_index import BookingIndex, to_seconds, window
+from src.geo.spatial_index import SpotIndex
+
+HOUR = 3600
+DAY_START = to_seconds("2026-03-02T08:00:00+08:00")
+
+
+def booking(booking_id, spot_id, start_hour, end_hour):
+    return {"id": booking_id, "spot_id": spot_id,
+            "start": DAY_START + int(start_hour * HOUR), "end": DAY_START + int(end_hour * HOUR)}
+
+
+def at(hour):
+    return DAY_START + int(hour * HOUR)
+
+
+def scan(bookings, spot_ids, start, end):
+    """Reference answer, checking every booking of every spot"""
+    busy = {b["spot_id"] for b in bookings if b["start"] < end and b["end"] > start}
+    return np.array([spot_id not in busy for spot_id in spot_ids])
+
+
+def random_bookings(count, spots, seed):
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, 48 * 4, count) * 900
+    lengths = rng.integers(1, 16, count) * 900
+    return [{"id": f"b{i}", "spot_id": f"s{int(rng.integers(spots))}",
+             "start": DAY_START + int(start), "end": DAY_START + int(start + length)}
+            for i, (start, length) in enumerate(zip(starts, lengths))]
+
+
+class TestWindows:
+    """Test half-open window overlap"""
+
+    @pytest.fixture
+    def index(self):
+        index = BookingIndex()
+        index.load([booking("1", "a", 1, 3), booking("2", "a", 5, 6), booking("3", "b", 0, 10)])
+        return index
+
+    @pytest.mark.parametrize("start, end, free_a", [
+        (0, 1, True),
+        (3, 5, True),
+        (0.5, 1.5, False),
+        (2.9, 3, False),
+        (4, 5.5, False),
+        (6, 24, True),
+        (0, 24, False),
+    ])
+    def test_overlap(self, index, start, end, free_a):
+        free = index.free(["a", "b", "unbooked"], at(start), at(end))
+        assert free.tolist() == [free_a, False, True]
+
+    def test_long_booking_hides_behind_later_short_ones(self):
+        index = BookingIndex()
+        index.load([booking("long", "a", 0, 10), booking("short", "a", 2, 3), booking("later", "a", 4, 5)])
+        assert index.free(["a"], at(6), at(7)).tolist() == [False]
+        assert index.free(["a"], at(11), at(12)).tolist() == [True]
+
+    def test_window_per_spot(self, index):
+        free = index.free(["a", "a", "b"], [at(0), at(2), at(10)], [at(1), at(4), at(11)])
+        assert free.tolist() == [True, False, True]
+
+    def test_times_as_strings_and_datetimes(self, index):
+        start = datetime.fromtimestamp(at(3), tz=timezone.utc)
+        assert index.free(["a"], start, start + timedelta(hours=2)).tolist() == [True]
+        assert index.free(["a"], start.isoformat(), (start + timedelta(hours=3)).isoformat()).tolist() == [False]
+
+    def test_invalid_bookings(self):
+        index = BookingIndex()
+        with pytest.raises(ValueError):
+            index.add(booking("x", "a", 2, 1))
+        with pytest.raises(ValueError):
+            index.add_many([booking("ok", "a", 1, 2), {"id": "y", "spot_id": "a", "start": "soon", "end": "later"}])
+        assert len(index) == 0
+
+    def test_window_from_filters(self):
+        assert window({}) is None
+        assert window({"start_time": "2026-03-02T10:00:00+08:00"}) == (at(2), at(2) + 1)
+        assert window({"start_time": "2026-03-02T10:00:00+08:00", "end_time": "2026-03-02T12:00:00+08:00"}) == (at(2), at(4))
+        assert window({"start_time": "tomorrow"}) is None
+
+
+class TestUpdates:
+    """Test that inserts and removals answer like a fresh load"""
+
+    @pytest.mark.parametrize("compact_after", [2, 10000])
+    def test_matches_a_scan(self, compact_after):
+        bookings = random_bookings(3000, spots=200, seed=5)
+        index = BookingIndex(compact_after=compact_after)
+        index.load(bookings[:2000])
+        index.add_many(bookings[2000:])
+        for b in bookings[::4]:
+            assert index.remove(b["id"])
+        moved = [dict(b, spot_id="s0", start=b["start"] + HOUR, end=b["end"] + HOUR) for b in bookings[1::8]]
+        index.add_many(moved)
+
+        expected = {b["id"]: b for b in bookings}
+        for b in bookings[::4]:
+            del expected[b["id"]]
+        expected.update({b["id"]: b for b in moved})
+        spot_ids = [f"s{i}" for i in range(205)]
+        for hour in range(0, 48, 3):
+            free = index.free(spot_ids, at(hour), at(hour + 2))
+            assert free.tolist() == scan(expected.values(), spot_ids, at(hour), at(hour + 2)).tolist()
+        assert index.stats()["compactions"] > (2 if compact_after == 2 else 0)
+
+    def test_remove_unknown(self):
+        assert BookingIndex().remove("nope") is False
+
+    def test_replacing_a_booking_frees_its_old_window(self):
+        index = BookingIndex()
+        index.load([booking("1", "a", 1, 2)])
+        index.add(booking("1", "a", 5, 6))
+        assert index.free(["a", "a"], [at(1), at(5)], [at(2), at(6)]).tolist() == [True, False]
+
+
+class TestSpotIndexWindow:
+    """Test dropping spots booked during the searched window"""
+
+    def test_query_with_times(self):
+        bookings = BookingIndex()
+        index = SpotIndex(bookings=bookings)
+        here = {"lat": 25.0339, "lng": 121.5645}
+        index.load([dict(here, id="a", price=2.0), dict(here, id="b", price=3.0)])
+        bookings.add(booking("1", "a", 1, 3))
+
+        filters = dict(here, radius=100, start_time="2026-03-02T10:00:00+08:00", end_time="2026-03-02T12:00:00+08:00")
+        assert [spot["id"] for spot in index.query(filters).spots] == ["b"]
+        assert [spot["id"] for spot in index.query(dict(here, radius=100, start_time="2026-03-02T10:30:00+08:00")).spots] == ["b"]
+        assert [spot["id"] for spot in index.query(dict(filters, start_time="2026-03-02T11:00:00+08:00")).spots] == ["a", "b"]
+        assert [spot["id"] for spot in index.query(dict(here, radius=100)).spots] == ["a", "b"]
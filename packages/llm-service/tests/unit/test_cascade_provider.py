@@ -0,0 +1,125 @@
+"""
+Unit tests for the small-then-large model cascade.
+"""
+import json
+
+import pytest
+
+from llm_providers.cascade_provider import CascadeProvider, parse_thresholds
+from src.deadline import Deadline, deadline_scope
+
+SEARCH_OK = {"intent": {"type": "parking_search", "confidence": 0.9}, "filters": {"radius": 500}}
+VIBE_OK = {
+    "vibe": {"score": 7, "summary": "Busy", "hashtags": []},
+    "parking": {"difficulty": 6, "level": "Moderate", "tips": [], "hashtags": []},
+}
+
+
+class FakeProvider:
+    """Provider returning a fixed answer and counting calls."""
+
+    def __init__(self, answer, error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+        self.closed = False
+
+    def generate_structured(self, prompt, system_prompt=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.answer if isinstance(self.answer, str) else json.dumps(self.answer)
+
+    def health_check(self):
+        return {"status": "healthy", "available": True}
+
+    def close(self):
+        self.closed = True
+
+
+def cascade(small_answer, large_answer=None, thresholds=None, error=None):
+    small = FakeProvider(small_answer, error=error)
+    large = FakeProvider(large_answer or {"from": "large"})
+    return CascadeProvider(small, large, thresholds), small, large
+
+
+class TestCascadeProvider:
+    """Test escalation decisions and reporting"""
+
+    def test_confident_answer_stays_on_small_model(self):
+        provider, small, large = cascade(SEARCH_OK)
+        assert json.loads(provider.generate_structured("q", route="search")) == SEARCH_OK
+        assert (small.calls, large.calls) == (1, 0)
+
+    def test_low_confidence_escalates(self):
+        answer = {"intent": {"type": "parking_search", "confidence": 0.4}, "filters": {}}
+        provider, _, large = cascade(answer)
+        assert json.loads(provider.generate_structured("q", route="search")) == {"from": "large"}
+        assert provider.stats()["routes"]["search"]["reasons"] == {"low_confidence": 1}
+
+    @pytest.mark.parametrize("answer, reason", [
+        ("not json at all", "invalid_json"),
+        ({"intent": {"type": "parking_search"}}, "incomplete"),
+        ({"intent": {"type": "greeting", "confidence": 0.95}}, "incomplete"),
+        ({"intent": {"type": "dance", "confidence": 0.95}}, "incomplete"),
+    ])
+    def test_invalid_search_answers_escalate(self, answer, reason):
+        provider, _, large = cascade(answer)
+        provider.generate_structured("q", route="search")
+        assert large.calls == 1
+        assert provider.stats()["routes"]["search"]["reasons"] == {reason: 1}
+
+    def test_vibe_checks_completeness(self):
+        provider, _, large = cascade(VIBE_OK)
+        provider.generate_structured("q", route="vibe")
+        assert large.calls == 0
+
+        bad = dict(VIBE_OK, parking={"difficulty": 15, "level": "Moderate"})
+        provider, _, large = cascade(bad)
+        provider.generate_structured("q", route="vibe")
+        assert large.calls == 1
+
+    def test_small_model_error_escalates(self):
+        provider, _, large = cascade(SEARCH_OK, error=RuntimeError("down"))
+        assert json.loads(provider.generate_structured("q", route="search")) == {"from": "large"}
+        stats = provider.stats()
+        assert stats["tiers"]["small"]["errors"] == 1
+        assert stats["routes"]["search"]["reasons"] == {"error": 1}
+
+    def test_route_comes_from_request_deadline(self):
+        answer = {"intent": {"type": "parking_search", "confidence": 0.75}, "filters": {}}
+        provider, _, large = cascade(answer, thresholds={"search": 0.8})
+        with deadline_scope(Deadline(5, route="search")):
+            provider.generate_structured("q")
+        assert large.calls == 1
+        assert "search" in provider.stats()["routes"]
+
+    def test_per_route_thresholds(self):
+        answer = {"intent": {"type": "parking_search", "confidence": 0.75}, "filters": {}}
+        provider, _, large = cascade(answer, thresholds=parse_thresholds("search=0.6"))
+        provider.generate_structured("q", route="search")
+        assert large.calls == 0
+
+    def test_escalation_rate(self):
+        provider, small, _ = cascade(SEARCH_OK)
+        for _ in range(3):
+            provider.generate_structured("q", route="search")
+        small.answer = "{}"
+        provider.generate_structured("q", route="search")
+
+        stats = provider.stats()
+        assert stats["routes"]["search"]["escalation_rate"] == 0.25
+        assert stats["tiers"]["small"]["calls"] == 4
+        assert stats["tiers"]["large"]["calls"] == 1
+
+    def test_close_closes_both_tiers(self):
+        provider, small, large = cascade(SEARCH_OK)
+        provider.close()
+        assert small.closed and large.closed
+
+
+def test_parse_thresholds():
+    thresholds = parse_thresholds("search=0.85, vibe = 0.5,bad")
+    assert thresholds["search"] == 0.85
+    assert thresholds["vibe"] == 0.5
+    assert thresholds["default"] == 0.0
@@ -0,0 +1,119 @@
+"""
+Unit tests for request deadline propagation.
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.deadline import (
+    CLIENT_DISCONNECTED,
+    Deadline,
+    DeadlineExceeded,
+    RequestCancelled,
+    await_with_deadline,
+    deadline_from_headers,
+    get_deadline,
+    run_with_deadline,
+)
+from src.metrics import metrics
+
+
+class TestDeadline:
+    """Test suite for Deadline bookkeeping."""
+
+    def test_unbounded_deadline(self):
+        deadline = Deadline()
+
+        assert deadline.remaining() is None
+        assert deadline.timeout_for(20) == 20
+        deadline.check()
+
+    def test_timeout_never_outlives_deadline(self):
+        deadline = Deadline(0.5)
+
+        assert deadline.timeout_for(20) <= 0.5
+        assert deadline.timeout_for(None) <= 0.5
+
+    def test_cancelled_deadline_raises(self):
+        deadline = Deadline(10)
+        deadline.cancel(CLIENT_DISCONNECTED)
+
+        with pytest.raises(RequestCancelled):
+            deadline.check()
+
+    def test_expired_deadline_raises(self):
+        deadline = Deadline(0)
+
+        with pytest.raises(DeadlineExceeded):
+            deadline.check()
+
+    def test_header_overrides_route_default(self):
+        deadline = deadline_from_headers({"x-request-timeout-ms": "2000"}, "search")
+
+        assert 1.5 < deadline.remaining() <= 2.0
+
+    def test_route_default_applies_without_header(self):
+        deadline = deadline_from_headers({}, "search")
+
+        assert 9 < deadline.remaining() <= 10
+
+
+class TestRunWithDeadline:
+    """Test suite for running provider calls under a deadline."""
+
+    @pytest.mark.asyncio
+    async def test_worker_sees_deadline(self):
+        deadline = Deadline(5)
+
+        result = await run_with_deadline(deadline, get_deadline)
+
+        assert result is deadline
+
+    @pytest.mark.asyncio
+    async def test_expiry_cancels_worker(self):
+        deadline = Deadline(0.2)
+        seen = {}
+
+        def slow_call():
+            current = get_deadline()
+            while not current.cancelled:
+                time.sleep(0.01)
+            seen["reason"] = current.cancel_reason
+
+        before = metrics.counter("requests_cancelled_total", route="test", reason="deadline_exceeded")
+        with pytest.raises(DeadlineExceeded):
+            await run_with_deadline(deadline, slow_call, route="test", poll_interval=0.02)
+        await asyncio.sleep(0.05)
+
+        assert seen["reason"] == "deadline_exceeded"
+        assert metrics.counter("requests_cancelled_total", route="test", reason="deadline_exceeded") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_worker(self):
+        deadline = Deadline(5)
+
+        async def disconnected():
+            return True
+
+        with pytest.raises(RequestCancelled):
+            await run_with_deadline(deadline, time.sleep, 0.3, is_disconnected=disconnected, poll_interval=0.02)
+        assert deadline.cancel_reason == CLIENT_DISCONNECTED
+
+    @pytest.mark.asyncio
+    async def test_await_with_deadline_cancels_task(self):
+        deadline = Deadline(0.1)
+        cancelled = asyncio.Event()
+
+        async def stage():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(DeadlineExceeded):
+            await await_with_deadline(deadline, stage(), stage="extract_entities", poll_interval=0.02)
+        await asyncio.sleep(0)
+
+        assert cancelled.is_set()
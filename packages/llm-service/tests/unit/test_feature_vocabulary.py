@@ -0,0 +1,97 @@
+"""
+Unit tests for feature normalization.
+"""
+import asyncio
+
+import pytest
+
+from src.nodes.filter_mapper import FilterMapperNode
+from src.nlp.feature_vocabulary import CANONICAL_FEATURES, FeatureVocabulary, edit_distance, stem
+
+
+@pytest.fixture(scope="module")
+def vocabulary():
+    return FeatureVocabulary()
+
+
+class TestFeatureVocabulary:
+    """Test mapping free-text features to canonical IDs"""
+
+    @pytest.mark.parametrize("feature, expected", [
+        ("ev_charging", "ev_charging"),
+        ("ev charger", "ev_charging"),
+        ("EV-charging", "ev_charging"),
+        ("roofed", "covered"),
+        ("indoor", "covered"),
+        ("cctv cameras", "cctv"),
+        ("24/7", "24_7_access"),
+        ("24_hours", "24_7_access"),
+        ("tesla_charging", "tesla_supercharger"),
+        ("wheelchair", "handicap_accessible"),
+        ("self parking", "self_park"),
+    ])
+    def test_synonyms_and_spellings(self, vocabulary, feature, expected):
+        assert vocabulary.normalize([feature])[0] == [expected]
+
+    @pytest.mark.parametrize("feature, expected", [
+        ("survailance", "cctv"),
+        ("valett", "valet_service"),
+        ("motorcylce", "motorcycle_allowed"),
+    ])
+    def test_misspellings_use_edit_distance(self, vocabulary, feature, expected):
+        assert vocabulary.normalize([feature])[0] == [expected]
+
+    def test_phrases_inside_longer_text(self, vocabulary):
+        ids, mask = vocabulary.normalize(["covered spot with EV charging"])
+        assert ids == ["ev_charging", "covered"]
+        assert mask == vocabulary.bits["ev_charging"] | vocabulary.bits["covered"]
+
+    def test_unknown_features_are_reported(self, vocabulary):
+        assert vocabulary.normalize(["unicorn stable", "indoor"]) == (["covered"], vocabulary.bits["covered"])
+        assert vocabulary.resolve("unicorn stable") == (0, 0, True)
+        assert vocabulary.match(["gated", "indoor"]).unknown == ["gated"]
+
+    @pytest.mark.parametrize("items, ids, excluded", [
+        (["not covered"], [], ["covered"]),
+        (["covered", "without EV charging"], ["covered"], ["ev_charging"]),
+        (["no valet or cctv", "with self parking"], ["self_park"], ["cctv", "valet_service"]),
+        (["no valet and cctv"], ["cctv"], ["valet_service"]),
+        (["covered", "not covered"], [], ["covered"]),
+    ])
+    def test_negated_features_are_excluded(self, vocabulary, items, ids, excluded):
+        match = vocabulary.match(items)
+        assert match.ids == ids
+        assert vocabulary.ids(match.excluded) == excluded
+        assert vocabulary.normalize(items)[0] == ids
+
+    def test_bits_follow_canonical_order(self, vocabulary):
+        ids, mask = vocabulary.normalize(list(CANONICAL_FEATURES))
+        assert ids == list(CANONICAL_FEATURES)
+        assert mask == (1 << len(CANONICAL_FEATURES)) - 1
+
+    def test_batch(self, vocabulary):
+        ids, masks = vocabulary.normalize_batch([["ev charger", "roof"], [], ["cctv"], ["cctv", "cameras"]])
+        assert ids == [["ev_charging", "covered"], [], ["cctv"], ["cctv"]]
+        assert masks.dtype.name == "uint32"
+        assert masks.tolist() == [0b101, 0, 64, 64]
+
+    def test_too_many_features(self):
+        with pytest.raises(ValueError):
+            FeatureVocabulary(features=[f"f{i}" for i in range(33)])
+
+
+def test_filter_mapper_passes_on_excluded_and_unknown_features():
+    mapper = FilterMapperNode()
+    mapper.place_index = None
+    state = {"entities": {"features": ["indoor", "no valet", "gated"]}}
+    filters = asyncio.run(mapper.map_to_filters(state, allow_network=False))["filters"]
+    assert filters["features"] == ["covered"]
+    assert filters["excluded_features"] == ["valet_service"]
+    assert filters["unrecognized_features"] == ["gated"]
+
+
+def test_stem_and_edit_distance():
+    assert stem("chargers") == stem("charging") == "charg"
+    assert stem("bus") == "bus"
+    assert edit_distance("valet", "valte", 1) == 1
+    assert edit_distance("covered", "camera", 2) is None
@@ -0,0 +1,163 @@
+"""
+Unit tests for the heuristic vibe scorer and the vibe cache.
+"""
+import numpy as np
+import pytest
+
+from src.cache.vibe_cache import VibeCache, vibe_key
+from src.vibe.heuristic_scorer import CATEGORIES, HeuristicVibeScorer, category_of
+
+LAT, LNG = 25.0330, 121.5654
+
+
+def pois_around(types, count, spread=0.002, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "name": f"Place {i}",
+            "type": types[i % len(types)],
+            "lat": LAT + rng.uniform(-spread, spread),
+            "lng": LNG + rng.uniform(-spread, spread),
+        }
+        for i in range(count)
+    ]
+
+
+class TestCategories:
+    """Test mapping free-form POI types to categories"""
+
+    @pytest.mark.parametrize("poi_type, category", [
+        ("restaurant", "food"),
+        ("Coffee Shop", "food"),
+        ("cafes", "food"),
+        ("bus_stop", "transit"),
+        ("MRT Station", "transit"),
+        ("parking_garage", "parking"),
+        ("business_center", "office"),
+        ("night_market", "nightlife"),
+        ("barber", "other"),
+        ("", "other"),
+    ])
+    def test_category_of(self, poi_type, category):
+        assert CATEGORIES[category_of(poi_type)] == category
+
+
+class TestHeuristicVibeScorer:
+    """Test scoring locations from POI data"""
+
+    def test_response_shape(self):
+        result = HeuristicVibeScorer().score(LAT, LNG, pois_around(["restaurant", "bar", "mall"], 30))
+
+        assert 1 <= result["vibe"]["score"] <= 10
+        assert result["vibe"]["hashtags"]
+        assert 1 <= result["parking"]["difficulty"] <= 10
+        assert result["parking"]["level"] in ("Easy", "Moderate", "Hard")
+        assert result["parking"]["tips"]
+        assert all({"method", "reason"} <= set(item) for item in result["transport"])
+
+    def test_dense_area_is_livelier_and_harder_to_park(self):
+        scorer = HeuristicVibeScorer()
+        dense = scorer.score(LAT, LNG, pois_around(["restaurant", "bar", "mall", "museum"], 200))
+        sparse = scorer.score(LAT, LNG, pois_around(["residential"], 2, spread=0.01))
+
+        assert dense["vibe"]["score"] > sparse["vibe"]["score"]
+        assert dense["parking"]["difficulty"] > sparse["parking"]["difficulty"]
+        assert dense["parking"]["level"] == "Hard"
+        assert sparse["parking"]["level"] == "Easy"
+
+    def test_parking_supply_lowers_difficulty(self):
+        scorer = HeuristicVibeScorer()
+        shops = pois_around(["restaurant", "mall"], 40)
+        garages = pois_around(["parking_garage"], 6, seed=1)
+
+        without = scorer.score(LAT, LNG, shops)["parking"]["difficulty"]
+        with_garages = scorer.score(LAT, LNG, shops + garages)["parking"]["difficulty"]
+        assert with_garages < without
+
+    def test_transit_suggests_public_transport(self):
+        result = HeuristicVibeScorer().score(LAT, LNG, pois_around(["subway_station", "bus_station"], 6))
+        assert result["transport"][0]["method"] == "Public"
+
+    def test_distant_pois_count_less(self):
+        scorer = HeuristicVibeScorer()
+        near = scorer.features(LAT, LNG, [{"name": "A", "type": "restaurant", "lat": LAT, "lng": LNG}])
+        far = scorer.features(LAT, LNG, [{"name": "B", "type": "restaurant", "lat": LAT + 0.01, "lng": LNG}])
+        assert near[CATEGORIES.index("food")] > far[CATEGORIES.index("food")] > 0
+
+    def test_pois_without_coordinates(self):
+        scorer = HeuristicVibeScorer()
+        counts = scorer.features(LAT, LNG, [{"name": "A", "type": "restaurant"}, {"name": "B", "type": "bar", "lat": "x"}])
+        assert counts[CATEGORIES.index("food")] == pytest.approx(0.5)
+        assert counts[CATEGORIES.index("nightlife")] == pytest.approx(0.5)
+
+    def test_empty_pois(self):
+        result = HeuristicVibeScorer().score(LAT, LNG, [])
+        assert result["vibe"]["summary"] == "Quiet area with few points of interest"
+        assert result["parking"]["level"] == "Easy"
+
+    def test_deterministic(self):
+        pois = pois_around(["restaurant", "bar", "park"], 50)
+        assert HeuristicVibeScorer().score(LAT, LNG, pois) == HeuristicVibeScorer().score(LAT, LNG, pois)
+
+    def test_features_from_arrays_matches_dicts(self):
+        scorer = HeuristicVibeScorer()
+        pois = pois_around(["restaurant", "bar", "subway"], 100)
+        categories = np.array([category_of(p["type"]) for p in pois])
+        lats = np.array([p["lat"] for p in pois])
+        lngs = np.array([p["lng"] for p in pois])
+
+        np.testing.assert_allclose(
+            scorer.features_from_arrays(LAT, LNG, categories, lats, lngs),
+            scorer.features(LAT, LNG, pois),
+        )
+
+    def test_custom_weights_override_defaults(self):
+        pois = pois_around(["restaurant"], 20)
+        default = HeuristicVibeScorer().score(LAT, LNG, pois)
+        tuned = HeuristicVibeScorer({"categories": {"food": {"demand": 0.0}}, "hard_min": 10}).score(LAT, LNG, pois)
+
+        assert tuned["parking"]["difficulty"] < default["parking"]["difficulty"]
+        assert tuned["vibe"] == default["vibe"]
+
+    def test_from_env_reads_weights_file(self, tmp_path, monkeypatch):
+        path = tmp_path / "weights.json"
+        path.write_text('{"vibe_bias": 5.0}')
+        monkeypatch.setenv("VIBE_HEURISTIC_WEIGHTS", str(path))
+
+        assert HeuristicVibeScorer.from_env().score(LAT, LNG, [])["vibe"]["score"] == 10
+
+    def test_from_env_falls_back_on_bad_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("VIBE_HEURISTIC_WEIGHTS", str(tmp_path / "missing.json"))
+        assert HeuristicVibeScorer.from_env().weights["vibe_bias"] == -1.5
+
+
+class TestVibeCache:
+    """Test the vibe analysis cache"""
+
+    def test_key_ignores_poi_order_and_tiny_moves(self):
+        pois = [{"name": "A", "type": "cafe"}, {"name": "B", "type": "bar"}]
+        assert vibe_key(LAT, LNG, pois) == vibe_key(LAT + 0.00001, LNG, list(reversed(pois)))
+        assert vibe_key(LAT, LNG, pois) != vibe_key(LAT, LNG, pois[:1])
+
+    def test_put_get_and_expiry(self):
+        now = [0.0]
+        cache = VibeCache(ttl_seconds=10, clock=lambda: now[0])
+        cache.put("k", "heuristic", {"vibe": {"score": 4}})
+
+        source, analysis = cache.get("k")
+        assert source == "heuristic"
+        analysis["vibe"]["score"] = 9
+        assert cache.get("k")[1]["vibe"]["score"] == 4
+
+        now[0] = 11.0
+        assert cache.get("k") is None
+
+    def test_evicts_least_recently_used(self):
+        cache = VibeCache(max_entries=2)
+        cache.put("a", "api", {})
+        cache.put("b", "api", {})
+        cache.get("a")
+        cache.put("c", "api", {})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
@@ -0,0 +1,84 @@
+"""
+Unit tests for the local intent classifier.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.nlp.intent_classifier import (
+    HashingVectorizer,
+    IntentClassifier,
+    load_intent_classifier,
+)
+
+BUNDLED_WEIGHTS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "src", "data", "intent_classifier.npz"
+)
+
+TEXTS = [
+    "find parking near downtown", "where can I park near the mall", "parking close to the station",
+    "how much is parking at lot B", "what are the hourly rates", "price to park downtown",
+]
+LABELS = ["find_parking"] * 3 + ["price_inquiry"] * 3
+
+
+class TestHashingVectorizer:
+    """Test feature hashing"""
+
+    def test_features_are_unit_length_and_stable(self):
+        vectorizer = HashingVectorizer(n_features=1024)
+        indices, values = vectorizer.features("Find parking downtown")
+        again, _ = vectorizer.features("Find parking downtown")
+
+        assert np.array_equal(indices, again)
+        assert indices.max() < 1024
+        assert np.isclose(np.linalg.norm(values), 1.0)
+
+    def test_empty_text(self):
+        indices, values = HashingVectorizer().features("  ")
+        assert len(indices) == 0 and len(values) == 0
+
+
+class TestIntentClassifier:
+    """Test training, calibration and serialization"""
+
+    @pytest.fixture
+    def classifier(self):
+        return IntentClassifier.fit(TEXTS, LABELS, vectorizer=HashingVectorizer(n_features=2048), epochs=200)
+
+    def test_fits_training_data(self, classifier):
+        assert classifier.predict("cheap parking near the station")[0] == "find_parking"
+        assert classifier.predict("what is the rate per hour")[0] == "price_inquiry"
+
+    def test_calibration_sets_temperature(self, classifier):
+        temperature = classifier.calibrate(TEXTS, LABELS)
+        assert temperature > 0
+        label, confidence = classifier.predict("how much is parking")
+        assert 0.0 < confidence <= 1.0
+
+    def test_save_and_load_round_trip(self, classifier, tmp_path):
+        classifier.temperature = 0.7
+        path = str(tmp_path / "intent.npz")
+        classifier.save(path)
+
+        loaded = IntentClassifier.load(path)
+
+        assert loaded.labels == classifier.labels
+        assert loaded.temperature == pytest.approx(0.7)
+        assert np.allclose(
+            loaded.predict_proba("parking rates downtown"),
+            classifier.predict_proba("parking rates downtown"),
+            atol=1e-2,
+        )
+
+    def test_missing_weights_file(self, tmp_path):
+        assert load_intent_classifier(str(tmp_path / "missing.npz")) is None
+        assert load_intent_classifier("") is None
+
+    def test_bundled_weights_classify_common_queries(self):
+        classifier = load_intent_classifier(os.path.abspath(BUNDLED_WEIGHTS))
+        assert classifier is not None
+        assert classifier.predict("Find parking near downtown")[0] == "find_parking"
+        assert classifier.predict("Is spot A123 available?")[0] == "check_availability"
+        assert classifier.predict("What are the parking rates?")[0] == "price_inquiry"
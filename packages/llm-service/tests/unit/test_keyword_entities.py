@@ -0,0 +1,35 @@
+"""
+Unit tests for the rule-based entity extraction behind the degraded search path.
+"""
+import pytest
+
+from src.nlp.keyword_entities import CHEAP_MAX_PRICE, extract_keyword_entities
+
+
+class TestKeywordEntities:
+    """Test locations, prices and features read without the LLM"""
+
+    @pytest.mark.parametrize("query, location", [
+        ("parking near taipei 101", "taipei 101"),
+        ("parking near taipei 101 not cheap", "taipei 101"),
+        ("parking near ximending without ev charging", "ximending"),
+        ("covered parking at songshan airport under $5", "songshan airport"),
+        ("parking near me", None),
+    ])
+    def test_location_ends_before_constraints(self, query, location):
+        assert extract_keyword_entities(query)["location"] == location
+
+    @pytest.mark.parametrize("query, max_price, min_price", [
+        ("cheap parking near taipei 101", CHEAP_MAX_PRICE, None),
+        ("parking near taipei 101 not cheap", None, None),
+        ("parking near taipei 101 under $4", 4.0, None),
+        ("parking near taipei 101 not under $4", None, None),
+        ("parking not over $3, at least $2", None, 2.0),
+    ])
+    def test_negated_prices_set_no_limit(self, query, max_price, min_price):
+        entities = extract_keyword_entities(query)
+        assert (entities["max_price"], entities["min_price"]) == (max_price, min_price)
+
+    def test_negated_features_are_left_out(self):
+        entities = extract_keyword_entities("covered parking near taipei 101 without ev charging")
+        assert entities["features"] == ["covered"]
@@ -0,0 +1,94 @@
+"""
+Unit tests for sampled, queue-backed logging.
+"""
+import logging
+import queue
+
+import pytest
+
+from src import logging_config
+from src.logging_config import NonBlockingQueueHandler, SamplingFilter, configure_logging, stop_logging
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def record(msg, level=logging.INFO, name="test", args=()):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class TestSamplingFilter:
+    """Test per-message rate limits"""
+
+    def test_limits_each_message_template_separately(self):
+        clock = FakeClock()
+        sampling = SamplingFilter(rate=1.0, burst=3, clock=clock)
+
+        kept = [sampling.filter(record("Parsed intent: %s", args=(i,))) for i in range(10)]
+        assert kept.count(True) == 3
+        assert sampling.filter(record("Mapped filters: %s", args=({},)))
+        assert sampling.dropped == 7
+
+    def test_refills_and_reports_suppressed_count(self):
+        clock = FakeClock()
+        sampling = SamplingFilter(rate=1.0, burst=1, clock=clock)
+        assert sampling.filter(record("hot path"))
+        assert not sampling.filter(record("hot path"))
+        assert not sampling.filter(record("hot path"))
+
+        clock.now = 1.0
+        resumed = record("hot path")
+        assert sampling.filter(resumed)
+        assert resumed.getMessage() == "hot path [2 similar messages suppressed]"
+
+    def test_warnings_are_never_sampled(self):
+        sampling = SamplingFilter(rate=1.0, burst=1, clock=FakeClock())
+        assert all(sampling.filter(record("upstream failed", level=logging.WARNING)) for _ in range(50))
+
+    def test_zero_rate_disables_sampling(self):
+        sampling = SamplingFilter(rate=0, burst=0, clock=FakeClock())
+        assert all(sampling.filter(record("x")) for _ in range(50))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(record("message %d", args=(i,)))
+
+    assert handler.queue.qsize() == 2
+    assert handler.queue.get_nowait().getMessage() == "message 0"
+
+
+class TestConfigureLogging:
+    """Test the lines configure_logging actually writes"""
+
+    @pytest.fixture(autouse=True)
+    def restore_root(self, monkeypatch):
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        monkeypatch.setattr(logging_config, "_listener", None)
+        yield
+        stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    @pytest.mark.parametrize("log_async", ["true", "false"])
+    def test_each_line_is_formatted_once(self, capsys, monkeypatch, log_async):
+        monkeypatch.setenv("LOG_ASYNC", log_async)
+        configure_logging("INFO", fmt="%(name)s - %(levelname)s - %(message)s")
+        logging.getLogger("x").info("hello %s", "world")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("x").exception("failed")
+        stop_logging()
+
+        lines = capsys.readouterr().err.splitlines()
+        assert lines[0] == "x - INFO - hello world"
+        assert lines[1] == "x - ERROR - failed"
+        assert lines[-1] == "ValueError: boom"
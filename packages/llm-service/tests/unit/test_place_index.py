@@ -0,0 +1,81 @@
+"""
+Unit tests for typo-tolerant place resolution.
+"""
+import random
+import string
+
+import pytest
+
+from src.config import config
+from src.geo.place_index import PlaceIndex, load_place_index, normalize_place, substring_distance
+
+
+@pytest.fixture(scope="module")
+def places():
+    return load_place_index(config.PLACES_PATH)
+
+
+class TestSubstringDistance:
+    """Test the bounded edit distance used to verify candidates"""
+
+    @pytest.mark.parametrize("pattern, text, distance", [
+        ("ximen", "near ximen station", 0),
+        ("taipei", "taipie", 1),
+        ("market", "nightmarkt", 1),
+        ("kitten", "sitting", 2),
+    ])
+    def test_distances(self, pattern, text, distance):
+        assert substring_distance(pattern, text, 3) == distance
+
+    def test_over_bound_is_none(self):
+        assert substring_distance("kitten", "sitting", 1) is None
+
+
+class TestPlaceIndex:
+    """Test resolving locations to known places"""
+
+    @pytest.mark.parametrize("location, name", [
+        ("Taipei 101", "Taipei 101"),
+        ("taipie 101", "Taipei 101"),
+        ("Taipei101", "Taipei 101"),
+        ("shilin nightmarket", "Shilin Night Market"),
+        ("ximen", "Ximending"),
+        ("da'an district", "Da'an District"),
+        ("xinyi distrct", "Xinyi District"),
+        ("near the ntu campus", "National Taiwan University"),
+        ("songshan airprot", "Songshan Airport"),
+    ])
+    def test_resolves_typos_and_aliases(self, places, location, name):
+        match = places.resolve(location)
+        assert match is not None and match.name == name
+        assert match.confidence >= config.PLACE_MATCH_MIN_CONFIDENCE
+
+    @pytest.mark.parametrize("location", ["parking", "nearby", "tsai's noodles", ""])
+    def test_unknown_locations_do_not_match(self, places, location):
+        assert places.resolve(location) is None
+
+    def test_confidence_reflects_edits(self, places):
+        assert places.resolve("taipei 101").confidence == 1.0
+        assert places.resolve("taipie 101").confidence == 0.9
+
+    def test_prefers_the_name_covering_most_of_the_query(self):
+        index = PlaceIndex([
+            {"name": "Central", "lat": 1, "lng": 1},
+            {"name": "Central Park Garage", "lat": 2, "lng": 2},
+        ])
+        assert index.resolve("central prak garage").name == "Central Park Garage"
+
+    def test_scales_to_many_places(self):
+        rng = random.Random(0)
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 9))) for _ in range(3000)]
+        names = [" ".join(rng.sample(words, 2)) for _ in range(20000)]
+        index = PlaceIndex([{"name": name, "lat": i, "lng": i} for i, name in enumerate(names)])
+
+        for name in rng.sample(names, 50):
+            typo = name[:3] + name[4] + name[3] + name[5:]
+            assert index.resolve(typo).matched == name
+
+
+def test_normalize_place():
+    assert normalize_place("  Da'an   District! ") == "daan district"
+    assert normalize_place("TAIPEI101") == "taipei 101"
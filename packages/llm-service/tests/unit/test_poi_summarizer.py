@@ -0,0 +1,100 @@
+"""
+Unit tests for POI summaries and prompt token counting.
+"""
+import pytest
+
+from src.tokens import TokenCounter
+from src.vibe.poi_summarizer import PoiSummarizer
+
+LAT, LNG = 25.0330, 121.5654
+
+
+def poi(name, poi_type, offset=None):
+    data = {"name": name, "type": poi_type}
+    if offset is not None:
+        data.update(lat=LAT + offset, lng=LNG)
+    return data
+
+
+@pytest.fixture
+def counter():
+    return TokenCounter(encoding=None)
+
+
+class TestTokenCounter:
+    """Test the token estimate used without tiktoken"""
+
+    def test_counts_words_and_punctuation(self, counter):
+        assert counter.count("") == 0
+        assert counter.count("cheap parking") == 3
+        assert counter.count("a, b") == 3
+
+    def test_observe_calibrates_the_estimate(self, counter):
+        text = "underground parking garages everywhere " * 20
+        before = counter.count(text)
+        for _ in range(50):
+            counter.observe(text, before * 2)
+        assert counter.count(text) > before * 1.5
+
+
+class TestPoiSummarizer:
+    """Test condensing POI lists for the vibe prompt"""
+
+    def test_counts_types_and_names_top_places(self, counter):
+        pois = [poi(f"Restaurant {i}", "restaurant", 0.001 * i) for i in range(14)]
+        pois += [poi(f"School {i}", "school", 0.002) for i in range(3)]
+        pois.append(poi("City Museum", "museum", 0.0005))
+
+        summary = PoiSummarizer(counter=counter).summarize(pois, LAT, LNG)
+
+        assert summary.text.startswith("18 places: 14 restaurants, 3 schools, 1 museum")
+        assert "City Museum (museum, 60m)" in summary.text
+        assert summary.text.count("Restaurant ") <= 2
+        assert summary.tokens < summary.baseline_tokens
+
+    def test_baseline_is_the_old_ten_poi_listing(self, counter):
+        pois = [poi(f"Restaurant {i}", "restaurant") for i in range(40)]
+        summary = PoiSummarizer(counter=counter).summarize(pois)
+        listing = ", ".join(f"Restaurant {i} (restaurant)" for i in range(10))
+        assert summary.baseline_tokens == counter.count(listing)
+
+    @pytest.mark.parametrize("count", [3, 10, 30, 1000])
+    def test_never_longer_than_the_listing_it_replaces(self, counter, count):
+        types = ["restaurant", "cafe", "school", "museum", "park", "convenience store", "bank"]
+        pois = [poi(f"Place Number {i}", types[i % len(types)], 0.0003 * i) for i in range(count)]
+        summary = PoiSummarizer(counter=counter).summarize(pois, LAT, LNG)
+        assert summary.tokens <= summary.baseline_tokens
+        if count >= 30:
+            assert summary.text.startswith(f"{count} places:")
+
+    def test_removes_duplicates(self, counter):
+        pois = [poi("Din Tai Fung", "restaurant"), poi("din  tai fung", "restaurant"), poi("Taipei 101", "landmark")]
+        summary = PoiSummarizer(counter=counter).summarize(pois)
+        assert summary.pois == 2
+        assert summary.text == "Taipei 101 (landmark), Din Tai Fung (restaurant)"
+
+    def test_nearby_places_rank_first(self, counter):
+        pois = [poi("Far Bar", "bar", 0.02), poi("Near Bar", "bar", 0.0001), poi("Mid Bar", "bar", 0.005)]
+        text = PoiSummarizer(per_type=1, counter=counter).summarize(pois, LAT, LNG).text
+        assert "Near Bar" in text and "Far Bar" not in text
+
+    @pytest.mark.parametrize("budget", [20, 40, 80, 160])
+    def test_respects_token_budget(self, counter, budget):
+        pois = [poi(f"Place {i}", t, 0.0003 * i) for i, t in enumerate(["cafe", "bar", "mall", "park", "hotel"] * 30)]
+        summary = PoiSummarizer(token_budget=budget, counter=counter).summarize(pois, LAT, LNG)
+        assert summary.tokens <= budget + 5
+        assert summary.text.startswith("150 places")
+
+    def test_long_type_lists_are_folded(self, counter):
+        pois = [poi(f"Place {i}", f"type{i}") for i in range(40)]
+        text = PoiSummarizer(token_budget=30, counter=counter).summarize(pois).text
+        assert "other places" in text
+
+    def test_no_pois(self, counter):
+        summary = PoiSummarizer(counter=counter).summarize([])
+        assert summary.text == "No POI data"
+        assert summary.pois == 0
+
+    def test_uncountable_types(self, counter):
+        text = PoiSummarizer(counter=counter, per_type=0).summarize([poi("A", "parking"), poi("B", "parking")]).text
+        assert text == "2 places: 2 parking"
@@ -0,0 +1,96 @@
+"""
+Unit tests for prefix-cache-friendly prompts and cached token accounting.
+"""
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from llm_providers.api_provider import OpenAICompatibleProvider
+from llm_providers.prefix_cache import PrefixCacheStats
+from src.deadline import Deadline, deadline_scope
+from src.prompts import SEARCH_PROMPT, VIBE_PROMPT
+
+
+def shared_prefix(a, b):
+    return len(os.path.commonprefix([a, b]))
+
+
+class TestPromptLayout:
+    """Test that request-specific values come after the static instructions"""
+
+    def test_search_prompt_prefix_is_static(self):
+        a = SEARCH_PROMPT.format(query="cheap parking near Taipei 101")
+        b = SEARCH_PROMPT.format(query="hello")
+        assert a[:shared_prefix(a, b)].endswith('Query: "')
+
+    def test_vibe_prompt_prefix_is_static(self):
+        a = VIBE_PROMPT.format(lat=25.03, lng=121.56, pois="3 places: 3 cafes")
+        b = VIBE_PROMPT.format(lat=37.77, lng=-122.42, pois="No POI data")
+        assert a[:shared_prefix(a, b)].endswith("Location: (")
+
+
+class TestPrefixCacheStats:
+    """Test cached prompt token totals"""
+
+    def test_hit_rate_counts_only_reporting_requests(self):
+        stats = PrefixCacheStats("test")
+        stats.record(100, 80)
+        stats.record(100, None)
+        stats.record(0, 0)
+
+        assert stats.stats() == {"requests": 2, "prompt_tokens": 200, "cached_tokens": 80, "hit_rate": 0.8}
+
+    def test_no_reports(self):
+        stats = PrefixCacheStats("test")
+        stats.record(50, None)
+        assert stats.stats()["hit_rate"] is None
+
+
+class TestApiProviderUsage:
+    """Test reading cached token counts from OpenAI-compatible responses"""
+
+    @pytest.fixture
+    def provider(self, monkeypatch):
+        monkeypatch.setenv("API_BASE_URL", "http://localhost:9/v1")
+        provider = OpenAICompatibleProvider()
+        provider.client = MagicMock()
+        return provider
+
+    def respond(self, provider, usage):
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"ok": true}'))],
+            usage=usage,
+        )
+        raw = MagicMock(headers={})
+        raw.parse.return_value = response
+        provider.client.with_options.return_value.chat.completions.with_raw_response.create.return_value = raw
+
+    def test_records_cached_tokens(self, provider):
+        self.respond(provider, SimpleNamespace(
+            prompt_tokens=400, total_tokens=420, prompt_tokens_details=SimpleNamespace(cached_tokens=384)
+        ))
+        assert provider.generate_structured("prompt", system_prompt="system") == '{"ok": true}'
+        assert provider.prefix_cache.stats()["hit_rate"] == 0.96
+
+    def test_records_cached_tokens_from_a_stream(self, provider):
+        usage = SimpleNamespace(prompt_tokens=400, total_tokens=420,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=384))
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='{"ok": true}'))], usage=None),
+                  SimpleNamespace(choices=[], usage=usage)]
+        raw = MagicMock(headers={})
+        raw.parse.return_value = MagicMock(__iter__=lambda _: iter(chunks))
+        create = provider.client.with_options.return_value.chat.completions.with_raw_response.create
+        create.return_value = raw
+        with deadline_scope(Deadline(5)):
+            assert provider.generate_structured("prompt", system_prompt="system") == '{"ok": true}'
+        assert create.call_args.kwargs["stream_options"] == {"include_usage": True}
+        assert provider.prefix_cache.stats()["hit_rate"] == 0.96
+
+    def test_endpoint_without_cache_details(self, provider):
+        self.respond(provider, SimpleNamespace(prompt_tokens=400, total_tokens=420, prompt_tokens_details=None))
+        provider.generate_structured("prompt")
+        assert provider.prefix_cache.stats() == {
+            "requests": 1, "prompt_tokens": 400, "cached_tokens": 0, "hit_rate": None
+        }
@@ -0,0 +1,165 @@
+"""
+Unit tests for the prompt and model evaluation suite.
+"""
+import json
+
+import pytest
+
+from src.evaluation.prompt_eval import (
+    TARGETS, KeywordStandIn, default_variants, evaluate, evaluate_variant, field_matches,
+    load_corpus, load_variants, pareto_front, recommend
+)
+from src.usage import Completion
+
+
+class ScriptedProvider:
+    """Answers each query with a fixed completion, found by the query text in the prompt"""
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    def generate_structured(self, prompt, system_prompt=None):
+        for query, answer in self.answers.items():
+            if query in prompt:
+                if isinstance(answer, Exception):
+                    raise answer
+                return answer
+        return "{}"
+
+
+CORPUS = [
+    {"query": "cheap parking near Taipei 101", "search_intent": "parking_search", "intent": "find_parking",
+     "entities": {"location": "Taipei 101", "features": [], "max_price": 5}},
+    {"query": "covered spot at Ximending", "search_intent": "parking_search", "intent": "find_parking",
+     "entities": {"location": "Ximending", "features": ["covered"]}},
+    {"query": "hello", "search_intent": "greeting"},
+]
+
+
+def report(target, accuracy, tokens, p95):
+    return {"target": target, "accuracy": accuracy, "tokens": {"total": tokens}, "latency_ms": {"p95": p95}}
+
+
+class TestFieldMatches:
+    """Test grading answer fields against labels"""
+
+    @pytest.mark.parametrize("field, expected, observed", [
+        ("features", ["covered", "ev_charging"], ["EV charger", "indoor"]),
+        ("features", [], None),
+        ("location", "Taipei 101", "taipei101"),
+        ("location", "Taipei Zoo", "the taipei zoo lot"),
+        ("location", None, ""),
+        ("max_price", 10, "$10"),
+        ("radius", 500, 500.0),
+        ("intent", "find_parking", "FIND_PARKING"),
+    ])
+    def test_matches(self, field, expected, observed):
+        assert field_matches(field, expected, observed)
+
+    @pytest.mark.parametrize("field, expected, observed", [
+        ("features", ["covered"], ["covered", "valet"]),
+        ("location", "Taipei 101", "Ximending"),
+        ("location", "Taipei 101", None),
+        ("max_price", 5, None),
+        ("max_price", 5, "cheap"),
+        ("intent", "find_parking", None),
+    ])
+    def test_mismatches(self, field, expected, observed):
+        assert not field_matches(field, expected, observed)
+
+
+class TestEvaluateVariant:
+    """Test accuracy, error and token accounting of one variant"""
+
+    def test_field_accuracy_errors_and_invalid_json(self):
+        provider = ScriptedProvider({
+            "cheap parking": json.dumps({"intent": {"type": "parking_search"}, "entities": {"location": "Taipei 101"},
+                                         "filters": {"max_price": 5, "required_features": []}}),
+            "covered spot": "not json",
+            "hello": TimeoutError("slow"),
+        })
+        result = evaluate_variant(provider, default_variants(["search"])[0], CORPUS, keep_misses=True)
+
+        assert result["queries"] == 3
+        assert result["errors"] == 1
+        assert result["invalid_json"] == 1
+        assert result["fields"]["max_price"] == {"correct": 1, "graded": 1, "accuracy": 1.0}
+        assert result["fields"]["intent"]["correct"] == 1
+        assert result["accuracy"] == round(4 / 8, 4)
+        assert {"query": "hello", "field": "intent", "expected": "greeting",
+                "observed": "TimeoutError: slow"} in result["misses"]
+        assert result["tokens"]["estimated"]
+
+    def test_skips_queries_without_labels_for_the_target(self):
+        provider = ScriptedProvider({})
+        result = evaluate_variant(provider, default_variants(["intent"])[0], CORPUS)
+        assert result["queries"] == 2
+
+    def test_uses_reported_tokens(self):
+        class Reporting:
+            def complete_structured(self, prompt, system_prompt=None):
+                return Completion('{"intent_type": "find_parking"}', 120, 8, 0.0, 0.05, "small")
+
+        result = evaluate_variant(Reporting(), default_variants(["intent"])[0], CORPUS)
+        assert result["accuracy"] == 1.0
+        assert result["tokens"] == {"prompt": 120.0, "completion": 8.0, "total": 128.0, "estimated": False}
+
+
+class TestChoosingVariants:
+    """Test the Pareto front and the cheapest variant holding accuracy"""
+
+    def test_pareto_front_is_per_target(self):
+        reports = {
+            "search:baseline": report("search", 0.90, 500, 900),
+            "search:short": report("search", 0.89, 300, 700),
+            "search:worse": report("search", 0.85, 400, 950),
+            "intent:baseline": report("intent", 0.50, 900, 900),
+        }
+        assert pareto_front(reports) == ["intent:baseline", "search:baseline", "search:short"]
+
+    def test_recommends_cheapest_within_tolerance_of_baseline(self):
+        reports = {
+            "search:baseline": report("search", 0.90, 500, 900),
+            "search:short": report("search", 0.89, 300, 700),
+            "search:tiny": report("search", 0.80, 100, 300),
+        }
+        assert recommend(reports, 0.02, {"search": "search:baseline"}) == {"search": "search:short"}
+        assert recommend(reports, 0.0, {"search": "search:baseline"}) == {"search": "search:baseline"}
+        assert recommend(reports, 0.2) == {"search": "search:tiny"}
+
+
+class TestVariantsAndCorpus:
+    """Test loading variants and the shipped corpus"""
+
+    def test_load_variants_from_files_and_defaults(self, tmp_path):
+        (tmp_path / "short.txt").write_text('Parking query JSON please. Query: "{query}"')
+        path = tmp_path / "variants.json"
+        path.write_text(json.dumps([
+            {"name": "search:short", "target": "search", "prompt_file": "short.txt", "model": "small"},
+            {"name": "intent:terse", "target": "intent", "system_prompt": "Classify the intent."},
+        ]))
+        short, terse = load_variants(str(path))
+        assert short.prompt.startswith("Parking query") and short.system_prompt == TARGETS["search"].system_prompt
+        assert short.model == "small"
+        assert terse.prompt == TARGETS["intent"].prompt and terse.system_prompt == "Classify the intent."
+
+    def test_rejects_unknown_target(self, tmp_path):
+        path = tmp_path / "variants.json"
+        path.write_text(json.dumps([{"name": "vibe:short", "target": "vibe"}]))
+        with pytest.raises(ValueError):
+            load_variants(str(path))
+
+    def test_keyword_stand_in_over_shipped_corpus(self):
+        corpus = load_corpus()
+        assert all("search_intent" in row for row in corpus)
+        result = evaluate(default_variants(), lambda model: KeywordStandIn(), corpus)
+
+        assert set(result["variants"]) == {"search:baseline", "intent:baseline", "entities:baseline"}
+        assert result["variants"]["search:baseline"]["fields"]["intent"]["accuracy"] == 1.0
+        assert all(variant["errors"] == 0 and variant["pareto"] for variant in result["variants"].values())
+        assert result["recommended"]["search"] == "search:baseline"
+
+    def test_variant_prompts_render_every_query(self):
+        for variant in default_variants():
+            for row in load_corpus():
+                assert row["query"] in variant.prompt.format(query=row["query"])
@@ -0,0 +1,178 @@
+"""
+Unit tests for the upstream rate limiter.
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from llm_providers.api_provider import OpenAICompatibleProvider
+from llm_providers.rate_limiter import (
+    RateLimiter,
+    RateLimitExceeded,
+    TokenBucket,
+    parse_reset_duration,
+)
+from src.deadline import Deadline, deadline_scope
+
+
+class FakeClock:
+    """Deterministic clock whose sleep advances time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket pacing."""
+
+    def test_reserve_within_capacity_does_not_wait(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, burst_seconds=10, clock=clock)
+
+        assert bucket.capacity == 10
+        assert bucket.reserve(5) == 0.0
+        assert bucket.available == 5
+
+    def test_reserve_beyond_capacity_paces(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, burst_seconds=2, clock=clock)
+
+        bucket.reserve(2)
+        # One token per second, so the next token is one second away
+        assert bucket.reserve(1) == pytest.approx(1.0)
+
+    def test_refill_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, burst_seconds=10, clock=clock)
+        bucket.reserve(10)
+
+        clock.now += 4
+        assert bucket.available == pytest.approx(4)
+
+    def test_sync_empty_budget_blocks_until_reset(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, burst_seconds=10, clock=clock)
+
+        bucket.sync(0, reset_seconds=5)
+        assert bucket.wait_time(1) == pytest.approx(6)
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter budgets and header sync."""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    def test_disabled_limiter_is_noop(self, clock):
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+        assert not limiter.enabled
+        assert limiter.acquire(1000) == 0.0
+        assert clock.sleeps == []
+
+    def test_requests_are_paced_smoothly(self, clock):
+        limiter = RateLimiter(requests_per_minute=60, burst_seconds=1, clock=clock, sleep=clock.sleep)
+
+        waits = [limiter.acquire() for _ in range(4)]
+
+        assert waits[0] == 0.0
+        assert waits[1:] == [pytest.approx(1.0)] * 3
+        assert limiter.throttled_calls == 3
+
+    def test_token_budget_limits_large_calls(self, clock):
+        limiter = RateLimiter(tokens_per_minute=600, burst_seconds=10, clock=clock, sleep=clock.sleep)
+
+        assert limiter.acquire(100) == 0.0
+        # 100 tokens per 10s burst, so another 100 needs 10 seconds of refill
+        assert limiter.acquire(100) == pytest.approx(10.0)
+
+    def test_reconcile_refunds_overestimate(self, clock):
+        limiter = RateLimiter(tokens_per_minute=600, burst_seconds=10, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire(100)
+        limiter.reconcile(100, 20)
+
+        assert limiter.stats()["tokens"]["available"] == pytest.approx(80)
+
+    def test_rejects_when_wait_exceeds_max(self, clock):
+        limiter = RateLimiter(requests_per_minute=1, burst_seconds=1, max_wait=5, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire()
+        assert limiter.rejected_calls == 1
+
+    def test_headers_clamp_remaining_budget(self, clock):
+        limiter = RateLimiter(requests_per_minute=600, burst_seconds=10, clock=clock, sleep=clock.sleep)
+
+        limiter.update_from_headers({
+            "x-ratelimit-limit-requests": "600",
+            "x-ratelimit-remaining-requests": "3",
+        })
+
+        stats = limiter.stats()
+        assert stats["requests"]["available"] == 3
+        assert stats["requests"]["server_remaining"] == 3
+        assert stats["last_header_sync"] is not None
+
+    def test_headers_teach_unknown_limits(self, clock):
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+        limiter.update_from_headers({
+            "x-ratelimit-limit-tokens": "90000",
+            "x-ratelimit-remaining-tokens": "89000",
+        })
+
+        assert limiter.enabled
+        assert limiter.stats()["tokens"]["per_minute"] == 90000
+
+    def test_retry_after_holds_requests(self, clock):
+        limiter = RateLimiter(requests_per_minute=60, burst_seconds=10, clock=clock, sleep=clock.sleep)
+
+        limiter.update_from_headers({"retry-after": "3"})
+
+        assert limiter.acquire() == pytest.approx(4.0)
+
+    @pytest.mark.parametrize("value,expected", [
+        ("1s", 1.0),
+        ("6m0s", 360.0),
+        ("250ms", 0.25),
+        ("2", 2.0),
+        ("", None),
+        (None, None),
+    ])
+    def test_parse_reset_duration(self, value, expected):
+        assert parse_reset_duration(value) == expected
+
+
+class TestApiProviderBudget:
+    """Test that API provider calls settle the token budget with reported usage"""
+
+    def test_streamed_call_reconciles_tokens(self, monkeypatch):
+        monkeypatch.setenv("API_BASE_URL", "http://localhost:9/v1")
+        clock = FakeClock()
+        provider = OpenAICompatibleProvider()
+        provider.rate_limiter = RateLimiter(tokens_per_minute=6000, burst_seconds=10, clock=clock, sleep=clock.sleep)
+        provider.client = MagicMock()
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='{"ok": true}'))], usage=None),
+                  SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=24, completion_tokens=6,
+                                                                    total_tokens=30, prompt_tokens_details=None))]
+        raw = MagicMock(headers={})
+        raw.parse.return_value = MagicMock(__iter__=lambda _: iter(chunks))
+        provider.client.with_options.return_value.chat.completions.with_raw_response.create.return_value = raw
+
+        with deadline_scope(Deadline(5)):
+            provider.complete_structured("prompt", system_prompt="system")
+
+        # The up-front estimate covers max_tokens; only the 30 tokens actually used stay spent
+        assert provider.rate_limiter.stats()["tokens"]["available"] == pytest.approx(970)
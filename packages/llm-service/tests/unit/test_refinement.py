@@ -0,0 +1,149 @@
+"""
+Unit tests for follow-up refinements and the session store behind them.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.cache.session_store import SessionStore
+from src.nlp.refinement import parse_refinement
+from src.nodes.filter_mapper import FilterMapperNode
+
+PREVIOUS = {
+    "location": "Taipei 101",
+    "features": ["covered"],
+    "max_price": 10.0,
+    "min_price": 8.0,
+    "radius": 1000,
+    "time_start": None,
+    "time_end": None,
+    "duration": None,
+}
+NOW = datetime(2026, 3, 2, 10, 0, tzinfo=timezone.utc)
+
+
+def refine(query):
+    return parse_refinement(query, PREVIOUS, now=NOW)
+
+
+class TestParseRefinement:
+    """Test reading follow-ups as changes to the previous entities"""
+
+    @pytest.mark.parametrize("query, changes", [
+        ("cheaper ones", {"max_price": 7.5, "min_price": None}),
+        ("under $6 please", {"max_price": 6.0, "min_price": None}),
+        ("any price", {"max_price": None}),
+        ("with EV charging", {"features": ["covered", "ev_charging"]}),
+        ("without the garage", {"features": []}),
+        ("no covered but with valet", {"features": ["valet_service"]}),
+        ("what about Ximending instead", {"location": "ximending"}),
+        ("Shilin night market instead", {"location": "shilin night market"}),
+        ("cheaper ones near the zoo", {"max_price": 7.5, "min_price": None, "location": "the zoo"}),
+        ("closer", {"radius": 500}),
+        ("a bit further out", {"radius": 2000}),
+        ("within 2km", {"radius": 2000}),
+    ])
+    def test_changes(self, query, changes):
+        refinement = refine(query)
+        assert refinement.changed == set(changes)
+        for field, value in changes.items():
+            assert refinement.entities[field] == value
+        for field in set(PREVIOUS) - set(changes):
+            assert refinement.entities[field] == PREVIOUS[field]
+
+    def test_times_replace_the_previous_ones(self):
+        refinement = refine("tomorrow at 3pm instead")
+        assert refinement.changed == {"time_start"}
+        assert refinement.entities["time_start"].hour == 15
+        assert refinement.entities["location"] == "Taipei 101"
+
+    def test_times_keep_what_the_follow_up_did_not_say(self):
+        start = datetime(2026, 3, 2, 13, 0, tzinfo=timezone.utc)
+        previous = dict(PREVIOUS, time_start=start, time_end=start + timedelta(hours=2), duration=120)
+
+        moved = parse_refinement("tomorrow at 3pm", previous, now=NOW).entities
+        assert moved["duration"] == 120
+        assert moved["time_end"] - moved["time_start"] == timedelta(hours=2)
+
+        longer = parse_refinement("for 3 hours instead", previous, now=NOW)
+        assert longer.changed == {"time_end", "duration"}
+        assert longer.entities["time_start"] == start
+        assert longer.entities["time_end"] == start + timedelta(hours=3)
+
+        without_duration = dict(previous, duration=None)
+        moved = parse_refinement("tomorrow at 3pm", without_duration, now=NOW).entities
+        assert moved["time_end"] - moved["time_start"] == timedelta(hours=2)
+
+    def test_cheaper_without_a_previous_cap(self):
+        refinement = parse_refinement("cheaper", dict(PREVIOUS, max_price=None, min_price=None))
+        assert refinement.entities["max_price"] == 5
+
+    @pytest.mark.parametrize("query", [
+        "hello",
+        "what is the weather like",
+        "find me covered parking near the airport tomorrow with valet and cctv for three hours",
+        "near me",
+        "what about near me",
+        "how about around here",
+        "with",
+    ])
+    def test_new_searches_are_not_refinements(self, query):
+        assert refine(query) is None
+
+    def test_does_not_change_the_previous_entities(self):
+        previous = dict(PREVIOUS, features=["covered"])
+        parse_refinement("with ev charging", previous)
+        assert previous["features"] == ["covered"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionStore:
+    """Test the bounded, expiring session store"""
+
+    def test_returns_copies(self):
+        store = SessionStore()
+        store.put("a", {"entities": {"features": ["covered"]}})
+        store.get("a")["entities"]["features"].append("valet")
+        assert store.get("a") == {"entities": {"features": ["covered"]}}
+
+    def test_idle_sessions_expire(self):
+        clock = FakeClock()
+        store = SessionStore(ttl_seconds=60, clock=clock)
+        store.put("a", {"query": "parking near Taipei 101"})
+        clock.now = 50
+        assert store.get("a") is not None
+        store.put("a", {"query": "cheaper ones"})
+        clock.now = 100
+        assert store.get("a") == {"query": "cheaper ones"}
+        clock.now = 161
+        assert store.get("a") is None
+        assert store.stats() == {"sessions": 0, "hits": 2, "misses": 1, "evictions": 1}
+
+    def test_evicts_least_recently_used(self):
+        store = SessionStore(max_entries=2)
+        store.put("a", {})
+        store.put("b", {})
+        store.get("a")
+        store.put("c", {})
+        assert store.get("b") is None
+        assert store.get("a") == {} and store.get("c") == {}
+
+
+class TestFilterMapperCoordinates:
+    """Test reusing the coordinates of an unchanged location"""
+
+    def test_skips_geocoding_with_known_coordinates(self):
+        mapper = FilterMapperNode()
+        mapper.place_index = None
+        state = {"entities": {"location": "somewhere unknown", "radius": 500}}
+        coordinates = {"lat": 25.0339, "lng": 121.5645}
+        result = asyncio.run(mapper.map_to_filters(state, coordinates=coordinates))
+        assert (result["filters"]["lat"], result["filters"]["lng"]) == (25.0339, 121.5645)
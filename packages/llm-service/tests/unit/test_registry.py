@@ -0,0 +1,220 @@
+"""
+Unit tests for the provider registry.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from llm_providers.registry import NoProviderAvailable, ProviderRegistry
+from src.deadline import Deadline, deadline_scope
+
+
+class FakeProvider:
+    """Provider whose calls can be held open to simulate in-flight work."""
+
+    def __init__(self, label, healthy=True):
+        self.label = label
+        self.healthy = healthy
+        self.closed = False
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def generate_structured(self, prompt, system_prompt=None):
+        self.started.set()
+        self.release.wait(5)
+        if self.closed:
+            raise RuntimeError("used after close")
+        return self.label
+
+    def health_check(self):
+        return {"status": "healthy" if self.healthy else "unhealthy", "available": self.healthy}
+
+    def close(self):
+        self.closed = True
+
+
+class TestProviderRegistry:
+    """Test swapping and draining providers"""
+
+    def test_no_provider(self):
+        registry = ProviderRegistry()
+        assert not registry.available
+        with pytest.raises(NoProviderAvailable):
+            registry.generate_structured("hi")
+
+    @pytest.mark.asyncio
+    async def test_reload_swaps_and_closes_old(self):
+        registry = ProviderRegistry()
+        old = FakeProvider("old")
+        registry.install(old, "api")
+        new = FakeProvider("new")
+
+        result = await registry.reload(lambda: (new, "vllm"))
+
+        assert result["success"] is True
+        assert registry.mode == "vllm"
+        assert registry.generate_structured("hi") == "new"
+        assert old.closed
+
+    @pytest.mark.asyncio
+    async def test_in_flight_call_drains_before_close(self):
+        registry = ProviderRegistry(drain_timeout=5)
+        old = FakeProvider("old")
+        old.release.clear()
+        registry.install(old, "api")
+
+        call = asyncio.ensure_future(asyncio.to_thread(registry.generate_structured, "hi"))
+        await asyncio.to_thread(old.started.wait, 5)
+
+        new = FakeProvider("new")
+        reload = asyncio.ensure_future(registry.reload(lambda: (new, "api"), name="next"))
+        await asyncio.sleep(0.1)
+
+        # New calls go to the new provider while the old one is still busy
+        assert registry.generate_structured("hi") == "new"
+        assert not old.closed
+
+        old.release.set()
+        assert await call == "old"
+        assert (await reload)["success"] is True
+        assert old.closed
+
+    @pytest.mark.asyncio
+    async def test_unhealthy_provider_is_not_swapped_in(self):
+        registry = ProviderRegistry()
+        old = FakeProvider("old")
+        registry.install(old, "api")
+        bad = FakeProvider("bad", healthy=False)
+
+        result = await registry.reload(lambda: (bad, "api"), name="bad")
+
+        assert result["success"] is False
+        assert registry.generate_structured("hi") == "old"
+        assert bad.closed
+        assert not old.closed
+
+    @pytest.mark.asyncio
+    async def test_keep_warm_and_activate(self):
+        registry = ProviderRegistry()
+        first = FakeProvider("first")
+        registry.install(first, "api", name="first")
+
+        await registry.reload(lambda: (FakeProvider("second"), "api"), name="second", keep_warm=True)
+        assert not first.closed
+        assert [entry["name"] for entry in registry.stats()["warm"]] == ["first"]
+
+        assert registry.activate("first")["success"] is True
+        assert registry.generate_structured("hi") == "first"
+        assert registry.activate("missing")["success"] is False
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reload_rejected(self):
+        registry = ProviderRegistry()
+        gate = threading.Event()
+
+        def slow_build():
+            gate.wait(5)
+            return FakeProvider("slow"), "api"
+
+        started = await registry.reload(slow_build, wait=False)
+        assert started["status"] == "started"
+        assert (await registry.reload(slow_build))["status"] == "in_progress"
+
+        gate.set()
+        await registry._reload_task
+        assert registry.mode == "api"
+
+    @pytest.mark.asyncio
+    async def test_repeated_keep_warm_reloads_keep_every_provider_reachable(self):
+        registry = ProviderRegistry()
+        providers = [FakeProvider(str(i)) for i in range(3)]
+        registry.install(providers[0], "api")
+
+        await registry.reload(lambda: (providers[1], "api"), keep_warm=True)
+        await registry.reload(lambda: (providers[2], "api"), keep_warm=True)
+
+        stats = registry.stats()
+        names = [stats["active"]["name"]] + [entry["name"] for entry in stats["warm"]]
+        assert len(set(names)) == 3
+        assert not any(provider.closed for provider in providers)
+        for name in names[1:]:
+            assert (await registry.evict(name))["success"] is True
+        assert providers[0].closed and providers[1].closed
+        assert registry.generate_structured("hi") == "2"
+
+    @pytest.mark.asyncio
+    async def test_failed_drain_first_reload_restores_the_old_provider(self):
+        registry = ProviderRegistry()
+        rebuilt = FakeProvider("rebuilt")
+        old = FakeProvider("old")
+        registry.install(old, "vllm", name="gpu", builder=lambda: (rebuilt, "vllm"))
+
+        result = await registry.reload(lambda: (FakeProvider("bad", healthy=False), "vllm"), drain_first=True)
+
+        assert result["success"] is False and result["restored"] is True
+        assert old.closed
+        assert registry.generate_structured("hi") == "rebuilt"
+        assert registry.stats()["active"]["name"] == "gpu"
+
+    @pytest.mark.asyncio
+    async def test_failed_drain_first_reload_without_a_builder(self):
+        registry = ProviderRegistry()
+        registry.install(FakeProvider("old"), "vllm")
+
+        def broken():
+            raise RuntimeError("CUDA out of memory")
+
+        result = await registry.reload(broken, drain_first=True)
+        assert result["restored"] is False
+        assert not registry.available
+
+    @pytest.mark.asyncio
+    async def test_calls_during_a_drain_first_reload_wait_for_the_new_provider(self):
+        registry = ProviderRegistry()
+        registry.install(FakeProvider("old"), "vllm")
+        building = threading.Event()
+        proceed = threading.Event()
+        new = FakeProvider("new")
+
+        def build():
+            building.set()
+            proceed.wait(5)
+            return new, "vllm"
+
+        reload = asyncio.ensure_future(registry.reload(build, drain_first=True))
+        await asyncio.to_thread(building.wait, 5)
+        assert registry.serving and not registry.available
+        call = asyncio.ensure_future(asyncio.to_thread(registry.generate_structured, "hi"))
+        await asyncio.sleep(0.05)
+        assert not call.done()
+
+        proceed.set()
+        assert (await reload)["success"] is True
+        assert await call == "new"
+
+    @pytest.mark.asyncio
+    async def test_waiting_for_a_drain_first_reload_is_bounded(self):
+        registry = ProviderRegistry(lease_timeout=5)
+        registry.install(FakeProvider("old"), "vllm")
+        building = threading.Event()
+        proceed = threading.Event()
+
+        def build():
+            building.set()
+            proceed.wait(5)
+            return FakeProvider("new"), "vllm"
+
+        reload = asyncio.ensure_future(registry.reload(build, drain_first=True))
+        await asyncio.to_thread(building.wait, 5)
+
+        def call():
+            with deadline_scope(Deadline(0.1)):
+                return registry.generate_structured("hi")
+
+        with pytest.raises(NoProviderAvailable):
+            await asyncio.to_thread(call)
+        proceed.set()
+        await reload
+        assert registry.generate_structured("hi") == "new"
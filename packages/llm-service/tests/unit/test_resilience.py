@@ -0,0 +1,162 @@
+"""
+Unit tests for the provider resilience layer.
+"""
+import pytest
+
+from llm_providers.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    RetryBudget,
+    RetryPolicy,
+    counts_as_failure,
+    is_retryable,
+)
+
+
+class StatusError(Exception):
+    """Exception carrying an HTTP status like the OpenAI SDK errors."""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    """Stand-in with the same name as the SDK timeout error."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Flaky:
+    """Callable that raises the given errors before succeeding."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def make_resilience(max_attempts=3, threshold=3, budget=None, clock=None):
+    breaker = CircuitBreaker("test", failure_threshold=threshold, recovery_timeout=10,
+                             clock=clock or FakeClock())
+    policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.01, budget=budget)
+    return Resilience("test", retry_policy=policy, breaker=breaker, sleep=lambda _: None)
+
+
+class TestErrorClassification:
+    """Test suite for retryable error classification."""
+
+    @pytest.mark.parametrize("status,retryable,failure", [
+        (400, False, False),
+        (401, False, False),
+        (404, False, False),
+        (429, True, False),
+        (500, True, True),
+        (503, True, True),
+    ])
+    def test_status_codes(self, status, retryable, failure):
+        error = StatusError(status)
+        assert is_retryable(error) is retryable
+        assert counts_as_failure(error) is failure
+
+    def test_transport_errors_are_retryable(self):
+        assert is_retryable(APITimeoutError())
+        assert is_retryable(ConnectionResetError())
+        assert not is_retryable(ValueError("bad json"))
+
+
+class TestResilience:
+    """Test suite for retries and circuit breaking."""
+
+    def test_retries_transient_errors(self):
+        resilience = make_resilience()
+        fn = Flaky(StatusError(503), APITimeoutError())
+
+        assert resilience.call(fn) == "ok"
+        assert fn.calls == 3
+
+    def test_does_not_retry_client_errors(self):
+        resilience = make_resilience()
+        fn = Flaky(StatusError(400))
+
+        with pytest.raises(StatusError):
+            resilience.call(fn)
+        assert fn.calls == 1
+
+    def test_attempts_are_bounded(self):
+        resilience = make_resilience(max_attempts=2, threshold=10)
+        fn = Flaky(*[StatusError(500)] * 5)
+
+        with pytest.raises(StatusError):
+            resilience.call(fn)
+        assert fn.calls == 2
+
+    def test_retry_budget_caps_retries(self):
+        budget = RetryBudget(ratio=0.0, min_balance=1)
+        resilience = make_resilience(max_attempts=5, threshold=10, budget=budget)
+        fn = Flaky(*[StatusError(500)] * 5)
+
+        with pytest.raises(StatusError):
+            resilience.call(fn)
+        # One initial attempt plus the single retry the budget allowed
+        assert fn.calls == 2
+
+    def test_circuit_opens_and_fails_fast(self):
+        resilience = make_resilience(max_attempts=1, threshold=2)
+        for _ in range(2):
+            with pytest.raises(StatusError):
+                resilience.call(Flaky(StatusError(502)))
+
+        fn = Flaky()
+        with pytest.raises(CircuitOpenError):
+            resilience.call(fn)
+        assert fn.calls == 0
+        assert resilience.breaker.stats()["state"] == CircuitBreaker.OPEN
+
+    def test_circuit_routes_to_fallback_when_open(self):
+        resilience = make_resilience(max_attempts=1, threshold=1)
+        with pytest.raises(StatusError):
+            resilience.call(Flaky(StatusError(500)))
+
+        assert resilience.call(Flaky(), fallback=lambda error: "fallback") == "fallback"
+
+    def test_half_open_probe_closes_circuit(self):
+        clock = FakeClock()
+        resilience = make_resilience(max_attempts=1, threshold=1, clock=clock)
+        with pytest.raises(StatusError):
+            resilience.call(Flaky(StatusError(500)))
+
+        clock.now += 11
+        assert resilience.call(Flaky()) == "ok"
+        assert resilience.breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens_circuit(self):
+        clock = FakeClock()
+        resilience = make_resilience(max_attempts=1, threshold=1, clock=clock)
+        with pytest.raises(StatusError):
+            resilience.call(Flaky(StatusError(500)))
+
+        clock.now += 11
+        with pytest.raises(StatusError):
+            resilience.call(Flaky(StatusError(500)))
+        with pytest.raises(CircuitOpenError):
+            resilience.call(Flaky())
+
+    def test_client_errors_do_not_trip_circuit(self):
+        resilience = make_resilience(max_attempts=1, threshold=1)
+        with pytest.raises(StatusError):
+            resilience.call(Flaky(StatusError(400)))
+
+        assert resilience.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,44 @@
+"""
+Unit tests for the direct JSON response path.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from src.responses import DefaultResponse, json_response
+
+
+class Answer(BaseModel):
+    success: bool
+    data: Dict[str, Any]
+    error: Optional[str] = None
+
+
+def test_json_response_matches_model():
+    model = Answer(success=True, data={"score": 7, "tags": ["#a"], "ratio": 0.5})
+    response = json_response(model, status_code=201)
+
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == model.model_dump()
+
+
+def test_route_returns_model_body_and_keeps_schema():
+    app = FastAPI(default_response_class=DefaultResponse)
+
+    @app.post("/answer", response_model=Answer)
+    async def answer():
+        return json_response(Answer(success=True, data={"nested": {"ok": True}}))
+
+    @app.get("/stats")
+    async def stats():
+        return {"count": 3, "rate": 0.25}
+
+    client = TestClient(app)
+    assert client.post("/answer").json() == {"success": True, "data": {"nested": {"ok": True}}, "error": None}
+    assert client.get("/stats").json() == {"count": 3, "rate": 0.25}
+    schema = client.get("/openapi.json").json()
+    assert "Answer" in schema["components"]["schemas"]
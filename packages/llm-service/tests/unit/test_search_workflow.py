@@ -0,0 +1,109 @@
+"""
+Unit tests for the search workflow's stage budgets and degraded fallbacks.
+"""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langgraph.graph")
+pytest.importorskip("langchain_openai")
+
+from src.deadline import Deadline, deadline_scope, get_deadline
+from src.nodes.filter_mapper import FilterMapperNode
+from src.workflows.search_workflow import SearchWorkflow
+
+QUERY = "covered parking near taipei 101 not cheap"
+
+
+@pytest.fixture
+def workflow():
+    # Stages only need their budgets and the filter mapper, not the LLM nodes
+    workflow = SearchWorkflow.__new__(SearchWorkflow)
+    workflow.stage_budgets = {"parse_intent": 0.05, "extract_entities": 0.05, "map_filters": 0.05}
+    workflow.filter_mapper = FilterMapperNode()
+    return workflow
+
+
+def state(**values):
+    return dict({"query": QUERY, "user_location": None, "intent": None, "entities": None, "filters": None}, **values)
+
+
+async def slow(state):
+    await asyncio.sleep(5)
+    return state
+
+
+class TestStages:
+    """Test that stages over their budget are cut off and replaced by their fallback"""
+
+    @pytest.mark.asyncio
+    async def test_slow_intent_defaults_to_find_parking(self, workflow):
+        stage = workflow._stage("parse_intent", slow, workflow._fallback_intent)
+        started = time.perf_counter()
+        result = await stage(state())
+        assert time.perf_counter() - started < 1
+        assert result["intent"]["intent_type"] == "find_parking"
+        assert result["degraded_stages"] == ["parse_intent"]
+
+    @pytest.mark.asyncio
+    async def test_slow_extraction_uses_keywords(self, workflow):
+        stage = workflow._stage("extract_entities", slow, workflow._fallback_entities)
+        result = await stage(state())
+        assert result["entities"]["location"] == "taipei 101"
+        assert result["entities"]["features"] == ["covered"]
+        assert result["entities"]["max_price"] is None
+        assert result["degraded_stages"] == ["extract_entities"]
+
+    @pytest.mark.asyncio
+    async def test_slow_mapping_skips_network_geocoding(self, workflow):
+        entities = {"location": None, "features": ["covered"], "max_price": 4, "radius": 500}
+        stage = workflow._stage("map_filters", slow, workflow._fallback_filters)
+        result = await stage(state(entities=entities, user_location={"lat": 25.0339, "lng": 121.5645},
+                                   degraded_stages=["extract_entities"]))
+        assert (result["filters"]["lat"], result["filters"]["max_price"]) == (25.0339, 4.0)
+        assert result["degraded_stages"] == ["extract_entities", "map_filters"]
+
+    @pytest.mark.asyncio
+    async def test_fast_stage_is_not_degraded(self, workflow):
+        async def parse(state):
+            state["intent"] = {"intent_type": "price_inquiry", "confidence": 0.9}
+            return state
+
+        result = await workflow._stage("parse_intent", parse, workflow._fallback_intent)(state())
+        assert result["intent"]["intent_type"] == "price_inquiry"
+        assert not result.get("degraded_stages")
+
+
+class TestStageDeadlines:
+    """Test that stage deadlines are children of the request deadline"""
+
+    @pytest.mark.asyncio
+    async def test_stage_budget_is_capped_by_the_request(self, workflow):
+        workflow.stage_budgets["parse_intent"] = 5
+        seen = []
+
+        async def parse(state):
+            seen.append(get_deadline())
+            return await slow(state)
+
+        request = Deadline(0.1)
+        with deadline_scope(request):
+            result = await workflow._stage("parse_intent", parse, workflow._fallback_intent)(state())
+        assert seen[0].parent is request and seen[0].expires_at <= request.expires_at
+        assert result["degraded_stages"] == ["parse_intent"]
+
+    @pytest.mark.asyncio
+    async def test_stage_overrun_leaves_the_request_running(self, workflow):
+        seen = []
+
+        async def extract(state):
+            seen.append(get_deadline())
+            return await slow(state)
+
+        request = Deadline(5)
+        with deadline_scope(request):
+            result = await workflow._stage("extract_entities", extract, workflow._fallback_entities)(state())
+        assert seen[0].expires_at < request.expires_at
+        assert result["degraded_stages"] == ["extract_entities"]
+        request.check()
@@ -0,0 +1,111 @@
+"""
+Unit tests for the near-duplicate query cache.
+"""
+import pytest
+
+from src.cache.similarity_cache import SimilarityCache, normalize_tokens
+from src.nlp.keyword_entities import extract_keyword_entities, split_features
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNormalizeTokens:
+    """Test query normalization"""
+
+    def test_splits_letters_and_digits(self):
+        assert normalize_tokens("Taipei101") == normalize_tokens("taipei 101")
+
+    def test_drops_stopwords_and_maps_synonyms(self):
+        assert normalize_tokens("affordable parking by the mall") == normalize_tokens("cheap parking near mall")
+
+
+class TestNegatedFeatures:
+    """Test reading negated features out of a query"""
+
+    @pytest.mark.parametrize("query, requested, negated", [
+        ("covered parking with ev charging", ["covered", "ev_charging"], []),
+        ("covered parking without ev charging", ["covered"], ["ev_charging"]),
+        ("no covered or valet near the station", [], ["covered", "valet"]),
+        ("not covered but cctv", ["surveillance"], ["covered"]),
+    ])
+    def test_split_features(self, query, requested, negated):
+        assert split_features(query) == (requested, negated)
+        assert extract_keyword_entities(query)["features"] == requested
+
+
+class TestSimilarityCache:
+    """Test lookup, verification and eviction"""
+
+    @pytest.fixture
+    def cache(self):
+        cache = SimilarityCache(max_entries=3)
+        cache.put("cheap parking near taipei 101", {"filters": {"max_price": 5}})
+        return cache
+
+    @pytest.mark.parametrize("query", [
+        "cheap parking by Taipei101",
+        "parking near taipei 101 that's cheap",
+        "Cheap parking near Taipei 101!",
+    ])
+    def test_near_duplicates_hit(self, cache, query):
+        match = cache.lookup(query)
+        assert match is not None
+        assert match.value == {"filters": {"max_price": 5}}
+        assert match.matched_query == "cheap parking near taipei 101"
+
+    @pytest.mark.parametrize("query", [
+        "cheap parking near taipei 102",
+        "parking near taipei 101",
+        "cheap parking near taipei 101 tomorrow",
+        "how much is parking near the stadium",
+    ])
+    def test_different_queries_miss(self, cache, query):
+        assert cache.lookup(query) is None
+
+    @pytest.mark.parametrize("query", [
+        "covered parking without ev charging near taipei 101",
+        "covered parking with no ev charging near taipei 101",
+    ])
+    def test_negated_features_miss(self, query):
+        cache = SimilarityCache()
+        cache.put("covered parking with ev charging near taipei 101", {"filters": {"features": ["covered", "ev_charging"]}})
+        assert cache.lookup(query) is None
+        assert cache.rejected == 1
+
+    def test_negations_of_the_same_feature_hit(self):
+        cache = SimilarityCache(threshold=0.6)
+        cache.put("covered parking without ev charging near taipei 101", {"filters": {"features": ["covered"]}})
+        assert cache.lookup("covered parking with no ev charging near taipei 101") is not None
+
+    def test_context_must_match(self, cache):
+        assert cache.lookup("cheap parking by Taipei101", context="zh") is None
+
+    def test_returned_value_is_a_copy(self, cache):
+        cache.lookup("cheap parking by Taipei101").value["filters"]["max_price"] = 99
+        assert cache.lookup("cheap parking by Taipei101").value["filters"]["max_price"] == 5
+
+    def test_lru_eviction(self, cache):
+        cache.put("parking near city hall", 1)
+        cache.put("ev charging near the mall", 2)
+        cache.lookup("cheap parking by Taipei101")
+        cache.put("covered parking near the stadium", 3)
+
+        assert cache.stats()["entries"] == 3
+        assert cache.stats()["evictions"] == 1
+        assert cache.lookup("parking near city hall") is None
+        assert cache.lookup("cheap parking near taipei 101") is not None
+        assert cache.lookup("covered parking by the stadium").value == 3
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = SimilarityCache(ttl_seconds=60, clock=clock)
+        cache.put("parking near city hall", 1)
+        clock.now = 61
+        assert cache.lookup("parking near city hall") is None
+        assert cache.stats()["entries"] == 0
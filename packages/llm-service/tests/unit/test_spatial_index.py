@@ -0,0 +1,148 @@
+"""
+Unit tests for the in-memory spatial index of parking spots.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from src.geo.spatial_index import SpotIndex, load_spots
+from src.ranking.spot_ranker import SpotRanker
+
+TAIPEI_101 = {"lat": 25.0339, "lng": 121.5645}
+FEATURES = [["covered", "security"], ["EV charger"], ["outdoor"], [], ["covered", "ev"], ["valet"]]
+
+
+def random_spots(count, seed=3, spread=0.05):
+    rng = np.random.default_rng(seed)
+    return [{
+        "id": f"spot-{i}",
+        "lat": TAIPEI_101["lat"] + float(rng.uniform(-spread, spread)),
+        "lng": TAIPEI_101["lng"] + float(rng.uniform(-spread, spread)),
+        "price": round(float(rng.uniform(1, 12)), 2),
+        "available": bool(rng.random() > 0.3),
+        "features": FEATURES[int(rng.integers(len(FEATURES)))],
+    } for i in range(count)]
+
+
+def ids(ranking):
+    return [spot["id"] for spot in ranking.spots]
+
+
+@pytest.fixture(scope="module")
+def spots():
+    return random_spots(3000)
+
+
+@pytest.fixture(scope="module")
+def index(spots):
+    index = SpotIndex(cell_m=200)
+    index.load(spots)
+    return index
+
+
+class TestQuery:
+    """Test that indexed queries answer like a scan of every spot"""
+
+    @pytest.mark.parametrize("filters", [
+        dict(TAIPEI_101, radius=500),
+        dict(TAIPEI_101, radius=1500, max_price=5, available=True),
+        dict(TAIPEI_101, radius=2000, features=["covered"], feature_mask=4),
+        {"lat": 25.06, "lng": 121.53, "radius": 800, "min_price": 6},
+        dict(TAIPEI_101, radius=50000),
+        {"max_price": 2},
+    ])
+    def test_matches_a_full_scan(self, index, spots, filters):
+        indexed = index.query(filters, top_k=0)
+        scanned = SpotRanker().rank(spots, filters, top_k=0)
+        assert ids(indexed) == ids(scanned)
+        assert indexed.matched == scanned.matched
+        if "lat" in filters and filters["radius"] < 5000:
+            assert indexed.considered < len(spots)
+
+    def test_top_k(self, index):
+        ranking = index.query(dict(TAIPEI_101, radius=1000), top_k=5)
+        assert len(ranking.spots) == 5
+        assert ranking.matched > 5
+
+    def test_returns_copies(self, index):
+        spot = index.query(dict(TAIPEI_101, radius=1000), top_k=1).spots[0]
+        spot["price"] = -1
+        assert index.get(spot["id"])["price"] != -1
+
+
+class TestUpdates:
+    """Test upserts and deletes"""
+
+    def test_partial_update_of_availability(self):
+        index = SpotIndex()
+        index.load([dict(TAIPEI_101, id="a", price=3.0, features=["covered"])])
+        filters = dict(TAIPEI_101, radius=100, available=True)
+        assert ids(index.query(filters)) == ["a"]
+
+        assert index.upsert({"id": "a", "available": False}) is False
+        assert ids(index.query(filters)) == []
+        assert index.get("a")["features"] == ["covered"]
+
+    def test_moved_spot_changes_cell(self):
+        index = SpotIndex(cell_m=100)
+        index.upsert(dict(TAIPEI_101, id="a"))
+        index.upsert({"id": "a", "lat": 25.0478, "lng": 121.5170})
+        assert ids(index.query(dict(TAIPEI_101, radius=200))) == []
+        assert ids(index.query({"lat": 25.0478, "lng": 121.5170, "radius": 200})) == ["a"]
+        assert index.stats()["cells"] == 1
+
+    def test_delete_and_reuse_rows(self):
+        index = SpotIndex(capacity=2)
+        for i in range(5):
+            assert index.upsert(dict(TAIPEI_101, id=str(i), price=float(i)))
+        assert index.delete("2") and not index.delete("2")
+        assert index.upsert(dict(TAIPEI_101, id="new", price=9.0))
+        assert len(index) == 5
+        assert sorted(ids(index.query(dict(TAIPEI_101, radius=100), top_k=0))) == ["0", "1", "3", "4", "new"]
+        assert sorted(ids(index.query({}, top_k=0))) == ["0", "1", "3", "4", "new"]
+
+    def test_updates_match_a_fresh_load(self):
+        spots = random_spots(500, seed=9)
+        incremental = SpotIndex()
+        for spot in spots:
+            incremental.upsert(spot)
+        for spot in spots[::3]:
+            incremental.delete(spot["id"])
+        for spot in spots[1::3]:
+            incremental.upsert({"id": spot["id"], "price": 1.0})
+
+        expected = [dict(spot, price=1.0) if i % 3 == 1 else spot for i, spot in enumerate(spots) if i % 3]
+        fresh = SpotIndex()
+        fresh.load(expected)
+        filters = dict(TAIPEI_101, radius=3000, max_price=6)
+        assert ids(incremental.query(filters, top_k=0)) == ids(fresh.query(filters, top_k=0))
+
+    def test_spots_without_coordinates_only_match_without_a_location(self):
+        index = SpotIndex()
+        index.load([{"id": "a", "price": 2.0}, {"id": "b", "lat": None, "lng": None}])
+        assert ids(index.query(dict(TAIPEI_101, radius=50000))) == []
+        assert ids(index.query({})) == ["a", "b"]
+
+
+class TestSnapshot:
+    """Test loading snapshot files"""
+
+    @pytest.mark.parametrize("layout", ["array", "object", "ndjson"])
+    def test_formats(self, tmp_path, layout, mock_parking_data):
+        path = tmp_path / "spots.json"
+        if layout == "array":
+            path.write_text(json.dumps(mock_parking_data))
+        elif layout == "object":
+            path.write_text(json.dumps({"spots": mock_parking_data}))
+        else:
+            path.write_text("\n".join(json.dumps(spot) for spot in mock_parking_data))
+        assert [spot["id"] for spot in load_spots(str(path))] == ["spot-001", "spot-002"]
+
+    def test_from_env(self, tmp_path, monkeypatch, mock_parking_data):
+        path = tmp_path / "spots.json"
+        path.write_text(json.dumps(mock_parking_data + [dict(mock_parking_data[0], price=1.0)]))
+        monkeypatch.setenv("SPOT_INDEX_PATH", str(path))
+        index = SpotIndex.from_env()
+        assert len(index) == 2
+        assert index.get("spot-001")["price"] == 1.0
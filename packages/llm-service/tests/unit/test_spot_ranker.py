@@ -0,0 +1,106 @@
+"""
+Unit tests for vectorized spot ranking against parsed filters.
+"""
+import numpy as np
+import pytest
+
+from src.geo.distance import haversine_m
+from src.ranking.spot_ranker import SpotRanker, parse_weights
+
+TAIPEI_101 = (25.0339, 121.5645)
+
+
+def spot(spot_id, meters_north, price, features=(), available=True):
+    # About 111,195 meters per degree of latitude
+    return {"id": spot_id, "lat": TAIPEI_101[0] + meters_north / 111195.0, "lng": TAIPEI_101[1],
+            "price": price, "available": available, "features": list(features)}
+
+
+SPOTS = [
+    spot("near-cheap", 100, 2.0, ["covered", "EV charger"]),
+    spot("near-dear", 150, 9.0, ["covered"]),
+    spot("far", 1800, 1.0, ["covered", "ev"]),
+    spot("taken", 50, 1.0, ["indoor"], available=False),
+    spot("open-air", 200, 3.0, ["outdoor"]),
+]
+FILTERS = {"lat": TAIPEI_101[0], "lng": TAIPEI_101[1], "radius": 1000, "available": True}
+
+
+def ids(ranking):
+    return [s["id"] for s in ranking.spots]
+
+
+class TestRank:
+    """Test masks, scores and ordering"""
+
+    def test_radius_and_availability(self):
+        ranking = SpotRanker().rank(SPOTS, FILTERS)
+        assert ids(ranking) == ["near-cheap", "open-air", "near-dear"]
+        assert (ranking.matched, ranking.considered) == (3, 5)
+        assert ranking.spots[0]["distance_m"] == pytest.approx(100, abs=1)
+
+    def test_price_bounds(self):
+        ranking = SpotRanker().rank(SPOTS, dict(FILTERS, max_price=5, min_price=2.5))
+        assert ids(ranking) == ["open-air"]
+
+    def test_workflow_features_must_all_match(self):
+        filters = dict(FILTERS, features=["covered", "ev_charging"])
+        assert ids(SpotRanker().rank(SPOTS, filters)) == ["near-cheap"]
+
+    def test_search_route_features_and_any_match(self):
+        filters = dict(FILTERS, required_features=["EV charging", "outdoor"])
+        assert ids(SpotRanker().rank(SPOTS, filters)) == []
+        assert ids(SpotRanker().rank(SPOTS, filters, require_all_features=False)) == ["near-cheap", "open-air"]
+
+    def test_negated_and_excluded_features(self):
+        assert ids(SpotRanker().rank(SPOTS, dict(FILTERS, features=["not covered"]))) == ["open-air"]
+        filters = dict(FILTERS, feature_mask=0, excluded_mask=SpotRanker().required_mask({"features": ["ev"]}))
+        assert ids(SpotRanker().rank(SPOTS, filters)) == ["open-air", "near-dear"]
+
+    def test_without_a_location_every_spot_is_in_range(self):
+        ranking = SpotRanker().rank(SPOTS, {"max_price": 3})
+        assert ids(ranking) == ["far", "taken", "near-cheap", "open-air"]
+        assert "distance_m" not in ranking.spots[0]
+
+    def test_top_k_keeps_the_best(self):
+        rng = np.random.default_rng(7)
+        spots = [spot(f"s{i}", float(rng.uniform(0, 2000)), float(rng.uniform(1, 10)), ["covered"])
+                 for i in range(5000)]
+        ranking = SpotRanker().rank(spots, FILTERS, top_k=10)
+        full = SpotRanker().rank(spots, FILTERS, top_k=0)
+        assert ids(ranking) == ids(full)[:10]
+        scores = [s["score"] for s in full.spots]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_missing_and_invalid_values(self):
+        spots = [
+            {"id": "no-coordinates", "price": 1.0},
+            {"id": "bad-price", "lat": TAIPEI_101[0], "lng": TAIPEI_101[1], "price": "free"},
+            {"id": "ok", "lat": TAIPEI_101[0], "lng": TAIPEI_101[1], "price": "2.5"},
+        ]
+        assert ids(SpotRanker().rank(spots, FILTERS)) == ["ok", "bad-price"]
+        assert ids(SpotRanker().rank(spots, dict(FILTERS, max_price=3))) == ["ok"]
+
+    def test_conftest_spots(self, mock_parking_data):
+        filters = {"lat": 40.7128, "lng": -74.0060, "radius": 500, "features": ["security"]}
+        ranking = SpotRanker().rank(mock_parking_data, filters)
+        assert ids(ranking) == ["spot-001"]
+        assert ranking.spots[0]["name"] == "Downtown Garage A"
+
+    def test_distances_match_scalar_haversine(self):
+        ranking = SpotRanker().rank(SPOTS, dict(FILTERS, radius=5000), top_k=0)
+        for s in ranking.spots:
+            assert s["distance_m"] == pytest.approx(haversine_m(*TAIPEI_101, s["lat"], s["lng"]), abs=0.1)
+
+
+class TestWeights:
+    """Test score weights"""
+
+    def test_parse_weights(self):
+        assert parse_weights("distance=0.2, price=0.8") == {"distance": 0.2, "price": 0.8, "features": 0.2}
+        assert parse_weights(None) == {"distance": 0.5, "price": 0.3, "features": 0.2}
+
+    def test_price_weight_prefers_cheaper_over_closer(self):
+        spots = [spot("closer", 50, 6.0), spot("cheaper", 600, 1.0)]
+        assert ids(SpotRanker(weights={"distance": 1.0, "price": 0.0}).rank(spots, FILTERS)) == ["closer", "cheaper"]
+        assert ids(SpotRanker(weights={"distance": 0.1, "price": 1.0}).rank(spots, FILTERS)) == ["cheaper", "closer"]
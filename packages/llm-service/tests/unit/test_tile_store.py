@@ -0,0 +1,72 @@
+"""
+Unit tests for the vibe tile store.
+"""
+import os
+
+import pytest
+
+from src.vibe.tile_store import TileStoreReader, VibeTileStore, tile_center, tile_key, write_tile_store
+
+RESOLUTION = 250.0
+
+
+def make_tile(lat, lng, score=7, summary="Lively area"):
+    key = tile_key(lat, lng, RESOLUTION)
+    center_lat, center_lng = tile_center(key, RESOLUTION)
+    return {
+        "key": key,
+        "lat": center_lat,
+        "lng": center_lng,
+        "poi_count": 3,
+        "poi_hash": 42,
+        "vibe": {"score": score, "summary": summary, "hashtags": ["#food", "#nightlife"]},
+        "parking": {"difficulty": 6, "level": "moderate", "tips": ["Arrive early"], "hashtags": ["#garage"]},
+        "transport": [{"method": "Walk", "reason": "Compact area"}],
+    }
+
+
+class TestTileStore:
+    """Test writing and reading tile stores"""
+
+    @pytest.fixture
+    def store_path(self, tmp_path):
+        path = str(tmp_path / "vibes.tiles")
+        tiles = [make_tile(25.0 + i * 0.01, 121.5 + j * 0.01) for i in range(10) for j in range(10)]
+        write_tile_store(path, tiles, RESOLUTION)
+        return path
+
+    def test_tile_key_round_trip(self):
+        key = tile_key(25.0338, 121.5645, RESOLUTION)
+        lat, lng = tile_center(key, RESOLUTION)
+        assert tile_key(lat, lng, RESOLUTION) == key
+        assert abs(lat - 25.0338) < 0.003 and abs(lng - 121.5645) < 0.003
+
+    def test_lookup_returns_record(self, store_path):
+        reader = TileStoreReader(store_path)
+        tile = reader.get(25.05, 121.53)
+
+        assert len(reader) == 100
+        assert tile["vibe"] == {"score": 7, "summary": "Lively area", "hashtags": ["#food", "#nightlife"]}
+        assert tile["parking"]["level"] == "Moderate"
+        assert tile["parking"]["tips"] == ["Arrive early"]
+        assert tile["transport"] == [{"method": "Walk", "reason": "Compact area"}]
+        assert tile["poi_hash"] == 42
+
+    def test_missing_tile(self, store_path):
+        assert TileStoreReader(store_path).get(10.0, 10.0) is None
+
+    def test_rewrite_is_picked_up(self, store_path):
+        store = VibeTileStore(store_path, check_interval=0)
+        assert store.get(25.0, 121.5)["vibe"]["score"] == 7
+
+        write_tile_store(store_path, [make_tile(25.0, 121.5, score=3)], RESOLUTION)
+        os.utime(store_path, (1, 1))
+
+        assert store.get(25.0, 121.5)["vibe"]["score"] == 3
+        assert store.stats()["tiles"] == 1
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"\x00" * 128)
+        with pytest.raises(ValueError):
+            TileStoreReader(str(path))
@@ -0,0 +1,92 @@
+"""
+Unit tests for the time expression parser.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.nlp.time_expressions import TimeExpressionParser, compile_grammar, load_timezone
+
+TAIPEI = load_timezone("Asia/Taipei")
+# A Monday afternoon
+NOW = datetime(2026, 10, 19, 15, 10, tzinfo=TAIPEI)
+
+
+def at(days, hour, minute=0):
+    return (NOW + timedelta(days=days)).replace(hour=hour, minute=minute)
+
+
+@pytest.fixture
+def parser():
+    return TimeExpressionParser(tz=TAIPEI, clock=lambda: NOW)
+
+
+class TestTimeExpressionParser:
+    """Test parsing and resolution against the reference clock"""
+
+    @pytest.mark.parametrize("query, start", [
+        ("parking tomorrow 2pm", at(1, 14)),
+        ("covered parking tomorrow", at(1, 9)),
+        ("spot at 9:15 a.m. the day after tomorrow", at(2, 9, 15)),
+        ("parking on friday evening", at(4, 18)),
+        ("next monday morning", at(7, 9)),
+        ("garage this weekend", at(5, 9)),
+        ("tonight", at(0, 19)),
+        ("parking at 5", at(0, 17)),
+        ("parking at 16:30", at(0, 16, 30)),
+        ("at noon", at(1, 12)),
+    ])
+    def test_start_times(self, parser, query, start):
+        assert parser.parse(query).start == start
+
+    def test_relative_offsets(self, parser):
+        assert parser.parse("ev charging in 30 minutes").start == at(0, 15, 40)
+        assert parser.parse("in half an hour").start == at(0, 15, 40)
+        assert parser.parse("in an hour").start == at(0, 16, 10)
+
+    def test_time_already_passed_today_means_tomorrow(self, parser):
+        assert parser.parse("parking at 9am").start == at(1, 9)
+        assert parser.parse("parking today at 9am").start == at(0, 9)
+
+    def test_current_daypart_starts_now(self, parser):
+        assert parser.parse("this afternoon").start == at(0, 15, 10)
+
+    @pytest.mark.parametrize("query, start, end", [
+        ("parking 2-5pm tomorrow", at(1, 14), at(1, 17)),
+        ("from 11 to 2pm on wednesday", at(2, 11), at(2, 14)),
+        ("between 9:30 and 11am tomorrow", at(1, 9, 30), at(1, 11)),
+        ("parking 10pm-2am", at(0, 22), at(1, 2)),
+        ("until 6pm", at(0, 15, 10), at(0, 18)),
+    ])
+    def test_ranges(self, parser, query, start, end):
+        times = parser.parse(query)
+        assert (times.start, times.end) == (start, end)
+        assert times.duration_minutes == (end - start).total_seconds() // 60
+
+    def test_durations(self, parser):
+        times = parser.parse("tomorrow 2pm for 3 hours")
+        assert (times.end, times.duration_minutes) == (at(1, 17), 180)
+        assert parser.parse("for an hour and a half").duration_minutes == 90
+        assert parser.parse("for 45 mins").start is None
+
+    @pytest.mark.parametrize("query", [
+        "cheap parking under $10 within 500m",
+        "24/7 garage near taipei 101",
+        "2 to 5 spots",
+        "parking for 3 cars",
+    ])
+    def test_ignores_numbers_that_are_not_times(self, parser, query):
+        assert parser.parse(query) == (None, None, None, [])
+
+    def test_resolves_in_parser_timezone(self, parser):
+        utc_now = datetime(2026, 10, 19, 7, 10, tzinfo=timezone.utc)
+        assert parser.parse("tomorrow 2pm", now=utc_now).start == at(1, 14)
+        assert parser.parse("now", now=utc_now).start.utcoffset() == timedelta(hours=8)
+
+    def test_grammar_is_compiled_once(self):
+        assert TimeExpressionParser().pattern is TimeExpressionParser().pattern
+        assert compile_grammar.cache_info().currsize >= 1
+
+
+def test_unknown_timezone_falls_back_to_utc():
+    assert load_timezone("Mars/Olympus_Mons") is timezone.utc
@@ -0,0 +1,181 @@
+"""
+Unit tests for traffic recording and replay.
+"""
+import os
+import gzip
+import json
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_providers.replay_provider import RecordingProvider, ReplayChatModel, ReplayMiss, ReplayProvider
+from src.replay.recorder import (
+    Recording,
+    RotatingNdjsonWriter,
+    TrafficRecorder,
+    TrafficRecorderMiddleware,
+    read_traffic,
+    record_call,
+    record_stage,
+    traffic_files,
+)
+
+
+class FakeProvider:
+    model = "fake"
+
+    def generate_structured(self, prompt, system_prompt=None, **kwargs):
+        if prompt == "fail":
+            raise TimeoutError("upstream")
+        return json.dumps({"echo": prompt})
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+def recorded(calls):
+    return [{"calls": [
+        {"prompt": prompt, "system_prompt": system, "response": response, "error": error, "latency_ms": 5}
+        for prompt, system, response, error in calls
+    ]}]
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), paths=["/echo"])
+    yield recorder
+    recorder.close()
+
+
+class TestRecorder:
+    """Test capturing requests to rotating gzip files"""
+
+    def test_writer_rotates_and_keeps_newest_files(self, tmp_path):
+        writer = RotatingNdjsonWriter(str(tmp_path), max_bytes=20, max_files=2)
+        for i in range(5):
+            writer.write(json.dumps({"i": i, "pad": "x" * 10}).encode() + b"\n")
+        writer.close()
+
+        files = traffic_files([str(tmp_path)])
+        assert len(files) == 2
+        assert [record["i"] for record in read_traffic(files)] == [3, 4]
+
+    def test_read_traffic_stops_at_truncated_tail(self, tmp_path):
+        path = tmp_path / "traffic-partial.ndjson.gz"
+        data = gzip.compress(b"".join(json.dumps({"i": i}).encode() + b"\n" for i in range(50)))
+        path.write_bytes(data[:-12])
+
+        records = list(read_traffic([str(path)]))
+        assert records
+        assert [record["i"] for record in records] == list(range(len(records)))
+
+    def test_recording_ignores_calls_after_close(self):
+        recording = Recording("POST", "/echo")
+        recording.add_call({"prompt": "a"})
+        recording.add_stage("parse", 0.002)
+        record = recording.close()
+        recording.add_call({"prompt": "late"})
+
+        assert [call["prompt"] for call in record["calls"]] == ["a"]
+        assert record["stages"] == {"parse": 2.0}
+
+    def test_nested_scopes_share_one_recording(self, recorder):
+        with recorder.recording("POST", "/echo") as outer:
+            with recorder.recording("CALL", "workflow:search") as inner:
+                record_stage("parse", 0.001)
+            assert inner is outer
+        recorder.close()
+
+        records = list(read_traffic([recorder.directory]))
+        assert len(records) == 1
+        assert records[0]["stages"] == {"parse": 1.0}
+
+    def test_record_call_outside_a_recording_is_ignored(self):
+        record_call("prompt", None, "response", 0.1)
+
+    def test_middleware_records_request_response_and_calls(self, recorder):
+        provider = RecordingProvider(FakeProvider())
+        app = FastAPI()
+
+        @app.post("/echo")
+        async def echo(body: dict):
+            return json.loads(provider.generate_structured(body["q"], system_prompt="sys"))
+
+        @app.post("/other")
+        async def other(body: dict):
+            return body
+
+        app.add_middleware(TrafficRecorderMiddleware, recorder=recorder)
+        client = TestClient(app)
+        assert client.post("/echo", json={"q": "hello"}).json() == {"echo": "hello"}
+        assert client.post("/other", json={"q": "skipped"}).status_code == 200
+        recorder.close()
+
+        records = list(read_traffic([recorder.directory]))
+        assert len(records) == 1
+        record = records[0]
+        assert (record["method"], record["path"], record["status"]) == ("POST", "/echo", 200)
+        assert record["request"] == {"q": "hello"}
+        assert record["response"] == {"echo": "hello"}
+        assert record["calls"][0]["prompt"] == "hello"
+        assert record["calls"][0]["system_prompt"] == "sys"
+        assert json.loads(record["calls"][0]["response"]) == {"echo": "hello"}
+
+    def test_recording_provider_records_failures(self, recorder):
+        provider = RecordingProvider(FakeProvider())
+        with recorder.recording("POST", "/echo") as recording:
+            with pytest.raises(TimeoutError):
+                provider.generate_structured("fail")
+        assert recording.calls[0]["error"] == "TimeoutError: upstream"
+        assert recording.calls[0]["response"] is None
+        assert provider.model == "fake"
+
+    def test_from_env_is_off_without_directory(self, monkeypatch):
+        monkeypatch.delenv("TRAFFIC_RECORD_DIR", raising=False)
+        assert TrafficRecorder.from_env() is None
+
+
+class TestReplayProvider:
+    """Test answering prompts from recorded completions"""
+
+    def test_replays_in_recorded_order_and_rotates(self):
+        replay = ReplayProvider(recorded([("q", "sys", "first", None), ("q", "sys", "second", None)]),
+                                latency="instant")
+        answers = [replay.generate_structured("q", system_prompt="sys") for _ in range(3)]
+        assert answers == ["first", "second", "first"]
+        assert replay.stats() == {"recorded": 2, "replayed": 3, "misses": 0}
+
+    def test_system_prompt_is_part_of_the_key(self):
+        replay = ReplayProvider(recorded([("q", "sys", "answer", None)]), latency="instant")
+        with pytest.raises(ReplayMiss):
+            replay.generate_structured("q", system_prompt="other")
+        assert replay.stats()["misses"] == 1
+
+    def test_recorded_errors_are_raised(self):
+        replay = ReplayProvider(recorded([("q", None, None, "TimeoutError: upstream")]), latency="instant")
+        with pytest.raises(RuntimeError, match="TimeoutError"):
+            replay.generate_structured("q")
+
+    def test_chat_model_splits_system_and_user_messages(self):
+        replay = ReplayProvider(recorded([("user", "system", '{"ok": true}', None)]), latency="recorded")
+        chat = ReplayChatModel(replay)
+        response = asyncio.run(chat.ainvoke([FakeMessage("system"), FakeMessage("user")]))
+        assert response.content == '{"ok": true}'
+
+    def test_rejects_unknown_latency_mode(self):
+        with pytest.raises(ValueError):
+            ReplayProvider([], latency="fast")
+
+    def test_round_trip_through_recording_files(self, recorder):
+        provider = RecordingProvider(FakeProvider())
+        with recorder.recording("POST", "/echo"):
+            provider.generate_structured("a", system_prompt="sys")
+        recorder.close()
+
+        replay = ReplayProvider(read_traffic([recorder.directory]), latency="instant")
+        assert json.loads(replay.generate_structured("a", system_prompt="sys")) == {"echo": "a"}
+        assert os.listdir(recorder.directory)
@@ -0,0 +1,181 @@
+"""
+Unit tests for per-request and per-route token usage accounting.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from llm_providers import api_provider
+from llm_providers.api_provider import OpenAICompatibleProvider
+from src.deadline import Deadline, deadline_scope, run_with_deadline
+from src.usage import Completion, UsageStats, parse_prices, usage_scope
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def completion(prompt=100, generated=20, model="big", queued=0.5, generating=2.0):
+    return Completion("{}", prompt, generated, queued, generating, model)
+
+
+class TestUsageStats:
+    """Test totals per route and model and the rolling window"""
+
+    def test_totals_per_route_and_model(self):
+        stats = UsageStats(prices=parse_prices("big=10/30"))
+        stats.record(completion(), route="search")
+        stats.record(completion(model="small"), route="search")
+        stats.record(completion(prompt=300, generated=40), route="vibe")
+
+        result = stats.stats()
+        assert set(result["routes"]) == {"search", "vibe"}
+        assert set(result["routes"]["search"]) == {"big", "small"}
+        vibe = result["routes"]["vibe"]["big"]
+        assert (vibe["prompt_tokens"], vibe["completion_tokens"]) == (300, 40)
+        assert vibe["completion_tokens_per_second"] == 20.0
+        assert vibe["cost_usd"] == pytest.approx((300 * 10 + 40 * 30) / 1e6)
+        assert result["routes"]["search"]["small"]["cost_usd"] is None
+        assert result["totals"]["calls"] == 3
+        assert result["totals"]["queue_ms"] == 1500.0
+
+    def test_rolling_window_drops_old_completions(self):
+        clock = FakeClock()
+        stats = UsageStats(window_seconds=60, clock=clock)
+        clock.now += 120
+        stats.record(completion(prompt=600, generated=60), route="search")
+        clock.now += 90
+        stats.record(completion(prompt=1200, generated=120), route="search")
+
+        rolling = stats.stats()["rolling"]
+        assert rolling["calls"] == 1
+        assert rolling["prompt_tokens_per_second"] == 20.0
+        assert rolling["completion_tokens_per_second"] == 2.0
+        assert stats.stats()["totals"]["prompt_tokens"] == 1800
+
+    def test_route_comes_from_the_request_deadline(self):
+        stats = UsageStats()
+
+        async def call():
+            return await run_with_deadline(Deadline(5, route="vibe"), stats.record, completion())
+
+        asyncio.run(call())
+        assert list(stats.stats()["routes"]) == ["vibe"]
+
+    def test_parse_prices_keeps_slashes_in_model_names(self):
+        assert parse_prices("openai/gpt-oss-20b=0.1/0.5, mini=0.15") == {
+            "openai/gpt-oss-20b": (0.1, 0.5),
+            "mini": (0.15, 0.0),
+        }
+
+
+class TestRequestUsage:
+    """Test counting the completions of one request"""
+
+    def test_completions_in_worker_threads_count_for_the_request(self):
+        stats = UsageStats()
+
+        async def serve():
+            with usage_scope() as usage:
+                await run_with_deadline(Deadline(5, route="search"), stats.record, completion(model="small"))
+                await run_with_deadline(Deadline(5, route="search"), stats.record, completion())
+            return usage.close()
+
+        summary = asyncio.run(serve())
+        assert summary["calls"] == 2
+        assert summary["prompt_tokens"] == 200
+        assert summary["models"] == {"small": 1, "big": 1}
+
+    def test_closed_request_ignores_late_completions(self):
+        stats = UsageStats()
+        with usage_scope() as usage:
+            summary = usage.close()
+            stats.record(completion(), route="vibe")
+        assert summary["calls"] == 0
+        assert usage.totals.calls == 0
+        assert stats.stats()["totals"]["calls"] == 1
+
+
+class TestProviderUsage:
+    """Test token counts and timings of API provider completions"""
+
+    @pytest.fixture
+    def provider(self, monkeypatch):
+        monkeypatch.setenv("API_BASE_URL", "http://localhost:9/v1")
+        provider = OpenAICompatibleProvider()
+        provider.client = MagicMock()
+        return provider
+
+    def respond(self, provider, usage, text='{"ok": true}'):
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=usage,
+        )
+        raw = MagicMock(headers={})
+        raw.parse.return_value = response
+        provider.client.with_options.return_value.chat.completions.with_raw_response.create.return_value = raw
+
+    def stream(self, provider, usage, text='{"ok": true}'):
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+                  for part in (text[:5], text[5:])]
+        chunks.append(SimpleNamespace(choices=[], usage=usage))
+        raw = MagicMock(headers={})
+        raw.parse.return_value = MagicMock(__iter__=lambda _: iter(chunks))
+        provider.client.with_options.return_value.chat.completions.with_raw_response.create.return_value = raw
+
+    def create(self, provider):
+        return provider.client.with_options.return_value.chat.completions.with_raw_response.create
+
+    def test_streams_ask_for_usage_until_rejected(self, provider):
+        self.stream(provider, None)
+        create = self.create(provider)
+        raw = create.return_value
+        request = httpx.Request("POST", "http://localhost:9/v1/chat/completions")
+        # The provider's own exception class, as other tests replace the openai module
+        rejected = api_provider.BadRequestError("unknown field stream_options",
+                                                response=httpx.Response(400, request=request), body=None)
+        create.side_effect = [rejected, raw, raw]
+        with deadline_scope(Deadline(5)):
+            assert provider.complete_structured("prompt").text == '{"ok": true}'
+            provider.complete_structured("prompt")
+        sent = [call.kwargs for call in create.call_args_list]
+        assert [kwargs["stream"] for kwargs in sent] == [True, True, True]
+        assert sent[0]["stream_options"] == {"include_usage": True}
+        assert "stream_options" not in sent[1] and "stream_options" not in sent[2]
+        assert not provider.stream_usage
+
+    def test_reported_token_counts(self, provider):
+        self.respond(provider, SimpleNamespace(prompt_tokens=400, completion_tokens=12, total_tokens=412,
+                                               prompt_tokens_details=None))
+        result = provider.complete_structured("prompt", system_prompt="system")
+        assert (result.text, result.prompt_tokens, result.completion_tokens) == ('{"ok": true}', 400, 12)
+        assert result.model == provider.model
+        assert not result.estimated
+        assert result.generation_seconds >= 0 and result.queue_seconds >= 0
+
+    def test_streamed_call_records_reported_usage(self, provider):
+        self.stream(provider, SimpleNamespace(prompt_tokens=400, completion_tokens=12, total_tokens=412,
+                                              prompt_tokens_details=None))
+        with usage_scope() as usage, deadline_scope(Deadline(5)):
+            result = provider.complete_structured("prompt", system_prompt="system")
+        summary = usage.close()
+        assert (result.text, result.prompt_tokens, result.completion_tokens) == ('{"ok": true}', 400, 12)
+        assert not result.estimated
+        assert summary["calls"] == 1 and summary["estimated_calls"] == 0
+        assert (summary["prompt_tokens"], summary["completion_tokens"]) == (400, 12)
+
+    def test_estimates_when_usage_is_missing(self, provider):
+        self.respond(provider, None, text='{"intent": {"type": "greeting"}}')
+        with usage_scope() as usage:
+            provider.generate_structured("hello there", system_prompt="Answer in JSON")
+        summary = usage.close()
+        assert summary["calls"] == 1
+        assert summary["estimated_calls"] == 1
+        assert summary["prompt_tokens"] > 0 and summary["completion_tokens"] > 0
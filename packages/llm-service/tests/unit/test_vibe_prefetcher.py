@@ -0,0 +1,178 @@
+"""
+Unit tests for speculative vibe prefetching after a search resolves a location.
+"""
+import asyncio
+
+from src.cache.vibe_cache import VibeCache, vibe_key
+from src.vibe.prefetcher import VibePrefetcher
+
+ANALYSIS = {"vibe": {"score": 8}, "parking": {"difficulty": 7}, "transport": []}
+TAIPEI_101 = {"lat": 25.0339, "lng": 121.5645, "radius": 500}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowAnalysis:
+    """Counts calls and answers once released"""
+
+    def __init__(self, result=("api", ANALYSIS)):
+        self.result = result
+        self.calls = []
+        self.release = None
+
+    async def __call__(self, lat, lng):
+        self.calls.append((lat, lng))
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def bound(analysis, busy=None, **kwargs):
+    cache = VibeCache()
+    prefetcher = VibePrefetcher(**kwargs)
+    prefetcher.bind(analysis, cache, busy=busy)
+    return prefetcher, cache
+
+
+def run(scenario):
+    """Run scenario(release) on a fresh loop, with release() letting analyses finish"""
+    async def main():
+        event = asyncio.Event()
+
+        async def release():
+            event.set()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        return await scenario(event, release)
+    return asyncio.run(main())
+
+
+class TestPrefetch:
+    """Test scheduling, deduplication and budgets"""
+
+    def test_fills_the_key_of_a_vibe_request_without_pois(self):
+        analysis = SlowAnalysis()
+        prefetcher, cache = bound(analysis)
+
+        async def scenario(event, release):
+            analysis.release = event
+            assert prefetcher.prefetch(TAIPEI_101) == "scheduled"
+            await release()
+
+        run(scenario)
+        assert analysis.calls == [(25.0339, 121.5645)]
+        assert cache.get(vibe_key(25.03391, 121.56452, [])) == ("api", ANALYSIS)
+        assert prefetcher.stats()["outcomes"] == {"scheduled": 1, "stored": 1}
+
+    def test_deduplicates_in_flight_and_cached_locations(self):
+        analysis = SlowAnalysis()
+        prefetcher, cache = bound(analysis, max_in_flight=4)
+
+        async def scenario(event, release):
+            analysis.release = event
+            outcomes = [prefetcher.prefetch(TAIPEI_101), prefetcher.prefetch(dict(TAIPEI_101, lat=25.03392))]
+            await release()
+            outcomes.append(prefetcher.prefetch(TAIPEI_101))
+            return outcomes
+
+        assert run(scenario) == ["scheduled", "duplicate", "cached"]
+        assert len(analysis.calls) == 1
+        assert cache.stats()["hits"] == 0
+
+    def test_gives_way_to_interactive_load_and_its_own_limit(self):
+        analysis = SlowAnalysis()
+        load = {"busy": True}
+        prefetcher, _ = bound(analysis, busy=lambda: load["busy"], max_in_flight=1)
+
+        async def scenario(event, release):
+            analysis.release = event
+            outcomes = [prefetcher.prefetch(TAIPEI_101)]
+            load["busy"] = False
+            outcomes.append(prefetcher.prefetch(TAIPEI_101))
+            outcomes.append(prefetcher.prefetch({"lat": 25.0478, "lng": 121.5170}))
+            await release()
+            return outcomes
+
+        assert run(scenario) == ["busy", "scheduled", "busy"]
+
+    def test_per_minute_budget(self):
+        clock = FakeClock()
+        analysis = SlowAnalysis()
+        prefetcher, _ = bound(analysis, max_in_flight=10, per_minute=2, clock=clock)
+        spots = [{"lat": 25.0 + i / 100, "lng": 121.5} for i in range(4)]
+
+        async def scenario(event, release):
+            analysis.release = event
+            outcomes = [prefetcher.prefetch(spot) for spot in spots[:3]]
+            clock.now += 61
+            outcomes.append(prefetcher.prefetch(spots[3]))
+            await release()
+            return outcomes
+
+        assert run(scenario) == ["scheduled", "scheduled", "budget", "scheduled"]
+
+    def test_filters_without_coordinates_or_unbound(self):
+        prefetcher = VibePrefetcher()
+        assert prefetcher.prefetch(TAIPEI_101) == "skipped"
+        prefetcher.bind(SlowAnalysis(), VibeCache())
+        assert prefetcher.prefetch({"radius": 500, "features": []}) == "skipped"
+        assert prefetcher.stats()["outcomes"] == {}
+
+    def test_failed_and_empty_analyses_store_nothing(self):
+        for result, outcome in ((None, "empty"), (RuntimeError("model down"), "failed")):
+            analysis = SlowAnalysis(result)
+            prefetcher, cache = bound(analysis)
+
+            async def scenario(event, release):
+                analysis.release = event
+                prefetcher.prefetch(TAIPEI_101)
+                await release()
+
+            run(scenario)
+            assert cache.stats()["entries"] == 0
+            assert prefetcher.stats()["outcomes"][outcome] == 1
+            assert prefetcher.stats()["in_flight"] == 0
+
+
+class TestWait:
+    """Test vibe requests joining a prefetch in flight"""
+
+    def test_waits_for_the_prefetch_then_finds_it_cached(self):
+        analysis = SlowAnalysis()
+        prefetcher, cache = bound(analysis)
+        key = vibe_key(TAIPEI_101["lat"], TAIPEI_101["lng"], [])
+
+        async def scenario(event, release):
+            analysis.release = event
+            prefetcher.prefetch(TAIPEI_101)
+            waiter = asyncio.ensure_future(prefetcher.wait(key))
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            event.set()
+            return await waiter, cache.get(key)
+
+        assert run(scenario) == (True, ("api", ANALYSIS))
+
+    def test_cancelled_waiter_leaves_the_prefetch_running(self):
+        analysis = SlowAnalysis()
+        prefetcher, cache = bound(analysis)
+        key = vibe_key(TAIPEI_101["lat"], TAIPEI_101["lng"], [])
+
+        async def scenario(event, release):
+            analysis.release = event
+            prefetcher.prefetch(TAIPEI_101)
+            waiter = asyncio.ensure_future(prefetcher.wait(key))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await release()
+            return await prefetcher.wait(key)
+
+        assert run(scenario) is False
+        assert cache.get(key) == ("api", ANALYSIS)